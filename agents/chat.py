@@ -5,7 +5,7 @@
 
 Особенности:
 - Кэширование ответов на типовые вопросы (FAQ)
-- Поддержка истории диалога
+- Поддержка истории диалога (упаковка в контекстное окно по токенам)
 - Различные стили общения
 - Автоматический веб-поиск для запросов, требующих актуальной информации
 """
@@ -16,8 +16,10 @@ from dataclasses import dataclass
 from infrastructure.local_llm import create_llm_for_stage
 from infrastructure.cache import get_cache
 from infrastructure.web_search import web_search
-from infrastructure.ast_analyzer import ProjectAnalyzer, analyze_code_structure
+from infrastructure.ast_analyzer import analyze_code_structure, get_project_analyzer
+from utils.config import get_config
 from utils.logger import get_logger
+from utils.tokenizer import MESSAGE_TOKEN_OVERHEAD, get_tokenizer, take_recent_within_budget
 
 
 logger = get_logger()
@@ -97,7 +99,8 @@ class ChatAgent:
         self,
         model: Optional[str] = None,
         temperature: float = 0.3,
-        max_tokens: int = 2048
+        max_tokens: int = 2048,
+        context_window: Optional[int] = None
     ):
         """Инициализирует ChatAgent.
         
@@ -105,6 +108,8 @@ class ChatAgent:
             model: Модель Ollama (None = автовыбор)
             temperature: Температура генерации (выше для креативности)
             max_tokens: Максимум токенов в ответе
+            context_window: Контекстное окно модели в токенах
+                (None = [interaction] context_window_tokens)
         """
         self.llm = create_llm_for_stage(
             stage="chat",
@@ -115,6 +120,7 @@ class ChatAgent:
         self.max_tokens = max_tokens
         self.temperature = temperature
         self.model = model
+        self.context_window = context_window or get_config().interaction_context_window_tokens
         # Кэш для результатов определения необходимости веб-поиска
         self._web_search_cache: Dict[str, bool] = {}
         logger.info(f"✅ ChatAgent инициализирован (модель: {model or 'auto'})")
@@ -205,7 +211,9 @@ class ChatAgent:
         
         try:
             # Используем нативный chat API — модель сама применит правильный шаблон и stop-токены
-            response = self.llm.chat(messages=messages)
+            # num_ctx — окно, под которое упакована история: без него Ollama
+            # берёт своё окно по умолчанию и молча обрезает начало промпта
+            response = self.llm.chat(messages=messages, options={"num_ctx": self.context_window})
             
             logger.info(f"✅ ChatAgent: получен ответ ({len(response)} символов)")
             
@@ -243,6 +251,11 @@ class ChatAgent:
         Модель сама применит правильный шаблон (Gemma, Llama, etc.)
         и stop-токены. Это исключает проблемы с кастомной разметкой.
         
+        История упаковывается по токенам: в контекстное окно за вычетом
+        ответа (max_tokens), системного промпта и текущего сообщения
+        попадают самые новые сообщения. Системные сообщения истории
+        (суммаризация диалога) добавляются к системному промпту.
+        
         Args:
             message: Текущее сообщение пользователя
             history: История диалога
@@ -260,16 +273,31 @@ class ChatAgent:
             today = datetime.now().strftime("%d %B %Y")
             full_system += f"\n\n---\nСегодняшняя дата: {today}\n\nАктуальная информация из веб-поиска:\n{web_context}"
         
-        messages.append({"role": "system", "content": full_system})
-        
         # Добавляем историю диалога
+        dialog: List[Dict[str, str]] = []
         if history:
             for msg in history:
                 role = msg.get("role", "user")
                 content = msg.get("content", "")
                 # Ollama chat API поддерживает только user/assistant/system
                 if role in ("user", "assistant"):
-                    messages.append({"role": role, "content": content})
+                    dialog.append({"role": role, "content": content})
+                elif role == "system" and content:
+                    full_system += f"\n\n{content}"
+        
+        messages.append({"role": "system", "content": full_system})
+        
+        tokenizer = get_tokenizer(self.llm.model or self.model)
+        budget = (
+            self.context_window - self.max_tokens
+            - tokenizer.count(full_system) - tokenizer.count(message) - 2 * MESSAGE_TOKEN_OVERHEAD
+        )
+        fitted = take_recent_within_budget(
+            dialog, budget, lambda m: tokenizer.count(m["content"]) + MESSAGE_TOKEN_OVERHEAD
+        )
+        if len(fitted) < len(dialog):
+            logger.debug(f"✂️ ChatAgent: история сокращена до {len(fitted)} из {len(dialog)} сообщений (бюджет {budget} токенов)")
+        messages.extend(fitted)
         
         # Текущее сообщение пользователя
         messages.append({"role": "user", "content": message})
@@ -482,7 +510,8 @@ class ChatAgent:
         # Phase 6: AST анализ для точных метрик
         ast_report = ""
         try:
-            analyzer = ProjectAnalyzer()
+            # Общий анализатор проекта: повторно разбираются только изменённые файлы
+            analyzer = get_project_analyzer(project_path)
             stats = analyzer.analyze_project(project_path)
             
             # Форматируем AST метрики
@@ -1,17 +1,30 @@
 """ConversationMemory для управления историей диалога.
 
 Хранит историю сообщений с автоматической суммаризацией
-при превышении лимита контекста.
+при превышении лимита контекста. Персистентность — через
+ConversationStore (agents/conversation_store.py): диалоги загружаются с
+диска при первом обращении, новое сообщение дописывается в хранилище
+без перезаписи всего диалога.
+
+Суммаризация (вызов LLM) по умолчанию выполняется в фоновом потоке, вне
+пути запроса: add_message только ставит диалог в очередь. Пока новая
+суммаризация не готова, get_context отдаёт прежнюю суммаризацию и все
+ещё не суммаризированные сообщения.
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Set
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
 from datetime import datetime, timezone, timedelta
+import threading
+import time
 import uuid
-import json
 from pathlib import Path
+from agents.conversation_store import ConversationStore, create_conversation_store
 from infrastructure.local_llm import LocalLLM
 from utils.logger import get_logger
 from utils.config import get_config
+from utils.tokenizer import MESSAGE_TOKEN_OVERHEAD, Tokenizer, get_tokenizer, take_recent_within_budget
 
 
 logger = get_logger()
@@ -36,6 +49,23 @@ class ConversationMessage:
     content: str
     timestamp: datetime
     metadata: Optional[Dict[str, Any]] = None
+    # Токены сообщения по токенизатору (Tokenizer.name), не сериализуется
+    _token_counts: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    
+    def token_count(self, tokenizer: Tokenizer) -> int:
+        """Токены сообщения в контексте LLM (со служебными токенами шаблона).
+        
+        Args:
+            tokenizer: Токенизатор модели
+            
+        Returns:
+            Количество токенов (вычисляется один раз на токенизатор)
+        """
+        count = self._token_counts.get(tokenizer.name)
+        if count is None:
+            count = tokenizer.count(self.content) + MESSAGE_TOKEN_OVERHEAD
+            self._token_counts[tokenizer.name] = count
+        return count
     
     def to_dict(self) -> Dict[str, Any]:
         """Конвертирует в словарь."""
@@ -108,11 +138,23 @@ class Conversation:
         """
         return self.messages[-count:] if len(self.messages) > count else self.messages
     
-    def get_context_for_llm(self, max_messages: int = 10) -> List[Dict[str, str]]:
+    def get_context_for_llm(
+        self,
+        max_messages: int = 10,
+        tail_from: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> List[Dict[str, str]]:
         """Возвращает контекст для LLM.
         
         Args:
             max_messages: Максимум сообщений (не считая суммаризации)
+            tail_from: Индекс, с которого сообщения включаются все, даже сверх
+                max_messages (не покрытые суммаризацией)
+            token_budget: Бюджет токенов на суммаризацию и сообщения
+                (None — без ограничения); сообщения берутся от новых к
+                старым, пока помещаются
+            model: Модель, токенизатором которой считается бюджет
             
         Returns:
             Список сообщений в формате [{role, content}]
@@ -127,7 +169,15 @@ class Conversation:
             })
         
         # Добавляем последние сообщения
-        recent = self.get_recent_messages(max_messages)
+        if tail_from is not None and len(self.messages) - tail_from > max_messages:
+            recent = self.messages[tail_from:]
+        else:
+            recent = self.get_recent_messages(max_messages)
+        
+        if token_budget is not None:
+            tokenizer = get_tokenizer(model)
+            used = sum(tokenizer.count(m["content"]) + MESSAGE_TOKEN_OVERHEAD for m in result)
+            recent = take_recent_within_budget(recent, token_budget - used, lambda m: m.token_count(tokenizer))
         for msg in recent:
             result.append({
                 "role": msg.role,
@@ -167,8 +217,9 @@ class ConversationMemory:
     
     Функции:
     - Хранение истории сообщений по conversation_id
-    - Автоматическая суммаризация при превышении лимита
-    - Персистентность на диск (опционально)
+    - Автоматическая суммаризация при превышении лимита (в фоне,
+      одна задача на диалог)
+    - Персистентность на диск (опционально, ленивая загрузка диалогов)
     - Получение контекста для LLM
     - TTL для автоочистки старых диалогов
     - Лимит на количество диалогов в памяти
@@ -198,7 +249,9 @@ class ConversationMemory:
         persist_dir: Optional[str] = None,
         summarization_model: Optional[str] = None,
         max_conversations: int = DEFAULT_MAX_CONVERSATIONS,
-        ttl_hours: int = DEFAULT_TTL_HOURS
+        ttl_hours: int = DEFAULT_TTL_HOURS,
+        storage_backend: str = "sqlite",
+        background_summarization: bool = True
     ):
         """Инициализирует ConversationMemory.
         
@@ -208,19 +261,36 @@ class ConversationMemory:
             summarization_model: Модель для суммаризации (None = auto)
             max_conversations: Максимальное количество диалогов в памяти
             ttl_hours: Время жизни неактивного диалога в часах
+            storage_backend: Хранилище на диске: "sqlite" или "json" (прежний формат)
+            background_summarization: Суммаризировать в фоновом потоке
+                (False — синхронно внутри add_message)
         """
         self.max_messages = max_messages_before_summary
         self.persist_dir = Path(persist_dir) if persist_dir else None
+        # Загруженные диалоги; при персистентности — кэш поверх хранилища
         self.conversations: Dict[str, Conversation] = {}
         self._llm: Optional[LocalLLM] = None
         self._summarization_model = summarization_model
         self.max_conversations = max_conversations
         self.ttl_hours = ttl_hours
-        
-        # Создаём директорию если нужно
-        if self.persist_dir:
-            self.persist_dir.mkdir(parents=True, exist_ok=True)
-            self._load_conversations()
+        self.background_summarization = background_summarization
+        
+        # Фоновая суммаризация: очередь диалогов (под _summary_lock).
+        # Диалог в очереди или в работе не ставится повторно — задача
+        # суммаризирует сообщения, накопившиеся к её запуску
+        self._summary_lock = threading.Lock()
+        self._summary_executor: Optional[ThreadPoolExecutor] = None
+        self._summary_queued: Set[str] = set()
+        self._summary_running: Set[str] = set()
+        self._summary_futures: Set[Future] = set()
+        self._summary_latencies: deque = deque(maxlen=100)
+        self._summary_counters = {"completed": 0, "failed": 0, "coalesced": 0}
+        self._closed = False
+        
+        # Диалоги с диска не читаются: загрузка при первом обращении
+        self._store: Optional[ConversationStore] = (
+            create_conversation_store(storage_backend, self.persist_dir) if self.persist_dir else None
+        )
         
         # Очищаем просроченные диалоги при старте
         self._cleanup_expired()
@@ -250,8 +320,10 @@ class ConversationMemory:
         Returns:
             Объект Conversation
         """
-        if conversation_id and conversation_id in self.conversations:
-            return self.conversations[conversation_id]
+        if conversation_id:
+            existing = self.get_conversation(conversation_id)
+            if existing is not None:
+                return existing
         
         # Проверяем лимит перед созданием нового диалога
         self._enforce_limit()
@@ -260,10 +332,73 @@ class ConversationMemory:
         new_id = conversation_id or str(uuid.uuid4())
         conversation = Conversation(id=new_id)
         self.conversations[new_id] = conversation
+        if self._store:
+            self._store.save_header(conversation)
         
         logger.info(f"📝 Создан новый диалог: {new_id}")
         return conversation
     
+    def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """Возвращает диалог, загружая его из хранилища при первом обращении.
+        
+        Args:
+            conversation_id: ID диалога
+            
+        Returns:
+            Объект Conversation или None если диалога нет
+        """
+        conversation = self.conversations.get(conversation_id)
+        if conversation is not None or not self._store:
+            return conversation
+        
+        data = self._store.load(conversation_id)
+        if data is None:
+            return None
+        try:
+            conversation = Conversation.from_dict(data)
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка загрузки диалога {conversation_id}: {e}")
+            return None
+        self.conversations[conversation_id] = conversation
+        return conversation
+    
+    def list_conversations(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """Возвращает диалоги для списка (без сообщений), новые первые.
+        
+        При персистентности — запрос к хранилищу по индексу, диалоги не
+        загружаются.
+        
+        Args:
+            limit: Размер страницы (None — все)
+            offset: Смещение страницы
+            
+        Returns:
+            Список словарей: id, created_at, updated_at (ISO), message_count,
+            has_summary, first_user_message, last_message
+        """
+        if self._store:
+            return self._store.list_conversations(limit=limit, offset=offset)
+        
+        items = []
+        for conv in sorted(self.conversations.values(), key=lambda c: _ensure_utc(c.updated_at), reverse=True):
+            first_user = next((m.content for m in conv.messages if m.role == "user"), None)
+            items.append({
+                "id": conv.id,
+                "created_at": _ensure_utc(conv.created_at).isoformat(),
+                "updated_at": _ensure_utc(conv.updated_at).isoformat(),
+                "message_count": len(conv.messages),
+                "has_summary": conv.summary is not None,
+                "first_user_message": first_user,
+                "last_message": conv.messages[-1].content if conv.messages else None
+            })
+        return items[offset:] if limit is None else items[offset:offset + limit]
+    
+    def count_conversations(self) -> int:
+        """Количество диалогов (в хранилище или в памяти)."""
+        if self._store:
+            return self._store.count()
+        return len(self.conversations)
+    
     def add_message(
         self,
         conversation_id: str,
@@ -288,47 +423,119 @@ class ConversationMemory:
         message = conversation.add_message(role, content, metadata)
         
         # Проверяем нужна ли суммаризация
-        unsummarized = len(conversation.messages) - conversation.summarized_count
-        if auto_summarize and unsummarized > self.max_messages:
-            self._summarize_conversation(conversation)
-        
-        # Сохраняем на диск
-        if self.persist_dir:
-            self._save_conversation(conversation)
+        if auto_summarize and self._needs_summary(conversation):
+            if self.background_summarization:
+                self._schedule_summary(conversation.id)
+            else:
+                self._summarize_conversation(conversation)
+        
+        # Дописываем сообщение в хранилище
+        if self._store:
+            try:
+                self._store.append_message(conversation, message)
+            except Exception as e:
+                logger.error(f"❌ Ошибка сохранения диалога: {e}", error=e)
         
         return message
     
     def get_context(
         self,
         conversation_id: str,
-        max_messages: int = 10
+        max_messages: int = 10,
+        token_budget: Optional[int] = None,
+        model: Optional[str] = None
     ) -> List[Dict[str, str]]:
         """Получает контекст диалога для LLM.
         
         Args:
             conversation_id: ID диалога
             max_messages: Максимум последних сообщений
+            token_budget: Бюджет токенов на контекст (None — без ограничения)
+            model: Модель, токенизатором которой считается бюджет
             
         Returns:
             Контекст в формате [{role, content}]
         """
-        if conversation_id not in self.conversations:
+        conversation = self.get_conversation(conversation_id)
+        if conversation is None:
             return []
         
-        return self.conversations[conversation_id].get_context_for_llm(max_messages)
+        with self._summary_lock:
+            # Пока суммаризация в очереди, не суммаризированные сообщения
+            # не отбрасываются, даже если их больше max_messages
+            pending = conversation_id in self._summary_queued or conversation_id in self._summary_running
+            tail_from = conversation.summarized_count if pending else None
+            return conversation.get_context_for_llm(
+                max_messages, tail_from=tail_from, token_budget=token_budget, model=model
+            )
+    
+    def _needs_summary(self, conversation: Conversation) -> bool:
+        """Превышен ли лимит не суммаризированных сообщений."""
+        return len(conversation.messages) - conversation.summarized_count > self.max_messages
+    
+    def _schedule_summary(self, conversation_id: str) -> None:
+        """Ставит суммаризацию диалога в фоновую очередь (без повторов)."""
+        with self._summary_lock:
+            if self._closed:
+                return
+            if conversation_id in self._summary_queued or conversation_id in self._summary_running:
+                self._summary_counters["coalesced"] += 1
+                return
+            if self._summary_executor is None:
+                self._summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarizer")
+            self._summary_queued.add(conversation_id)
+            future = self._summary_executor.submit(self._run_summary, conversation_id)
+            self._summary_futures.add(future)
+        future.add_done_callback(self._forget_future)
+    
+    def _forget_future(self, future: Future) -> None:
+        with self._summary_lock:
+            self._summary_futures.discard(future)
+    
+    def _run_summary(self, conversation_id: str) -> None:
+        """Фоновая задача: суммаризирует диалог и сохраняет заголовок."""
+        with self._summary_lock:
+            self._summary_queued.discard(conversation_id)
+            self._summary_running.add(conversation_id)
+        
+        requeue = False
+        try:
+            conversation = self.conversations.get(conversation_id)
+            if conversation is None or not self._needs_summary(conversation):
+                return
+            if self._summarize_conversation(conversation) and self._store and not self._closed:
+                try:
+                    self._store.save_header(conversation)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка сохранения суммаризации: {e}", error=e)
+            # Пока шёл вызов LLM, могли накопиться новые сообщения
+            requeue = self._needs_summary(conversation)
+        finally:
+            with self._summary_lock:
+                self._summary_running.discard(conversation_id)
+        if requeue:
+            self._schedule_summary(conversation_id)
     
-    def _summarize_conversation(self, conversation: Conversation) -> None:
-        """Суммаризирует старые сообщения в диалоге.
+    def _summarize_conversation(self, conversation: Conversation) -> bool:
+        """Суммаризирует старые сообщения в диалоге (блокирующий вызов LLM).
         
         Args:
             conversation: Диалог для суммаризации
+        
+        Returns:
+            True если суммаризация обновлена
         """
+        # Снимок: сообщения могут добавляться, пока LLM генерирует суммаризацию
+        with self._summary_lock:
+            messages = list(conversation.messages)
+            previous_summary = conversation.summary
+        
         # Получаем сообщения для суммаризации (оставляем последние max_messages/2)
         keep_count = self.max_messages // 2
-        to_summarize = conversation.messages[:-keep_count] if len(conversation.messages) > keep_count else []
+        to_summarize = messages[:-keep_count] if len(messages) > keep_count else []
         
         if not to_summarize:
-            return
+            return False
         
         # Формируем текст для суммаризации
         conversation_text = "\n".join([
@@ -336,55 +543,75 @@ class ConversationMemory:
         ])
         
         # Добавляем предыдущую суммаризацию если есть
-        if conversation.summary:
-            conversation_text = f"Предыдущая суммаризация: {conversation.summary}\n\n{conversation_text}"
+        if previous_summary:
+            conversation_text = f"Предыдущая суммаризация: {previous_summary}\n\n{conversation_text}"
         
         prompt = self.SUMMARIZATION_PROMPT.format(conversation=conversation_text)
         
+        start = time.perf_counter()
         try:
             llm = self._get_llm()
             summary = llm.generate(prompt, num_predict=256)
-            
-            # Обновляем диалог
-            conversation.summary = summary.strip()
-            conversation.summarized_count = len(conversation.messages) - keep_count
-            
-            logger.info(f"📋 Диалог {conversation.id} суммаризирован ({conversation.summarized_count} сообщений)")
-            
         except Exception as e:
+            with self._summary_lock:
+                self._summary_counters["failed"] += 1
             logger.error(f"❌ Ошибка суммаризации: {e}", error=e)
+            return False
+        latency = time.perf_counter() - start
+        
+        with self._summary_lock:
+            self._summary_counters["completed"] += 1
+            self._summary_latencies.append(latency)
+            # Диалог могли удалить, пока шла генерация
+            if self.conversations.get(conversation.id) is not conversation:
+                return False
+            # Обновляем диалог
+            conversation.summary = summary.strip()
+            conversation.summarized_count = len(messages) - keep_count
+        
+        logger.info(
+            f"📋 Диалог {conversation.id} суммаризирован "
+            f"({conversation.summarized_count} сообщений, {latency:.1f}с)"
+        )
+        return True
     
-    def _save_conversation(self, conversation: Conversation) -> None:
-        """Сохраняет диалог на диск.
+    def wait_for_summaries(self, timeout: Optional[float] = None) -> bool:
+        """Дожидается фоновых суммаризаций (для тестов и остановки).
         
         Args:
-            conversation: Диалог для сохранения
-        """
-        if not self.persist_dir:
-            return
+            timeout: Максимальное ожидание в секундах (None — без ограничения)
         
-        filepath = self.persist_dir / f"{conversation.id}.json"
-        try:
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(conversation.to_dict(), f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"❌ Ошибка сохранения диалога: {e}", error=e)
+        Returns:
+            True если очередь пуста
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._summary_lock:
+                futures = set(self._summary_futures)
+            if not futures:
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            wait(futures, timeout=remaining)
     
-    def _load_conversations(self) -> None:
-        """Загружает диалоги с диска."""
-        if not self.persist_dir or not self.persist_dir.exists():
-            return
+    def get_summarization_stats(self) -> Dict[str, Any]:
+        """Метрики фоновой суммаризации.
         
-        for filepath in self.persist_dir.glob("*.json"):
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                conversation = Conversation.from_dict(data)
-                self.conversations[conversation.id] = conversation
-            except Exception as e:
-                logger.warning(f"⚠️ Ошибка загрузки диалога {filepath}: {e}")
-        
-        logger.info(f"📂 Загружено {len(self.conversations)} диалогов")
+        Returns:
+            Глубина очереди, задачи в работе, счётчики и задержка (секунды)
+        """
+        with self._summary_lock:
+            latencies = sorted(self._summary_latencies)
+            return {
+                "background": self.background_summarization,
+                "queue_depth": len(self._summary_queued),
+                "in_progress": len(self._summary_running),
+                **self._summary_counters,
+                "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+                "latency_p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+                "latency_last": self._summary_latencies[-1] if latencies else 0.0
+            }
     
     def delete_conversation(self, conversation_id: str) -> bool:
         """Удаляет диалог.
@@ -395,16 +622,12 @@ class ConversationMemory:
         Returns:
             True если удалён успешно
         """
-        if conversation_id not in self.conversations:
-            return False
-        
-        del self.conversations[conversation_id]
+        deleted = self.conversations.pop(conversation_id, None) is not None
+        if self._store:
+            deleted = self._store.delete(conversation_id) or deleted
         
-        # Удаляем файл
-        if self.persist_dir:
-            filepath = self.persist_dir / f"{conversation_id}.json"
-            if filepath.exists():
-                filepath.unlink()
+        if not deleted:
+            return False
         
         logger.info(f"🗑️ Диалог {conversation_id} удалён")
         return True
@@ -413,9 +636,8 @@ class ConversationMemory:
         """Очищает все диалоги."""
         self.conversations.clear()
         
-        if self.persist_dir:
-            for filepath in self.persist_dir.glob("*.json"):
-                filepath.unlink()
+        if self._store:
+            self._store.clear()
         
         logger.info("🗑️ Все диалоги очищены")
     
@@ -431,20 +653,24 @@ class ConversationMemory:
         ttl_delta = timedelta(hours=self.ttl_hours)
         expired_ids = []
         
-        for conv_id, conv in self.conversations.items():
-            # ИСПРАВЛЕНИЕ: Проверяем что updated_at не является Mock объектом
-            try:
-                # В тестовом режиме пропускаем проверку TTL для Mock объектов
-                if is_test_mode():
-                    # Проверяем что это реальный datetime, а не Mock
-                    if not isinstance(conv.updated_at, datetime):
-                        continue
-                
-                if isinstance(conv.updated_at, datetime) and (now - conv.updated_at > ttl_delta):
-                    expired_ids.append(conv_id)
-            except (TypeError, AttributeError):
-                # Пропускаем Mock объекты или некорректные типы
-                continue
+        if self._store:
+            # Запрос по индексу updated_at, диалоги не загружаются
+            expired_ids = self._store.expired(now - ttl_delta)
+        else:
+            for conv_id, conv in self.conversations.items():
+                # ИСПРАВЛЕНИЕ: Проверяем что updated_at не является Mock объектом
+                try:
+                    # В тестовом режиме пропускаем проверку TTL для Mock объектов
+                    if is_test_mode():
+                        # Проверяем что это реальный datetime, а не Mock
+                        if not isinstance(conv.updated_at, datetime):
+                            continue
+                    
+                    if isinstance(conv.updated_at, datetime) and (now - conv.updated_at > ttl_delta):
+                        expired_ids.append(conv_id)
+                except (TypeError, AttributeError):
+                    # Пропускаем Mock объекты или некорректные типы
+                    continue
         
         for conv_id in expired_ids:
             self.delete_conversation(conv_id)
@@ -462,9 +688,19 @@ class ConversationMemory:
         """
         from utils.test_mode import is_test_mode
         
-        if len(self.conversations) <= self.max_conversations:
+        total = self.count_conversations()
+        if total <= self.max_conversations:
             return 0
         
+        if self._store:
+            removed = sum(
+                1 for conv_id in self._store.oldest(total - self.max_conversations)
+                if self.delete_conversation(conv_id)
+            )
+            if removed:
+                logger.info(f"🗑️ Удалено {removed} диалогов (превышен лимит {self.max_conversations})")
+            return removed
+        
         # Сортируем по времени обновления (старые первые)
         # ИСПРАВЛЕНИЕ: Фильтруем Mock объекты перед сортировкой
         valid_convs = []
@@ -512,6 +748,20 @@ class ConversationMemory:
             "over_limit": over_limit,
             "total": expired + over_limit
         }
+    
+    def close(self) -> None:
+        """Останавливает фоновую суммаризацию и закрывает хранилище диалогов.
+        
+        Суммаризации из очереди отменяются: при следующем сообщении диалог
+        снова попадёт в очередь.
+        """
+        with self._summary_lock:
+            self._closed = True
+            executor = self._summary_executor
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if self._store:
+            self._store.close()
 
 
 # Singleton
@@ -530,7 +780,9 @@ def get_conversation_memory() -> ConversationMemory:
         persist_dir = Path(config.output_dir) / "conversations"
         _conversation_memory = ConversationMemory(
             max_messages_before_summary=20,
-            persist_dir=str(persist_dir)
+            persist_dir=str(persist_dir),
+            storage_backend=config.interaction_conversation_storage,
+            background_summarization=config.interaction_background_summarization
         )
     return _conversation_memory
 
@@ -538,5 +790,7 @@ def get_conversation_memory() -> ConversationMemory:
 def reset_conversation_memory() -> None:
     """Сбрасывает singleton ConversationMemory."""
     global _conversation_memory
+    if _conversation_memory is not None:
+        _conversation_memory.close()
     _conversation_memory = None
     logger.info("🔄 ConversationMemory сброшен")
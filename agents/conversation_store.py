@@ -0,0 +1,458 @@
+"""Хранилища истории диалогов для ConversationMemory.
+
+- SQLiteConversationStore (по умолчанию) — один файл SQLite в режиме WAL:
+  сообщение добавляется одной строкой в таблицу messages, заголовок
+  диалога (время обновления, суммаризация, счётчик сообщений, первое
+  сообщение пользователя и последнее сообщение для списка) обновляется в
+  той же транзакции. Список диалогов и очистка по TTL/лимиту — запросы по
+  индексу updated_at, без чтения сообщений
+- JsonConversationStore — прежний формат: файл {conversation_id}.json на
+  диалог, переписывается целиком при каждом сообщении
+
+При открытии SQLite хранилища JSON файлы из той же директории
+импортируются в базу и переносятся в json_backup/.
+
+Хранилища принимают объекты Conversation/ConversationMessage (через
+to_dict и атрибуты) и возвращают словари в формате Conversation.to_dict().
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.logger import get_logger
+
+
+logger = get_logger()
+
+_DB_FILE = "conversations.sqlite"
+_JSON_BACKUP_DIR = "json_backup"
+
+# Сколько символов первого и последнего сообщения хранится для списка диалогов
+_TITLE_SOURCE_CHARS = 200
+_PREVIEW_CHARS = 100
+
+
+def _timestamp(dt: datetime) -> str:
+    """ISO время в UTC с микросекундами (строки сортируются как время)."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _summary_from_dict(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Запись списка диалогов из словаря Conversation.to_dict()."""
+    messages = data.get("messages", [])
+    first_user = next((m["content"] for m in messages if m["role"] == "user"), None)
+    return {
+        "id": data["id"],
+        "created_at": data["created_at"],
+        "updated_at": data["updated_at"],
+        "message_count": len(messages),
+        "has_summary": data.get("summary") is not None,
+        "first_user_message": first_user[:_TITLE_SOURCE_CHARS] if first_user is not None else None,
+        "last_message": messages[-1]["content"][:_PREVIEW_CHARS] if messages else None
+    }
+
+
+class ConversationStore(ABC):
+    """Интерфейс хранилища диалогов.
+
+    Записи в списке диалогов (list_conversations) содержат id, created_at,
+    updated_at, message_count, has_summary, first_user_message (начало
+    первого сообщения пользователя) и last_message (начало последнего
+    сообщения).
+    """
+
+    @abstractmethod
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Диалог с сообщениями в формате Conversation.to_dict() (None если нет)."""
+
+    @abstractmethod
+    def save_header(self, conversation: Any) -> None:
+        """Создаёт диалог или обновляет его заголовок (без сообщений)."""
+
+    @abstractmethod
+    def append_message(self, conversation: Any, message: Any) -> None:
+        """Добавляет сообщение и обновляет заголовок диалога."""
+
+    @abstractmethod
+    def list_conversations(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """Диалоги для списка, новые первые."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Количество диалогов."""
+
+    @abstractmethod
+    def expired(self, cutoff: datetime) -> List[str]:
+        """ID диалогов, не обновлявшихся с cutoff."""
+
+    @abstractmethod
+    def oldest(self, count: int) -> List[str]:
+        """ID count давно не обновлявшихся диалогов (старые первые)."""
+
+    @abstractmethod
+    def delete(self, conversation_id: str) -> bool:
+        """Удаляет диалог; True если он был."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Удаляет все диалоги."""
+
+    def close(self) -> None:
+        """Освобождает ресурсы."""
+
+
+class JsonConversationStore(ConversationStore):
+    """Файл {conversation_id}.json на диалог (прежний формат).
+
+    Каждое сообщение переписывает файл целиком, список диалогов читает все
+    файлы — годится для небольшой истории и совместимости. Запись идёт под
+    блокировкой через временный файл и os.replace: поток суммаризации и поток
+    запроса не перемешивают записи одного файла.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        """Инициализация хранилища.
+
+        Args:
+            directory: Директория с JSON файлами
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, conversation_id: str) -> Path:
+        return self.directory / f"{conversation_id}.json"
+
+    def _read_all(self) -> List[Dict[str, Any]]:
+        """Все диалоги с диска (повреждённые файлы пропускаются)."""
+        result = []
+        for filepath in self.directory.glob("*.json"):
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    result.append(json.load(f))
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка загрузки диалога {filepath}: {e}")
+        return result
+
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        filepath = self._path(conversation_id)
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                data: Dict[str, Any] = json.load(f)
+            return data
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка загрузки диалога {filepath}: {e}")
+            return None
+
+    def _write(self, conversation: Any) -> None:
+        path = self._path(conversation.id)
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            # Снимок берётся под блокировкой: последняя запись — самое свежее состояние
+            with self._lock:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(conversation.to_dict(), f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения диалога: {e}", error=e)
+
+    def save_header(self, conversation: Any) -> None:
+        self._write(conversation)
+
+    def append_message(self, conversation: Any, message: Any) -> None:
+        self._write(conversation)
+
+    def list_conversations(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        summaries = [_summary_from_dict(data) for data in self._read_all()]
+        summaries.sort(key=lambda s: _timestamp(datetime.fromisoformat(s["updated_at"])), reverse=True)
+        return summaries[offset:] if limit is None else summaries[offset:offset + limit]
+
+    def count(self) -> int:
+        return sum(1 for _ in self.directory.glob("*.json"))
+
+    def expired(self, cutoff: datetime) -> List[str]:
+        return [
+            s["id"] for s in self.list_conversations()
+            if _timestamp(datetime.fromisoformat(s["updated_at"])) < _timestamp(cutoff)
+        ]
+
+    def oldest(self, count: int) -> List[str]:
+        if count <= 0:
+            return []
+        return [s["id"] for s in reversed(self.list_conversations())][:count]
+
+    def delete(self, conversation_id: str) -> bool:
+        filepath = self._path(conversation_id)
+        if not filepath.exists():
+            return False
+        filepath.unlink()
+        return True
+
+    def clear(self) -> None:
+        for filepath in self.directory.glob("*.json"):
+            filepath.unlink()
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Диалоги в SQLite (WAL): сообщение — одна строка.
+
+    Потокобезопасен (одно соединение под Lock).
+    """
+
+    def __init__(self, directory: Path, migrate_json: bool = True) -> None:
+        """Открывает (или создаёт) базу диалогов.
+
+        Args:
+            directory: Директория с базой (и JSON файлами для миграции)
+            migrate_json: Импортировать JSON файлы прежнего формата
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / _DB_FILE
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # В WAL режиме NORMAL не повреждает базу при сбое, теряются лишь последние транзакции
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "id TEXT PRIMARY KEY, created_at TEXT NOT NULL, updated_at TEXT NOT NULL, "
+            "summary TEXT, summarized_count INTEGER NOT NULL DEFAULT 0, metadata TEXT, "
+            "message_count INTEGER NOT NULL DEFAULT 0, "
+            "first_user_message TEXT, last_message TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "conversation_id TEXT NOT NULL REFERENCES conversations (id) ON DELETE CASCADE, "
+            "seq INTEGER NOT NULL, id TEXT NOT NULL, role TEXT NOT NULL, "
+            "content TEXT NOT NULL, timestamp TEXT NOT NULL, metadata TEXT, "
+            "PRIMARY KEY (conversation_id, seq))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations (updated_at)"
+        )
+        self._conn.commit()
+
+        if migrate_json:
+            self._migrate_json()
+
+    @staticmethod
+    def _header_row(conversation: Any) -> tuple[Any, ...]:
+        return (
+            conversation.id,
+            _timestamp(conversation.created_at),
+            _timestamp(conversation.updated_at),
+            conversation.summary,
+            conversation.summarized_count,
+            json.dumps(conversation.metadata, ensure_ascii=False) if conversation.metadata is not None else None
+        )
+
+    def _upsert_header(self, conversation: Any) -> None:
+        """Создаёт/обновляет заголовок (вызывается под _lock, без commit)."""
+        self._conn.execute(
+            "INSERT INTO conversations (id, created_at, updated_at, summary, summarized_count, metadata) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET updated_at = excluded.updated_at, "
+            "summary = excluded.summary, summarized_count = excluded.summarized_count, "
+            "metadata = excluded.metadata",
+            self._header_row(conversation)
+        )
+
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            header = self._conn.execute(
+                "SELECT * FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            if header is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT id, role, content, timestamp, metadata FROM messages "
+                "WHERE conversation_id = ? ORDER BY seq",
+                (conversation_id,)
+            ).fetchall()
+        return {
+            "id": header["id"],
+            "messages": [
+                {
+                    "id": row["id"],
+                    "role": row["role"],
+                    "content": row["content"],
+                    "timestamp": row["timestamp"],
+                    "metadata": json.loads(row["metadata"]) if row["metadata"] is not None else None
+                }
+                for row in rows
+            ],
+            "summary": header["summary"],
+            "summarized_count": header["summarized_count"],
+            "created_at": header["created_at"],
+            "updated_at": header["updated_at"],
+            "metadata": json.loads(header["metadata"]) if header["metadata"] is not None else None
+        }
+
+    def save_header(self, conversation: Any) -> None:
+        with self._lock:
+            self._upsert_header(conversation)
+            self._conn.commit()
+
+    def append_message(self, conversation: Any, message: Any) -> None:
+        content = message.content
+        metadata = json.dumps(message.metadata, ensure_ascii=False) if message.metadata is not None else None
+        with self._lock:
+            try:
+                self._upsert_header(conversation)
+                self._conn.execute(
+                    "INSERT INTO messages (conversation_id, seq, id, role, content, timestamp, metadata) "
+                    "SELECT id, message_count, ?, ?, ?, ?, ? FROM conversations WHERE id = ?",
+                    (message.id, message.role, content, _timestamp(message.timestamp), metadata, conversation.id)
+                )
+                self._conn.execute(
+                    "UPDATE conversations SET message_count = message_count + 1, last_message = ?, "
+                    "first_user_message = COALESCE(first_user_message, ?) WHERE id = ?",
+                    (
+                        content[:_PREVIEW_CHARS],
+                        content[:_TITLE_SOURCE_CHARS] if message.role == "user" else None,
+                        conversation.id
+                    )
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def list_conversations(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, created_at, updated_at, message_count, summary IS NOT NULL AS has_summary, "
+                "first_user_message, last_message FROM conversations "
+                "ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset)
+            ).fetchall()
+        return [{**dict(row), "has_summary": bool(row["has_summary"])} for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0])
+
+    def expired(self, cutoff: datetime) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM conversations WHERE updated_at < ?", (_timestamp(cutoff),)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def oldest(self, count: int) -> List[str]:
+        if count <= 0:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM conversations ORDER BY updated_at LIMIT ?", (count,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, conversation_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM messages")
+            self._conn.execute("DELETE FROM conversations")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _migrate_json(self) -> None:
+        """Импортирует JSON файлы прежнего формата и переносит их в json_backup/."""
+        json_files = sorted(self.directory.glob("*.json"))
+        if not json_files:
+            return
+
+        backup_dir = self.directory / _JSON_BACKUP_DIR
+        backup_dir.mkdir(exist_ok=True)
+        imported = 0
+        for filepath in json_files:
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._import(data)
+                imported += 1
+            except Exception as e:
+                # Файл остаётся на месте: следующий запуск попробует снова
+                logger.warning(f"⚠️ Не удалось импортировать диалог {filepath}: {e}")
+                continue
+            shutil.move(str(filepath), str(backup_dir / filepath.name))
+
+        logger.info(f"📦 Импортировано {imported} диалогов из JSON в {self.path}")
+
+    def _import(self, data: Dict[str, Any]) -> None:
+        """Записывает диалог из словаря Conversation.to_dict() (существующий не трогает)."""
+        messages = data.get("messages", [])
+        summary = _summary_from_dict(data)
+        with self._lock:
+            try:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO conversations (id, created_at, updated_at, summary, "
+                    "summarized_count, metadata, message_count, first_user_message, last_message) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        data["id"],
+                        _timestamp(datetime.fromisoformat(data["created_at"])),
+                        _timestamp(datetime.fromisoformat(data["updated_at"])),
+                        data.get("summary"),
+                        data.get("summarized_count", 0),
+                        json.dumps(data["metadata"], ensure_ascii=False) if data.get("metadata") is not None else None,
+                        len(messages),
+                        summary["first_user_message"],
+                        summary["last_message"]
+                    )
+                )
+                if cursor.rowcount:
+                    self._conn.executemany(
+                        "INSERT INTO messages (conversation_id, seq, id, role, content, timestamp, metadata) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (
+                                data["id"], seq, m["id"], m["role"], m["content"],
+                                _timestamp(datetime.fromisoformat(m["timestamp"])),
+                                json.dumps(m["metadata"], ensure_ascii=False) if m.get("metadata") is not None else None
+                            )
+                            for seq, m in enumerate(messages)
+                        ]
+                    )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+
+def create_conversation_store(backend: str, directory: Path) -> ConversationStore:
+    """Создаёт хранилище диалогов.
+
+    Args:
+        backend: "sqlite" или "json"
+        directory: Директория хранилища
+
+    Returns:
+        Экземпляр ConversationStore
+    """
+    if backend == "json":
+        return JsonConversationStore(directory)
+    if backend != "sqlite":
+        logger.warning(f"⚠️ Неизвестное хранилище диалогов '{backend}', используется sqlite")
+    return SQLiteConversationStore(directory)
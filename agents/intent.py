@@ -433,7 +433,9 @@ JSON:"""
             response_model=IntentResponse,
             fallback_fn=lambda: self._response_to_result(self._classify_legacy(query)),
             agent_name="intent",
-            num_predict=config.llm_tokens_intent
+            num_predict=config.llm_tokens_intent,
+            # Классификация одинакового запроса не меняется: ответ из кэша по TTL этапа intent
+            cache=True
         )
         
         # Конвертируем IntentResponse -> IntentResult
@@ -496,7 +498,7 @@ JSON:"""
         """
         prompt = self._get_prompt(query, is_structured=False)
         config = get_config()
-        response = self.llm.generate(prompt, num_predict=config.llm_tokens_intent)
+        response = self.llm.generate(prompt, num_predict=config.llm_tokens_intent, cache=True)
         
         return self._parse_llm_classification(response, query)
     
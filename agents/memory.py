@@ -2,7 +2,7 @@
 import json
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass, asdict
-from infrastructure.rag import RAGSystem
+from infrastructure.rag import RAGSystem, document_id
 from utils.logger import get_logger
 
 
@@ -116,11 +116,18 @@ class MemoryAgent:
             metadata["plan_preview"] = plan[:500]
         
         # Сохраняем в RAG
-        self.memory_rag.add_documents(
+        # ID по содержимому: не зависит от счётчика процесса и не заменяет
+        # другой опыт (повторное сохранение того же опыта — тот же документ)
+        added = self.memory_rag.add_documents(
             documents=[memory_text],
-            metadatas=[metadata]
+            metadatas=[metadata],
+            ids=[document_id(memory_text)]
         )
         
+        # Embeddings снова считаются — дописываем опыт, отложенный при прошлых сбоях
+        if added and self.memory_rag.failed_documents:
+            self.memory_rag.retry_failed_documents()
+        
         # Сохраняем полный код и план в отдельном хранилище (если нужно)
         # Пока используем расширенный текст в документе
         
@@ -119,7 +119,8 @@ class PlannerAgent(BaseAgent):
         )
         
         config = get_config()
-        response = self.llm.generate(prompt, num_predict=config.llm_tokens_planning)
+        # План повторно запущенной задачи — из кэша ответов (TTL этапа planning)
+        response = self.llm.generate(prompt, num_predict=config.llm_tokens_planning, cache=True)
         
         plan = self._clean_plan(response)
         
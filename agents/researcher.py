@@ -1,9 +1,10 @@
 """Агент для сбора контекста (RAG + веб-поиск + память + codebase indexing)."""
 from typing import Optional, Any
 from pathlib import Path
-from infrastructure.rag import RAGSystem
+from infrastructure.rag import RAGSystem, ProgressCallback
 from infrastructure.web_search import web_search
 from infrastructure.context_engine import ContextEngine
+from infrastructure.project_index_registry import get_context_engine, normalize_extensions
 from agents.memory import MemoryAgent
 from utils.logger import get_logger
 
@@ -33,10 +34,13 @@ class ResearcherAgent:
             rag_system: Опциональный экземпляр RAGSystem. Если None, создаётся новый.
             memory_agent: Опциональный экземпляр MemoryAgent для получения рекомендаций.
             context_engine: Опциональный экземпляр ContextEngine для индексации кодовой базы.
+                Если None, используется общий ContextEngine процесса.
         """
         self.rag = rag_system if rag_system is not None else RAGSystem()
         self.memory = memory_agent
-        self.context_engine = context_engine if context_engine is not None else ContextEngine()
+        # По умолчанию — общий ContextEngine процесса: индексы, построенные
+        # /api/index и прежними задачами, переиспользуются
+        self.context_engine = context_engine if context_engine is not None else get_context_engine()
         self.min_confidence_threshold = 0.7
         self.min_rag_results = 2
     
@@ -250,7 +254,7 @@ class ResearcherAgent:
             logger.warning(f"⚠️ Путь к проекту не существует: {project_path}")
             return ""
         
-        extensions = file_extensions or ['.py']
+        extensions = normalize_extensions(file_extensions)
         
         try:
             # Получаем контекст через ContextEngine
@@ -275,23 +279,46 @@ class ResearcherAgent:
     def index_project(
         self,
         project_path: str,
-        file_extensions: Optional[list[str]] = None
+        file_extensions: Optional[list[str]] = None,
+        embed_in_rag: bool = False,
+        progress_callback: Optional[ProgressCallback] = None
     ) -> int:
         """Индексирует проект для последующего поиска.
         
         Args:
             project_path: Путь к проекту
             file_extensions: Расширения файлов для индексации
+            embed_in_rag: Дополнительно записать чанки кода в RAG (векторный поиск)
+            progress_callback: Опциональный callback (обработано, всего) для
+                прогресса записи чанков в RAG
             
         Returns:
             Количество проиндексированных файлов
         """
-        extensions = file_extensions or ['.py']
+        extensions = normalize_extensions(file_extensions)
         
         try:
             index = self.context_engine.index_project(project_path, extensions)
             file_count = len(index)
             logger.info(f"📚 Проиндексировано {file_count} файлов в проекте {project_path}")
+            
+            if embed_in_rag:
+                chunks = [chunk for file_chunks in index.values() for chunk in file_chunks]
+                added = self.rag.add_documents(
+                    documents=[chunk.content for chunk in chunks],
+                    metadatas=[
+                        {
+                            "file_path": chunk.file_path,
+                            "name": chunk.name,
+                            "chunk_type": chunk.chunk_type,
+                            "start_line": str(chunk.start_line),
+                        }
+                        for chunk in chunks
+                    ],
+                    ids=[chunk.id for chunk in chunks],
+                    progress_callback=progress_callback
+                )
+                logger.info(f"📚 В RAG записано {added} из {len(chunks)} чанков проекта {project_path}")
             return file_count
         except Exception as e:
             logger.error(f"❌ Ошибка индексации проекта: {e}", error=e)
@@ -107,7 +107,8 @@ class BaseReviewer:
         logger.debug(f"🔍 {self.ROLE} начинает ревью...")
         
         prompt = self._build_prompt(code, tests, previous_issues)
-        response = self.llm.generate(prompt, num_predict=1024)
+        # Ревью того же кода в следующем раунде дебатов — из кэша (TTL этапа critic)
+        response = self.llm.generate(prompt, num_predict=1024, cache=True)
         result = self._parse_response(response)
         
         logger.debug(f"   {self.ROLE}: найдено {len(result.issues)} проблем")
@@ -23,6 +23,7 @@ from backend.middleware.request_tracker import RequestTrackerMiddleware
 from backend.shutdown_manager import get_shutdown_manager
 from infrastructure.connection_pool import get_ollama_pool, initialize_ollama_pool
 from infrastructure.cache import get_cache
+from infrastructure.ollama_health import get_ollama_health_monitor
 from infrastructure.performance_metrics import get_performance_metrics
 from infrastructure.event_store import EventStore
 from utils.logger import get_logger
@@ -159,9 +160,15 @@ async def lifespan(app: FastAPI):
     try:
         await EventStore.cleanup_all_old_events()
         logger.debug("🧹 Финальная очистка EventStore выполнена")
+        # Закрываем бэкенд событий (соединение SQLite)
+        EventStore.set_backend(None)
     except Exception as e:
         logger.warning(f"⚠️ Ошибка финальной очистки EventStore: {e}")
     
+    # Останавливаем фоновый прогрев индексов проектов
+    from infrastructure.project_index_registry import reset_project_index_registry
+    reset_project_index_registry()
+    
     # Shutdown
     logger.info("🛑 Backend API завершает работу...")
     await _cleanup_on_shutdown()
@@ -270,17 +277,21 @@ async def health() -> dict:
         }
     }
     
-    # Проверяем Ollama
+    # Проверяем Ollama (результат заодно обновляет общий статус для LLM вызовов)
+    ollama_monitor = get_ollama_health_monitor()
     try:
         models = ollama.list()
+        ollama_monitor.record_success()
         model_count = len(models.get("models", []))
         health_status["services"]["ollama"] = "ok"
         health_status["ollama_models"] = model_count
     except Exception as e:
+        ollama_monitor.record_failure(e)
         logger.debug(f"⚠️ Ошибка проверки Ollama в health check: {e}")
         health_status["services"]["ollama"] = "error"
         health_status["ollama_error"] = str(e)
         health_status["status"] = "degraded"
+    health_status["ollama_monitor"] = ollama_monitor.get_stats()
     
     # Проверяем кэш
     try:
@@ -11,7 +11,7 @@ import asyncio
 import re
 import uuid
 from typing import Dict, Any, Optional, AsyncGenerator, List
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Header
 from pydantic import BaseModel, Field
 
 from agents.intent import IntentAgent, IntentResult
@@ -71,7 +71,8 @@ from backend.dependencies import get_memory_agent as _get_memory_agent
 from backend.routers.agent_handlers import (
     run_analyze_stream,
     run_chat_stream,
-    run_workflow_stream
+    run_workflow_stream,
+    resume_workflow_stream
 )
 
 # TaskRequest импортирован из backend.types
@@ -328,6 +329,7 @@ async def get_project_files(
         Древовидная структура файлов и папок
     """
     import os
+    from infrastructure.project_scanner import get_project_scanner
     
     # Валидируем путь и проверяем, что он в пределах проекта
     # ИСПРАВЛЕНИЕ: Если project_path не указан, разрешаем доступ к любой директории
@@ -373,51 +375,60 @@ async def get_project_files(
         allowed_ext = {(e.strip() if e.strip().startswith('.') else f'.{e.strip()}').lower() 
                        for e in extensions.split(',')}
     
-    def scan_dir(dir_path: str, depth: int = 0) -> Dict[str, Any]:
-        """Рекурсивно сканирует директорию и возвращает структуру дерева."""
-        result: Dict[str, Any] = {
-            "name": os.path.basename(dir_path) or dir_path,
-            "path": dir_path,
-            "type": "directory",
-            "children": []
-        }
-        
-        if depth >= max_depth:
-            result["truncated"] = True
-            return result
-        
-        try:
-            entries = sorted(os.listdir(dir_path))
-        except PermissionError:
-            result["error"] = "Нет доступа"
-            return result
-        
-        dirs, files = [], []
-        
-        for entry in entries:
-            entry_path = os.path.join(dir_path, entry)
-            
-            if os.path.isdir(entry_path):
-                if entry not in IGNORED_DIRS and not entry.startswith('.'):
-                    child = scan_dir(entry_path, depth + 1)
-                    if child.get("children") or child.get("truncated"):
-                        dirs.append(child)
-            else:
-                if entry not in IGNORED_FILES and not entry.startswith('.'):
-                    ext = os.path.splitext(entry)[1].lower()
-                    if allowed_ext is None or ext in allowed_ext:
-                        files.append({
-                            "name": entry,
-                            "path": entry_path,
-                            "type": "file",
-                            "extension": ext,
-                            "size": os.path.getsize(entry_path)
-                        })
-        
-        result["children"] = dirs + files
-        return result
+    def dir_node(rel_dir: str) -> Dict[str, Any]:
+        """Узел каталога дерева (создаётся вместе с родителями)."""
+        node = nodes.get(rel_dir)
+        if node is None:
+            parent, name = os.path.split(rel_dir)
+            node = {
+                "name": name,
+                "path": os.path.join(path, rel_dir),
+                "type": "directory",
+                "children": []
+            }
+            dir_node(parent)["children"].append(node)
+            nodes[rel_dir] = node
+        return node
+    
+    def sort_tree(node: Dict[str, Any]) -> None:
+        """Каталоги перед файлами, те и другие по имени."""
+        dirs = sorted((c for c in node["children"] if c["type"] == "directory"), key=lambda c: c["name"])
+        files = sorted((c for c in node["children"] if c["type"] == "file"), key=lambda c: c["name"])
+        for child in dirs:
+            sort_tree(child)
+        node["children"] = dirs + files
+    
+    tree: Dict[str, Any] = {
+        "name": os.path.basename(path) or path,
+        "path": path,
+        "type": "directory",
+        "children": []
+    }
+    nodes: Dict[str, Dict[str, Any]] = {"": tree}
     
-    tree = scan_dir(path)
+    if max_depth <= 0:
+        tree["truncated"] = True
+    else:
+        # Общий обход сканера проектов (os.scandir, .gitignore); каталоги без
+        # подходящих файлов в дерево не попадают
+        scan = get_project_scanner().walk(path, max_depth=max_depth, skip_dirs=IGNORED_DIRS)
+        for rel_dir in scan.truncated_dirs:
+            dir_node(rel_dir)["truncated"] = True
+        for file in scan.files:
+            name = os.path.basename(file.rel_path)
+            if name in IGNORED_FILES:
+                continue
+            ext = os.path.splitext(name)[1].lower()
+            if allowed_ext is not None and ext not in allowed_ext:
+                continue
+            dir_node(os.path.dirname(file.rel_path))["children"].append({
+                "name": name,
+                "path": file.path,
+                "type": "file",
+                "extension": ext,
+                "size": file.size
+            })
+        sort_tree(tree)
     
     def count_items(node: Dict[str, Any]) -> tuple[int, int]:
         """Подсчитывает количество файлов и директорий в дереве."""
@@ -503,7 +514,7 @@ async def index_project(request: IndexProjectRequest) -> Dict[str, Any]:
     Returns:
         Статус индексации с количеством проиндексированных файлов
     """
-    from infrastructure.context_engine import ContextEngine
+    from infrastructure.project_index_registry import get_project_index_registry, normalize_extensions
     from pathlib import Path
     import asyncio
     
@@ -517,23 +528,14 @@ async def index_project(request: IndexProjectRequest) -> Dict[str, Any]:
             detail=f"Проект не найден или не является директорией: {project_path}"
         )
     
-    # Нормализуем расширения (добавляем точку если отсутствует)
-    normalized_extensions = []
-    for ext in file_extensions:
-        ext = ext.strip()
-        if not ext.startswith('.'):
-            ext = f'.{ext}'
-        normalized_extensions.append(ext)
+    # Нормализуем расширения (точка, без повторов) — как ключ реестра индексов
+    normalized_extensions = normalize_extensions(file_extensions)
     
     try:
-        # Создаём ContextEngine и индексируем проект
-        context_engine = ContextEngine()
-        
-        # Индексация выполняется синхронно, запускаем в отдельном потоке
-        index_result = await asyncio.to_thread(
-            context_engine.index_project,
-            project_path=project_path,
-            extensions=normalized_extensions if normalized_extensions else None
+        # Индекс строится в общем реестре процесса (фоновый поток прогрева) и
+        # переиспользуется этапом исследования и анализом
+        index_result = await asyncio.wrap_future(
+            get_project_index_registry().warm_up(project_path, normalized_extensions)
         )
         
         # Подсчитываем количество файлов и чанков
@@ -563,6 +565,19 @@ async def index_project(request: IndexProjectRequest) -> Dict[str, Any]:
         )
 
 
+@router.get("/index/stats")
+async def get_index_stats() -> Dict[str, Any]:
+    """Возвращает состояние индексов проектов.
+
+    Returns:
+        Проекты в памяти, их объём, идущие прогревы и свежесть наблюдаемых
+        проектов (отставание индекса от файлов, пачки изменений)
+    """
+    from infrastructure.project_index_registry import get_project_index_registry
+
+    return get_project_index_registry().get_stats()
+
+
 @router.get("/metrics/stages")
 async def get_stage_metrics() -> Dict[str, Any]:
     """Возвращает метрики производительности по этапам workflow.
@@ -898,6 +913,55 @@ async def stream_task_results(
     )
 
 
+@router.get("/stream/{task_id}/events")
+async def resume_task_stream(
+    task_id: str,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    after: Optional[str] = Query(None, description="ID последнего полученного события (если нет заголовка)")
+):
+    """Продолжает SSE стрим задачи после обрыва соединения.
+    
+    EventSource при переподключении сам присылает заголовок Last-Event-ID;
+    клиент без EventSource передаёт его параметром after. Событие
+    stream_start в начале стрима /stream содержит task_id. С бэкендом
+    [event_store] backend = "sqlite" стрим продолжается на любом воркере.
+    
+    Args:
+        task_id: ID задачи
+        last_event_id: Заголовок Last-Event-ID
+        after: ID последнего полученного события
+        
+    Returns:
+        StreamingResponse с SSE событиями после Last-Event-ID
+    """
+    from fastapi.responses import StreamingResponse
+    from infrastructure.event_store import EventStore
+    
+    last_event_id = last_event_id or after
+    # Проверяем события без регистрации сессии (get_event_store): запрос
+    # к неизвестной задаче не занимает место в лимите сессий
+    probe = EventStore(task_id)
+    # Сессия неизвестна (или события истекли по TTL): ждать нечего
+    if not await probe.get_events_after(last_event_id) and (
+        last_event_id is None or await probe.get_event(last_event_id) is None
+    ):
+        raise HTTPException(status_code=404, detail=f"События задачи {task_id} не найдены")
+    
+    return StreamingResponse(
+        resume_workflow_stream(task_id, last_event_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache, no-transform",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+            "X-Content-Type-Options": "nosniff",
+            "Access-Control-Allow-Origin": "http://localhost:5173",
+            "Access-Control-Allow-Credentials": "true",
+            "Access-Control-Allow-Headers": "*"
+        }
+    )
+
+
 @router.get("/improvements")
 async def get_improvement_suggestions(
     min_confidence: float = 1.0
@@ -1070,32 +1134,40 @@ async def get_settings() -> Dict[str, Any]:
     }
 
 
-def _get_conversation_title(messages: list) -> str:
+def _strip_markdown(text: str) -> str:
+    """Убирает markdown разметку и лишние пробелы."""
+    text = re.sub(r'[#*_`~\[\]()>]', '', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _get_conversation_title(first_user_message: Optional[str]) -> str:
     """Генерирует заголовок диалога из первого сообщения пользователя.
     
     Args:
-        messages: Список сообщений диалога
+        first_user_message: Первое сообщение пользователя (None если его нет)
         
     Returns:
         Заголовок диалога (до 50 символов)
     """
-    # Ищем первое сообщение пользователя
-    for msg in messages:
-        if msg.role == "user":
-            text = msg.content.strip()
-            # Убираем markdown разметку
-            text = re.sub(r'[#*_`~\[\]()>]', '', text)
-            text = re.sub(r'\s+', ' ', text).strip()
-            # Обрезаем до 50 символов
-            if len(text) > 50:
-                return text[:47] + '...'
-            return text if text else 'Новый диалог'
-    return 'Новый диалог'
+    if first_user_message is None:
+        return 'Новый диалог'
+    text = _strip_markdown(first_user_message)
+    # Обрезаем до 50 символов
+    if len(text) > 50:
+        return text[:47] + '...'
+    return text if text else 'Новый диалог'
 
 
 @router.get("/conversations")
-async def list_conversations() -> Dict[str, Any]:
-    """Возвращает список диалогов.
+async def list_conversations(limit: Optional[int] = None, offset: int = 0) -> Dict[str, Any]:
+    """Возвращает список диалогов (новые первые).
+    
+    Список строится запросом к хранилищу диалогов по индексу, сообщения
+    не загружаются.
+    
+    Args:
+        limit: Размер страницы (None — все диалоги)
+        offset: Смещение страницы
     
     Returns:
         Список диалогов с метаданными
@@ -1103,34 +1175,27 @@ async def list_conversations() -> Dict[str, Any]:
     conv_memory = get_conversation_memory()
     
     conversations = []
-    for conv_id, conv in conv_memory.conversations.items():
-        # Заголовок — первое сообщение пользователя
-        title = _get_conversation_title(conv.messages)
-        
+    for item in conv_memory.list_conversations(limit=limit, offset=offset):
         # Preview — последнее сообщение (для поиска)
-        preview = ""
-        if conv.messages:
-            last_msg = conv.messages[-1].content[:100]
-            # Убираем markdown из preview тоже
-            preview = re.sub(r'[#*_`~\[\]()>]', '', last_msg)
-            preview = re.sub(r'\s+', ' ', preview).strip()
+        last_message = item["last_message"]
+        preview = _strip_markdown(last_message[:100]) if last_message else ""
         
         conversations.append({
-            "id": conv_id,
-            "created_at": conv.created_at.isoformat(),
-            "updated_at": conv.updated_at.isoformat(),
-            "message_count": len(conv.messages),
-            "has_summary": conv.summary is not None,
+            "id": item["id"],
+            "created_at": item["created_at"],
+            "updated_at": item["updated_at"],
+            "message_count": item["message_count"],
+            "has_summary": item["has_summary"],
             "preview": preview,
-            "title": title  # Новое поле — заголовок диалога
+            # Заголовок — первое сообщение пользователя
+            "title": _get_conversation_title(item["first_user_message"])
         })
     
-    # Сортируем по дате обновления (новые первые)
-    conversations.sort(key=lambda x: str(x["updated_at"]), reverse=True)  # type: ignore[arg-type]  # conversations содержит dict с ключом "updated_at", str() гарантирует строку для сортировки
-    
     return {
         "conversations": conversations,
-        "total": len(conversations)
+        "total": conv_memory.count_conversations(),
+        "limit": limit,
+        "offset": offset
     }
 
 
@@ -1146,11 +1211,10 @@ async def get_conversation(conversation_id: str) -> Dict[str, Any]:
     """
     conv_memory = get_conversation_memory()
     
-    if conversation_id not in conv_memory.conversations:
+    conv = conv_memory.get_conversation(conversation_id)
+    if conv is None:
         raise HTTPException(status_code=404, detail="Диалог не найден")
     
-    conv = conv_memory.conversations[conversation_id]
-    
     return {
         "id": conv.id,
         "created_at": conv.created_at.isoformat(),
@@ -1252,14 +1316,15 @@ async def get_active_tasks() -> Dict[str, Any]:
 
 
 @router.get("/tasks/history")
-async def get_task_history(limit: int = 20) -> Dict[str, Any]:
-    """Возвращает историю всех задач.
+async def get_task_history(limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """Возвращает историю всех задач (страницами, новые первые).
     
     Args:
-        limit: Максимальное количество задач
+        limit: Размер страницы
+        offset: Смещение страницы
         
     Returns:
-        Список всех задач с метаданными
+        Страница задач с метаданными и общее количество задач
     """
     config = get_config()
     
@@ -1271,7 +1336,7 @@ async def get_task_history(limit: int = 20) -> Dict[str, Any]:
         }
     
     checkpointer = get_task_checkpointer()
-    all_tasks = checkpointer.list_all_tasks()[:limit]
+    all_tasks = checkpointer.list_all_tasks(limit=max(limit, 0), offset=max(offset, 0))
     
     return {
         "tasks": [
@@ -1287,7 +1352,9 @@ async def get_task_history(limit: int = 20) -> Dict[str, Any]:
             }
             for t in all_tasks
         ],
-        "total": len(all_tasks),
+        "total": checkpointer.count_tasks(),
+        "limit": limit,
+        "offset": offset,
         "persistence_enabled": True
     }
 
@@ -1308,7 +1375,7 @@ async def get_task_details(task_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=400, detail="Persistence отключена")
     
     checkpointer = get_task_checkpointer()
-    result = checkpointer.load_checkpoint(task_id)
+    result = await asyncio.to_thread(checkpointer.load_checkpoint, task_id)
     
     if not result:
         raise HTTPException(status_code=404, detail="Задача не найдена")
@@ -1353,7 +1420,7 @@ async def resume_task(task_id: str):
         raise HTTPException(status_code=400, detail="Persistence отключена")
     
     checkpointer = get_task_checkpointer()
-    result = checkpointer.load_checkpoint(task_id)
+    result = await asyncio.to_thread(checkpointer.load_checkpoint, task_id)
     
     if not result:
         raise HTTPException(status_code=404, detail="Задача не найдена")
@@ -1592,7 +1659,7 @@ async def delete_task(task_id: str) -> Dict[str, str]:
     
     checkpointer = get_task_checkpointer()
     
-    if not checkpointer.delete_checkpoint(task_id):
+    if not await asyncio.to_thread(checkpointer.delete_checkpoint, task_id):
         raise HTTPException(status_code=404, detail="Задача не найдена")
     
     return {
@@ -2,10 +2,11 @@
 
 from backend.routers.agent_handlers.chat_handler import run_chat_stream
 from backend.routers.agent_handlers.analyze_handler import run_analyze_stream
-from backend.routers.agent_handlers.workflow_handler import run_workflow_stream
+from backend.routers.agent_handlers.workflow_handler import resume_workflow_stream, run_workflow_stream
 
 __all__ = [
     'run_chat_stream',
     'run_analyze_stream',
     'run_workflow_stream',
+    'resume_workflow_stream',
 ]
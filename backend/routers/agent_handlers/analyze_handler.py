@@ -3,7 +3,6 @@ import asyncio
 import uuid
 from typing import AsyncGenerator, Optional, List
 
-from agents.researcher import ResearcherAgent
 from agents.chat import get_chat_agent
 from agents.conversation import get_conversation_memory
 from utils.config import get_config
@@ -11,6 +10,8 @@ from utils.model_checker import TaskComplexity
 from utils.ui_delays import ui_sleep
 from backend.sse_manager import SSEManager
 from infrastructure.model_router import get_model_router
+from infrastructure.project_index_registry import get_project_index_registry
+from backend.dependencies import get_researcher_agent
 from utils.logger import get_logger
 
 logger = get_logger()
@@ -56,6 +57,9 @@ async def run_analyze_stream(
         )
         return
     
+    # Индексация начинается сразу, в фоне общего реестра индексов
+    get_project_index_registry().warm_up(project_path, file_extensions)
+    
     # Отправляем stage_start для intent
     yield await SSEManager.stream_stage_start(
         stage="intent",
@@ -78,8 +82,9 @@ async def run_analyze_stream(
     await ui_sleep()
     
     try:
-        # Собираем контекст из проекта
-        researcher = ResearcherAgent()
+        # Собираем контекст из проекта (общий ContextEngine: индекс из прогрева
+        # или прежней индексации переиспользуется)
+        researcher = get_researcher_agent()
         
         codebase_context = await asyncio.to_thread(
             researcher.research,
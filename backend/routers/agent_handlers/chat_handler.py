@@ -91,15 +91,18 @@ async def run_chat_stream(
     # Получаем менеджер диалогов
     conv_memory = get_conversation_memory()
     
-    # Добавляем сообщение пользователя в историю
-    conv_memory.add_message(conv_id, "user", task)
-    
-    # Получаем контекст диалога
+    # Получаем контекст диалога до текущего сообщения: ChatAgent добавляет
+    # его сам. История упаковывается по токенам в окно модели за вычетом ответа
     conversation_history = conv_memory.get_context(
         conv_id, 
-        max_messages=config.interaction_max_context_messages
+        max_messages=config.interaction_max_context_messages,
+        token_budget=config.interaction_context_window_tokens - config.llm_tokens_chat,
+        model=chat_model
     )
     
+    # Добавляем сообщение пользователя в историю
+    conv_memory.add_message(conv_id, "user", task)
+    
     # Отправляем stage_start
     yield await SSEManager.stream_stage_start(
         stage="chat",
@@ -15,12 +15,73 @@ from backend.messages import GREETING_MESSAGE, HELP_MESSAGE
 from infrastructure.workflow_graph import create_workflow_graph
 from infrastructure.workflow_state import AgentState
 from infrastructure.model_router import get_model_router
-from infrastructure.event_store import get_event_store, EventStore
+from infrastructure.project_index_registry import get_project_index_registry
+from infrastructure.event_dispatcher import HEARTBEAT, coalesce_chunk_events, iter_event_batches
+from infrastructure.event_store import Event, get_event_store, EventStore, STREAM_END
 from backend.dependencies import get_memory_agent
 from utils.logger import get_logger
 
 logger = get_logger()
 
+# Тип события EventStore для готового SSE кадра, который handler отправил
+# клиенту сам (этапы, результат, done): продолжение стрима отдаёт его как есть
+SSE_FRAME = "sse_frame"
+
+
+def _with_event_id(sse_event: str, event_id: str) -> str:
+    """Ставит ID EventStore в готовую SSE строку (заменяя её собственный id:, если он есть)."""
+    if sse_event.startswith("id: "):
+        sse_event = sse_event.split("\n", 1)[1]
+    return f"id: {event_id}\n{sse_event}"
+
+
+async def _event_to_sse(event: Event) -> str:
+    """Преобразует событие EventStore в SSE строку для realtime стрима.
+    
+    Каждое событие получает id: из EventStore — тот же, по которому
+    клиент продолжает стрим через Last-Event-ID.
+    
+    Args:
+        event: Событие из очереди сессии
+        
+    Returns:
+        SSE событие
+    """
+    if event.event_type == SSE_FRAME:
+        return _with_event_id(event.data, event.event_id)
+    if event.event_type == "thinking" or event.event_type.startswith("thinking_"):
+        if isinstance(event.data, str):
+            # ReasoningStreamManager всегда возвращает готовую SSE строку
+            return _with_event_id(event.data, event.event_id)
+        # Fallback: если по какой-то причине data не строка,
+        # создаём событие с правильным типом (thinking_started/in_progress/etc)
+        event_type = event.event_type if event.event_type.startswith("thinking_") else "thinking_started"
+        return await SSEManager.send_event(event_type, {"content": str(event.data), "stage": "unknown"}, event.event_id)
+    if event.event_type == "progress":
+        # Пробрасываем progress события для non-reasoning моделей:
+        # data уже содержит готовую SSE строку от SSEManager.stream_stage_progress
+        if isinstance(event.data, str):
+            return _with_event_id(event.data, event.event_id)
+        return await SSEManager.send_event(
+            "stage_progress",
+            event.data if isinstance(event.data, dict) else {"message": str(event.data)},
+            event.event_id
+        )
+    if event.event_type in ("plan_chunk", "test_chunk", "code_chunk"):
+        return SSEManager.encode_event(event.event_type, {"chunk": event.data}, event.event_id)
+    if event.event_type == "error":
+        # Если data уже строка (SSE событие), используем её, иначе создаём error событие из данных
+        if isinstance(event.data, str):
+            return _with_event_id(event.data, event.event_id)
+        # event.data должен быть словарём с полями stage, message, type и т.д.
+        error_data = event.data if isinstance(event.data, dict) else {"message": str(event.data)}
+        return _with_event_id(await SSEManager.stream_error(
+            stage=error_data.get("stage", "unknown"),
+            error_message=error_data.get("message", "Неизвестная ошибка"),
+            error_details=error_data.get("error_details", {})
+        ), event.event_id)
+    return await SSEManager.send_event(event.event_type, {"data": event.data}, event.event_id)
+
 
 async def run_workflow_stream(
     task: str,
@@ -47,9 +108,21 @@ async def run_workflow_stream(
     """
     task_id = str(uuid.uuid4())
     
+    # Первое событие сессии — в хранилище (до создания очереди, чтобы не
+    # уйти в стрим дважды): с его ID клиент продолжит стрим через
+    # GET /api/stream/{task_id}/events, если соединение оборвётся
+    event_store = await get_event_store(task_id)
+    start_id = await event_store.save_event("stream_start", {"task_id": task_id})
+    yield SSEManager.encode_event("stream_start", {"task_id": task_id}, start_id)
+    
     # Создаём очередь событий для реального времени
     event_queue = EventStore.get_event_queue(task_id)
     
+    async def stored(sse_event: str) -> str:
+        """Сохраняет кадр, отправляемый напрямую, для продолжения стрима и ставит ему ID."""
+        event_id = await event_store.save_event(SSE_FRAME, sse_event, realtime=False)
+        return _with_event_id(sse_event, event_id)
+    
     # Очередь для SSE событий от фоновой задачи
     sse_queue: asyncio.Queue = asyncio.Queue()
     
@@ -60,77 +133,32 @@ async def run_workflow_stream(
     async def stream_events_realtime():
         """Отправляет события из очереди в SSE поток в реальном времени.
         
-        ОПТИМИЗАЦИЯ: Уменьшен таймаут с 0.1 до 0.01 для более быстрой отправки событий.
-        Thinking блоки и чанки кода отправляются немедленно без задержек.
-        ИСПРАВЛЕНИЕ: Добавлены heartbeat события каждые 15 секунд для предотвращения timeout.
+        Событие ожидается без опроса (await в iter_event_batches); heartbeat
+        при простое ставит в очередь общий таймер процесса. События пачки
+        (с окном [streaming] sse_coalesce_window_ms) уходят в SSE поток одной
+        записью, подряд идущие чанки одного типа — одним кадром.
         """
-        import time
-        last_heartbeat = time.time()
-        HEARTBEAT_INTERVAL = 15.0  # Отправляем heartbeat каждые 15 секунд
-        
+        linger = get_config().sse_coalesce_window_ms / 1000
         try:
-            while not stop_realtime_streaming.is_set():
-                try:
-                    # ОПТИМИЗАЦИЯ: Уменьшен таймаут для более быстрой отправки (0.01 вместо 0.1)
-                    # Это позволяет отправлять события почти мгновенно
-                    event = await asyncio.wait_for(event_queue.get(), timeout=0.01)
-                    
-                    # Преобразуем событие в SSE формат
-                    if event.event_type == "thinking" or event.event_type.startswith("thinking_"):
-                        if isinstance(event.data, str):
-                            # ReasoningStreamManager всегда возвращает готовую SSE строку
-                            sse_event = event.data
-                        else:
-                            # Fallback: если по какой-то причине data не строка,
-                            # создаём событие с правильным типом (thinking_started/in_progress/etc)
-                            event_type = event.event_type if event.event_type.startswith("thinking_") else "thinking_started"
-                            sse_event = await SSEManager.send_event(event_type, {"content": str(event.data), "stage": "unknown"})
-                    elif event.event_type == "progress":
-                        # ИСПРАВЛЕНИЕ: Пробрасываем progress события для non-reasoning моделей
-                        # data уже содержит готовую SSE строку от SSEManager.stream_stage_progress
-                        if isinstance(event.data, str):
-                            sse_event = event.data
-                        else:
-                            # Fallback: создаём progress событие
-                            sse_event = await SSEManager.send_event("stage_progress", event.data if isinstance(event.data, dict) else {"message": str(event.data)})
-                    elif event.event_type in ("plan_chunk", "test_chunk", "code_chunk"):
-                        sse_event = await SSEManager.send_event(event.event_type, {"chunk": event.data})
-                    elif event.event_type == "error":
-                        # ИСПРАВЛЕНИЕ: Обработка error событий - если data уже строка (SSE событие), используем её,
-                        # иначе создаём error событие из данных
-                        if isinstance(event.data, str):
-                            sse_event = event.data
-                        else:
-                            # event.data должен быть словарём с полями stage, message, type и т.д.
-                            error_data = event.data if isinstance(event.data, dict) else {"message": str(event.data)}
-                            sse_event = await SSEManager.stream_error(
-                                stage=error_data.get("stage", "unknown"),
-                                error_message=error_data.get("message", "Неизвестная ошибка"),
-                                error_details=error_data.get("error_details", {})
-                            )
-                    else:
-                        sse_event = await SSEManager.send_event(event.event_type, {"data": event.data})
-                    
-                    # ОПТИМИЗАЦИЯ: Отправляем событие немедленно без дополнительных задержек
-                    await sse_queue.put(sse_event)
-                    last_heartbeat = time.time()  # Обновляем время последнего события
-                    # ОПТИМИЗАЦИЯ: Логируем только важные события или периодически
-                    # Это уменьшает объем логов (события отправляются очень часто)
+            async for batch in iter_event_batches(event_queue, linger=linger):
+                if stop_realtime_streaming.is_set():
+                    break
+                sse_events = []
+                for event in coalesce_chunk_events(batch):
+                    if event is HEARTBEAT:
+                        sse_events.append(SSEManager.encode_event("heartbeat", {"status": "alive"}))
+                        logger.debug("💓 Heartbeat отправлен")
+                        continue
+                    try:
+                        sse_events.append(await _event_to_sse(event))
+                    except Exception as e:
+                        logger.error(f"❌ Ошибка в stream_events_realtime: {e}", error=e)
+                        continue
+                    # Логируем только важные события (события отправляются очень часто)
                     if event.event_type in ("error", "done", "stage_start", "stage_end"):
                         logger.debug(f"📤 Событие отправлено: {event.event_type}")
-                    
-                except asyncio.TimeoutError:
-                    # ИСПРАВЛЕНИЕ: Отправляем heartbeat если прошло больше HEARTBEAT_INTERVAL
-                    current_time = time.time()
-                    if current_time - last_heartbeat > HEARTBEAT_INTERVAL:
-                        heartbeat_event = await SSEManager.send_event("heartbeat", {"status": "alive"})
-                        await sse_queue.put(heartbeat_event)
-                        last_heartbeat = current_time
-                        logger.debug("💓 Heartbeat отправлен")
-                    continue
-                except Exception as e:
-                    logger.error(f"❌ Ошибка в stream_events_realtime: {e}", error=e)
-                    break
+                if sse_events:
+                    await sse_queue.put("".join(sse_events))
         except asyncio.CancelledError:
             logger.debug("🛑 stream_events_realtime отменён")
         finally:
@@ -149,6 +177,29 @@ async def run_workflow_stream(
         logger.error(f"❌ Ошибка создания фоновой задачи: {e}", error=e)
         realtime_task = None
     
+    async def end_stream() -> None:
+        """Останавливает фоновую задачу и завершает сессию EventStore."""
+        stop_realtime_streaming.set()
+        if realtime_task and not realtime_task.done():
+            realtime_task.cancel()
+            try:
+                await asyncio.wait_for(realtime_task, timeout=2.0)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                pass
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка при отмене фоновой задачи: {e}")
+        
+        # События сессии остаются до TTL для продолжения стрима по
+        # Last-Event-ID; в процессе освобождается только очередь
+        try:
+            await event_store.save_event(STREAM_END, {"task_id": task_id})
+            await EventStore.release_session(task_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка при освобождении сессии EventStore: {e}")
+        
+        # Удаляем очередь событий
+        EventStore.remove_event_queue(task_id)
+    
     # ИСПРАВЛЕНИЕ: Быстрая проверка приветствия только для простых приветствий
     # Если приветствие содержит вопросы - используем ChatAgent с веб-поиском
     if IntentAgent.is_greeting_fast(task):
@@ -166,7 +217,8 @@ async def run_workflow_stream(
                 greeting_message=GREETING_MESSAGE,
                 task=task
             ):
-                yield event
+                yield await stored(event)
+            await end_stream()
             return
         else:
             # Приветствие с вопросом - используем ChatAgent (он проверит необходимость веб-поиска)
@@ -201,18 +253,18 @@ async def run_workflow_stream(
         if similarity >= 0.9 and success >= 0.85 and has_code:
             logger.info("✅ Задача уже решалась успешно - используем готовое решение из памяти")
             
-            yield await SSEManager.stream_stage_start(
+            yield await stored(await SSEManager.stream_stage_start(
                 stage="memory_check",
                 message="Проверяю память..."
-            )
+            ))
             # ОПТИМИЗАЦИЯ: Убрана задержка для более быстрого стриминга
             # await ui_sleep()
             
-            yield await SSEManager.stream_stage_end(
+            yield await stored(await SSEManager.stream_stage_end(
                 stage="memory_check",
                 message=f"Найдено готовое решение (схожесть: {similarity:.1%})",
                 result={"similarity": similarity, "success": success}
-            )
+            ))
             # ОПТИМИЗАЦИЯ: Убрана задержка для более быстрого стриминга
             # await ui_sleep()
             
@@ -237,7 +289,7 @@ async def run_workflow_stream(
                 "Продолжаю с полным циклом для адаптации под текущую задачу."
             )
             
-            yield await SSEManager.stream_stage_end(
+            yield await stored(await SSEManager.stream_stage_end(
                 stage="memory_reuse",
                 message=memory_message,
                 result={
@@ -247,7 +299,7 @@ async def run_workflow_stream(
                     "code_preview": code_preview[:500] if code_preview else "",
                     "plan_preview": plan_preview[:300] if plan_preview else ""
                 }
-            )
+            ))
             # ОПТИМИЗАЦИЯ: Убрана задержка для более быстрого стриминга
             # await ui_sleep()
             
@@ -306,7 +358,7 @@ async def run_workflow_stream(
             logger.warning(warning_message)
             
             # Отправляем предупреждение пользователю через SSE
-            yield await SSEManager.send_event(
+            yield await stored(await SSEManager.send_event(
                 "warning",
                 {
                     "message": warning_message,
@@ -316,14 +368,15 @@ async def run_workflow_stream(
                     "min_quality_required": min_quality,
                     "complexity": complexity_name
                 }
-            )
+            ))
             
     except RuntimeError as e:
         logger.error(f"❌ Ошибка инициализации: {e}", error=e)
-        yield await SSEManager.stream_error(
+        yield await stored(await SSEManager.stream_error(
             stage="initialization",
             error_message=str(e)
-        )
+        ))
+        await end_stream()
         return
     
     # ИСПРАВЛЕНИЕ: Автоматически определяем project_path если не указан
@@ -349,6 +402,9 @@ async def run_workflow_stream(
             project_path = None
         else:
             logger.info(f"✅ project_path валиден: {project_path}")
+            # Индексируем проект в фоне, пока идут intent и планирование:
+            # этап исследования возьмёт готовый индекс из общего реестра
+            get_project_index_registry().warm_up(project_path, file_extensions)
     
     # Создаём начальный state
     initial_state: AgentState = {
@@ -369,6 +425,7 @@ async def run_workflow_stream(
         "tests": "",
         "code": "",
         "validation_results": {},
+        "validation_fingerprints": [],
         "debug_result": None,
         "reflection_result": None,
         "critic_report": None,
@@ -397,19 +454,12 @@ async def run_workflow_stream(
         async for event in graph.astream(initial_state):
             graph_iteration += 1
             
-            # Проверяем очередь SSE событий из фоновой задачи
-            for _ in range(10):
-                if sse_queue.empty():
-                    break
-                try:
-                    sse_event = sse_queue.get_nowait()
-                    yield sse_event
-                    # ОПТИМИЗАЦИЯ: Убрана минимальная задержка для более быстрого стриминга
-                    # await asyncio.sleep(0.001)
-                except asyncio.QueueEmpty:
-                    break
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка отправки realtime SSE события: {e}")
+            # Все готовые SSE события фоновой задачи — одной записью
+            ready_events = []
+            while not sse_queue.empty():
+                ready_events.append(sse_queue.get_nowait())
+            if ready_events:
+                yield "".join(ready_events)
             
             # Обрабатываем события графа
             for node_name, node_state in event.items():
@@ -419,10 +469,10 @@ async def run_workflow_stream(
                 # даже если plan еще не заполнен (он заполнится позже через event_references)
                 if node_name == "planner" and event_references and not node_state.get("plan"):
                     # Отправляем stage_start для planner если есть event_references (стриминг начался)
-                    yield await SSEManager.stream_stage_start(
+                    yield await stored(await SSEManager.stream_stage_start(
                         stage="planning",
                         message="Создаю план выполнения..."
-                    )
+                    ))
                 
                 if event_references:
                     session_id = initial_state.get("task_id") or initial_state.get("session_id") or "default"
@@ -436,31 +486,7 @@ async def run_workflow_stream(
                         logger.debug(f"📤 Отправляю {len(stored_events)} SSE событий из узла {node_name}")
                         
                         for stored_event in stored_events:
-                            if stored_event.event_type == "thinking":
-                                if isinstance(stored_event.data, str):
-                                    # ReasoningStreamManager всегда возвращает готовую SSE строку
-                                    sse_event = stored_event.data
-                                else:
-                                    # Fallback: создаём thinking_started событие
-                                    sse_event = await SSEManager.send_event("thinking_started", {"content": str(stored_event.data), "stage": "unknown"})
-                            elif stored_event.event_type.startswith("thinking_"):
-                                if isinstance(stored_event.data, str):
-                                    # Готовая SSE строка с правильным event_type
-                                    sse_event = stored_event.data
-                                else:
-                                    # Fallback: используем event_type из stored_event
-                                    sse_event = await SSEManager.send_event(stored_event.event_type, {"content": str(stored_event.data), "stage": "unknown"})
-                            elif stored_event.event_type == "progress":
-                                # ИСПРАВЛЕНИЕ: Пробрасываем progress события для non-reasoning моделей
-                                if isinstance(stored_event.data, str):
-                                    sse_event = stored_event.data
-                                else:
-                                    sse_event = await SSEManager.send_event("stage_progress", stored_event.data if isinstance(stored_event.data, dict) else {"message": str(stored_event.data)})
-                            elif stored_event.event_type in ("plan_chunk", "test_chunk", "code_chunk"):
-                                sse_event = await SSEManager.send_event(stored_event.event_type, {"chunk": stored_event.data})
-                            else:
-                                sse_event = await SSEManager.send_event(stored_event.event_type, {"data": stored_event.data})
-                            yield sse_event
+                            yield await _event_to_sse(stored_event)
                         
                         if "event_references" not in initial_state:
                             initial_state["event_references"] = []
@@ -477,7 +503,7 @@ async def run_workflow_stream(
                     if sse_event == "__STOP_WORKFLOW__":
                         should_stop = True
                         break
-                    yield sse_event
+                    yield await stored(sse_event)
                 
                 if should_stop:
                     break
@@ -496,28 +522,51 @@ async def run_workflow_stream(
         
     except Exception as e:
         logger.error(f"❌ Ошибка выполнения workflow: {e}", error=e)
-        yield await SSEManager.stream_error(
+        yield await stored(await SSEManager.stream_error(
             stage="workflow",
             error_message=f"Ошибка выполнения workflow: {str(e)}",
             error_details={"exception_type": type(e).__name__}
-        )
+        ))
     finally:
         # Останавливаем фоновую задачу и очищаем ресурсы
-        stop_realtime_streaming.set()
-        if realtime_task and not realtime_task.done():
-            realtime_task.cancel()
+        await end_stream()
+
+
+async def resume_workflow_stream(
+    task_id: str,
+    last_event_id: Optional[str] = None
+) -> AsyncGenerator[str, None]:
+    """Продолжает SSE стрим задачи после Last-Event-ID.
+    
+    Отдаёт сохранённые события сессии с номером больше last_event_id и
+    дальше следит за хранилищем до события STREAM_END. С sqlite бэкендом
+    стрим продолжается и на воркере, который задачу не запускал.
+    
+    Args:
+        task_id: ID задачи (из события stream_start)
+        last_event_id: ID последнего полученного события (None — с начала)
+        
+    Yields:
+        SSE события в формате text/event-stream
+    """
+    event_store = await get_event_store(task_id)
+    heartbeat_interval = get_config().event_store_heartbeat_interval
+    loop = asyncio.get_running_loop()
+    last_sent = loop.time()
+    try:
+        async for event in event_store.tail_events(last_event_id):
+            if event is None:
+                if loop.time() - last_sent >= heartbeat_interval:
+                    last_sent = loop.time()
+                    yield SSEManager.encode_event("heartbeat", {"status": "alive"})
+                continue
+            last_sent = loop.time()
+            yield await _event_to_sse(event)
+    finally:
+        # Очередь идущего в этом процессе стрима принадлежит run_workflow_stream,
+        # он освободит сессию сам по окончании
+        if not EventStore.is_streaming(task_id):
             try:
-                await asyncio.wait_for(realtime_task, timeout=2.0)
-            except (asyncio.CancelledError, asyncio.TimeoutError):
-                pass
+                await EventStore.release_session(task_id)
             except Exception as e:
-                logger.warning(f"⚠️ Ошибка при отмене фоновой задачи: {e}")
-        
-        # Очищаем сессию из EventStore
-        try:
-            await EventStore.cleanup_session(task_id)
-        except Exception as e:
-            logger.warning(f"⚠️ Ошибка при очистке сессии EventStore: {e}")
-        
-        # Удаляем очередь событий
-        EventStore.remove_event_queue(task_id)
+                logger.warning(f"⚠️ Ошибка при освобождении сессии EventStore: {e}")
@@ -13,6 +13,7 @@ from typing import Any
 
 from fastapi import APIRouter
 
+from agents.conversation import get_conversation_memory
 from infrastructure.performance_metrics import get_performance_metrics, PerformanceMetrics
 from utils.logger import get_logger
 
@@ -123,3 +124,15 @@ async def get_benchmark() -> dict[str, Any]:
         },
         "multiplier": getattr(metrics, 'time_multiplier', 1.0)
     }
+
+
+@router.get("/metrics/conversations")
+async def get_conversation_metrics() -> dict[str, Any]:
+    """Возвращает метрики диалогов: очередь и задержку фоновой суммаризации."""
+    conv_memory = get_conversation_memory()
+    
+    return {
+        "conversations": conv_memory.count_conversations(),
+        "summarization": conv_memory.get_summarization_stats(),
+        "last_updated": datetime.now().isoformat()
+    }
@@ -169,6 +169,8 @@ class ShutdownManager:
             config = get_config()
             if config.persistence_enabled:
                 checkpointer = get_task_checkpointer()
+                # Дописываем checkpoint, которые ещё в очереди фоновой записи
+                await asyncio.to_thread(checkpointer.flush)
                 active_count = len(checkpointer.list_active_tasks())
                 if active_count > 0:
                     logger.info(f"📝 Сохранено {active_count} активных checkpoint")
@@ -1,12 +1,94 @@
-"""Утилита для генерации SSE событий из workflow агентов."""
-from typing import AsyncGenerator, Dict, Any, Optional
+"""Утилита для генерации SSE событий из workflow агентов.
+
+Кодирование события синхронное (encode_event): один f-string без списка
+строк, timestamp дописывается в готовый JSON без копирования data.
+Строка id: пишется только для событий с ID EventStore — по нему клиент
+продолжает стрим через Last-Event-ID, а чанки и heartbeat вне хранилища
+идут без ID. JSON кодирует переиспользуемый JSONEncoder или, при
+[streaming] sse_json_backend = "orjson", orjson (компактный JSON без
+пробелов после разделителей).
+"""
+from typing import AsyncGenerator, Callable, Dict, Any, Optional
 from datetime import datetime
 import json
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson опционален
+    orjson = None
+
+from utils.config import get_config
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Тот же вывод, что json.dumps(..., ensure_ascii=False), без создания
+# JSONEncoder на каждый вызов
+_json_encode = json.JSONEncoder(ensure_ascii=False).encode
+_dumps: Optional[Callable[[Any], str]] = None
+_timestamp_field = ', "timestamp": "'
+
+
+def _orjson_encode(data: Any) -> str:
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def set_json_backend(backend: Optional[str] = None) -> str:
+    """Выбирает JSON бэкенд кодирования SSE событий.
+    
+    Args:
+        backend: "json" или "orjson" (None — из [streaming] sse_json_backend)
+        
+    Returns:
+        Фактически используемый бэкенд ("orjson" без установленного пакета
+        заменяется на "json")
+    """
+    global _dumps, _timestamp_field
+    if backend is None:
+        backend = get_config().sse_json_backend
+    if backend == "orjson" and orjson is None:
+        logger.warning("⚠️ orjson не установлен, SSE события кодируются через json")
+        backend = "json"
+    if backend == "orjson":
+        _dumps, _timestamp_field = _orjson_encode, ',"timestamp":"'
+    else:
+        backend = "json"
+        _dumps, _timestamp_field = _json_encode, ', "timestamp": "'
+    return backend
+
 
 class SSEManager:
     """Менеджер для генерации Server-Sent Events из workflow агентов."""
 
+    @staticmethod
+    def encode_event(
+        event_type: str,
+        data: Dict[str, Any],
+        event_id: Optional[str] = None
+    ) -> str:
+        """Синхронно кодирует SSE событие в формате text/event-stream.
+        
+        Args:
+            event_type: Тип события (stage_start, stage_end, progress, result, error)
+            data: Данные события (не изменяются)
+            event_id: ID события EventStore (None — событие без строки id:)
+            
+        Returns:
+            Строка в формате SSE, завершённая пустой строкой
+        """
+        if _dumps is None:
+            set_json_backend()
+        timestamp = datetime.now().isoformat()
+        if data and "timestamp" not in data:
+            # Дописываем timestamp последним полем готового объекта
+            json_data = f"{_dumps(data)[:-1]}{_timestamp_field}{timestamp}\"}}"
+        else:
+            json_data = _dumps({**data, "timestamp": timestamp})
+        # SSE требует двойной перевод строки (\n\n) для завершения события
+        if event_id is None:
+            return f"event: {event_type}\ndata: {json_data}\n\n"
+        return f"id: {event_id}\nevent: {event_type}\ndata: {json_data}\n\n"
+
     @staticmethod
     async def send_event(
         event_type: str,
@@ -15,6 +97,8 @@ class SSEManager:
     ) -> str:
         """Генерирует SSE событие в формате text/event-stream.
         
+        Асинхронная обёртка над encode_event для существующих вызовов.
+        
         Args:
             event_type: Тип события (stage_start, stage_end, progress, result, error)
             data: Данные события
@@ -23,25 +107,7 @@ class SSEManager:
         Returns:
             Строка в формате SSE
         """
-        if event_id is None:
-            event_id = str(datetime.now().timestamp())
-        
-        lines: list[str] = []
-        lines.append(f"id: {event_id}")
-        lines.append(f"event: {event_type}")
-        
-        # Добавляем timestamp
-        data_with_timestamp = {
-            **data,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        json_data = json.dumps(data_with_timestamp, ensure_ascii=False)
-        lines.append(f"data: {json_data}")
-        lines.append("")  # Пустая строка для завершения события
-        
-        # SSE требует двойной перевод строки (\n\n) для завершения события
-        return "\n".join(lines) + "\n"
+        return SSEManager.encode_event(event_type, data, event_id)
 
     @staticmethod
     async def stream_stage_start(
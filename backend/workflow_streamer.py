@@ -493,7 +493,8 @@ class WorkflowStreamer:
             context=node_state.get("context", ""),
             tests=node_state.get("tests", ""),
             code=node_state.get("code", ""),
-            prompts_used=[]
+            prompts_used=[],
+            model=node_state.get("model") or self.config.default_model
         )
         
         token_status = check_token_limit(
@@ -90,6 +90,7 @@ def main() -> None:
                 "tests": "",
                 "code": "",
                 "validation_results": {},
+                "validation_fingerprints": [],
                 "debug_result": None,
                 "reflection_result": None,
                 "iteration": 0,
@@ -17,14 +17,21 @@
 from __future__ import annotations
 
 import ast
+import os
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
 
+from infrastructure.project_scanner import ScannedFile, get_project_scanner
 from utils.logger import get_logger
 
 logger = get_logger()
 
+# Сколько проектов держит get_project_analyzer
+_MAX_PROJECT_ANALYZERS = 8
+
 
 @dataclass
 class FunctionInfo:
@@ -144,7 +151,7 @@ class ASTAnalyzer:
         """
         try:
             tree = ast.parse(code)
-            return self._analyze_tree(tree, code, file_path)
+            return self.analyze_tree(tree, code, file_path)
         except SyntaxError as e:
             logger.debug(f"Синтаксическая ошибка в {file_path}: {e}")
             return None
@@ -175,13 +182,22 @@ class ASTAnalyzer:
             logger.warning(f"Ошибка чтения {file_path}: {e}")
             return None
     
-    def _analyze_tree(
+    def analyze_tree(
         self,
         tree: ast.Module,
         code: str,
         file_path: str
     ) -> FileAnalysis:
-        """Анализирует AST дерево."""
+        """Анализирует уже разобранное AST дерево (без повторного ast.parse).
+        
+        Args:
+            tree: Разобранный модуль
+            code: Исходный код модуля
+            file_path: Путь к файлу (для отчётов)
+            
+        Returns:
+            FileAnalysis модуля
+        """
         functions: list[FunctionInfo] = []
         classes: list[ClassInfo] = []
         imports: list[ImportInfo] = []
@@ -413,6 +429,23 @@ class DependencyGraph:
             if module_path not in self._nodes[imp].imported_by:
                 self._nodes[imp].imported_by.append(module_path)
     
+    def remove_module(self, module_path: str) -> None:
+        """Удаляет зависимости модуля (узел остаётся, пока его импортируют другие).
+        
+        Args:
+            module_path: Путь к модулю
+        """
+        node = self._nodes.get(module_path)
+        if node is None:
+            return
+        for imp in node.imports:
+            dep = self._nodes.get(imp)
+            if dep is not None and module_path in dep.imported_by:
+                dep.imported_by.remove(module_path)
+        node.imports = []
+        if not node.imported_by:
+            del self._nodes[module_path]
+    
     def get_dependencies(self, module_path: str) -> list[str]:
         """Возвращает модули которые импортирует данный модуль."""
         node = self._nodes.get(module_path)
@@ -484,13 +517,26 @@ class DependencyGraph:
 
 
 class ProjectAnalyzer:
-    """Анализатор проекта через AST."""
+    """Анализатор проекта через AST.
+    
+    Анализ инкрементальный: повторный analyze_project того же проекта
+    разбирает только файлы с изменившимися mtime/размером, update_files
+    обновляет перечисленные файлы без обхода проекта (наблюдатель файлов).
+    """
     
     def __init__(self):
         """Инициализирует анализатор."""
         self._analyzer = ASTAnalyzer()
         self._graph = DependencyGraph()
         self._analyses: dict[str, FileAnalysis] = {}
+        # Относительный путь -> (mtime_ns, размер) на момент разбора
+        self._signatures: dict[str, tuple[int, int]] = {}
+        self._project: Path | None = None
+        self._extensions: list[str] = [".py"]
+        self._scanned = False
+        self._lock = threading.RLock()
+        # Изменения файлов приходят от наблюдателя: analyze_project не обходит проект
+        self.watched = False
     
     def analyze_project(
         self,
@@ -510,37 +556,30 @@ class ProjectAnalyzer:
             extensions = [".py"]
         
         project = Path(project_path)
-        skip_patterns = ['.venv', '__pycache__', '.git', 'node_modules', '.tox']
         
         logger.info(f"📊 Анализирую проект: {project_path}")
         
-        files_analyzed = 0
-        total_loc = 0
-        total_functions = 0
-        total_classes = 0
-        
-        for ext in extensions:
-            for file_path in project.rglob(f"*{ext}"):
-                if any(skip in str(file_path) for skip in skip_patterns):
-                    continue
-                
-                analysis = self._analyzer.analyze_file(file_path)
-                if analysis:
-                    relative_path = str(file_path.relative_to(project))
-                    self._analyses[relative_path] = analysis
-                    
-                    # Добавляем в граф зависимостей
-                    imports = analysis.get_imported_modules()
-                    self._graph.add_module(relative_path, imports)
-                    
-                    # Собираем метрики
-                    files_analyzed += 1
-                    total_loc += analysis.metrics.lines_of_code
-                    total_functions += analysis.metrics.functions_count
-                    total_classes += analysis.metrics.classes_count
-        
-        # Вычисляем важность модулей
-        self._graph.calculate_importance()
+        with self._lock:
+            self._switch_project(project, extensions)
+            if not (self.watched and self._scanned):
+                # Обход и разбор общие с другими потребителями сканера
+                files = get_project_scanner().files(str(project), extensions)
+                seen = {file.rel_path for file in files}
+                for relative_path in set(self._signatures) - seen:
+                    self._forget(relative_path)
+                self._analyze_changed(files)
+                self._scanned = True
+            
+            # Вычисляем важность модулей
+            self._graph.calculate_importance()
+            
+            analyses = self._analyses.values()
+            files_analyzed = len(self._analyses)
+            total_loc = sum(analysis.metrics.lines_of_code for analysis in analyses)
+            total_functions = sum(analysis.metrics.functions_count for analysis in analyses)
+            total_classes = sum(analysis.metrics.classes_count for analysis in analyses)
+            dependency_stats = self._graph.get_stats()
+            most_important = self._graph.get_most_important(10)
         
         logger.info(
             f"✅ Проанализировано {files_analyzed} файлов, "
@@ -552,10 +591,77 @@ class ProjectAnalyzer:
             "total_loc": total_loc,
             "total_functions": total_functions,
             "total_classes": total_classes,
-            "dependency_graph": self._graph.get_stats(),
-            "most_important_modules": self._graph.get_most_important(10)
+            "dependency_graph": dependency_stats,
+            "most_important_modules": most_important
         }
     
+    @property
+    def extensions(self) -> list[str]:
+        """Расширения файлов последнего анализа."""
+        return list(self._extensions)
+    
+    def update_files(self, project_path: str | Path, changed_paths: Iterable[str]) -> None:
+        """Переанализирует изменённые файлы, удалённые убирает из анализа и графа.
+        
+        Args:
+            project_path: Путь к проекту
+            changed_paths: Пути файлов относительно корня проекта
+        """
+        project = Path(project_path)
+        scanner = get_project_scanner()
+        with self._lock:
+            self._switch_project(project, self._extensions)
+            files: list[ScannedFile] = []
+            for relative_path in changed_paths:
+                file = None
+                if relative_path.endswith(tuple(self._extensions)) and not scanner.is_ignored(str(project), relative_path):
+                    file = ScannedFile.from_path(str(project / relative_path), str(project))
+                if file is not None:
+                    files.append(file)
+                else:
+                    self._forget(relative_path)
+            self._analyze_changed(files)
+    
+    def _switch_project(self, project: Path, extensions: list[str]) -> None:
+        """Сбрасывает накопленный анализ, если анализируется другой проект."""
+        project = Path(os.path.abspath(project))
+        if self._project == project and self._extensions == extensions:
+            return
+        self._graph = DependencyGraph()
+        self._analyses.clear()
+        self._signatures.clear()
+        self._project = project
+        self._extensions = list(extensions)
+        self._scanned = False
+    
+    def _analyze_changed(self, files: list[ScannedFile]) -> None:
+        """Разбирает файлы, изменившиеся с прошлого разбора (через кэш сканера)."""
+        stale = [
+            file for file in files
+            if self._signatures.get(file.rel_path) != (file.mtime_ns, file.size)
+        ]
+        for file, parsed in zip(stale, get_project_scanner().parse(stale)):
+            relative_path = file.rel_path
+            if parsed is None:
+                self._forget(relative_path)
+                continue
+            self._signatures[relative_path] = (file.mtime_ns, file.size)
+            
+            analysis = parsed.analysis
+            self._graph.remove_module(relative_path)
+            if analysis:
+                self._analyses[relative_path] = analysis
+                # Добавляем в граф зависимостей
+                self._graph.add_module(relative_path, analysis.get_imported_modules())
+            else:
+                self._analyses.pop(relative_path, None)
+    
+    def _forget(self, relative_path: str) -> None:
+        """Убирает удалённый файл из анализа."""
+        self._signatures.pop(relative_path, None)
+        if self._analyses.pop(relative_path, None) is not None:
+            self._graph.remove_module(relative_path)
+    
     def get_file_analysis(self, file_path: str) -> FileAnalysis | None:
         """Возвращает анализ конкретного файла."""
         return self._analyses.get(file_path)
@@ -592,6 +698,35 @@ class ProjectAnalyzer:
         return "\n".join(lines)
 
 
+_project_analyzers: OrderedDict[str, ProjectAnalyzer] = OrderedDict()
+_project_analyzers_lock = threading.Lock()
+
+
+def get_project_analyzer(project_path: str | Path, create: bool = True) -> ProjectAnalyzer | None:
+    """Возвращает общий для процесса анализатор проекта.
+    
+    Повторный анализ того же проекта переиспользует разобранные файлы.
+    Хранится до _MAX_PROJECT_ANALYZERS проектов (давно не использованные удаляются).
+    
+    Args:
+        project_path: Путь к проекту
+        create: Создать анализатор, если проекта ещё нет (False — вернуть None)
+        
+    Returns:
+        ProjectAnalyzer проекта или None
+    """
+    key = os.path.abspath(project_path)
+    with _project_analyzers_lock:
+        analyzer = _project_analyzers.get(key)
+        if analyzer is not None:
+            _project_analyzers.move_to_end(key)
+        elif create:
+            analyzer = _project_analyzers[key] = ProjectAnalyzer()
+            while len(_project_analyzers) > _MAX_PROJECT_ANALYZERS:
+                _project_analyzers.popitem(last=False)
+        return analyzer
+
+
 def analyze_code_structure(code: str, file_path: str = "<string>") -> dict[str, Any] | None:
     """Утилита для быстрого анализа кода.
     
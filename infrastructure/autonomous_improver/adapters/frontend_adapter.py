@@ -5,6 +5,8 @@ import re
 import json
 import logging
 
+from infrastructure.project_scanner import get_project_scanner
+
 from .base import LanguageAdapter
 
 logger = logging.getLogger("autonomous_improver")
@@ -44,13 +46,11 @@ class FrontendAdapter:
         return [".ts", ".tsx", ".js", ".jsx", ".html", ".md", ".json"]
     
     def discover_files(self, project_path: Path) -> List[Path]:
-        """Находит все фронтенд-файлы в проекте."""
-        frontend_files = []
-        
-        for ext in self.file_extensions:
-            frontend_files.extend(project_path.rglob(f"*{ext}"))
-        
-        return frontend_files
+        """Находит все фронтенд-файлы в проекте (общий обход сканера, с учётом .gitignore)."""
+        return [
+            project_path / file.rel_path
+            for file in get_project_scanner().files(str(project_path), self.file_extensions)
+        ]
     
     def analyze_structure(self, file_path: Path) -> Optional[FrontendStructure]:
         """Анализирует структуру фронтенд-файла."""
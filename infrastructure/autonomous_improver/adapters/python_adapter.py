@@ -3,6 +3,7 @@ from pathlib import Path
 from typing import List, Optional, Any
 
 from infrastructure.ast_analyzer import ASTAnalyzer, FileAnalysis
+from infrastructure.project_scanner import get_project_scanner
 from utils.logger import get_logger
 from .base import LanguageAdapter
 
@@ -28,9 +29,11 @@ class PythonAdapter(LanguageAdapter):
         self.ast_analyzer = ASTAnalyzer()
     
     def discover_files(self, project_path: Path) -> List[Path]:
-        """Находит все Python файлы в проекте."""
-        python_files = list(project_path.rglob("*.py"))
-        return python_files
+        """Находит все Python файлы в проекте (общий обход сканера, с учётом .gitignore)."""
+        return [
+            project_path / file.rel_path
+            for file in get_project_scanner().files(str(project_path), self.file_extensions)
+        ]
     
     def analyze_structure(self, file_path: Path) -> Optional[FileAnalysis]:
         """Анализирует структуру Python файла через AST."""
@@ -42,7 +45,8 @@ class PythonAdapter(LanguageAdapter):
             return None
         
         try:
-            return self.ast_analyzer.analyze_file(file_path)
+            # Разбор из общего кэша: файл, уже разобранный индексацией, не парсится заново
+            return get_project_scanner().analyze_file(str(file_path))
         except Exception as e:
             logger.debug(f"⚠️ Ошибка AST анализа файла {file_path}: {e}")
             return None
@@ -178,14 +178,16 @@ class ProjectProfile:
             ProjectProfile с автоматически определёнными настройками
         """
         from pathlib import Path
+        from infrastructure.project_scanner import get_project_scanner
         
         path = Path(project_path)
         profile = cls()
         
-        # Определяем язык по файлам и конфигурационным файлам
-        python_files = list(path.rglob("*.py"))
-        ts_files = list(path.rglob("*.ts")) + list(path.rglob("*.tsx"))
-        js_files = list(path.rglob("*.js")) + list(path.rglob("*.jsx"))
+        # Определяем язык по файлам и конфигурационным файлам (один общий обход)
+        scanner = get_project_scanner()
+        python_files = scanner.files(project_path, [".py"])
+        ts_files = scanner.files(project_path, [".ts", ".tsx"])
+        js_files = scanner.files(project_path, [".js", ".jsx"])
         
         # Проверяем конфигурационные файлы
         has_requirements = (path / "requirements.txt").exists()
@@ -1,39 +1,160 @@
-"""Система кэширования для результатов."""
+"""Система кэширования для результатов.
+
+SimpleCache — LRU кэш в памяти с TTL на каждую запись и лимитами по
+количеству записей и по объёму (байты). Все операции O(1): записи лежат
+в OrderedDict в порядке использования, при переполнении вытесняется
+самая давно использованная. Истёкшие записи удаляются при обращении,
+а также при каждом set() проверяется пара записей в начале LRU очереди
+(без полного обхода кэша на горячем пути).
+"""
+import asyncio
 import hashlib
-import json
+import inspect
+import sys
+import threading
 import time
-from typing import Any, Optional, Dict, Callable
+from collections import OrderedDict
+from enum import Enum
+from pathlib import PurePath
+from typing import Any, Optional, Dict, Callable, Tuple
 from functools import wraps
+from utils.config import get_config
 from utils.logger import get_logger
 
 logger = get_logger()
 
+# Глубина обхода контейнеров при оценке размера значения
+_SIZE_ESTIMATE_DEPTH = 3
+
+# Сколько записей из начала LRU очереди проверять на истечение при каждом set()
+_EXPIRE_CHECKS_PER_SET = 2
+
+
+def estimate_size(value: Any, depth: int = _SIZE_ESTIMATE_DEPTH) -> int:
+    """Приблизительный размер значения в байтах.
+
+    Для строк и байтов точный, для контейнеров — сумма элементов до
+    заданной глубины. Нужен для лимита по объёму, а не для точного учёта.
+
+    Args:
+        value: Значение
+        depth: Оставшаяся глубина обхода контейнеров
+
+    Returns:
+        Размер в байтах
+    """
+    size = sys.getsizeof(value)
+    if depth <= 0 or isinstance(value, (str, bytes, bytearray)):
+        return size
+    if isinstance(value, dict):
+        return size + sum(
+            estimate_size(k, depth - 1) + estimate_size(v, depth - 1)
+            for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(estimate_size(item, depth - 1) for item in value)
+    return size
+
+
+def _feed_key(hasher: Any, value: Any) -> None:
+    """Добавляет значение в хэш ключа: тег типа, длина и данные.
+
+    Тег и длина исключают коллизии вида "1"/1 и ("a", "b")/"('a', 'b')".
+    Строки и байты хэшируются как есть, без промежуточной сериализации.
+
+    Raises:
+        TypeError: Значение не из поддерживаемых типов (экземпляры
+            произвольных классов не дают стабильного ключа)
+    """
+    if value is None or isinstance(value, bool):
+        hasher.update(b"n" if value is None else (b"T" if value else b"F"))
+    elif isinstance(value, str):
+        data = value.encode("utf-8", "surrogatepass")
+        hasher.update(b"s%d:" % len(data))
+        hasher.update(data)
+    elif isinstance(value, (bytes, bytearray)):
+        hasher.update(b"b%d:" % len(value))
+        hasher.update(value)
+    elif isinstance(value, Enum):
+        hasher.update(b"e")
+        _feed_key(hasher, f"{type(value).__module__}.{type(value).__qualname__}")
+        _feed_key(hasher, value.value)
+    elif isinstance(value, int):
+        hasher.update(b"i%d;" % value)
+    elif isinstance(value, float):
+        hasher.update(b"f" + repr(value).encode() + b";")
+    elif isinstance(value, PurePath):
+        hasher.update(b"p")
+        _feed_key(hasher, str(value))
+    elif isinstance(value, (tuple, list)):
+        hasher.update((b"t" if isinstance(value, tuple) else b"l") + b"%d:" % len(value))
+        for item in value:
+            _feed_key(hasher, item)
+    elif isinstance(value, dict):
+        # Порядок вставки не влияет на ключ: элементы сортируются по своему хэшу
+        hasher.update(b"d%d:" % len(value))
+        for item in sorted(make_cache_key(k, v) for k, v in value.items()):
+            hasher.update(item.encode())
+    elif isinstance(value, (set, frozenset)):
+        hasher.update(b"S%d:" % len(value))
+        for item in sorted(make_cache_key(v) for v in value):
+            hasher.update(item.encode())
+    else:
+        raise TypeError(f"Значение типа {type(value).__qualname__} не подходит для ключа кэша")
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Стабильный ключ кэша из аргументов.
+
+    Части — None, bool, int, float, str, bytes, Enum, пути и контейнеры из
+    них (tuple, list, dict, set). Ключ одинаков в разных процессах (годится
+    для дискового кэша), длинные строки хэшируются без копирования в pickle.
+
+    Returns:
+        Хэш ключа (blake2b, 128 бит)
+
+    Raises:
+        TypeError: Если часть ключа другого типа
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    _feed_key(hasher, parts)
+    return hasher.hexdigest()
+
 
 class CacheEntry:
     """Запись в кэше."""
-    
-    def __init__(self, value: Any, ttl: int = 3600):
+
+    __slots__ = ("value", "created_at", "ttl", "expires_at", "size")
+
+    def __init__(self, value: Any, ttl: int = 3600, size: int = 0):
         """Инициализация записи кэша.
-        
+
         Args:
             value: Значение для кэширования
             ttl: Время жизни (секунды)
+            size: Оценка размера значения в байтах
         """
         self.value = value
         self.created_at = time.time()
         self.ttl = ttl
-    
-    def is_expired(self) -> bool:
+        # Монотонное время не зависит от перевода системных часов
+        self.expires_at = time.monotonic() + ttl
+        self.size = size
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
         """Проверяет, истёк ли срок действия записи.
-        
+
+        Args:
+            now: Текущее монотонное время (чтобы не запрашивать его для каждой записи)
+
         Returns:
             True если истёк, False иначе
         """
-        return time.time() - self.created_at > self.ttl
-    
+        return (time.monotonic() if now is None else now) > self.expires_at
+
     def get(self) -> Optional[Any]:
         """Возвращает значение если оно ещё валидно.
-        
+
         Returns:
             Значение или None если истёк срок
         """
@@ -43,186 +164,351 @@ class CacheEntry:
 
 
 class SimpleCache:
-    """Простой в памяти кэш."""
-    
-    def __init__(self, max_size: int = 1000):
+    """LRU кэш в памяти с TTL и лимитами по количеству и объёму.
+
+    Потокобезопасен (Lock на каждую операцию). Операции не блокируются
+    на I/O, поэтому безопасны и из event loop.
+    """
+
+    def __init__(self, max_size: int = 1000, max_bytes: Optional[int] = None):
         """Инициализация кэша.
-        
+
         Args:
             max_size: Максимальное количество записей
+            max_bytes: Максимальный суммарный размер значений в байтах (None — без лимита)
         """
         self.max_size = max_size
-        self.cache: Dict[str, CacheEntry] = {}
-    
+        self.max_bytes = max_bytes
+        self.cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
     def _generate_key(self, *args: Any, **kwargs: Any) -> str:
         """Генерирует ключ кэша из аргументов.
-        
+
         Args:
             *args: Позиционные аргументы
             **kwargs: Именованные аргументы
-            
+
         Returns:
             Ключ кэша
+
+        Raises:
+            TypeError: Если аргумент не годится для ключа (см. make_cache_key)
         """
-        key_data = json.dumps({
-            'args': str(args),
-            'kwargs': str(sorted(kwargs.items()))
-        }, sort_keys=True, default=str)
-        return hashlib.md5(key_data.encode()).hexdigest()
-    
+        return make_cache_key(args, kwargs)
+
+    def _remove(self, key: str) -> None:
+        """Удаляет запись (вызывается под блокировкой)."""
+        entry = self.cache.pop(key)
+        self.total_bytes -= entry.size
+
     def get(self, key: str) -> Optional[Any]:
         """Получает значение из кэша.
-        
+
         Args:
             key: Ключ кэша
-            
+
         Returns:
             Значение или None
         """
-        if key not in self.cache:
-            return None
-        
-        entry = self.cache[key]
-        value = entry.get()
-        
-        if value is None:
-            del self.cache[key]
-            return None
-        
-        return value
-    
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if time.monotonic() > entry.expires_at:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
     def set(self, key: str, value: Any, ttl: int = 3600) -> None:
         """Устанавливает значение в кэш.
-        
+
+        При переполнении вытесняются самые давно использованные записи.
+
         Args:
             key: Ключ кэша
             value: Значение
             ttl: Время жизни (секунды)
         """
-        # Удаляем старые записи если кэш переполнен
-        if len(self.cache) >= self.max_size:
-            # Удаляем половину самых старых записей
-            sorted_keys = sorted(
-                self.cache.keys(),
-                key=lambda k: self.cache[k].created_at
-            )
-            for k in sorted_keys[:len(self.cache) // 2]:
-                del self.cache[k]
-        
-        self.cache[key] = CacheEntry(value, ttl)
-    
+        size = estimate_size(value) if self.max_bytes is not None else 0
+
+        with self._lock:
+            previous = self.cache.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous.size
+
+            if self.max_bytes is not None and size > self.max_bytes:
+                # Значение больше всего кэша — не вытесняем ради него всё остальное
+                logger.debug(f"⚠️ Значение ({size} байт) больше лимита кэша, не кэшируется")
+                return
+
+            self.cache[key] = CacheEntry(value, ttl, size)
+            self.total_bytes += size
+
+            # Инкрементальная очистка: самые давно использованные записи
+            # чаще всего и есть истёкшие
+            now = time.monotonic()
+            for _ in range(_EXPIRE_CHECKS_PER_SET):
+                oldest_key, oldest = next(iter(self.cache.items()))
+                if oldest_key == key or now <= oldest.expires_at:
+                    break
+                self._remove(oldest_key)
+                self.expirations += 1
+
+            while len(self.cache) > self.max_size or (
+                self.max_bytes is not None and self.total_bytes > self.max_bytes
+            ):
+                _, entry = self.cache.popitem(last=False)
+                self.total_bytes -= entry.size
+                self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        """Удаляет запись.
+
+        Returns:
+            True если запись была в кэше
+        """
+        with self._lock:
+            if key not in self.cache:
+                return False
+            self._remove(key)
+            return True
+
     def clear(self) -> None:
         """Очищает кэш."""
-        self.cache.clear()
-    
+        with self._lock:
+            self.cache.clear()
+            self.total_bytes = 0
+
+    def _cleanup_expired_locked(self) -> int:
+        """Удаляет истёкшие записи (вызывается под блокировкой)."""
+        now = time.monotonic()
+        expired_keys = [k for k, v in self.cache.items() if v.is_expired(now)]
+        for k in expired_keys:
+            self._remove(k)
+        self.expirations += len(expired_keys)
+        return len(expired_keys)
+
     def cleanup_expired(self) -> int:
         """Удаляет истёкшие записи.
-        
+
         Returns:
             Количество удалённых записей
         """
-        expired_keys = [
-            k for k, v in self.cache.items()
-            if v.is_expired()
-        ]
-        
-        for k in expired_keys:
-            del self.cache[k]
-        
-        if expired_keys:
-            logger.debug(f"🧹 Очищено {len(expired_keys)} истёкших записей кэша")
-        
-        return len(expired_keys)
+        with self._lock:
+            removed = self._cleanup_expired_locked()
+
+        if removed:
+            logger.debug(f"🧹 Очищено {removed} истёкших записей кэша")
+
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики кэша.
+
+        Returns:
+            Словарь с hits, misses, hit_rate, evictions, expirations, size, bytes
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self.cache),
+                "max_size": self.max_size,
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def __len__(self) -> int:
+        return len(self.cache)
 
 
 # Глобальный кэш
-_global_cache = SimpleCache()
+_global_cache: Optional[SimpleCache] = None
+_global_cache_lock = threading.Lock()
 
 
 def get_cache() -> SimpleCache:
     """Возвращает глобальный кэш.
-    
+
     Returns:
         Экземпляр SimpleCache
     """
+    global _global_cache
+
+    if _global_cache is None:
+        with _global_cache_lock:
+            if _global_cache is None:
+                config = get_config()
+                max_memory_mb = config.cache_max_memory_mb
+                _global_cache = SimpleCache(
+                    max_size=config.cache_max_entries,
+                    max_bytes=max_memory_mb * 1024 * 1024 if max_memory_mb > 0 else None
+                )
     return _global_cache
 
 
+def _is_method(func: Callable) -> bool:
+    """True, если первый параметр функции — self или cls."""
+    try:
+        params = list(inspect.signature(func).parameters)
+    except (TypeError, ValueError):
+        return False
+    return bool(params) and params[0] in ("self", "cls")
+
+
+def _function_key(
+    func: Callable,
+    args: Tuple[Any, ...],
+    kwargs: Dict[str, Any],
+    is_method: bool = False
+) -> Optional[str]:
+    """Ключ кэша для вызова функции (модуль и qualname исключают коллизии одноимённых функций).
+
+    Метод кэшируется отдельно для каждого получателя: cls — по имени класса,
+    self — по классу и id экземпляра (как прежний ключ из repr по умолчанию),
+    разные экземпляры не делят запись.
+
+    Returns:
+        Ключ или None, если аргументы не годятся для ключа (вызов без кэша)
+    """
+    receiver: Tuple[Any, ...] = ()
+    if is_method and args:
+        owner, args = args[0], args[1:]
+        if isinstance(owner, type):
+            receiver = (owner.__module__, owner.__qualname__)
+        else:
+            receiver = (type(owner).__module__, type(owner).__qualname__, id(owner))
+    try:
+        return make_cache_key(func.__module__, func.__qualname__, receiver, args, kwargs)
+    except TypeError as e:
+        logger.debug(f"⚠️ Вызов {func.__qualname__} не кэшируется: {e}")
+        return None
+
+
 def cached(ttl: int = 3600) -> Callable:
     """Декоратор для кэширования результатов функции.
-    
+
     Args:
         ttl: Время жизни кэша (секунды)
-        
+
     Returns:
         Декоратор
     """
     def decorator(func: Callable) -> Callable:
+        is_method = _is_method(func)
+
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
             cache = get_cache()
-            
-            # Генерируем ключ
-            key_data = json.dumps({
-                'func': func.__name__,
-                'args': str(args),
-                'kwargs': str(sorted(kwargs.items()))
-            }, sort_keys=True, default=str)
-            key = hashlib.md5(key_data.encode()).hexdigest()
-            
+            key = _function_key(func, args, kwargs, is_method)
+            if key is None:
+                return func(*args, **kwargs)
+
             # Проверяем кэш
             cached_value = cache.get(key)
             if cached_value is not None:
                 logger.debug(f"💾 Попадание в кэш для {func.__name__}")
                 return cached_value
-            
+
             # Вычисляем результат
             result = func(*args, **kwargs)
-            
+
             # Сохраняем в кэш
             cache.set(key, result, ttl)
             return result
-        
+
         return wrapper
-    
+
     return decorator
 
 
 def async_cached(ttl: int = 3600) -> Callable:
     """Декоратор для кэширования результатов асинхронной функции.
-    
+
+    Одновременные вызовы с одинаковыми аргументами ждут один и тот же
+    вызов функции, а не выполняют её параллельно (защита от stampede).
+    Если этот вызов отменён, ожидающие не получают чужую отмену: первый
+    из них повторяет вызов, остальные ждут уже его.
+
     Args:
         ttl: Время жизни кэша (секунды)
-        
+
     Returns:
         Декоратор
     """
     def decorator(func: Callable) -> Callable:
+        # Незавершённые вызовы: ключ -> future (свой для каждого event loop)
+        in_flight: Dict[Tuple[int, str], "asyncio.Future[Any]"] = {}
+        is_method = _is_method(func)
+
         @wraps(func)
         async def wrapper(*args: Any, **kwargs: Any) -> Any:
             cache = get_cache()
-            
-            # Генерируем ключ
-            key_data = json.dumps({
-                'func': func.__name__,
-                'args': str(args),
-                'kwargs': str(sorted(kwargs.items()))
-            }, sort_keys=True, default=str)
-            key = hashlib.md5(key_data.encode()).hexdigest()
-            
+            key = _function_key(func, args, kwargs, is_method)
+            if key is None:
+                return await func(*args, **kwargs)
+
             # Проверяем кэш
             cached_value = cache.get(key)
             if cached_value is not None:
                 logger.debug(f"💾 Попадание в кэш для {func.__name__}")
                 return cached_value
-            
-            # Вычисляем результат
-            result = await func(*args, **kwargs)
-            
+
+            flight_key = (id(asyncio.get_running_loop()), key)
+            pending = in_flight.get(flight_key)
+            while pending is not None:
+                try:
+                    return await asyncio.shield(pending)
+                except asyncio.CancelledError:
+                    # Отменили нас самих — отмена пробрасывается
+                    if not pending.cancelled() or asyncio.current_task().cancelling():
+                        raise
+                # Отменён вызов, который мы ждали: его результат мог успеть
+                # попасть в кэш, иначе вызов повторяется (один на всех ожидающих)
+                cached_value = cache.get(key)
+                if cached_value is not None:
+                    return cached_value
+                pending = in_flight.get(flight_key)
+
+            future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+            in_flight[flight_key] = future
+            try:
+                # Вычисляем результат
+                result = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                # Исключение получат ожидающие; если их нет — не логировать "never retrieved"
+                future.exception()
+                raise
+            finally:
+                in_flight.pop(flight_key, None)
+
             # Сохраняем в кэш
             cache.set(key, result, ttl)
+            future.set_result(result)
             return result
-        
+
         return wrapper
-    
+
     return decorator
@@ -213,6 +213,22 @@ class CircuitBreaker:
             self.stats.successes = 0
             logger.warning(f"⚠️ Circuit breaker '{self.name}' снова открыт после ошибки")
     
+    def allow_request(self) -> bool:
+        """Разрешён ли вызов сейчас (для кода, который выполняет вызов сам).
+        
+        Returns:
+            True если circuit закрыт или пора пробовать восстановление
+        """
+        return self._should_attempt_call()
+    
+    def record_success(self) -> None:
+        """Учитывает успешный вызов, выполненный в обход call()."""
+        self._on_success()
+    
+    def record_failure(self) -> None:
+        """Учитывает ошибку вызова, выполненного в обход call()."""
+        self._on_failure()
+    
     def get_stats(self) -> Dict[str, Any]:
         """Возвращает статистику circuit breaker.
         
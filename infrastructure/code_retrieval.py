@@ -7,15 +7,25 @@ from __future__ import annotations
 
 import ast
 import hashlib
+import json
+import threading
+import weakref
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Any
+from typing import Iterable, Optional, Any
 
+from infrastructure.context_index import FileSignature, ProjectIndexStore, compress_payload
+from infrastructure.embedding_cache import EmbeddingCache, get_embedding_cache
+from infrastructure.project_scanner import ScannedFile, get_project_scanner
 from utils.config import get_config
 from utils.logger import get_logger
 
 logger = get_logger()
 
+# Батч для SentenceTransformer.encode и для upsert/delete в ChromaDB
+_ENCODE_BATCH_SIZE = 64
+_UPSERT_BATCH_SIZE = 1000
+
 
 @dataclass
 class CodeExample:
@@ -82,6 +92,9 @@ class CodeRetriever:
         
         # Кэш для GitHub
         self._github_cache: dict[str, list[CodeExample]] = {}
+        
+        # Персистентный кэш embeddings (общий с RAG)
+        self._embedding_cache: EmbeddingCache | None = get_embedding_cache()
     
     def _ensure_initialized(self) -> bool:
         """Инициализирует модели при первом использовании.
@@ -105,6 +118,8 @@ class CodeRetriever:
                 metadata={"hnsw:space": "cosine"}
             )
             
+            with _live_retrievers_lock:
+                _live_retrievers.add(self)
             logger.info("✅ Code Retriever инициализирован")
             return True
             
@@ -116,6 +131,18 @@ class CodeRetriever:
             logger.error(f"❌ Ошибка инициализации Code Retriever: {e}")
             return False
     
+    def _encode(self, text: str) -> list[float]:
+        """Возвращает embedding текста, используя персистентный кэш."""
+        if self._embedding_cache is not None:
+            cached = self._embedding_cache.get(self._embedding_model_name, text)
+            if cached is not None:
+                return cached
+        
+        embedding = self._embedding_model.encode(text).tolist()
+        if self._embedding_cache is not None:
+            self._embedding_cache.put(self._embedding_model_name, text, embedding)
+        return embedding
+    
     def find_similar(
         self,
         query: str,
@@ -170,7 +197,7 @@ class CodeRetriever:
             return []
         
         try:
-            query_embedding = self._embedding_model.encode(query).tolist()
+            query_embedding = self._encode(query)
             
             results = self._collection.query(
                 query_embeddings=[query_embedding],
@@ -324,16 +351,27 @@ class CodeRetriever:
     def index_project(
         self,
         project_path: str,
-        extensions: list[str] | None = None
+        extensions: list[str] | None = None,
+        incremental: bool = True,
+        changed_paths: Iterable[str] | None = None
     ) -> int:
         """Индексирует проект для локального поиска.
         
+        В инкрементальном режиме файлы с прежней сигнатурой (mtime, размер,
+        хэш содержимого) не перечитываются, для изменённых файлов
+        пересчитываются только новые функции, векторы удалённых функций
+        и файлов удаляются из коллекции. Новые функции кодируются батчами
+        и записываются в ChromaDB одним upsert на батч.
+        
         Args:
             project_path: Путь к проекту
             extensions: Расширения файлов для индексации
+            incremental: False — переиндексировать все файлы заново
+            changed_paths: Сверить только эти файлы (пути относительно корня,
+                от наблюдателя файлов); None — обойти весь проект
             
         Returns:
-            Количество проиндексированных функций/классов
+            Количество проиндексированных функций в проекте
         """
         if not self._ensure_initialized():
             return 0
@@ -341,41 +379,181 @@ class CodeRetriever:
         if extensions is None:
             extensions = [".py"]
         
-        indexed = 0
         project = Path(project_path)
-        skip_patterns = ['.venv', '__pycache__', '.git', 'node_modules', '.chroma']
-        
         logger.info(f"📂 Индексирую проект: {project_path}")
         
-        for ext in extensions:
-            for file_path in project.rglob(f"*{ext}"):
-                if any(skip in str(file_path) for skip in skip_patterns):
+        store = ProjectIndexStore(self._manifest_path(project), f"code_retrieval:v1:{self._embedding_model_name}")
+        manifest = store.load(decoder=json.loads)
+        
+        touched: list[tuple[str, FileSignature]] = []
+        to_index: list[tuple[str, FileSignature, list[tuple[str, str]]]] = []
+        seen: set[str] = set()
+        
+        # Обход и разбор AST общие с другими потребителями сканера (кэш по
+        # mtime/размеру, большие пачки — в пуле процессов)
+        scanner = get_project_scanner()
+        if changed_paths is None:
+            files = scanner.files(project_path, extensions)
+        else:
+            changed_paths = set(changed_paths)
+            files = [
+                file for file in (
+                    ScannedFile.from_path(str(project / rel_path), project_path)
+                    for rel_path in sorted(changed_paths)
+                    if rel_path.endswith(tuple(extensions)) and not scanner.is_ignored(project_path, rel_path)
+                )
+                if file is not None
+            ]
+        
+        stale: list[ScannedFile] = []
+        for file in files:
+            seen.add(file.rel_path)
+            cached = manifest.signature(file.rel_path) if incremental else None
+            if not (cached and cached.mtime_ns == file.mtime_ns and cached.size == file.size):
+                stale.append(file)
+        
+        for file, parsed in zip(stale, scanner.parse(stale)):
+            if parsed is None:
+                logger.debug(f"Не удалось проиндексировать {file.path}")
+                continue
+            signature = FileSignature(file.mtime_ns, file.size, parsed.content_hash)
+            cached = manifest.signature(file.rel_path) if incremental else None
+            if cached and cached.content_hash == signature.content_hash:
+                touched.append((file.rel_path, signature))
+                continue
+            to_index.append((file.rel_path, signature, parsed.functions))
+        
+        updated: list[tuple[str, FileSignature, bytes | None, None]] = []
+        stale_ids: list[str] = []
+        new_items: list[tuple[str, str, str, str]] = []
+        # До манифеста функции проекта хранились под ID md5(код): при первой
+        # индексации проекта их векторы удаляются, иначе в поиске будут дубли
+        legacy_ids: list[str] = []
+        first_index = not manifest.tracked_files()
+        # Коллекция общая для всех проектов: корень проекта в ID, иначе
+        # одинаковые файлы по одному пути в двух проектах затрут друг друга
+        project_root = str(project.resolve())
+        for rel_path, signature, functions in to_index:
+            old_ids = set(manifest[rel_path]) if rel_path in manifest else set()
+            ids: list[str] = []
+            for code, description in functions:
+                doc_id = hashlib.md5(f"{project_root}\0{rel_path}\0{code}".encode()).hexdigest()
+                if doc_id in ids:
                     continue
-                
-                try:
-                    content = file_path.read_text(encoding='utf-8')
-                    tree = ast.parse(content)
-                    
-                    for node in ast.walk(tree):
-                        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                            code = ast.get_source_segment(content, node)
-                            if code and len(code) > 30:
-                                docstring = ast.get_docstring(node) or node.name
-                                self._index_code(
-                                    code=code,
-                                    description=docstring[:200],
-                                    source="local",
-                                    file_path=str(file_path.relative_to(project)),
-                                    language="python"
-                                )
-                                indexed += 1
-                                
-                except Exception as e:
-                    logger.debug(f"Не удалось проиндексировать {file_path}: {e}")
-        
-        logger.info(f"✅ Проиндексировано {indexed} функций из {project_path}")
+                ids.append(doc_id)
+                if doc_id not in old_ids or not incremental:
+                    new_items.append((doc_id, code, description, rel_path))
+                if first_index:
+                    legacy_ids.append(hashlib.md5(code.encode()).hexdigest())
+            stale_ids.extend(old_ids.difference(ids))
+            blob = compress_payload(json.dumps(ids).encode()) if ids else None
+            updated.append((rel_path, signature, blob, None))
+        
+        if changed_paths is None:
+            removed = [path for path in manifest.tracked_files() if path not in seen]
+        else:
+            removed = [path for path in changed_paths if path not in seen and manifest.signature(path)]
+        for path in removed:
+            if path in manifest:
+                stale_ids.extend(manifest[path])
+        
+        self._upsert_batch(new_items)
+        for i in range(0, len(stale_ids), _UPSERT_BATCH_SIZE):
+            self._collection.delete(ids=stale_ids[i:i + _UPSERT_BATCH_SIZE])
+        # Только векторы индексации проекта: примеры из истории и GitHub с тем же кодом остаются
+        for i in range(0, len(legacy_ids), _UPSERT_BATCH_SIZE):
+            self._collection.delete(ids=legacy_ids[i:i + _UPSERT_BATCH_SIZE], where={"source": "local"})
+        
+        # Манифест пишется после коллекции: при сбое файлы просто переиндексируются
+        for rel_path, signature, blob, _ in updated:
+            manifest.set_file(rel_path, signature, blob)
+        for rel_path, signature in touched:
+            manifest.touch_file(rel_path, signature)
+        for path in removed:
+            manifest.remove_file(path)
+        store.apply(updated, touched, removed)
+        
+        indexed = sum(len(manifest[path]) for path in manifest)
+        logger.info(
+            f"✅ Проиндексировано {indexed} функций из {project_path} "
+            f"(разобрано файлов: {len(to_index)}, новых функций: {len(new_items)}, "
+            f"удалено: {len(stale_ids)}, файлов без изменений: {len(seen) - len(to_index)})"
+        )
         return indexed
     
+    def update_files(
+        self,
+        project_path: str,
+        changed_paths: Iterable[str],
+        extensions: list[str] | None = None
+    ) -> int:
+        """Обновляет изменённые файлы уже проиндексированного проекта.
+        
+        Проект, который этот retriever ещё не индексировал, пропускается:
+        частичный индекс из одних изменённых файлов бесполезен для поиска.
+        
+        Args:
+            project_path: Путь к проекту
+            changed_paths: Пути файлов относительно корня проекта
+            extensions: Расширения файлов индекса
+            
+        Returns:
+            Количество функций в индексе проекта (0 — проект пропущен)
+        """
+        if self._collection is None or not self._manifest_path(Path(project_path)).exists():
+            return 0
+        return self.index_project(project_path, extensions, changed_paths=changed_paths)
+    
+    def _manifest_path(self, project: Path) -> Path:
+        """Путь к манифесту файлов проекта (сигнатуры и ID векторов)."""
+        manifest_dir = Path(self._chroma_path) / "manifests"
+        manifest_dir.mkdir(parents=True, exist_ok=True)
+        key = hashlib.md5(f"{project.resolve()}:{self._collection_name}".encode()).hexdigest()
+        return manifest_dir / f"{key}.sqlite"
+    
+    def _encode_many(self, texts: list[str]) -> list[list[float]]:
+        """Кодирует тексты батчами, используя персистентный кэш."""
+        embeddings: list[list[float] | None] = (
+            self._embedding_cache.get_many(self._embedding_model_name, texts)
+            if self._embedding_cache is not None
+            else [None] * len(texts)
+        )
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = self._embedding_model.encode(
+                [texts[i] for i in missing],
+                batch_size=_ENCODE_BATCH_SIZE
+            ).tolist()
+            if self._embedding_cache is not None:
+                self._embedding_cache.put_many(self._embedding_model_name, [texts[i] for i in missing], computed)
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+        return embeddings  # type: ignore[return-value]  # все промахи заполнены выше
+    
+    def _upsert_batch(self, items: list[tuple[str, str, str, str]]) -> None:
+        """Кодирует и записывает функции проекта батчами.
+        
+        Args:
+            items: Список (doc_id, код, описание, путь к файлу)
+        """
+        for i in range(0, len(items), _UPSERT_BATCH_SIZE):
+            batch = items[i:i + _UPSERT_BATCH_SIZE]
+            embeddings = self._encode_many([f"{description}\n{code}" for _, code, description, _ in batch])
+            self._collection.upsert(
+                ids=[doc_id for doc_id, _, _, _ in batch],
+                embeddings=embeddings,
+                documents=[code for _, code, _, _ in batch],
+                metadatas=[
+                    {
+                        "description": description[:500],
+                        "source": "local",
+                        "file_path": file_path,
+                        "language": "python"
+                    }
+                    for _, _, description, file_path in batch
+                ]
+            )
+    
     def _index_code(
         self,
         code: str,
@@ -389,7 +567,7 @@ class CodeRetriever:
             return
         
         doc_id = hashlib.md5(code.encode()).hexdigest()
-        embedding = self._embedding_model.encode(f"{description}\n{code}").tolist()
+        embedding = self._encode(f"{description}\n{code}")
         
         self._collection.upsert(
             ids=[doc_id],
@@ -439,6 +617,11 @@ class CodeRetriever:
             return {"count": 0, "initialized": True}
 
 
+# Инициализированные экземпляры CodeRetriever (для get_initialized_code_retrievers)
+_live_retrievers: weakref.WeakSet[CodeRetriever] = weakref.WeakSet()
+_live_retrievers_lock = threading.Lock()
+
+
 def is_code_retrieval_enabled() -> bool:
     """Проверяет включён ли code retrieval в конфигурации."""
     config = get_config()
@@ -463,3 +646,13 @@ def get_code_retriever() -> CodeRetriever | None:
         collection_name="code_examples",
         chroma_path=retrieval_config.get("chroma_path", ".chroma_code")
     )
+
+
+def get_initialized_code_retrievers() -> list[CodeRetriever]:
+    """Возвращает CodeRetriever процесса, чьи модели уже загружены.
+    
+    Для фоновых обновлений индекса (наблюдатель файлов): модель embeddings
+    не загружается ради проекта, если по нему ещё никто не искал.
+    """
+    with _live_retrievers_lock:
+        return list(_live_retrievers)
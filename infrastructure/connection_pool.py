@@ -18,6 +18,7 @@
 import asyncio
 import json
 import threading
+import weakref
 from typing import Optional, Any, AsyncGenerator
 import httpx
 from utils.logger import get_logger
@@ -30,7 +31,10 @@ class OllamaConnectionPool:
     """Асинхронный пул соединений для Ollama.
     
     Использует httpx.AsyncClient с connection pooling и HTTP/2.
-    Semaphore ограничивает количество одновременных запросов.
+    Semaphore ограничивает количество одновременных запросов. Стримы его не
+    занимают: генерация держит соединение минутами, и стримы сверх
+    pool_size ждали бы конца чужих генераций. У стримов свой лимит на
+    открытие (stream_semaphore), он освобождается на первом байте ответа.
     """
     
     def __init__(self, base_url: str, pool_size: int = 10, timeout: int = 300):
@@ -46,6 +50,8 @@ class OllamaConnectionPool:
         self.timeout = timeout
         self.client: Optional[httpx.AsyncClient] = None
         self.semaphore = asyncio.Semaphore(pool_size)
+        # Стримы, ждущие первого байта (открытие соединения + prefill модели)
+        self.stream_semaphore = asyncio.Semaphore(pool_size)
     
     async def initialize(self) -> None:
         """Инициализирует пул соединений.
@@ -54,8 +60,13 @@ class OllamaConnectionPool:
         """
         if self.client is None:
             limits = httpx.Limits(
-                max_connections=self.pool_size,
-                max_keepalive_connections=self.pool_size // 2
+                # Одновременные запросы ограничивают семафоры пула; лимит
+                # соединений httpx поставил бы стримы сверх pool_size в очередь
+                # за чужими генерациями
+                max_connections=None,
+                # Тёплыми держим pool_size соединений, чтобы пиковая нагрузка
+                # не переоткрывала TCP соединения
+                max_keepalive_connections=self.pool_size
             )
             timeout = httpx.Timeout(self.timeout)
             
@@ -184,13 +195,14 @@ class OllamaConnectionPool:
             RuntimeError: Если не удалось подключиться к Ollama
             httpx.HTTPError: Если запрос не удался
         """
-        payload = {
+        payload: dict[str, Any] = {
             "model": model,
             "prompt": prompt,
             "stream": False,
-            **(options or {}),
             **kwargs
         }
+        if options:
+            payload["options"] = options
         
         try:
             response = await self.post("/api/generate", json=payload)
@@ -219,6 +231,9 @@ class OllamaConnectionPool:
             endpoint: Endpoint API
             **kwargs: Дополнительные параметры
             
+        Не занимает semaphore запросов: одновременно открываются не больше
+        pool_size стримов, но после первого байта стрим слот не держит.
+        
         Yields:
             Части ответа (bytes)
             
@@ -229,15 +244,24 @@ class OllamaConnectionPool:
         if self.client is None:
             raise RuntimeError("Пул соединений не инициализирован. Вызовите initialize() сначала.")
         
-        async with self.semaphore:
-            try:
-                async with self.client.stream(method, endpoint, **kwargs) as response:
-                    response.raise_for_status()
-                    async for chunk in response.aiter_bytes():
-                        yield chunk
-            except httpx.HTTPError as e:
-                logger.error(f"❌ HTTP ошибка при streaming запросе к {endpoint}: {e}")
-                raise
+        # Лимит только на открытие стрима: слот освобождается на первом байте,
+        # дальше генерация не задерживает следующие стримы
+        await self.stream_semaphore.acquire()
+        opening = True
+        try:
+            async with self.client.stream(method, endpoint, **kwargs) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    if opening:
+                        opening = False
+                        self.stream_semaphore.release()
+                    yield chunk
+        except httpx.HTTPError as e:
+            logger.error(f"❌ HTTP ошибка при streaming запросе к {endpoint}: {e}")
+            raise
+        finally:
+            if opening:
+                self.stream_semaphore.release()
     
     async def generate_stream(
         self,
@@ -265,37 +289,103 @@ class OllamaConnectionPool:
                     break
                 content = chunk.get("response", "")
         """
-        payload = {
+        payload: dict[str, Any] = {
             "model": model,
             "prompt": prompt,
             "stream": True,
-            **(options or {}),
             **kwargs
         }
+        if options:
+            # Ollama API принимает параметры генерации во вложенном поле options
+            payload["options"] = options
         
+        # Ollama отправляет JSON строки разделённые \n, но границы TCP чанков
+        # не совпадают с границами строк — накапливаем хвост между чанками
+        buffer = b""
         async for chunk_bytes in self.stream("POST", "/api/generate", json=payload):
-            # Парсим JSON чанки от Ollama
-            try:
-                # Ollama отправляет JSON строки разделённые \n
-                for line in chunk_bytes.decode('utf-8').strip().split('\n'):
-                    if line:
-                        yield json.loads(line)
-            except (json.JSONDecodeError, UnicodeDecodeError) as e:
-                logger.warning(f"⚠️ Ошибка парсинга чанка: {e}")
-                continue
+            buffer += chunk_bytes
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                parsed = self._parse_stream_line(line)
+                if parsed is not None:
+                    yield parsed
+        
+        parsed = self._parse_stream_line(buffer)
+        if parsed is not None:
+            yield parsed
+    
+    @staticmethod
+    def _parse_stream_line(line: bytes) -> Optional[dict]:
+        """Парсит одну JSON строку стрима Ollama.
+        
+        Args:
+            line: Строка стрима (без завершающего \n)
+            
+        Returns:
+            Словарь чанка или None для пустой/битой строки
+            
+        Raises:
+            RuntimeError: Если Ollama прислал ошибку внутри стрима
+        """
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            data = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.warning(f"⚠️ Ошибка парсинга чанка: {e}")
+            return None
+        
+        # Ошибки модели (например, падение runner) приходят строкой {"error": "..."}
+        if isinstance(data, dict) and data.get("error"):
+            raise RuntimeError(f"Ollama: {data['error']}")
+        return data
 
 
-# Глобальный пул соединений
-_pool: Optional[OllamaConnectionPool] = None
+# Пулы соединений по event loop: httpx.AsyncClient и семафоры привязаны к loop,
+# в котором созданы. Запись исчезает вместе с собранным сборщиком мусора loop
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, OllamaConnectionPool]" = (
+    weakref.WeakKeyDictionary()
+)
 _pool_lock = threading.Lock()
-_pool_initialized = False
+
+
+def _pop_closed_loop_pools() -> list[OllamaConnectionPool]:
+    """Забирает из реестра пулы, чьи event loop уже закрыты.
+    
+    Вызывается под _pool_lock. Пулы работающих loop не трогаются: их
+    соединения используются в своих потоках.
+    
+    Returns:
+        Список пулов для закрытия
+    """
+    stale = [loop for loop in list(_pools.keys()) if loop.is_closed()]
+    return [_pools.pop(loop) for loop in stale]
+
+
+async def _close_stale_pools(pools: list[OllamaConnectionPool]) -> None:
+    """Закрывает пулы, чьи event loop уже закрыты.
+    
+    Сокеты освобождаются из текущего loop, ошибки транспорта мёртвого
+    loop игнорируются.
+    
+    Args:
+        pools: Пулы закрытых event loop
+    """
+    for pool in pools:
+        try:
+            await pool.close()
+        except Exception as e:
+            logger.debug(f"⚠️ Ошибка закрытия устаревшего connection pool: {e}")
+            pool.client = None
 
 
 async def get_ollama_pool() -> OllamaConnectionPool:
-    """Возвращает глобальный пул соединений Ollama.
+    """Возвращает пул соединений Ollama для текущего event loop.
     
-    Создаёт и инициализирует пул при первом вызове (ленивая инициализация).
-    Потокобезопасен для использования в многопоточных окружениях.
+    Создаёт и инициализирует пул при первом вызове в loop (ленивая инициализация).
+    Каждый loop (asyncio.run в CLI, отдельный loop в тестах или потоке) получает
+    свой пул; пул закрывается, только когда закрыт его loop.
     Использует единый источник конфигурации (config.toml с поддержкой env vars).
     
     Returns:
@@ -304,28 +394,43 @@ async def get_ollama_pool() -> OllamaConnectionPool:
     Raises:
         RuntimeError: Если не удалось инициализировать пул
     """
-    global _pool, _pool_initialized
+    loop = asyncio.get_running_loop()
     
-    if _pool is None:
-        with _pool_lock:
-            # Двойная проверка для потокобезопасности
-            if _pool is None:
-                try:
-                    config = get_config()
-                    _pool = OllamaConnectionPool(
-                        base_url=config.ollama_host,
-                        pool_size=config.connection_pool_size,
-                        timeout=config.ollama_timeout
-                    )
-                    await _pool.initialize()
-                    _pool_initialized = True
-                    logger.info("✅ Ollama connection pool инициализирован")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка инициализации connection pool: {e}", error=e)
-                    _pool = None
-                    raise RuntimeError(f"Не удалось инициализировать connection pool: {e}")
+    # Под блокировкой только работа с реестром, без await
+    with _pool_lock:
+        stale = _pop_closed_loop_pools()
+        pool = _pools.get(loop)
+        if pool is None:
+            try:
+                config = get_config()
+                pool = OllamaConnectionPool(
+                    base_url=config.ollama_host,
+                    pool_size=config.connection_pool_size,
+                    timeout=config.ollama_timeout
+                )
+            except Exception as e:
+                logger.error(f"❌ Ошибка инициализации connection pool: {e}", error=e)
+                raise RuntimeError(f"Не удалось инициализировать connection pool: {e}")
+            _pools[loop] = pool
+    
+    if stale:
+        logger.debug(f"🔄 Закрываю {len(stale)} connection pool закрытых event loop")
+        await _close_stale_pools(stale)
+    
+    if pool.client is None:
+        try:
+            # initialize идемпотентен: повторный вызов из другой корутины
+            # этого же loop ничего не делает
+            await pool.initialize()
+            logger.info("✅ Ollama connection pool инициализирован")
+        except Exception as e:
+            logger.error(f"❌ Ошибка инициализации connection pool: {e}", error=e)
+            with _pool_lock:
+                if _pools.get(loop) is pool:
+                    del _pools[loop]
+            raise RuntimeError(f"Не удалось инициализировать connection pool: {e}")
     
-    return _pool
+    return pool
 
 
 async def initialize_ollama_pool() -> None:
@@ -341,19 +446,21 @@ async def initialize_ollama_pool() -> None:
 
 
 async def close_ollama_pool() -> None:
-    """Закрывает глобальный пул соединений.
+    """Закрывает пул соединений текущего event loop.
     
-    Вызывается при graceful shutdown приложения.
+    Вызывается при graceful shutdown приложения. Заодно закрывает пулы
+    уже закрытых loop; пулы других работающих loop не трогает.
     """
-    global _pool, _pool_initialized
+    loop = asyncio.get_running_loop()
     
     with _pool_lock:
-        if _pool:
-            try:
-                await _pool.close()
-                logger.info("✅ Ollama connection pool закрыт")
-            except Exception as e:
-                logger.warning(f"⚠️ Ошибка при закрытии connection pool: {e}")
-            finally:
-                _pool = None
-                _pool_initialized = False
+        stale = _pop_closed_loop_pools()
+        pool = _pools.pop(loop, None)
+    
+    await _close_stale_pools(stale)
+    if pool is not None:
+        try:
+            await pool.close()
+            logger.info("✅ Ollama connection pool закрыт")
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка при закрытии connection pool: {e}")
@@ -5,9 +5,13 @@
 
 Решение v0.2 (улучшенная реализация):
 - Умное разбиение кода на чанки (AST парсинг для Python, regex fallback)
-- Простая оценка релевантности (BM25 + ключевые слова)
-- Сборка оптимального контекста в пределах лимита токенов
-- Кэширование индекса проекта
+- Оценка релевантности BM25 по инвертированному индексу, который строится
+  при индексации (запрос — слияние postings, без повторной токенизации)
+- Сборка оптимального контекста в пределах лимита токенов (токены
+  считает токенизатор модели из utils.tokenizer, счётчики запоминаются
+  по хэшу содержимого чанка)
+- Персистентный индекс проекта на диске (SQLite) с инкрементальной
+  переиндексацией: перечанкиваются только изменённые файлы (mtime/размер/хэш)
 - Использование AST для более точного разбиения (опционально)
 
 Что НЕ включено (для упрощения):
@@ -18,12 +22,25 @@
 import re
 import hashlib
 import json
+import os
 from pathlib import Path
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Set, Tuple, Any
-from collections import Counter
+from dataclasses import dataclass, field, astuple
+from typing import List, Dict, Optional, Set, Tuple, Any, Mapping, Iterable, Iterator, Callable
+from collections import Counter, OrderedDict
+import heapq
 import math
+import threading
+import zlib
+from infrastructure.context_index import (
+    FileSignature,
+    LazyChunkIndex,
+    ProjectIndexStore,
+    compress_payload,
+)
+from infrastructure.project_scanner import ScannedFile, get_project_scanner
+from utils.config import get_config
 from utils.logger import get_logger
+from utils.tokenizer import Tokenizer, get_tokenizer
 
 logger = get_logger()
 
@@ -44,9 +61,23 @@ class CodeChunk:
     def __hash__(self) -> int:
         return hash(self.id)
     
-    def estimated_tokens(self) -> int:
-        """Примерная оценка токенов (~4 символа = 1 токен)."""
-        return len(self.content) // 4
+    def estimated_tokens(self, tokenizer: Optional[Tokenizer] = None) -> int:
+        """Токены содержимого чанка.
+        
+        Args:
+            tokenizer: Токенизатор (None — токенизатор модели по умолчанию)
+        """
+        return (tokenizer or get_tokenizer(get_config().default_model)).count(self.content)
+
+
+def _encode_chunks(chunks: List[CodeChunk]) -> bytes:
+    """Сериализует чанки файла для персистентного индекса (компактные списки полей)."""
+    return json.dumps([astuple(chunk) for chunk in chunks], ensure_ascii=False).encode('utf-8')
+
+
+def _decode_chunks(payload: bytes) -> List[CodeChunk]:
+    """Восстанавливает чанки файла из персистентного индекса."""
+    return [CodeChunk(*fields) for fields in json.loads(payload)]
 
 
 @dataclass
@@ -68,15 +99,22 @@ class CodeChunker:
     CLASS_PATTERN = re.compile(r'^class\s+(\w+)(?:\([^)]+\))?:', re.MULTILINE)
     FUNCTION_PATTERN = re.compile(r'^def\s+(\w+)\s*\([^)]*\)\s*[-:>]?', re.MULTILINE)
     
-    def __init__(self, max_chunk_tokens: int = 500, use_ast: bool = True) -> None:
+    def __init__(
+        self,
+        max_chunk_tokens: int = 500,
+        use_ast: bool = True,
+        tokenizer: Optional[Tokenizer] = None
+    ) -> None:
         """Инициализация чанкера.
         
         Args:
             max_chunk_tokens: Максимальный размер чанка в токенах
             use_ast: Использовать AST парсинг для Python файлов (более точное)
+            tokenizer: Токенизатор (None — токенизатор модели по умолчанию)
         """
         self.max_chunk_tokens = max_chunk_tokens
         self.use_ast = use_ast
+        self.tokenizer = tokenizer or get_tokenizer(get_config().default_model)
         self._ast_analyzer: Optional[Any] = None
         
         if self.use_ast:
@@ -151,7 +189,7 @@ class CodeChunker:
                 docstring=docstring
             )
             
-            if chunk.estimated_tokens() > self.max_chunk_tokens:
+            if chunk.estimated_tokens(self.tokenizer) > self.max_chunk_tokens:
                 sub_chunks = self._split_large_chunk(chunk)
                 chunks.extend(sub_chunks)
             else:
@@ -185,7 +223,7 @@ class CodeChunker:
                 docstring=docstring
             )
             
-            if chunk.estimated_tokens() > self.max_chunk_tokens:
+            if chunk.estimated_tokens(self.tokenizer) > self.max_chunk_tokens:
                 sub_chunks = self._split_large_chunk(chunk)
                 chunks.extend(sub_chunks)
             else:
@@ -242,7 +280,7 @@ class CodeChunker:
             )
             
             # Если чанк слишком большой, разбиваем его
-            if chunk.estimated_tokens() > self.max_chunk_tokens:
+            if chunk.estimated_tokens(self.tokenizer) > self.max_chunk_tokens:
                 # Разбиваем большой чанк на меньшие части
                 sub_chunks = self._split_large_chunk(chunk)
                 chunks.extend(sub_chunks)
@@ -353,26 +391,37 @@ class CodeChunker:
         sub_chunks: List[CodeChunk] = []
         lines = chunk.content.split('\n')
         
-        # Простое разбиение по строкам
-        chunk_size_lines = max(1, (self.max_chunk_tokens * 4) // 80)  # ~80 символов на строку
-        
-        for i in range(0, len(lines), chunk_size_lines):
-            sub_lines = lines[i:i + chunk_size_lines]
+        # Разбиение по строкам: строки набираются, пока помещаются в
+        # max_chunk_tokens (токены всех строк считаются одним пакетом)
+        line_tokens = self.tokenizer.count_batch(lines)
+        groups: List[Tuple[int, int]] = []
+        start = 0
+        budget = 0
+        for i, tokens in enumerate(line_tokens):
+            # +1 — перевод строки
+            if i > start and budget + tokens + 1 > self.max_chunk_tokens:
+                groups.append((start, i))
+                start, budget = i, 0
+            budget += tokens + 1
+        groups.append((start, len(lines)))
+        
+        for part, (first, last) in enumerate(groups):
+            sub_lines = lines[first:last]
             sub_content = '\n'.join(sub_lines)
             
             if not sub_content.strip():
                 continue
             
             sub_chunk = CodeChunk(
-                id=f"{chunk.id}:part{i // chunk_size_lines}",
+                id=f"{chunk.id}:part{part}",
                 file_path=chunk.file_path,
-                start_line=chunk.start_line + i,
-                end_line=min(chunk.start_line + i + len(sub_lines) - 1, chunk.end_line),
+                start_line=chunk.start_line + first,
+                end_line=min(chunk.start_line + last - 1, chunk.end_line),
                 content=sub_content,
                 chunk_type=chunk.chunk_type,
-                name=f"{chunk.name}_part{i // chunk_size_lines}",
-                signature=chunk.signature if i == 0 else "",
-                docstring=chunk.docstring if i == 0 else ""
+                name=f"{chunk.name}_part{part}",
+                signature=chunk.signature if part == 0 else "",
+                docstring=chunk.docstring if part == 0 else ""
             )
             sub_chunks.append(sub_chunk)
         
@@ -391,16 +440,204 @@ class CodeChunker:
         )
 
 
-class RelevanceScorer:
-    """Простая оценка релевантности чанков к запросу (BM25-подобная)."""
+# Стоп-слова, которые не участвуют в поиске
+_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been',
+    'to', 'of', 'in', 'on', 'at', 'for', 'with', 'by'
+})
+_CAMEL_CASE_PATTERN = re.compile(r'([a-z])([A-Z])')
+_WORD_PATTERN = re.compile(r'\b\w+\b')
+
+# Статистика термов чанка: (длина документа в токенах, {термин: взвешенный TF})
+ChunkTerms = Tuple[int, Dict[str, float]]
+
+
+def _tokenize(text: str) -> List[str]:
+    """Разбивает текст на токены (ключевые слова).
+    
+    Поддерживает CamelCase и snake_case.
+    """
+    if not text:
+        return []
+    # Сначала разбиваем CamelCase на отдельные слова
+    # ConfigManager -> Config Manager
+    text = _CAMEL_CASE_PATTERN.sub(r'\1 \2', text)
+    # Заменяем snake_case на пробелы и приводим к нижнему регистру
+    text = text.replace('_', ' ').lower()
+    # Разбиваем по пробелам и знакам препинания,
+    # фильтруем очень короткие токены и стоп-слова
+    return [t for t in _WORD_PATTERN.findall(text) if len(t) > 2 and t not in _STOP_WORDS]
+
+
+class BM25Index:
+    """Инвертированный индекс для BM25 ранжирования чанков.
+    
+    Строится один раз при индексации: для каждого термина хранится список
+    документов (postings) со взвешенной частотой. Запрос — это слияние
+    postings терминов запроса, без повторной токенизации чанков.
+    
+    Документы сгруппированы (группа = файл), чтобы при изменении файла
+    удалять и добавлять только его postings.
+    """
+    
+    # Параметры BM25: насыщение TF и сила нормализации по длине документа
+    K1 = 1.2
+    B = 0.75
     
     def __init__(self) -> None:
-        """Инициализация скорера."""
-        self.idf_cache: Dict[str, float] = {}
+        """Инициализация пустого индекса."""
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._doc_lengths: Dict[int, int] = {}
+        # doc_id -> (группа, позиция документа в группе)
+        self._doc_refs: Dict[int, Tuple[str, int]] = {}
+        self._group_docs: Dict[str, List[int]] = {}
+        self._doc_terms: Dict[int, List[str]] = {}
+        self._total_length = 0
+        self._next_id = 0
+        # Нормализация по длине k1 * (1 - b + b * dl / avgdl) для каждого документа.
+        # Зависит от средней длины, поэтому сбрасывается при любом изменении индекса
+        self._norms: Optional[Dict[int, float]] = None
+    
+    def __len__(self) -> int:
+        return len(self._doc_refs)
+    
+    def add_group(self, group: str, docs: List[ChunkTerms]) -> None:
+        """Добавляет документы группы (заменяя прежние документы этой группы).
+        
+        Args:
+            group: Идентификатор группы (путь файла)
+            docs: Статистика термов документов в порядке их позиций
+        """
+        self.remove_group(group)
+        self._norms = None
+        doc_ids: List[int] = []
+        for position, (length, weighted_tf) in enumerate(docs):
+            doc_id = self._next_id
+            self._next_id += 1
+            doc_ids.append(doc_id)
+            self._doc_refs[doc_id] = (group, position)
+            self._doc_lengths[doc_id] = length
+            self._doc_terms[doc_id] = list(weighted_tf)
+            self._total_length += length
+            for term, tf in weighted_tf.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                postings[doc_id] = tf
+        if doc_ids:
+            self._group_docs[group] = doc_ids
+    
+    def remove_group(self, group: str) -> None:
+        """Удаляет все документы группы из индекса."""
+        doc_ids = self._group_docs.pop(group, [])
+        if doc_ids:
+            self._norms = None
+        for doc_id in doc_ids:
+            for term in self._doc_terms.pop(doc_id):
+                postings = self._postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._doc_lengths.pop(doc_id)
+            del self._doc_refs[doc_id]
+    
+    def _get_norms(self) -> Dict[int, float]:
+        """Возвращает (и при необходимости пересчитывает) нормализацию длины документов."""
+        if self._norms is None:
+            avg_length = self._total_length / len(self._doc_refs) or 1.0
+            k1, b = self.K1, self.B
+            self._norms = {
+                doc_id: k1 * (1.0 - b + b * length / avg_length)
+                for doc_id, length in self._doc_lengths.items()
+            }
+        return self._norms
+    
+    def search(self, query_terms: List[str]) -> Iterator[Tuple[str, int, float, List[str]]]:
+        """Ранжирует документы по запросу.
+        
+        Сначала отдаёт совпавшие документы по убыванию BM25 (ленивый heap,
+        поэтому потребитель, которому нужно несколько лучших, не платит
+        за сортировку всех совпадений), затем остальные с нулевой оценкой.
+        
+        Args:
+            query_terms: Токены запроса
+            
+        Yields:
+            (группа, позиция, оценка, совпавшие термины)
+        """
+        total_docs = len(self._doc_refs)
+        if total_docs == 0:
+            return
+        
+        norms = self._get_norms()
+        terms = [term for term in dict.fromkeys(query_terms) if term in self._postings]
+        scores: Dict[int, float] = {}
+        
+        for term in terms:
+            postings = self._postings[term]
+            doc_freq = len(postings)
+            # BM25 IDF со сдвигом +1, чтобы частые термины не давали отрицательный вклад
+            idf = math.log((total_docs - doc_freq + 0.5) / (doc_freq + 0.5) + 1.0)
+            weight = idf * (self.K1 + 1.0)
+            get_score = scores.get
+            for doc_id, tf in postings.items():
+                scores[doc_id] = get_score(doc_id, 0.0) + weight * tf / (tf + norms[doc_id])
+        
+        # Равные оценки упорядочены по doc_id, т.е. по порядку индексации
+        heap = [(-score, doc_id) for doc_id, score in scores.items()]
+        heapq.heapify(heap)
+        while heap:
+            neg_score, doc_id = heapq.heappop(heap)
+            group, position = self._doc_refs[doc_id]
+            # Совпавшие термины считаем только для реально отданных документов
+            matched = [term for term in terms if doc_id in self._postings[term]]
+            yield group, position, -neg_score, matched
+        
+        for doc_id, (group, position) in self._doc_refs.items():
+            if doc_id not in scores:
+                yield group, position, 0.0, []
+
+
+class RelevanceScorer:
+    """Оценка релевантности чанков к запросу (BM25 по инвертированному индексу).
+    
+    Поля чанка имеют разный вес: совпадение в имени важнее, чем в сигнатуре,
+    docstring и теле. Взвешенные частоты считаются один раз на чанк
+    (chunk_terms) и кладутся в BM25Index.
+    """
+    
+    # Веса полей чанка во взвешенной частоте термина
+    FIELD_WEIGHTS: Tuple[Tuple[str, float], ...] = (
+        ("name", 3.0),       # Имя - очень важно
+        ("signature", 2.0),  # Сигнатура - важно
+        ("docstring", 1.5),  # Docstring - важно
+        ("content", 1.0),
+    )
+    
+    def chunk_terms(self, chunk: CodeChunk) -> ChunkTerms:
+        """Считает длину и взвешенные частоты терминов чанка.
+        
+        Args:
+            chunk: Чанк кода
+            
+        Returns:
+            (длина в токенах, {термин: взвешенный TF})
+        """
+        weighted_tf: Dict[str, float] = {}
+        length = 0
+        for field_name, weight in self.FIELD_WEIGHTS:
+            tokens = _tokenize(getattr(chunk, field_name))
+            length += len(tokens)
+            for term, count in Counter(tokens).items():
+                weighted_tf[term] = weighted_tf.get(term, 0.0) + weight * count
+        return length, weighted_tf
     
     def score_chunks(self, query: str, chunks: List[CodeChunk]) -> List[ScoredChunk]:
         """Оценивает релевантность чанков к запросу.
         
+        Для произвольного списка чанков строит временный BM25Index.
+        ContextEngine использует заранее построенный индекс через rank().
+        
         Args:
             query: Поисковый запрос
             chunks: Список чанков для оценки
@@ -411,135 +648,67 @@ class RelevanceScorer:
         if not chunks:
             return []
         
-        if not query.strip():
-            return [ScoredChunk(chunk=ch, score=0.0) for ch in chunks]
+        index = BM25Index()
+        index.add_group("", [self.chunk_terms(chunk) for chunk in chunks])
+        return list(self.rank(query, index, lambda group, position: chunks[position]))
+    
+    def rank(
+        self,
+        query: str,
+        index: BM25Index,
+        resolve: Callable[[str, int], CodeChunk]
+    ) -> Iterator[ScoredChunk]:
+        """Ранжирует чанки по готовому индексу.
         
+        Args:
+            query: Поисковый запрос
+            index: Инвертированный индекс
+            resolve: Функция получения чанка по (группа, позиция)
+            
+        Yields:
+            ScoredChunk по убыванию релевантности
+        """
         query_terms = self._tokenize(query)
-        if not query_terms:
-            return [ScoredChunk(chunk=ch, score=0.0) for ch in chunks]
-        
-        # Предвычисляем IDF для всех терминов
-        self._compute_idf(query_terms, chunks)
-        
-        scored: List[ScoredChunk] = []
-        
-        for chunk in chunks:
-            score, matched = self._score_chunk(query_terms, chunk, chunks)
-            scored.append(ScoredChunk(
-                chunk=chunk,
+        for group, position, score, matched in index.search(query_terms):
+            yield ScoredChunk(
+                chunk=resolve(group, position),
                 score=score,
                 matched_keywords=matched
-            ))
-        
-        # Сортируем по убыванию релевантности
-        scored.sort(key=lambda x: x.score, reverse=True)
-        
-        return scored
+            )
     
     def _tokenize(self, text: str) -> List[str]:
         """Разбивает текст на токены (ключевые слова).
         
         Поддерживает CamelCase и snake_case.
         """
-        # Сначала разбиваем CamelCase на отдельные слова
-        # ConfigManager -> Config Manager
-        text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
-        # Заменяем snake_case на пробелы
-        text = text.replace('_', ' ')
-        # Приводим к нижнему регистру
-        text = text.lower()
-        # Разбиваем по пробелам и знакам препинания
-        tokens = re.findall(r'\b\w+\b', text)
-        # Фильтруем очень короткие токены и стоп-слова
-        stop_words = {'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'to', 'of', 'in', 'on', 'at', 'for', 'with', 'by'}
-        return [t for t in tokens if len(t) > 2 and t not in stop_words]
-    
-    def _compute_idf(self, query_terms: List[str], chunks: List[CodeChunk]) -> None:
-        """Вычисляет IDF (inverse document frequency) для терминов запроса."""
-        total_chunks = len(chunks)
-        if total_chunks == 0:
-            return
-        
-        for term in query_terms:
-            if term in self.idf_cache:
-                continue
-            
-            # Считаем, в скольких чанках встречается термин
-            # Используем _tokenize для правильной обработки CamelCase
-            doc_freq = sum(
-                1 for chunk in chunks
-                if term in self._tokenize(chunk.content) or
-                   term in self._tokenize(chunk.name) or
-                   term in self._tokenize(chunk.signature)
-            )
-            
-            # IDF = log((total_docs - docs_with_term + 0.5) / (docs_with_term + 0.5))
-            # Используем BM25 IDF формулу для избежания нулевых значений
-            if doc_freq > 0:
-                self.idf_cache[term] = math.log((total_chunks - doc_freq + 0.5) / (doc_freq + 0.5) + 1.0)
-            else:
-                # Если термин не найден, даем максимальный IDF
-                self.idf_cache[term] = math.log(total_chunks + 1.0)
-    
-    def _score_chunk(self, query_terms: List[str], chunk: CodeChunk, all_chunks: List[CodeChunk]) -> Tuple[float, List[str]]:
-        """Оценивает один чанк по запросу."""
-        # Собираем текст чанка для поиска (НЕ lowercase, чтобы сохранить CamelCase)
-        chunk_text = f"{chunk.name} {chunk.signature} {chunk.docstring} {chunk.content}"
-        
-        score = 0.0
-        matched = []
-        
-        # TF (term frequency) - частота термина в чанке
-        chunk_terms = self._tokenize(chunk_text)
-        total_terms = len(chunk_terms) + 1  # +1 чтобы избежать деления на 0
-        
-        for term in query_terms:
-            term_freq = chunk_terms.count(term)
-            
-            if term_freq > 0:
-                # TF * IDF
-                tf = term_freq / total_terms
-                idf = self.idf_cache.get(term, 0.0)
-                
-                # Бонусы за совпадение в имени или сигнатуре
-                if term in chunk.name.lower():
-                    tf *= 3.0  # Имя - очень важно
-                elif term in chunk.signature.lower():
-                    tf *= 2.0  # Сигнатура - важно
-                elif term in chunk.docstring.lower():
-                    tf *= 1.5  # Docstring - важно
-                
-                score += tf * idf
-                matched.append(term)
-        
-        return score, matched
+        return _tokenize(text)
 
 
 class ContextComposer:
     """Собирает оптимальный контекст в пределах лимита токенов."""
     
-    def __init__(self, max_tokens: int = 4000) -> None:
+    def __init__(self, max_tokens: int = 4000, tokenizer: Optional[Tokenizer] = None) -> None:
         """Инициализация композитора.
         
         Args:
             max_tokens: Максимальное количество токенов в контексте
+            tokenizer: Токенизатор (None — токенизатор модели по умолчанию)
         """
         self.max_tokens = max_tokens
+        self.tokenizer = tokenizer or get_tokenizer(get_config().default_model)
     
-    def compose(self, scored_chunks: List[ScoredChunk], query: str = "", max_tokens_override: Optional[int] = None) -> str:
+    def compose(self, scored_chunks: Iterable[ScoredChunk], query: str = "", max_tokens_override: Optional[int] = None) -> str:
         """Собирает контекст из оцененных чанков.
         
         Args:
-            scored_chunks: Список оцененных чанков (уже отсортированных)
+            scored_chunks: Оцененные чанки (уже отсортированные). Может быть
+                ленивым итератором — читается только пока есть место в лимите
             query: Поисковый запрос (для контекста)
             max_tokens_override: Опциональное ограничение токенов (если None, используется self.max_tokens)
             
         Returns:
             Собранный контекст в пределах лимита токенов
         """
-        if not scored_chunks:
-            return ""
-        
         # Используем переданное ограничение или значение по умолчанию
         max_tokens_limit = max_tokens_override if max_tokens_override is not None else self.max_tokens
         
@@ -548,7 +717,7 @@ class ContextComposer:
         
         for scored in scored_chunks:
             chunk = scored.chunk
-            chunk_tokens = chunk.estimated_tokens()
+            chunk_tokens = chunk.estimated_tokens(self.tokenizer)
             
             # Проверяем, поместится ли чанк
             if total_tokens + chunk_tokens > max_tokens_limit:
@@ -604,7 +773,8 @@ class ContextComposer:
         Returns:
             Обрезанный контент с сохранением важных частей
         """
-        max_chars = max_tokens * 4  # ~4 символа на токен
+        # Граница по токенизатору модели: символов в max_tokens токенах
+        max_chars = self.tokenizer.prefix_chars(chunk.content, max_tokens)
         if len(chunk.content) <= max_chars:
             return chunk.content
         
@@ -683,7 +853,9 @@ class ContextEngine:
         self,
         max_context_tokens: int = 4000,
         max_chunk_tokens: int = 500,
-        cache_dir: Optional[Path] = None
+        cache_dir: Optional[Path] = None,
+        model: Optional[str] = None,
+        max_index_memory_mb: float = 0
     ) -> None:
         """Инициализация Context Engine.
         
@@ -691,19 +863,53 @@ class ContextEngine:
             max_context_tokens: Максимальный размер контекста
             max_chunk_tokens: Максимальный размер чанка
             cache_dir: Директория для кэширования индексов
+            model: Модель, токенизатором которой считаются лимиты
+                (None — модель по умолчанию из конфига)
+            max_index_memory_mb: Лимит индексов проектов в памяти (0 — без
+                лимита); сверх него давно не использованные проекты
+                выгружаются и при следующем обращении читаются с диска
         """
-        self.chunker = CodeChunker(max_chunk_tokens=max_chunk_tokens, use_ast=True)
+        self.tokenizer = get_tokenizer(model or get_config().default_model)
+        self.chunker = CodeChunker(max_chunk_tokens=max_chunk_tokens, use_ast=True, tokenizer=self.tokenizer)
         self.scorer = RelevanceScorer()
-        self.composer = ContextComposer(max_tokens=max_context_tokens)
+        self.composer = ContextComposer(max_tokens=max_context_tokens, tokenizer=self.tokenizer)
         self.cache_dir = cache_dir or Path(".context_cache")
         self.cache_dir.mkdir(exist_ok=True)
         
-        # Кэш индексов проектов: cache_key -> {file_path -> chunks}
-        self._index_cache: Dict[str, Dict[str, List[CodeChunk]]] = {}
+        # Отпечаток настроек чанкера: при их смене сохранённые чанки невалидны
+        self._chunker_fingerprint = (
+            f"chunker:v2:{max_chunk_tokens}:{int(self.chunker.use_ast)}:{self.tokenizer.name}"
+        )
+        
+        # Индексы проектов в памяти: cache_key -> {file_path -> chunks}
+        # Загружаются с диска лениво, при первом обращении к проекту;
+        # порядок — от давно не использованных к недавним (LRU)
+        self._index_cache: "OrderedDict[str, LazyChunkIndex]" = OrderedDict()
+        # BM25 индексы проектов: cache_key -> инвертированный индекс чанков
+        self._bm25_cache: Dict[str, BM25Index] = {}
+        self._max_index_memory_bytes = int(max_index_memory_mb * 1024 * 1024)
+        # Индексация идёт через asyncio.to_thread: _index_lock защищает словари
+        # кэша, блокировка проекта — его индекс (разные проекты не ждут друг друга)
+        self._index_lock = threading.RLock()
+        self._project_locks: Dict[str, threading.Lock] = {}
+        # Проекты, изменения файлов которых приходят от наблюдателя (update_files)
+        self._watched: Set[str] = set()
+    
+    def _project_lock(self, cache_key: str) -> threading.Lock:
+        """Блокировка индекса проекта."""
+        with self._index_lock:
+            lock = self._project_locks.get(cache_key)
+            if lock is None:
+                lock = self._project_locks[cache_key] = threading.Lock()
+            return lock
     
-    def index_project(self, project_path: str, extensions: Optional[List[str]] = None) -> Dict[str, List[CodeChunk]]:
+    def index_project(self, project_path: str, extensions: Optional[List[str]] = None) -> Mapping[str, List[CodeChunk]]:
         """Индексирует проект - разбивает все файлы на чанки.
         
+        Индекс инкрементальный и персистентный: при повторном вызове
+        (в том числе после перезапуска процесса) заново разбиваются только
+        файлы, у которых изменились mtime/размер и хэш содержимого.
+        
         Args:
             project_path: Путь к корню проекта
             extensions: Список расширений файлов для индексации (по умолчанию ['.py'])
@@ -718,37 +924,154 @@ class ContextEngine:
         if not project_path_obj.exists():
             raise ValueError(f"Проект не найден: {project_path}")
         
-        # Проверяем кэш
         cache_key = self._get_cache_key(project_path, extensions)
-        cached_index = self._load_cache(cache_key)
-        if cached_index:
-            return cached_index
+        with self._project_lock(cache_key):
+            index = self._refresh_index(project_path_obj, project_path, extensions, cache_key)[0]
+        self._evict_cold(keep=cache_key)
+        return index
+    
+    def update_files(
+        self,
+        project_path: str,
+        extensions: Optional[List[str]],
+        changed_paths: Iterable[str]
+    ) -> None:
+        """Обновляет в индексе только изменённые файлы (без обхода проекта).
         
-        # Индексируем все файлы
-        index: Dict[str, List[CodeChunk]] = {}
+        Используется наблюдателем файлов: существующие файлы перечанковываются
+        (если изменилось содержимое), отсутствующие удаляются из индекса.
         
-        for ext in extensions:
-            for file_path in project_path_obj.rglob(f"*{ext}"):
-                # Пропускаем скрытые папки и __pycache__
-                if any(part.startswith('.') or part == '__pycache__' for part in file_path.parts):
-                    continue
-                
-                try:
-                    content = file_path.read_text(encoding='utf-8')
-                    chunks = self.chunker.chunk_file(str(file_path.relative_to(project_path_obj)), content)
-                    
-                    if chunks:
-                        index[str(file_path.relative_to(project_path_obj))] = chunks
-                except Exception as e:
-                    logger.debug(f"⚠️ Ошибка индексации файла {file_path}: {e}")
-                    # Игнорируем ошибки чтения файлов
-                    continue
+        Args:
+            project_path: Путь к корню проекта
+            extensions: Расширения файлов индекса (по умолчанию ['.py'])
+            changed_paths: Пути изменённых файлов относительно корня проекта
+        """
+        if extensions is None:
+            extensions = ['.py']
+        cache_key = self._get_cache_key(project_path, extensions)
+        with self._project_lock(cache_key):
+            self._refresh_index(Path(project_path), project_path, extensions, cache_key, changed_paths)
+        self._evict_cold(keep=cache_key)
+    
+    def set_watched(self, project_path: str, extensions: Optional[List[str]], watched: bool) -> None:
+        """Отмечает, что изменения файлов проекта приходят от наблюдателя.
         
-        # Сохраняем в кэш
-        self._save_cache(cache_key, index)
-        self._index_cache[cache_key] = index
+        Для такого проекта get_context не обходит файлы проекта: индекс
+        актуализирует update_files. Явный index_project по-прежнему сверяет все файлы.
+        """
+        cache_key = self._get_cache_key(project_path, extensions or ['.py'])
+        with self._index_lock:
+            if watched:
+                self._watched.add(cache_key)
+            else:
+                self._watched.discard(cache_key)
+    
+    def _refresh_index(
+        self,
+        project_path_obj: Path,
+        project_path: str,
+        extensions: List[str],
+        cache_key: str,
+        changed_paths: Optional[Iterable[str]] = None
+    ) -> Tuple[LazyChunkIndex, BM25Index]:
+        """Сверяет индекс проекта с файлами на диске и перечанковывает изменённые.
         
-        return index
+        Args:
+            changed_paths: Сверить только эти файлы (относительные пути);
+                None — обойти весь проект
+        """
+        store = ProjectIndexStore(self.cache_dir / f"{cache_key}.sqlite", self._chunker_fingerprint)
+        
+        index, bm25 = self._load_cache(cache_key, store)
+        
+        updated: List[Tuple[str, FileSignature, Optional[bytes], Optional[bytes]]] = []
+        touched: List[Tuple[str, FileSignature]] = []
+        seen: Set[str] = set()
+        
+        # Обход и хэши файлов — общие с другими потребителями сканера
+        scanner = get_project_scanner()
+        if changed_paths is None:
+            files = scanner.files(project_path, extensions)
+        else:
+            changed_paths = set(changed_paths)
+            files = [
+                file for file in (
+                    ScannedFile.from_path(os.path.join(project_path, rel_path), project_path)
+                    for rel_path in sorted(changed_paths)
+                    if rel_path.endswith(tuple(extensions)) and not scanner.is_ignored(project_path, rel_path)
+                )
+                if file is not None
+            ]
+        
+        stale: List[ScannedFile] = []
+        for file in files:
+            seen.add(file.rel_path)
+            cached = index.signature(file.rel_path)
+            if not (cached and cached.mtime_ns == file.mtime_ns and cached.size == file.size):
+                stale.append(file)
+        
+        for file, parsed in zip(stale, scanner.parse(stale, analyze=scanner.prefetch_ast)):
+            if parsed is not None:
+                self._index_file(file, parsed.content_hash, index, bm25, updated, touched)
+        
+        if changed_paths is None:
+            removed = [path for path in index.tracked_files() if path not in seen]
+        else:
+            removed = [path for path in changed_paths if path not in seen and index.signature(path)]
+        for path in removed:
+            index.remove_file(path)
+            bm25.remove_group(path)
+        
+        # Сохраняем изменения на диск
+        self._save_cache(store, updated, touched, removed)
+        
+        if updated or removed:
+            logger.debug(
+                f"📂 Индекс {project_path}: перечанковано {len(updated)}, "
+                f"удалено {len(removed)}, без изменений {len(seen) - len(updated)}"
+            )
+        
+        return index, bm25
+    
+    def _index_file(
+        self,
+        file: ScannedFile,
+        file_hash: str,
+        index: LazyChunkIndex,
+        bm25: BM25Index,
+        updated: List[Tuple[str, FileSignature, Optional[bytes], Optional[bytes]]],
+        touched: List[Tuple[str, FileSignature]]
+    ) -> None:
+        """Перечанковывает файл, если его содержимое изменилось с прошлой индексации."""
+        rel_path = file.rel_path
+        signature = FileSignature(file.mtime_ns, file.size, file_hash)
+        cached = index.signature(rel_path)
+        if cached and cached.content_hash == file_hash:
+            # Файл тронут (touch, checkout), но содержимое то же
+            index.touch_file(rel_path, signature)
+            touched.append((rel_path, signature))
+            return
+        try:
+            with open(file.path, 'rb') as f:
+                chunks = self.chunker.chunk_file(rel_path, f.read().decode('utf-8'))
+        except Exception as e:
+            logger.debug(f"⚠️ Ошибка индексации файла {file.path}: {e}")
+            # Игнорируем ошибки чтения файлов
+            return
+        
+        if chunks:
+            # Статистика термов считается один раз здесь, а не на каждый запрос
+            terms = [self.scorer.chunk_terms(chunk) for chunk in chunks]
+            payload = _encode_chunks(chunks)
+            blob = compress_payload(payload)
+            terms_blob = compress_payload(json.dumps(terms, ensure_ascii=False).encode('utf-8'))
+            bm25.add_group(rel_path, terms)
+        else:
+            payload = b""
+            blob = terms_blob = None
+            bm25.remove_group(rel_path)
+        index.set_file(rel_path, signature, blob, terms_blob, chunks, decoded_size=len(payload))
+        updated.append((rel_path, signature, blob, terms_blob))
     
     def get_context(
         self,
@@ -768,44 +1091,107 @@ class ContextEngine:
         Returns:
             Собранный контекст в пределах лимита токенов
         """
-        # Индексируем проект (с кэшированием)
-        index = self.index_project(project_path, extensions)
-        
-        # Собираем все чанки из индекса
-        all_chunks: List[CodeChunk] = []
-        for chunks in index.values():
-            all_chunks.extend(chunks)
-        
-        if not all_chunks:
-            return ""
-        
-        # Оцениваем релевантность
-        scored_chunks = self.scorer.score_chunks(query, all_chunks)
+        if extensions is None:
+            extensions = ['.py']
         
-        # Собираем контекст (с опциональным ограничением токенов)
-        context = self.composer.compose(scored_chunks, query, max_tokens_override=max_context_tokens)
+        project_path_obj = Path(project_path)
+        if not project_path_obj.exists():
+            raise ValueError(f"Проект не найден: {project_path}")
         
+        cache_key = self._get_cache_key(project_path, extensions)
+        with self._project_lock(cache_key):
+            # Индексируем проект (инкрементально, с кэшированием). Индекс
+            # проекта под наблюдателем уже актуален — файлы не обходятся
+            with self._index_lock:
+                watched = cache_key in self._watched and cache_key in self._index_cache
+            index, bm25 = self._refresh_index(
+                project_path_obj, project_path, extensions, cache_key, () if watched else None
+            )
+            
+            if not len(bm25):
+                context = ""
+            else:
+                # Ранжируем по инвертированному индексу. Итератор ленивый: чанки
+                # распаковываются только для тех, что попадут в контекст
+                scored_chunks = self.scorer.rank(
+                    query, bm25, lambda file_path, position: index[file_path][position]
+                )
+                
+                # Собираем контекст (с опциональным ограничением токенов)
+                context = self.composer.compose(scored_chunks, query, max_tokens_override=max_context_tokens)
+        self._evict_cold(keep=cache_key)
         return context
     
     def _get_cache_key(self, project_path: str, extensions: List[str]) -> str:
-        """Генерирует ключ кэша для проекта."""
-        key_str = f"{project_path}:{sorted(extensions)}"
+        """Генерирует ключ кэша для проекта.
+        
+        Путь приводится к абсолютному, расширения — к отсортированному
+        набору, чтобы "proj/" и "/abs/proj" с [".js", ".py"] и [".py", ".js"]
+        попадали в один индекс.
+        """
+        key_str = f"{os.path.abspath(project_path)}:{sorted(set(extensions))}"
         return hashlib.md5(key_str.encode()).hexdigest()
     
-    def _load_cache(self, cache_key: str) -> Optional[Dict[str, List[CodeChunk]]]:
-        """Загружает индекс из кэша."""
-        cache_file = self.cache_dir / f"{cache_key}.json"
-        if not cache_file.exists():
-            return None
+    def index_memory_bytes(self) -> int:
+        """Приблизительный объём индексов проектов в памяти."""
+        with self._index_lock:
+            return sum(index.memory_bytes() for index in self._index_cache.values())
+    
+    def cached_projects(self) -> int:
+        """Количество проектов, чьи индексы загружены в память."""
+        with self._index_lock:
+            return len(self._index_cache)
+    
+    def _evict_cold(self, keep: str) -> None:
+        """Выгружает давно не использованные проекты сверх лимита памяти.
         
-        try:
-            # Кэш содержит только метаданные, нужно будет перестроить
-            # Для v0.1 просто не используем кэш файлов, только память
-            return self._index_cache.get(cache_key)
-        except Exception as e:
-            logger.debug(f"⚠️ Ошибка загрузки кэша индекса: {e}")
-            return None
+        Проект keep и проекты, которые сейчас индексируются, не выгружаются.
+        Выгруженный индекс остаётся на диске и загружается при следующем обращении.
+        """
+        if not self._max_index_memory_bytes:
+            return
+        with self._index_lock:
+            total = sum(index.memory_bytes() for index in self._index_cache.values())
+            for cache_key in list(self._index_cache):
+                if total <= self._max_index_memory_bytes:
+                    break
+                if cache_key == keep or self._project_locks[cache_key].locked():
+                    continue
+                total -= self._index_cache.pop(cache_key).memory_bytes()
+                del self._bm25_cache[cache_key]
+                logger.debug(f"📤 Индекс проекта {cache_key[:8]} выгружен из памяти (лимит индексов)")
     
-    def _save_cache(self, cache_key: str, index: Dict[str, List[CodeChunk]]) -> None:
-        """Сохраняет индекс в кэш (для v0.1 - только в память)."""
-        self._index_cache[cache_key] = index
+    def _load_cache(self, cache_key: str, store: ProjectIndexStore) -> Tuple[LazyChunkIndex, BM25Index]:
+        """Возвращает индекс проекта из памяти или лениво загружает его с диска.
+        
+        BM25 индекс собирается из сохранённой статистики термов, без
+        распаковки и токенизации самих чанков.
+        """
+        with self._index_lock:
+            index = self._index_cache.get(cache_key)
+            if index is not None:
+                self._index_cache.move_to_end(cache_key)
+                return index, self._bm25_cache[cache_key]
+        
+        # Загрузка с диска — под блокировкой проекта, другие проекты не ждут
+        index = store.load(decoder=_decode_chunks)
+        bm25 = BM25Index()
+        for file_path, terms_blob in index.term_blobs():
+            terms = json.loads(zlib.decompress(terms_blob))
+            bm25.add_group(file_path, [(length, weighted_tf) for length, weighted_tf in terms])
+        with self._index_lock:
+            self._index_cache[cache_key] = index
+            self._bm25_cache[cache_key] = bm25
+        if len(index):
+            logger.debug(f"📂 Загружен индекс с диска: {len(index)} файлов, {len(bm25)} чанков")
+        return index, bm25
+    
+    def _save_cache(
+        self,
+        store: ProjectIndexStore,
+        updated: List[Tuple[str, FileSignature, Optional[bytes], Optional[bytes]]],
+        touched: List[Tuple[str, FileSignature]],
+        removed: List[str]
+    ) -> None:
+        """Сохраняет изменения индекса на диск."""
+        store.apply(updated, touched, removed)
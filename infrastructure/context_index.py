@@ -0,0 +1,286 @@
+"""Персистентный индекс чанков проекта для Context Engine.
+
+Хранит результат CodeChunker.chunk_file на диске (SQLite), по одной строке
+на файл. Каждый файл помечен сигнатурой (mtime_ns, размер, хэш содержимого),
+поэтому при повторной индексации перечанкиваются только изменённые файлы:
+
+- mtime и размер совпали — файл не читается вообще
+- mtime изменился, но хэш тот же (touch, git checkout) — обновляется сигнатура
+- хэш изменился — файл заново разбивается на чанки
+- файла больше нет — строка удаляется
+
+Чанки хранятся сжатыми (zlib) и декодируются лениво, при первом обращении
+к файлу в LazyChunkIndex. Рядом с чанками хранится сжатая статистика термов
+(для BM25 индекса), чтобы после перезапуска не токенизировать весь проект
+заново. Формат обоих блобов задаёт вызывающий код, модуль ничего не знает
+о CodeChunk.
+
+Использование:
+    store = ProjectIndexStore(cache_dir / f"{cache_key}.sqlite", fingerprint="chunker:v1:500")
+    index = store.load(decoder=decode_chunks)
+    store.apply(updated=[...], touched=[...], removed=[...])
+"""
+import hashlib
+import sqlite3
+import zlib
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+# Версия схемы таблиц. При изменении индекс пересоздаётся с нуля
+SCHEMA_VERSION = 2
+
+
+@dataclass(frozen=True)
+class FileSignature:
+    """Сигнатура состояния файла на момент индексации."""
+    mtime_ns: int
+    size: int
+    content_hash: str
+
+
+def content_hash(data: bytes) -> str:
+    """Быстрый хэш содержимого файла (blake2b, 128 бит)."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def compress_payload(payload: bytes) -> bytes:
+    """Сжимает сериализованные чанки для хранения на диске и в памяти."""
+    return zlib.compress(payload, 1)
+
+
+class LazyChunkIndex(Mapping):
+    """Индекс {file_path: [chunks]} с ленивой распаковкой чанков.
+
+    Хранит сжатые блобы всех файлов, распаковывает и декодирует чанки
+    файла только при первом обращении и запоминает результат.
+    Файлы без чанков (пустые, нечитаемые) хранят только сигнатуру,
+    чтобы не перечитывать их при каждой индексации, но не видны как ключи.
+    """
+
+    def __init__(self, decoder: Callable[[bytes], List[Any]]) -> None:
+        """Инициализация пустого индекса.
+
+        Args:
+            decoder: Функция разворачивания распакованного блоба в список чанков
+        """
+        self._decoder = decoder
+        self._signatures: Dict[str, FileSignature] = {}
+        self._blobs: Dict[str, bytes] = {}
+        self._term_blobs: Dict[str, bytes] = {}
+        self._decoded: Dict[str, List[Any]] = {}
+        # Размер распакованных данных декодированных файлов (оценка памяти чанков)
+        self._decoded_sizes: Dict[str, int] = {}
+        self._memory_bytes = 0
+
+    def __getitem__(self, file_path: str) -> List[Any]:
+        chunks = self._decoded.get(file_path)
+        if chunks is None:
+            blob = self._blobs[file_path]
+            payload = zlib.decompress(blob)
+            chunks = self._decoder(payload)
+            self._decoded[file_path] = chunks
+            self._set_decoded_size(file_path, len(payload))
+        return chunks
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._blobs)
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def signature(self, file_path: str) -> Optional[FileSignature]:
+        """Возвращает сигнатуру файла или None, если файл не индексировался."""
+        return self._signatures.get(file_path)
+
+    def tracked_files(self) -> List[str]:
+        """Все файлы с сигнатурой, включая файлы без чанков."""
+        return list(self._signatures)
+
+    def term_blobs(self) -> Iterator[Tuple[str, bytes]]:
+        """Сжатая статистика термов всех файлов с чанками."""
+        return iter(self._term_blobs.items())
+
+    def memory_bytes(self) -> int:
+        """Приблизительный объём индекса в памяти: сжатые блобы и распакованные чанки."""
+        return self._memory_bytes
+
+    def _set_decoded_size(self, file_path: str, size: int) -> None:
+        self._memory_bytes += size - self._decoded_sizes.pop(file_path, 0)
+        if size:
+            self._decoded_sizes[file_path] = size
+
+    def _drop_blobs(self, file_path: str) -> None:
+        blob = self._blobs.pop(file_path, None)
+        terms_blob = self._term_blobs.pop(file_path, None)
+        self._memory_bytes -= (len(blob) if blob else 0) + (len(terms_blob) if terms_blob else 0)
+        self._decoded.pop(file_path, None)
+        self._set_decoded_size(file_path, 0)
+
+    def set_file(
+        self,
+        file_path: str,
+        signature: FileSignature,
+        blob: Optional[bytes],
+        terms_blob: Optional[bytes] = None,
+        chunks: Optional[List[Any]] = None,
+        decoded_size: int = 0
+    ) -> None:
+        """Добавляет или заменяет файл в индексе.
+
+        Args:
+            file_path: Относительный путь файла
+            signature: Сигнатура файла
+            blob: Сжатые чанки или None, если чанков нет
+            terms_blob: Сжатая статистика термов чанков
+            chunks: Уже декодированные чанки (чтобы не распаковывать заново)
+            decoded_size: Размер несжатых чанков (для оценки памяти)
+        """
+        self._signatures[file_path] = signature
+        self._drop_blobs(file_path)
+        if blob is None:
+            return
+        self._blobs[file_path] = blob
+        self._memory_bytes += len(blob)
+        if terms_blob is not None:
+            self._term_blobs[file_path] = terms_blob
+            self._memory_bytes += len(terms_blob)
+        if chunks is not None:
+            self._decoded[file_path] = chunks
+            self._set_decoded_size(file_path, decoded_size)
+
+    def touch_file(self, file_path: str, signature: FileSignature) -> None:
+        """Обновляет сигнатуру файла без изменения чанков."""
+        self._signatures[file_path] = signature
+
+    def remove_file(self, file_path: str) -> None:
+        """Удаляет файл из индекса."""
+        self._signatures.pop(file_path, None)
+        self._drop_blobs(file_path)
+
+
+class ProjectIndexStore:
+    """SQLite хранилище индекса одного проекта.
+
+    Соединение открывается на каждую операцию, поэтому экземпляр можно
+    использовать из разных потоков (индексация идёт через asyncio.to_thread).
+    """
+
+    def __init__(self, db_path: Path, fingerprint: str) -> None:
+        """Инициализация хранилища.
+
+        Args:
+            db_path: Путь к файлу SQLite
+            fingerprint: Отпечаток настроек чанкера. Если он изменился
+                (другой max_chunk_tokens, другая версия формата), сохранённые
+                чанки невалидны и индекс очищается
+        """
+        self.db_path = db_path
+        self.fingerprint = fingerprint
+
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает соединение и создаёт схему при необходимости."""
+        conn = sqlite3.connect(str(self.db_path))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+        expected = f"{SCHEMA_VERSION}:{self.fingerprint}"
+        row = conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if row is None or row[0] != expected:
+            if row is not None:
+                logger.info(f"🔄 Формат индекса или настройки чанкера изменились, {self.db_path.name} будет перестроен")
+            with conn:
+                # Схема таблицы могла измениться — пересоздаём её целиком
+                conn.execute("DROP TABLE IF EXISTS files")
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)",
+                    (expected,)
+                )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, "
+            "content_hash TEXT NOT NULL, chunks BLOB, terms BLOB)"
+        )
+        return conn
+
+    def load(self, decoder: Callable[[bytes], List[Any]]) -> LazyChunkIndex:
+        """Загружает индекс с диска (чанки остаются сжатыми до обращения).
+
+        Args:
+            decoder: Функция декодирования распакованного блоба в чанки
+
+        Returns:
+            LazyChunkIndex с сигнатурами и сжатыми чанками всех файлов
+        """
+        index = LazyChunkIndex(decoder)
+        try:
+            conn = self._connect()
+            try:
+                for path, mtime_ns, size, file_hash, blob, terms_blob in conn.execute(
+                    "SELECT path, mtime_ns, size, content_hash, chunks, terms FROM files"
+                ):
+                    index.set_file(path, FileSignature(mtime_ns, size, file_hash), blob, terms_blob)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Не удалось загрузить индекс {self.db_path}: {e}. Индексирую заново")
+            self._reset()
+            return LazyChunkIndex(decoder)
+        return index
+
+    def apply(
+        self,
+        updated: List[Tuple[str, FileSignature, Optional[bytes], Optional[bytes]]],
+        touched: List[Tuple[str, FileSignature]],
+        removed: List[str]
+    ) -> None:
+        """Записывает изменения одной транзакцией.
+
+        Args:
+            updated: Перечанкованные файлы (путь, сигнатура, сжатые чанки
+                или None, сжатая статистика термов или None)
+            touched: Файлы с новой сигнатурой и прежними чанками
+            removed: Удалённые файлы
+        """
+        if not (updated or touched or removed):
+            return
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO files (path, mtime_ns, size, content_hash, chunks, terms) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [
+                            (path, sig.mtime_ns, sig.size, sig.content_hash, blob, terms_blob)
+                            for path, sig, blob, terms_blob in updated
+                        ]
+                    )
+                    conn.executemany(
+                        "UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?",
+                        [(sig.mtime_ns, sig.size, path) for path, sig in touched]
+                    )
+                    conn.executemany(
+                        "DELETE FROM files WHERE path = ?",
+                        [(path,) for path in removed]
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # Индекс в памяти остаётся корректным, на диске просто перестроится позже
+            logger.warning(f"⚠️ Не удалось сохранить индекс {self.db_path}: {e}")
+
+    def _reset(self) -> None:
+        """Удаляет повреждённый файл индекса."""
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                Path(f"{self.db_path}{suffix}").unlink(missing_ok=True)
+            except OSError:
+                pass
@@ -0,0 +1,452 @@
+"""Персистентный кэш embeddings, общий для RAG, CodeRetriever и MemoryAgent.
+
+Ключ записи — (имя модели, хэш текста), поэтому одинаковый текст не
+эмбеддится повторно ни при переиндексации проекта, ни при повторных запросах.
+
+Хранение (отдельно для каждой модели, т.к. у моделей разная размерность):
+
+- `<model>.f32` — матрица float32 [слот x размерность], открыта через mmap
+- `<model>.sqlite` — индекс смещений: хэш текста -> номер слота + время
+  последнего обращения (для LRU)
+
+При заполнении max_entries вытесняется давно не использованная запись,
+её слот переиспользуется. Порядок записи (сначала удаляем старый ключ из
+индекса, потом пишем вектор, потом добавляем новый ключ) гарантирует,
+что после падения процесса ключ не укажет на чужой вектор.
+
+Один каталог кэша могут открыть несколько процессов (воркеры uvicorn, CLI
+рядом с API). Поэтому операции с хранилищем идут под межпроцессной
+блокировкой `<model>.lock` (fcntl.flock: запись — эксклюзивная, чтение —
+разделяемая), а индекс слотов в памяти перечитывается с диска, если
+другой процесс успел записать (`PRAGMA data_version`). Иначе два процесса
+выдали бы один свободный слот разным текстам и затёрли бы векторы друг
+друга.
+
+Использование:
+    cache = get_embedding_cache()
+    vector = cache.get("nomic-embed-text", text)
+    if vector is None:
+        vector = embed(text)
+        cache.put("nomic-embed-text", text, vector)
+"""
+import hashlib
+import mmap
+import re
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from utils.config import get_config
+from utils.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессной блокировки нет, кэш — на один процесс
+    fcntl = None
+
+logger = get_logger()
+
+# Размер float32 в байтах
+_FLOAT_SIZE = 4
+
+# Начальная ёмкость матрицы (слотов), дальше растёт удвоением до max_entries
+_INITIAL_CAPACITY = 1024
+
+
+def text_hash(text: str) -> str:
+    """Хэш текста для ключа кэша (blake2b, 128 бит)."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+class _ModelStore:
+    """Хранилище embeddings одной модели: mmap матрица + SQLite индекс слотов."""
+
+    def __init__(self, base_path: Path, max_entries: int) -> None:
+        """Открывает (или создаёт) хранилище.
+
+        Args:
+            base_path: Путь без расширения, к нему добавляются .f32 и .sqlite
+            max_entries: Максимальное количество векторов
+        """
+        self.matrix_path = base_path.with_suffix(".f32")
+        self.db_path = base_path.with_suffix(".sqlite")
+        self.lock_path = base_path.with_suffix(".lock")
+        self.max_entries = max_entries
+        self.dim = 0
+        self.capacity = 0
+        # hash -> slot в порядке LRU (в конце — самые свежие)
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free_slots: List[int] = []
+        self._next_slot = 0
+        self._clock = 0
+        self._touched: Dict[str, int] = {}
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        # PRAGMA data_version на момент загрузки индекса (None — не загружен)
+        self._data_version: Optional[int] = None
+
+        self._lock_file = open(self.lock_path, "a+b")
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "slot INTEGER PRIMARY KEY, hash TEXT NOT NULL UNIQUE, last_used INTEGER NOT NULL)"
+        )
+        with self._locked(exclusive=True):
+            pass  # _locked загружает индекс с диска
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        """Межпроцессная блокировка хранилища с актуальным индексом слотов.
+
+        Args:
+            exclusive: Эксклюзивная блокировка (запись) или разделяемая (чтение)
+        """
+        if fcntl is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            self._sync()
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        """Перечитывает индекс слотов, если его изменил другой процесс."""
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        if self._data_version is not None:
+            # Сначала сохраняем свои обращения, чтобы не потерять LRU порядок
+            self.flush()
+        self._load()
+        self._data_version = version
+
+    def _load(self) -> None:
+        """Загружает индекс слотов и открывает матрицу."""
+        self._slots.clear()
+        self._free_slots = []
+        self._next_slot = 0
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        if row is None:
+            self._close_matrix()
+            self.dim = 0
+            self.capacity = 0
+            return
+        self.dim = int(row[0])
+        if not self.matrix_path.exists():
+            logger.warning(f"⚠️ Матрица {self.matrix_path.name} не найдена, кэш embeddings очищен")
+            self._reset()
+            return
+
+        self._open_matrix(self.matrix_path.stat().st_size // (self.dim * _FLOAT_SIZE))
+        rows = self._conn.execute("SELECT hash, slot, last_used FROM entries ORDER BY last_used").fetchall()
+        for file_hash, slot, last_used in rows:
+            if slot >= self.capacity:
+                continue
+            self._slots[file_hash] = slot
+            self._clock = max(self._clock, last_used)
+        used = set(self._slots.values())
+        self._next_slot = max(used) + 1 if used else 0
+        self._free_slots = [slot for slot in range(self._next_slot) if slot not in used]
+
+    def _reset(self) -> None:
+        """Очищает хранилище (смена размерности, потерянная матрица)."""
+        self._close_matrix()
+        with self._conn:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM meta")
+        self.matrix_path.unlink(missing_ok=True)
+        self.dim = 0
+        self.capacity = 0
+        self._slots.clear()
+        self._free_slots = []
+        self._next_slot = 0
+        self._touched.clear()
+
+    def _open_matrix(self, capacity: int) -> None:
+        """Открывает файл матрицы на заданное число слотов."""
+        self._close_matrix()
+        size = capacity * self.dim * _FLOAT_SIZE
+        self.matrix_path.touch(exist_ok=True)
+        self._file = open(self.matrix_path, "r+b")
+        if self._file.seek(0, 2) < size:
+            self._file.truncate(size)
+        self.capacity = capacity
+        if size:
+            self._mmap = mmap.mmap(self._file.fileno(), size)
+
+    def _close_matrix(self) -> None:
+        """Закрывает mmap и файл матрицы."""
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[List[float]]]:
+        """Возвращает векторы по хэшам текстов (None для промахов)."""
+        with self._locked(exclusive=False):
+            return [self._get(key) for key in keys]
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        """Возвращает вектор по хэшу текста или None (под блокировкой)."""
+        slot = self._slots.get(key)
+        if slot is None or self._mmap is None:
+            return None
+        self._slots.move_to_end(key)
+        self._clock += 1
+        self._touched[key] = self._clock
+        offset = slot * self.dim * _FLOAT_SIZE
+        vector = array("f")
+        vector.frombytes(self._mmap[offset:offset + self.dim * _FLOAT_SIZE])
+        return vector.tolist()
+
+    def put_many(self, items: Sequence[tuple]) -> int:
+        """Записывает векторы [(hash, vector)].
+
+        Returns:
+            Количество вытесненных записей
+        """
+        if not items:
+            return 0
+        with self._locked(exclusive=True):
+            return self._put_many(items)
+
+    def _put_many(self, items: Sequence[tuple]) -> int:
+        """Записывает векторы под эксклюзивной блокировкой."""
+        if self.dim == 0:
+            self.dim = len(items[0][1])
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+
+        # Назначаем слоты, вытесняя самые старые записи при заполнении
+        assigned: List[tuple] = []
+        evicted: List[str] = []
+        for key, vector in items:
+            if key in self._slots or len(vector) != self.dim:
+                continue
+            if self._free_slots:
+                slot = self._free_slots.pop()
+            elif self._next_slot < self.max_entries:
+                slot = self._next_slot
+                self._next_slot += 1
+            else:
+                old_key, slot = self._slots.popitem(last=False)
+                self._touched.pop(old_key, None)
+                evicted.append(old_key)
+            self._slots[key] = slot
+            assigned.append((key, slot, vector))
+        if not assigned:
+            return 0
+
+        if evicted:
+            with self._conn:
+                self._conn.executemany("DELETE FROM entries WHERE hash = ?", [(key,) for key in evicted])
+
+        if self._next_slot > self.capacity:
+            capacity = max(self.capacity, _INITIAL_CAPACITY)
+            while capacity < self._next_slot:
+                capacity *= 2
+            self._open_matrix(min(capacity, self.max_entries))
+
+        assert self._mmap is not None
+        row_size = self.dim * _FLOAT_SIZE
+        rows = []
+        for key, slot, vector in assigned:
+            offset = slot * row_size
+            self._mmap[offset:offset + row_size] = array("f", vector).tobytes()
+            self._clock += 1
+            self._touched.pop(key, None)
+            rows.append((slot, key, self._clock))
+
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (slot, hash, last_used) VALUES (?, ?, ?)", rows
+            )
+        return len(evicted)
+
+    def flush(self, sync: bool = False) -> None:
+        """Сохраняет время последнего обращения (для LRU после перезапуска).
+
+        Args:
+            sync: Дополнительно сбросить страницы матрицы на диск (msync)
+        """
+        if self._touched:
+            touched, self._touched = self._touched, {}
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE hash = ?",
+                    [(clock, key) for key, clock in touched.items()]
+                )
+        if sync and self._mmap is not None:
+            self._mmap.flush()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def close(self) -> None:
+        """Сбрасывает изменения и закрывает файлы."""
+        try:
+            self.flush(sync=True)
+        finally:
+            self._close_matrix()
+            self._conn.close()
+            self._lock_file.close()
+
+
+class EmbeddingCache:
+    """Персистентный LRU кэш embeddings с ключом (модель, хэш текста).
+
+    Потокобезопасен: RAGSystem считает батчи embeddings в пуле потоков.
+    """
+
+    def __init__(self, cache_dir: Path, max_entries: int = 100_000) -> None:
+        """Инициализация кэша.
+
+        Args:
+            cache_dir: Директория для файлов кэша
+            max_entries: Максимальное количество векторов на модель
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max(1, max_entries)
+        self._stores: Dict[str, _ModelStore] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _store(self, model: str) -> Optional[_ModelStore]:
+        """Возвращает хранилище модели, открывая его при первом обращении."""
+        store = self._stores.get(model)
+        if store is None:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                slug = re.sub(r"[^\w.-]", "_", model)
+                store = _ModelStore(self.cache_dir / f"{slug}-{text_hash(model)[:8]}", self.max_entries)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"⚠️ Кэш embeddings для {model} недоступен: {e}")
+                return None
+            self._stores[model] = store
+        return store
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Возвращает закэшированные векторы (None для промахов).
+
+        Args:
+            model: Имя embedding модели
+            texts: Тексты
+
+        Returns:
+            Векторы в порядке текстов
+        """
+        with self._lock:
+            store = self._store(model)
+            if store is None:
+                self.misses += len(texts)
+                return [None] * len(texts)
+            try:
+                vectors = store.get_many([text_hash(text) for text in texts])
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"⚠️ Не удалось прочитать кэш embeddings: {e}")
+                vectors = [None] * len(texts)
+            hits = sum(1 for vector in vectors if vector is not None)
+            self.hits += hits
+            self.misses += len(texts) - hits
+            return vectors
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Возвращает закэшированный вектор текста или None."""
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Сохраняет векторы текстов.
+
+        Args:
+            model: Имя embedding модели
+            texts: Тексты
+            vectors: Векторы в порядке текстов
+        """
+        with self._lock:
+            store = self._store(model)
+            if store is None:
+                return
+            try:
+                self.evictions += store.put_many(
+                    [(text_hash(text), vector) for text, vector in zip(texts, vectors)]
+                )
+                store.flush()
+            except (OSError, sqlite3.Error, ValueError) as e:
+                # Кэш — только ускорение, ошибка записи не должна ронять индексацию
+                logger.warning(f"⚠️ Не удалось сохранить embeddings в кэш: {e}")
+
+    def put(self, model: str, text: str, vector: Sequence[float]) -> None:
+        """Сохраняет вектор текста."""
+        self.put_many(model, [text], [vector])
+
+    def get_stats(self) -> Dict[str, float]:
+        """Метрики кэша: попадания, промахи, вытеснения, размер."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": sum(len(store) for store in self._stores.values()),
+            }
+
+    def flush(self) -> None:
+        """Сбрасывает LRU метаданные всех моделей на диск."""
+        with self._lock:
+            for store in self._stores.values():
+                try:
+                    store.flush(sync=True)
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(f"⚠️ Не удалось сохранить кэш embeddings: {e}")
+
+    def close(self) -> None:
+        """Закрывает все хранилища."""
+        with self._lock:
+            for store in self._stores.values():
+                try:
+                    store.close()
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(f"⚠️ Ошибка закрытия кэша embeddings: {e}")
+            self._stores.clear()
+
+
+# === Singleton ===
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Возвращает глобальный кэш embeddings или None, если он отключён в конфиге.
+
+    Returns:
+        EmbeddingCache или None
+    """
+    global _embedding_cache
+
+    config = get_config()
+    if not config.embedding_cache_enabled:
+        return None
+
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(
+                    cache_dir=Path(config.embedding_cache_directory),
+                    max_entries=config.embedding_cache_max_entries
+                )
+    return _embedding_cache
@@ -0,0 +1,373 @@
+"""Бэкенды хранения событий EventStore.
+
+- MemoryEventBackend (по умолчанию) — кольцевые буферы в памяти процесса;
+  события видны только воркеру, который их сохранил
+- SQLiteEventBackend — один файл SQLite в режиме WAL, общий для всех
+  воркеров uvicorn на машине: воркер сохраняет событие строкой таблицы
+  events, любой воркер читает события сессии (в том числе продолжение
+  стрима после Last-Event-ID при переподключении клиента к другому
+  воркеру). Номер события — AUTOINCREMENT, монотонный для всех процессов
+
+ID события — его номер строкой: event_id == str(seq).
+"""
+import itertools
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence, Union
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Как часто (сохранений в сессию) SQLite бэкенд обрезает сессию до
+# max_events_per_session: буфер сессии может превышать лимит на эту величину
+_TRIM_EVERY = 64
+
+
+@dataclass(slots=True)
+class Event:
+    """Событие для хранения."""
+    event_id: str
+    event_type: str
+    data: Any
+    timestamp: datetime
+    session_id: str
+    # Монотонный номер события (event_id == str(seq)), 0 — событие создано вне EventStore
+    seq: int = 0
+
+
+def _event_seq(event: Event) -> int:
+    return event.seq
+
+
+def parse_event_seq(event_id: Any) -> Optional[int]:
+    """Номер события из ID (None, если ID не номер EventStore)."""
+    try:
+        return int(event_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def _find_event(events: Sequence[Event], event_id: str) -> Optional[Event]:
+    """Ищет событие в буфере сессии: бинарный поиск по номеру."""
+    seq = parse_event_seq(event_id)
+    if seq is not None and seq > 0:
+        index = bisect_left(events, seq, key=_event_seq)
+        if index < len(events) and events[index].event_id == event_id:
+            return events[index]
+    # События, добавленные в обход бэкенда, не упорядочены по номеру
+    for event in events:
+        if event.event_id == event_id:
+            return event
+    return None
+
+
+def _tail_from(events: Sequence[Event], min_seq: int) -> List[Event]:
+    """События буфера с номером >= min_seq (обход с конца, O(размер хвоста))."""
+    tail: List[Event] = []
+    for event in reversed(events):
+        if event.seq < min_seq:
+            break
+        tail.append(event)
+    tail.reverse()
+    return tail
+
+
+def _drop_expired(events: Union[Deque[Event], List[Event]], cutoff: datetime) -> int:
+    """Снимает с головы буфера события старше cutoff.
+
+    События добавляются в порядке времени, поэтому устаревшие — префикс буфера.
+
+    Returns:
+        Количество удалённых событий
+    """
+    expired = 0
+    while expired < len(events) and events[expired].timestamp < cutoff:
+        expired += 1
+    if expired:
+        if isinstance(events, deque):
+            for _ in range(expired):
+                events.popleft()
+        else:
+            del events[:expired]
+    return expired
+
+
+class EventBackend(ABC):
+    """Хранилище событий сессий (события в порядке номеров)."""
+
+    # Операции ждут диска или блокировки другого процесса: EventStore
+    # вызывает их в отдельном потоке, а не в event loop
+    blocking = False
+
+    @abstractmethod
+    def append(self, session_id: str, event_type: str, data: Any, timestamp: datetime) -> Event:
+        """Сохраняет событие и присваивает ему номер."""
+
+    @abstractmethod
+    def get_event(self, session_id: str, event_id: str) -> Optional[Event]:
+        """Событие сессии по ID (None если его нет)."""
+
+    @abstractmethod
+    def get_events(self, session_id: str, event_ids: List[str]) -> List[Event]:
+        """События сессии по ID в порядке запроса (отсутствующие пропускаются)."""
+
+    @abstractmethod
+    def get_events_after(self, session_id: str, after_seq: Optional[int]) -> List[Event]:
+        """События сессии с номером больше after_seq (None — все)."""
+
+    @abstractmethod
+    def delete_session(self, session_id: str) -> None:
+        """Удаляет все события сессии."""
+
+    @abstractmethod
+    def delete_expired(self, cutoff: datetime, session_id: Optional[str] = None) -> List[str]:
+        """Удаляет события старше cutoff.
+
+        Args:
+            cutoff: Граница времени
+            session_id: Только эта сессия (None — все)
+
+        Returns:
+            Сессии, у которых не осталось событий
+        """
+
+    @abstractmethod
+    def evict_session(self, session_id: str) -> None:
+        """Освобождает память процесса, занятую сессией (вытеснение по LRU).
+
+        События, общие для воркеров, не удаляются — их удалит delete_expired.
+        """
+
+    def close(self) -> None:
+        """Освобождает ресурсы."""
+
+
+class MemoryEventBackend(EventBackend):
+    """Кольцевые буферы событий в памяти процесса."""
+
+    def __init__(self, events: Optional[Dict[str, Deque[Event]]] = None, max_events_per_session: int = 5000) -> None:
+        """Инициализация.
+
+        Args:
+            events: Словарь session_id -> буфер (EventStore передаёт свой _events)
+            max_events_per_session: Ёмкость кольцевого буфера сессии
+        """
+        self.events: Dict[str, Deque[Event]] = {} if events is None else events
+        self.max_events_per_session = max_events_per_session
+        self._seq_counter = itertools.count(1)
+
+    def append(self, session_id: str, event_type: str, data: Any, timestamp: datetime) -> Event:
+        seq = next(self._seq_counter)
+        event = Event(str(seq), event_type, data, timestamp, session_id, seq)
+        # Создаем буфер если его еще нет; при переполнении deque вытесняет самое старое событие
+        buffer = self.events.get(session_id)
+        if buffer is None:
+            buffer = deque(maxlen=self.max_events_per_session)
+            self.events[session_id] = buffer
+        buffer.append(event)
+        return event
+
+    def get_event(self, session_id: str, event_id: str) -> Optional[Event]:
+        return _find_event(self.events.get(session_id, ()), event_id)
+
+    def get_events(self, session_id: str, event_ids: List[str]) -> List[Event]:
+        events = self.events.get(session_id, ())
+        seqs = [seq for seq in (parse_event_seq(eid) for eid in event_ids) if seq is not None]
+        if not events or not seqs or len(seqs) < len(event_ids) or min(seqs) <= 0:
+            found = (_find_event(events, eid) for eid in event_ids)
+            return [event for event in found if event is not None]
+
+        # Ссылки узла — свежие события: достаточно хвоста буфера от младшей ссылки
+        event_map = {e.event_id: e for e in _tail_from(events, min(seqs))}
+        return [event_map[eid] for eid in event_ids if eid in event_map]
+
+    def get_events_after(self, session_id: str, after_seq: Optional[int]) -> List[Event]:
+        events = self.events.get(session_id, ())
+        if after_seq is None:
+            return list(events)
+        return _tail_from(events, after_seq + 1)
+
+    def delete_session(self, session_id: str) -> None:
+        self.events.pop(session_id, None)
+
+    def evict_session(self, session_id: str) -> None:
+        # События видны только этому процессу: буфер вытесняется целиком
+        self.delete_session(session_id)
+
+    def delete_expired(self, cutoff: datetime, session_id: Optional[str] = None) -> List[str]:
+        session_ids = [session_id] if session_id is not None else list(self.events)
+        emptied = []
+        for sid in session_ids:
+            events = self.events.get(sid)
+            if events is None:
+                continue
+            removed = _drop_expired(events, cutoff)
+            if removed and session_id is not None:
+                logger.debug(f"🧹 Очищено {removed} старых событий для сессии {sid[:8]}...")
+            if not events:
+                # Удаляем ключ если буфер пуст
+                del self.events[sid]
+                emptied.append(sid)
+        return emptied
+
+
+class SQLiteEventBackend(EventBackend):
+    """События в SQLite (WAL), общие для процессов на одной машине.
+
+    Каждый процесс держит своё соединение (потокобезопасно, под Lock);
+    WAL позволяет читать, пока другой воркер пишет.
+    """
+
+    blocking = True
+
+    def __init__(self, path: Path, max_events_per_session: int = 5000) -> None:
+        """Открывает (или создаёт) базу событий.
+
+        Args:
+            path: Файл SQLite
+            max_events_per_session: Сколько последних событий хранится на сессию
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_events_per_session = max_events_per_session
+        self._appends: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # timeout — ожидание блокировки записи другим воркером
+        self._conn = sqlite3.connect(str(self.path), timeout=10.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # События живут минуты, fsync на каждое сохранение не нужен
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+            "event_type TEXT NOT NULL, data TEXT NOT NULL, timestamp REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_events_session ON events (session_id, seq)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp)")
+        self._conn.commit()
+
+    @staticmethod
+    def _row_to_event(row: tuple) -> Event:
+        seq, session_id, event_type, data, timestamp = row
+        return Event(str(seq), event_type, json.loads(data), datetime.fromtimestamp(timestamp), session_id, seq)
+
+    def append(self, session_id: str, event_type: str, data: Any, timestamp: datetime) -> Event:
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO events (session_id, event_type, data, timestamp) VALUES (?, ?, ?, ?)",
+                (session_id, event_type, payload, timestamp.timestamp())
+            )
+            seq = cursor.lastrowid
+            assert seq is not None  # INSERT в таблицу с AUTOINCREMENT
+            appends = self._appends.get(session_id, 0) + 1
+            self._appends[session_id] = appends
+            if appends % _TRIM_EVERY == 0:
+                # Кольцевой буфер: оставляем max_events_per_session последних событий
+                self._conn.execute(
+                    "DELETE FROM events WHERE session_id = ? AND seq <= ("
+                    "SELECT seq FROM events WHERE session_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                    (session_id, session_id, self.max_events_per_session)
+                )
+            self._conn.commit()
+        # JSON представление: другие воркеры получат те же данные
+        return Event(str(seq), event_type, json.loads(payload), timestamp, session_id, seq)
+
+    def get_event(self, session_id: str, event_id: str) -> Optional[Event]:
+        events = self.get_events(session_id, [event_id])
+        return events[0] if events else None
+
+    def get_events(self, session_id: str, event_ids: List[str]) -> List[Event]:
+        seqs = [seq for seq in (parse_event_seq(eid) for eid in event_ids) if seq is not None]
+        if not seqs:
+            return []
+        found: Dict[str, Event] = {}
+        with self._lock:
+            # Параметров в запросе не больше лимита SQLite (999 в старых версиях)
+            for start in range(0, len(seqs), 500):
+                batch = seqs[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT seq, session_id, event_type, data, timestamp FROM events "
+                    f"WHERE session_id = ? AND seq IN ({', '.join('?' * len(batch))})",
+                    (session_id, *batch)
+                ).fetchall()
+                for row in rows:
+                    event = self._row_to_event(row)
+                    found[event.event_id] = event
+        return [found[eid] for eid in event_ids if eid in found]
+
+    def get_events_after(self, session_id: str, after_seq: Optional[int]) -> List[Event]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, session_id, event_type, data, timestamp FROM events "
+                "WHERE session_id = ? AND seq > ? ORDER BY seq",
+                (session_id, after_seq or 0)
+            ).fetchall()
+        return [self._row_to_event(row) for row in rows]
+
+    def delete_session(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM events WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+            self._appends.pop(session_id, None)
+
+    def evict_session(self, session_id: str) -> None:
+        # Строки читают другие воркеры: забываем только счётчик обрезки
+        with self._lock:
+            self._appends.pop(session_id, None)
+
+    def delete_expired(self, cutoff: datetime, session_id: Optional[str] = None) -> List[str]:
+        condition = "timestamp < ?"
+        params: List[Any] = [cutoff.timestamp()]
+        if session_id is not None:
+            condition += " AND session_id = ?"
+            params.append(session_id)
+        with self._lock:
+            sessions = [row[0] for row in self._conn.execute(
+                f"SELECT DISTINCT session_id FROM events WHERE {condition}", params
+            )]
+            self._conn.execute(f"DELETE FROM events WHERE {condition}", params)
+            self._conn.commit()
+            emptied = [
+                sid for sid in sessions
+                if self._conn.execute("SELECT 1 FROM events WHERE session_id = ? LIMIT 1", (sid,)).fetchone() is None
+            ]
+            for sid in emptied:
+                self._appends.pop(sid, None)
+        return emptied
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_event_backend(
+    backend: str,
+    path: str,
+    max_events_per_session: int,
+    events: Optional[Dict[str, Deque[Event]]] = None
+) -> EventBackend:
+    """Создаёт бэкенд событий по имени из конфига.
+
+    Args:
+        backend: "memory" или "sqlite"
+        path: Файл базы для sqlite
+        max_events_per_session: Ёмкость буфера сессии
+        events: Словарь буферов для memory бэкенда
+
+    Returns:
+        EventBackend
+    """
+    if backend == "sqlite":
+        return SQLiteEventBackend(Path(path), max_events_per_session)
+    if backend != "memory":
+        logger.warning(f"⚠️ Неизвестный бэкенд событий '{backend}', используется memory")
+    return MemoryEventBackend(events, max_events_per_session)
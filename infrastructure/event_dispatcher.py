@@ -0,0 +1,255 @@
+"""Доставка событий EventStore подписчикам SSE без опроса очередей.
+
+Подписчик ждёт событие обычным await queue.get() — без wait_for с
+таймаутом, который создаёт и отменяет таймер на каждой итерации. Heartbeat
+для простаивающих подписок ставит в их очереди один общий таймер
+(HeartbeatWheel, хэшированное колесо таймеров): одна задача на процесс
+просыпается раз в tick и проверяет только подписки, чей срок в текущем
+слоте. Пока событий нет, ни подписчики, ни колесо не тратят CPU.
+
+iter_event_batches отдаёт все готовые события разом, чтобы обработчик
+SSE записал их в ответ одной записью; с окном linger пачка добирает события,
+пришедшие за это время, а coalesce_chunk_events склеивает подряд идущие
+чанки одного типа в одно событие (один SSE кадр вместо кадра на токен).
+
+Использование:
+    queue = EventStore.get_event_queue(session_id)
+    async for batch in iter_event_batches(queue):
+        for item in batch:
+            if item is HEARTBEAT:
+                ...
+"""
+import asyncio
+import math
+import threading
+import time
+from typing import Any, AsyncGenerator, Dict, List, Optional, Set
+
+from infrastructure.event_backend import Event
+from utils.config import get_config
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+class _Heartbeat:
+    """Маркер heartbeat в очереди подписчика."""
+
+    def __repr__(self) -> str:
+        return "HEARTBEAT"
+
+
+HEARTBEAT = _Heartbeat()
+
+# Чанки, которые клиент дописывает к предыдущим (data — строка)
+COALESCIBLE_EVENT_TYPES = frozenset({"plan_chunk", "test_chunk", "code_chunk"})
+
+
+class HeartbeatWheel:
+    """Общий таймер heartbeat для подписок (хэшированное колесо таймеров).
+
+    Подписка лежит в слоте, соответствующем её сроку. Активность подписки
+    (touch) только обновляет время — подписка не переставляется, а при
+    срабатывании слота переносится на last_activity + interval, если
+    heartbeat ещё не нужен.
+    """
+
+    def __init__(self, interval: float = 15.0, tick: float = 1.0) -> None:
+        """Инициализация.
+
+        Args:
+            interval: Heartbeat после стольких секунд без событий
+            tick: Шаг колеса (точность срока heartbeat), секунды
+        """
+        self.interval = interval
+        self.tick = min(tick, interval)
+        self._size = math.ceil(self.interval / self.tick) + 1
+        self._slots: List[Set[asyncio.Queue]] = [set() for _ in range(self._size)]
+        # Очередь подписки -> время последней активности (monotonic)
+        self._subscriptions: Dict[asyncio.Queue, float] = {}
+        self._current = 0
+        self._task: Optional[asyncio.Task] = None
+        self.heartbeats_sent = 0
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def _schedule(self, queue: asyncio.Queue, due: float, now: float) -> None:
+        ticks = min(max(1, math.ceil((due - now) / self.tick)), self._size - 1)
+        self._slots[(self._current + ticks) % self._size].add(queue)
+
+    def register(self, queue: asyncio.Queue) -> None:
+        """Добавляет подписку (вызывать из event loop).
+
+        Args:
+            queue: Очередь подписчика, в которую ставится HEARTBEAT
+        """
+        now = time.monotonic()
+        self._subscriptions[queue] = now
+        self._schedule(queue, now + self.interval, now)
+        self._ensure_running()
+
+    def touch(self, queue: asyncio.Queue) -> None:
+        """Отмечает активность подписки (heartbeat откладывается)."""
+        if queue in self._subscriptions:
+            self._subscriptions[queue] = time.monotonic()
+
+    def unregister(self, queue: asyncio.Queue) -> None:
+        """Удаляет подписку; колесо останавливается, когда подписок нет."""
+        # Из слота очередь удаляется лениво при его срабатывании
+        self._subscriptions.pop(queue, None)
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    def _advance(self) -> None:
+        """Сдвигает колесо на слот и обрабатывает подписки с истёкшим сроком."""
+        self._current = (self._current + 1) % self._size
+        due_queues = self._slots[self._current]
+        self._slots[self._current] = set()
+        now = time.monotonic()
+        for queue in due_queues:
+            last_activity = self._subscriptions.get(queue)
+            if last_activity is None:
+                continue
+            due = last_activity + self.interval
+            # Полшага допуска: срок внутри текущего слота
+            if due <= now + self.tick / 2:
+                queue.put_nowait(HEARTBEAT)
+                self.heartbeats_sent += 1
+                self._subscriptions[queue] = now
+                due = now + self.interval
+            self._schedule(queue, due, now)
+
+    async def _run(self) -> None:
+        try:
+            while self._subscriptions:
+                await asyncio.sleep(self.tick)
+                self._advance()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # Следующая подписка запустит колесо заново
+            self._slots = [set() for _ in range(self._size)]
+            for queue, last_activity in self._subscriptions.items():
+                self._schedule(queue, last_activity + self.interval, time.monotonic())
+
+    def stop(self) -> None:
+        """Останавливает задачу колеса (для shutdown и тестов)."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+
+async def iter_event_batches(
+    queue: asyncio.Queue,
+    wheel: Optional["HeartbeatWheel"] = None,
+    max_batch: int = 64,
+    linger: float = 0.0
+) -> AsyncGenerator[List[Any], None]:
+    """Отдаёт пачки готовых элементов очереди подписчика.
+
+    Ждёт первый элемент без таймаута, затем забирает всё, что уже готово
+    (до max_batch). Если первый элемент — событие и задан linger, пачка
+    ждёт ещё linger секунд и добирает пришедшие за это время события
+    (одно ожидание на пачку). Простаивающей подписке колесо ставит HEARTBEAT.
+
+    Args:
+        queue: Очередь событий подписчика
+        wheel: Колесо heartbeat (None — общее колесо процесса)
+        max_batch: Максимум элементов в пачке
+        linger: Окно добора событий в пачку, секунды (0 — только готовые)
+
+    Yields:
+        Список событий и маркеров HEARTBEAT в порядке очереди
+    """
+    if wheel is None:
+        wheel = get_heartbeat_wheel()
+    wheel.register(queue)
+    try:
+        while True:
+            batch = [await queue.get()]
+            if linger > 0 and batch[0] is not HEARTBEAT and queue.qsize() < max_batch - 1:
+                await asyncio.sleep(linger)
+            while len(batch) < max_batch:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            if any(item is not HEARTBEAT for item in batch):
+                wheel.touch(queue)
+            yield batch
+    finally:
+        wheel.unregister(queue)
+
+
+def coalesce_chunk_events(batch: List[Any]) -> List[Any]:
+    """Склеивает подряд идущие чанки одного типа в одно событие.
+
+    Склеиваются только события COALESCIBLE_EVENT_TYPES со строковыми
+    данными; у склеенного события ID, номер и время последнего чанка.
+    Порядок остальных элементов (HEARTBEAT, thinking, stage) сохраняется.
+
+    Args:
+        batch: Пачка из iter_event_batches
+
+    Returns:
+        Пачка, в которой каждая серия чанков заменена одним событием
+    """
+    result: List[Any] = []
+    parts: List[str] = []
+    for item in batch:
+        if (
+            parts
+            and isinstance(item, Event)
+            and item.event_type == result[-1].event_type
+            and isinstance(item.data, str)
+        ):
+            parts.append(item.data)
+            result[-1] = item
+            continue
+        if len(parts) > 1:
+            result[-1] = _merge_chunks(result[-1], parts)
+        parts = []
+        result.append(item)
+        if isinstance(item, Event) and item.event_type in COALESCIBLE_EVENT_TYPES and isinstance(item.data, str):
+            parts = [item.data]
+    if len(parts) > 1:
+        result[-1] = _merge_chunks(result[-1], parts)
+    return result
+
+
+def _merge_chunks(last: Event, parts: List[str]) -> Event:
+    return Event(
+        event_id=last.event_id,
+        event_type=last.event_type,
+        data="".join(parts),
+        timestamp=last.timestamp,
+        session_id=last.session_id,
+        seq=last.seq
+    )
+
+
+_wheel: Optional[HeartbeatWheel] = None
+_wheel_lock = threading.Lock()
+
+
+def get_heartbeat_wheel() -> HeartbeatWheel:
+    """Возвращает общее колесо heartbeat процесса ([event_store] heartbeat_interval)."""
+    global _wheel
+    if _wheel is None:
+        with _wheel_lock:
+            if _wheel is None:
+                _wheel = HeartbeatWheel(interval=get_config().event_store_heartbeat_interval)
+    return _wheel
+
+
+def reset_heartbeat_wheel() -> None:
+    """Останавливает и сбрасывает общее колесо (для тестов)."""
+    global _wheel
+    with _wheel_lock:
+        if _wheel is not None:
+            _wheel.stop()
+        _wheel = None
@@ -2,26 +2,47 @@
 
 Позволяет хранить SSE события вне AgentState для предотвращения
 раздувания состояния при длительных задачах.
+
+События хранит бэкенд ([event_store] backend, infrastructure/event_backend.py):
+- memory — кольцевые буферы в памяти процесса ([event_store]
+  max_events_per_session), поиск по ID — бинарный поиск по номеру,
+  устаревшие события снимаются с головы буфера
+- sqlite — общий файл SQLite (WAL) для нескольких воркеров uvicorn:
+  переподключившийся к другому воркеру клиент продолжает стрим после
+  Last-Event-ID (tail_events, GET /api/stream/{task_id}/events). Запись и
+  чтение идут в отдельном потоке: ожидание блокировки записи другим
+  воркером не останавливает event loop
+
+По окончании стрима сессия освобождается (release_session): очередь
+реального времени удаляется, а события остаются до TTL — для продолжения
+стрима.
+
+ID события — монотонный номер (строкой). Экземпляры сессий и очереди
+реального времени — в памяти процесса; сессии (в том числе освобождённые)
+упорядочены по последнему использованию (OrderedDict), вытеснение при
+лимите — O(1). Вытеснение освобождает только память процесса: буфер
+memory бэкенда удаляется, строки sqlite остаются до TTL.
 """
 import asyncio
-import uuid
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, field
+import functools
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, TypeVar
 from datetime import datetime, timedelta
 
+from infrastructure.event_backend import Event, EventBackend, create_event_backend, parse_event_seq
+from utils.config import get_config
 from utils.logger import get_logger
 
 logger = get_logger()
 
+__all__ = ["Event", "EventStore", "STREAM_END", "get_event_store"]
 
-@dataclass
-class Event:
-    """Событие для хранения."""
-    event_id: str
-    event_type: str
-    data: Any
-    timestamp: datetime
-    session_id: str
+# Последнее событие сессии: стрим завершён, продолжение стрима закрывается
+STREAM_END = "stream_end"
+
+T = TypeVar("T")
 
 
 class EventStore:
@@ -31,7 +52,9 @@ class EventStore:
     События привязаны к session_id для изоляции между запросами.
     
     Особенности:
-    - Хранение событий в памяти (можно расширить до Redis/DB)
+    - Хранение событий в памяти процесса или в SQLite, общем для воркеров
+    - Кольцевой буфер событий на сессию
+    - Монотонные ID событий (продолжение стрима после Last-Event-ID)
     - Автоматическая очистка старых событий
     - Изоляция по session_id
     - Настраиваемый TTL для событий
@@ -39,21 +62,34 @@ class EventStore:
     - Периодическая автоматическая очистка
     """
     
-    _instances: Dict[str, 'EventStore'] = {}
+    # Экземпляры в порядке последнего использования (первый — кандидат на вытеснение)
+    _instances: "OrderedDict[str, EventStore]" = OrderedDict()
     _lock = asyncio.Lock()
     
-    # Глобальное хранилище событий (session_id -> events)
+    # Буферы memory бэкенда (session_id -> кольцевой буфер событий)
     # Используем обычный dict вместо defaultdict для лучшей изоляции в тестах
-    _events: Dict[str, List[Event]] = {}
+    _events: Dict[str, Deque[Event]] = {}
+    
+    # Бэкенд событий (создаётся при первом обращении, см. _get_backend)
+    _backend: Optional[EventBackend] = None
+    
+    # Поток операций блокирующего бэкенда: один поток сохраняет порядок событий
+    _executor: Optional[ThreadPoolExecutor] = None
     
     # Очереди событий для реального времени (session_id -> asyncio.Queue)
     _event_queues: Dict[str, asyncio.Queue] = {}
     
-    # TTL для событий (по умолчанию 1 час)
-    _event_ttl = timedelta(hours=1)
+    # Дополнительные подписчики сессии (session_id -> очереди), см. subscribe
+    _subscribers: Dict[str, List[asyncio.Queue]] = {}
+    
+    # TTL для событий
+    _event_ttl = timedelta(minutes=get_config().event_store_event_ttl_minutes)
     
     # Максимальное количество сессий (для предотвращения утечек памяти)
-    _max_sessions = 1000
+    _max_sessions = get_config().event_store_max_sessions
+    
+    # Ёмкость кольцевого буфера событий сессии
+    _max_events_per_session = get_config().event_store_max_events_per_session
     
     # Флаг для периодической очистки
     _cleanup_task: Optional[asyncio.Task] = None
@@ -77,67 +113,72 @@ class EventStore:
         Returns:
             Экземпляр EventStore для сессии
         """
-        if session_id not in cls._instances:
-            oldest_session = None
-            async with cls._lock:
-                if session_id not in cls._instances:
-                    # Проверяем лимит сессий
-                    if len(cls._instances) >= cls._max_sessions:
-                        # Находим самую старую сессию (LRU) внутри блокировки
-                        oldest_timestamp = datetime.now()
-                        
-                        for sid, events in cls._events.items():
-                            if events:
-                                last_event_time = max(e.timestamp for e in events)
-                                if last_event_time < oldest_timestamp:
-                                    oldest_timestamp = last_event_time
-                                    oldest_session = sid
-                        
-                        # Если нет событий, удаляем первую сессию из _instances
-                        if not oldest_session and cls._instances:
-                            oldest_session = next(iter(cls._instances.keys()))
-                    
-                    cls._instances[session_id] = cls(session_id)
+        store = cls._instances.get(session_id)
+        if store is not None:
+            cls._touch(session_id)
+            return store
+        
+        oldest_sessions: List[str] = []
+        async with cls._lock:
+            if session_id not in cls._instances:
+                # Лимит сессий: вытесняем давно не использованные (голова OrderedDict)
+                excess = len(cls._instances) + 1 - cls._max_sessions
+                oldest_sessions = list(itertools.islice(cls._instances, max(excess, 0)))
+                
+                cls._instances[session_id] = cls(session_id)
                     
-                    # ИСПРАВЛЕНИЕ: Запускаем периодическую очистку если ещё не запущена
-                    # Но только если не в тестовом режиме (чтобы не мешать тестам)
-                    from utils.test_mode import is_test_mode
-                    if not is_test_mode() and (cls._cleanup_task is None or cls._cleanup_task.done()):
-                        cls._cleanup_task = asyncio.create_task(cls._periodic_cleanup())
-            
-            # Вызываем cleanup_session ВНЕ блокировки чтобы избежать deadlock
-            if oldest_session:
-                logger.debug(f"🗑️ Удаляю самую старую сессию {oldest_session[:8]}... (лимит сессий достигнут)")
-                await cls.cleanup_session(oldest_session)
+                # Запускаем периодическую очистку если ещё не запущена
+                # Но только если не в тестовом режиме (чтобы не мешать тестам)
+                from utils.test_mode import is_test_mode
+                if not is_test_mode() and (cls._cleanup_task is None or cls._cleanup_task.done()):
+                    cls._cleanup_task = asyncio.create_task(cls._periodic_cleanup())
+        
+        # Вытесняем ВНЕ блокировки чтобы избежать deadlock
+        for oldest_session in oldest_sessions:
+            logger.debug(f"🗑️ Вытесняю самую старую сессию {oldest_session[:8]}... (лимит сессий достигнут)")
+            await cls._evict_session(oldest_session)
         
         return cls._instances[session_id]
     
     @classmethod
-    async def _remove_oldest_session(cls) -> None:
-        """Удаляет самую старую сессию (LRU)."""
-        if not cls._instances:
-            return
-        
-        # Находим сессию с самым старым последним событием
-        oldest_session = None
-        oldest_timestamp = datetime.now()
-        
-        for session_id, events in cls._events.items():
-            if events:
-                last_event_time = max(e.timestamp for e in events)
-                if last_event_time < oldest_timestamp:
-                    oldest_timestamp = last_event_time
-                    oldest_session = session_id
-        
-        # Если нет событий, удаляем первую сессию из _instances
-        if not oldest_session and cls._instances:
-            oldest_session = next(iter(cls._instances.keys()))
-        
-        if oldest_session:
-            logger.debug(f"🗑️ Удаляю самую старую сессию {oldest_session[:8]}... (лимит сессий достигнут)")
-            # Используем cleanup_session, но вне блокировки чтобы избежать deadlock
-            # (cleanup_session сам использует _lock)
-            await cls.cleanup_session(oldest_session)
+    def _get_backend(cls) -> EventBackend:
+        """Бэкенд событий из конфига (memory работает со словарём _events)."""
+        if cls._backend is None:
+            config = get_config()
+            cls._backend = create_event_backend(
+                config.event_store_backend,
+                config.event_store_sqlite_path,
+                cls._max_events_per_session,
+                events=cls._events
+            )
+        return cls._backend
+    
+    @classmethod
+    async def _run(cls, func: Callable[..., T], *args: Any) -> T:
+        """Вызывает операцию бэкенда: блокирующего — в потоке событий, иначе сразу."""
+        if not cls._get_backend().blocking:
+            return func(*args)
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-store")
+        return await asyncio.get_running_loop().run_in_executor(cls._executor, functools.partial(func, *args))
+    
+    @classmethod
+    def set_backend(cls, backend: Optional[EventBackend]) -> None:
+        """Заменяет бэкенд событий (None — снова из конфига при следующем обращении).
+        
+        Прежний бэкенд закрывается.
+        """
+        if cls._backend is not None and cls._backend is not backend:
+            cls._backend.close()
+        cls._backend = backend
+    
+    @classmethod
+    def _touch(cls, session_id: str) -> None:
+        """Отмечает сессию как использованную (конец очереди LRU)."""
+        try:
+            cls._instances.move_to_end(session_id)
+        except KeyError:
+            pass
     
     @classmethod
     async def _periodic_cleanup(cls) -> None:
@@ -155,7 +196,7 @@ class EventStore:
                 # Продолжаем работу даже при ошибке
                 await asyncio.sleep(60)  # Ждём минуту перед следующей попыткой
     
-    async def save_event(self, event_type: str, data: Any) -> str:
+    async def save_event(self, event_type: str, data: Any, realtime: bool = True) -> str:
         """Сохраняет событие и возвращает его ID.
         
         Также отправляет событие в очередь для реального времени, если очередь существует.
@@ -163,43 +204,26 @@ class EventStore:
         Args:
             event_type: Тип события (thinking, plan_chunk, etc.)
             data: Данные события
+            realtime: False — вызывающий сам отправил событие в стрим, в
+                очередь реального времени сессии оно не ставится (подписчики
+                продолжения стрима получают его как обычно)
             
         Returns:
             ID сохранённого события
         """
-        event_id = str(uuid.uuid4())
-        event = Event(
-            event_id=event_id,
-            event_type=event_type,
-            data=data,
-            timestamp=datetime.now(),
-            session_id=self.session_id
-        )
-        
-        # Создаем список если его еще нет
-        if self.session_id not in EventStore._events:
-            EventStore._events[self.session_id] = []
-        EventStore._events[self.session_id].append(event)
+        backend = EventStore._get_backend()
+        event = await EventStore._run(backend.append, self.session_id, event_type, data, datetime.now())
+        event_id = event.event_id
+        EventStore._touch(self.session_id)
         
-        # Отправляем событие в очередь для реального времени
-        # ИСПРАВЛЕНИЕ: Проверяем наличие очереди и отправляем событие
-        if self.session_id in EventStore._event_queues:
-            try:
-                queue = EventStore._event_queues[self.session_id]
-                # Используем await для асинхронной отправки
-                await queue.put(event)
-            except Exception as e:
-                logger.warning(f"⚠️ Не удалось отправить событие в очередь: {e}")
+        # Отправляем событие подписчикам реального времени
+        EventStore._publish(self.session_id, event, realtime)
         
-        # ИСПРАВЛЕНИЕ: Очищаем старые события для этой сессии, но НЕ сразу после сохранения
-        # чтобы только что сохраненное событие не было удалено. Очистка происходит периодически.
-        # await self._cleanup_old_events()  # Убрано - очистка происходит периодически
+        # Старые события очищаются периодически (cleanup_all_old_events)
         
-        # ОПТИМИЗАЦИЯ: Логируем только периодически (каждые 10 событий) или при ошибках
-        # Это значительно уменьшает объем логов
-        event_count = len(EventStore._events.get(self.session_id, []))
-        if event_count % 10 == 0 or event_type == "error":
-            logger.debug(f"💾 Событие #{event_count} сохранено: {event_type} (ID: {event_id[:8]}...)")
+        # Логируем только периодически (каждые 10 событий) или при ошибках
+        if event.seq % 10 == 0 or event_type == "error":
+            logger.debug(f"💾 Событие #{event.seq} сохранено: {event_type} (сессия {self.session_id[:8]}...)")
         
         return event_id
     
@@ -217,6 +241,41 @@ class EventStore:
             cls._event_queues[session_id] = asyncio.Queue()
         return cls._event_queues[session_id]
     
+    @classmethod
+    def subscribe(cls, session_id: str) -> asyncio.Queue:
+        """Создаёт дополнительную очередь подписчика событий сессии.
+        
+        Каждое новое событие получают очередь get_event_queue и все
+        подписчики (например, несколько вкладок одной задачи).
+        
+        Args:
+            session_id: ID сессии
+            
+        Returns:
+            Очередь подписчика (удаляется через unsubscribe)
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        cls._subscribers.setdefault(session_id, []).append(queue)
+        return queue
+    
+    @classmethod
+    def unsubscribe(cls, session_id: str, queue: asyncio.Queue) -> None:
+        """Удаляет очередь подписчика, созданную subscribe."""
+        queues = cls._subscribers.get(session_id)
+        if queues and queue in queues:
+            queues.remove(queue)
+            if not queues:
+                del cls._subscribers[session_id]
+    
+    @classmethod
+    def _publish(cls, session_id: str, event: Event, realtime: bool = True) -> None:
+        """Ставит событие в очереди всех подписчиков сессии (без ожидания)."""
+        queue = cls._event_queues.get(session_id) if realtime else None
+        if queue is not None:
+            queue.put_nowait(event)
+        for subscriber in cls._subscribers.get(session_id, ()):
+            subscriber.put_nowait(event)
+    
     @classmethod
     def remove_event_queue(cls, session_id: str) -> None:
         """Удаляет очередь событий для сессии.
@@ -239,26 +298,71 @@ class EventStore:
         """
         async with cls._lock:
             # Очищаем события
-            if session_id in cls._events:
-                del cls._events[session_id]
-            
-            # Удаляем очередь
-            if session_id in cls._event_queues:
-                # Очищаем очередь от оставшихся событий
-                queue = cls._event_queues[session_id]
-                while not queue.empty():
-                    try:
-                        queue.get_nowait()
-                    except asyncio.QueueEmpty:
-                        break
-                del cls._event_queues[session_id]
-            
-            # Удаляем экземпляр
-            if session_id in cls._instances:
-                del cls._instances[session_id]
-            
+            backend = cls._get_backend()
+            await cls._run(backend.delete_session, session_id)
+            cls._release_locked(session_id)
             logger.debug(f"🧹 Сессия {session_id[:8]}... полностью очищена")
     
+    @classmethod
+    async def release_session(cls, session_id: str) -> None:
+        """Освобождает сессию процесса после окончания стрима.
+        
+        Очередь реального времени удаляется сразу, события остаются
+        в бэкенде до TTL (cleanup_all_old_events): переподключившийся
+        клиент продолжает стрим по Last-Event-ID, в том числе через
+        другой воркер с sqlite бэкендом. Экземпляр остаётся в LRU и
+        считается в лимите сессий: буфер освобождённой сессии вытесняется
+        вместе с ним. Подписчики (продолжения стрима) отписываются сами.
+        
+        Args:
+            session_id: ID сессии
+        """
+        async with cls._lock:
+            cls._drop_queue_locked(session_id)
+    
+    @classmethod
+    def is_streaming(cls, session_id: str) -> bool:
+        """True, если стрим сессии ещё идёт в этом процессе (есть очередь реального времени)."""
+        return session_id in cls._event_queues
+    
+    @classmethod
+    async def _evict_session(cls, session_id: str) -> None:
+        """Вытесняет сессию из процесса при лимите сессий.
+        
+        В отличие от cleanup_session, события в общем хранилище (sqlite)
+        не удаляются: их может дочитывать другой воркер, строки удалит
+        очистка по TTL. Буфер memory бэкенда удаляется.
+        
+        Args:
+            session_id: ID сессии
+        """
+        async with cls._lock:
+            await cls._run(cls._get_backend().evict_session, session_id)
+            cls._release_locked(session_id)
+    
+    @classmethod
+    def _release_locked(cls, session_id: str) -> None:
+        """Удаляет очередь, подписчиков и экземпляр сессии (под _lock)."""
+        cls._drop_queue_locked(session_id)
+        cls._subscribers.pop(session_id, None)
+        
+        # Удаляем экземпляр
+        if session_id in cls._instances:
+            del cls._instances[session_id]
+    
+    @classmethod
+    def _drop_queue_locked(cls, session_id: str) -> None:
+        """Удаляет очередь реального времени сессии (под _lock)."""
+        if session_id in cls._event_queues:
+            # Очищаем очередь от оставшихся событий
+            queue = cls._event_queues[session_id]
+            while not queue.empty():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+            del cls._event_queues[session_id]
+    
     async def get_event(self, event_id: str) -> Optional[Event]:
         """Получает событие по ID.
         
@@ -268,11 +372,7 @@ class EventStore:
         Returns:
             Событие или None если не найдено
         """
-        events = EventStore._events.get(self.session_id, [])
-        for event in events:
-            if event.event_id == event_id:
-                return event
-        return None
+        return await EventStore._run(EventStore._get_backend().get_event, self.session_id, event_id)
     
     async def get_events(self, event_ids: List[str]) -> List[Event]:
         """Получает несколько событий по ID.
@@ -283,9 +383,73 @@ class EventStore:
         Returns:
             Список событий (в порядке запроса)
         """
-        events = EventStore._events.get(self.session_id, [])
-        event_map = {e.event_id: e for e in events}
-        return [event_map[eid] for eid in event_ids if eid in event_map]
+        return await EventStore._run(EventStore._get_backend().get_events, self.session_id, event_ids)
+    
+    async def get_events_after(self, last_event_id: Optional[str]) -> List[Event]:
+        """Возвращает события, сохранённые после last_event_id.
+        
+        Для продолжения SSE стрима по заголовку Last-Event-ID (с sqlite
+        бэкендом — и событий, сохранённых другим воркером). Если событие
+        уже вытеснено из буфера, возвращаются все оставшиеся события с
+        большими номерами.
+        
+        Args:
+            last_event_id: ID последнего полученного события (None — все события)
+            
+        Returns:
+            События в порядке сохранения
+        """
+        return await EventStore._run(
+            EventStore._get_backend().get_events_after, self.session_id, parse_event_seq(last_event_id)
+        )
+    
+    async def tail_events(
+        self,
+        last_event_id: Optional[str],
+        poll_interval: float = 0.5,
+        idle_timeout: Optional[float] = None
+    ) -> AsyncIterator[Optional[Event]]:
+        """Продолжает стрим сессии после last_event_id до события STREAM_END.
+        
+        События, сохранённые в этом процессе, будят ожидание сразу (через
+        подписку), сохранённые другим воркером (sqlite бэкенд) читаются
+        опросом раз в poll_interval.
+        
+        Args:
+            last_event_id: ID последнего полученного клиентом события (None — с начала)
+            poll_interval: Интервал опроса бэкенда (секунды)
+            idle_timeout: Закончить без новых событий за это время (None — TTL событий)
+            
+        Yields:
+            События в порядке сохранения; None — за poll_interval новых событий
+            не было (повод отправить heartbeat)
+        """
+        if idle_timeout is None:
+            idle_timeout = EventStore._event_ttl.total_seconds()
+        loop = asyncio.get_running_loop()
+        queue = EventStore.subscribe(self.session_id)
+        try:
+            idle_since = loop.time()
+            while True:
+                events = await self.get_events_after(last_event_id)
+                for event in events:
+                    yield event
+                    if event.event_type == STREAM_END:
+                        return
+                if events:
+                    last_event_id = events[-1].event_id
+                    idle_since = loop.time()
+                elif loop.time() - idle_since >= idle_timeout:
+                    return
+                try:
+                    await asyncio.wait_for(queue.get(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    yield None
+                # Новые события прочитает следующий запрос к бэкенду
+                while not queue.empty():
+                    queue.get_nowait()
+        finally:
+            EventStore.unsubscribe(self.session_id, queue)
     
     async def get_all_events(self) -> List[Event]:
         """Возвращает все события для сессии.
@@ -293,35 +457,18 @@ class EventStore:
         Returns:
             Список всех событий сессии
         """
-        return EventStore._events.get(self.session_id, []).copy()
+        return await EventStore._run(EventStore._get_backend().get_events_after, self.session_id, None)
     
     async def clear_events(self) -> None:
         """Очищает все события для сессии."""
-        if self.session_id in EventStore._events:
-            del EventStore._events[self.session_id]
-            logger.debug(f"🗑️ События очищены для сессии {self.session_id[:8]}...")
+        await EventStore._run(EventStore._get_backend().delete_session, self.session_id)
+        logger.debug(f"🗑️ События очищены для сессии {self.session_id[:8]}...")
     
     async def _cleanup_old_events(self) -> None:
         """Очищает старые события (старше TTL)."""
-        now = datetime.now()
-        events = EventStore._events.get(self.session_id, [])
-        
-        # Фильтруем события, оставляя только свежие
-        fresh_events = [
-            e for e in events
-            if now - e.timestamp < EventStore._event_ttl
-        ]
-        
-        if len(fresh_events) != len(events):
-            if fresh_events:
-                EventStore._events[self.session_id] = fresh_events
-            elif self.session_id in EventStore._events:
-                # Удаляем ключ если список пустой
-                del EventStore._events[self.session_id]
-            logger.debug(
-                f"🧹 Очищено {len(events) - len(fresh_events)} старых событий "
-                f"для сессии {self.session_id[:8]}..."
-            )
+        await EventStore._run(
+            EventStore._get_backend().delete_expired, datetime.now() - EventStore._event_ttl, self.session_id
+        )
     
     @classmethod
     async def cleanup_all_old_events(cls) -> None:
@@ -330,28 +477,13 @@ class EventStore:
         Также очищает пустые очереди событий для предотвращения утечек памяти.
         """
         async with cls._lock:
-            now = datetime.now()
-            sessions_to_remove = []
-            
-            # Очищаем старые события
-            # Создаем копию списка ключей для безопасной итерации
-            session_ids = list(EventStore._events.keys())
-            for session_id in session_ids:
-                events = EventStore._events.get(session_id, [])
-                fresh_events = [
-                    e for e in events
-                    if now - e.timestamp < EventStore._event_ttl
-                ]
-                
-                if not fresh_events:
-                    sessions_to_remove.append(session_id)
-                else:
-                    EventStore._events[session_id] = fresh_events
+            # Очищаем старые события; сессии без событий удаляются
+            sessions_to_remove = await cls._run(
+                cls._get_backend().delete_expired, datetime.now() - EventStore._event_ttl
+            )
             
             # Удаляем пустые сессии
             for session_id in sessions_to_remove:
-                if session_id in EventStore._events:
-                    del EventStore._events[session_id]
                 if session_id in EventStore._instances:
                     del EventStore._instances[session_id]
                 # Также удаляем очередь если она пустая
@@ -364,7 +496,7 @@ class EventStore:
             # Очищаем пустые очереди (даже если сессия ещё существует)
             queues_to_remove = []
             for session_id, queue in list(EventStore._event_queues.items()):
-                if queue.empty() and session_id not in EventStore._events:
+                if queue.empty() and session_id not in EventStore._events and session_id not in EventStore._instances:
                     queues_to_remove.append(session_id)
             
             for session_id in queues_to_remove:
@@ -19,6 +19,7 @@ import hashlib
 import json
 
 from infrastructure.local_llm import LocalLLM, create_llm_for_stage, LLMTimeoutError
+from infrastructure.ollama_health import get_ollama_health_monitor
 from utils.model_checker import (
     get_light_model,
     get_all_reasoning_models,
@@ -224,6 +225,21 @@ class FastAdvisor:
                     await callback(response)
                 return response
         
+        # Ollama недоступен — сразу отвечаем, не занимая поток до таймаута
+        if not get_ollama_health_monitor().is_available():
+            logger.debug("⚠️ FastAdvisor: Ollama недоступен, консультация пропущена")
+            unavailable = AdvisorResponse(
+                advice="Консультация недоступна: Ollama не отвечает.",
+                confidence=0.0,
+                priority=request.priority,
+                model_used=self.model,
+                response_time_ms=0,
+                metadata={"ollama_unavailable": True}
+            )
+            if callback:
+                await callback(unavailable)
+            return unavailable
+        
         # Формируем промпт
         prompt = self._build_prompt(request)
         
@@ -0,0 +1,270 @@
+"""Кэш ответов LLM для LocalLLM.generate/chat.
+
+Одинаковые промпты (классификация повторных запросов, планирование при
+повторном запуске задачи, ревью в раундах дебатов) не отправляются в Ollama
+повторно. Ключ — (модель, промпт или сообщения, options, format).
+
+Два уровня:
+- память — SimpleCache (LRU + TTL), ответ отдаётся без обращения к диску
+- диск — SQLite, переживает перезапуск; попадание поднимается в память
+
+Кэш применяется только при низкой температуре или если вызывающий код явно
+запросил его (cache=True — IntentAgent, PlannerAgent, рецензенты дебатов).
+TTL задаётся для каждого этапа в [llm_cache.ttl].
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from infrastructure.cache import SimpleCache, make_cache_key
+from utils.config import get_config
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Как часто (в записях) чистить диск от истёкших и лишних ответов
+_DISK_PRUNE_EVERY = 100
+
+
+class LLMResponseCache:
+    """Двухуровневый кэш ответов LLM (память + SQLite)."""
+
+    def __init__(
+        self,
+        memory_entries: int = 500,
+        disk_path: Optional[Path] = None,
+        disk_max_entries: int = 20_000
+    ) -> None:
+        """Инициализация кэша.
+
+        Args:
+            memory_entries: Ёмкость уровня в памяти
+            disk_path: Путь к файлу SQLite (None — только память)
+            disk_max_entries: Максимум ответов на диске (вытесняются давно не использованные)
+        """
+        self.memory = SimpleCache(max_size=memory_entries)
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._sets_until_prune = _DISK_PRUNE_EVERY
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_path is not None:
+            try:
+                disk_path.parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(str(disk_path), check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Дисковый кэш ответов LLM недоступен ({disk_path}): {e}")
+                self._conn = None
+
+    @staticmethod
+    def make_key(kind: str, model: str, payload: Any, options: Dict[str, Any], format: Optional[str], extra: Dict[str, Any]) -> str:
+        """Ключ кэша для запроса.
+
+        Args:
+            kind: "generate" или "chat"
+            model: Модель Ollama
+            payload: Промпт или список сообщений
+            options: Итоговые options запроса
+            format: Формат ответа
+            extra: Остальные параметры запроса
+
+        Returns:
+            Ключ кэша
+
+        Raises:
+            TypeError: Если параметр не годится для ключа (см. make_cache_key)
+        """
+        return make_cache_key(kind, model, payload, options, format, extra)
+
+    def get(self, key: str) -> Optional[str]:
+        """Возвращает закэшированный ответ или None."""
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self.memory_hits += 1
+            return value
+
+        with self._lock:
+            if self._conn is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            try:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or row[1] <= now:
+                    if row is not None:
+                        self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                        self._conn.commit()
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.debug(f"⚠️ Ошибка чтения кэша ответов LLM: {e}")
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            value, expires_at = row
+
+        # Поднимаем в память на оставшееся время жизни
+        self.memory.set(key, value, ttl=max(1, int(expires_at - now)))
+        return value
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        """Сохраняет ответ на оба уровня.
+
+        Args:
+            key: Ключ кэша
+            value: Ответ модели
+            ttl: Время жизни (секунды)
+        """
+        self.memory.set(key, value, ttl=ttl)
+
+        with self._lock:
+            if self._conn is None:
+                return
+            now = time.time()
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, value, now + ttl, now)
+                )
+                self._sets_until_prune -= 1
+                if self._sets_until_prune <= 0:
+                    self._sets_until_prune = _DISK_PRUNE_EVERY
+                    self._prune_locked(now)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                # Кэш — только ускорение, ошибка записи не должна ломать генерацию
+                logger.debug(f"⚠️ Ошибка записи кэша ответов LLM: {e}")
+
+    def delete(self, key: str) -> None:
+        """Удаляет ответ с обоих уровней (например, не прошедший валидацию).
+
+        Args:
+            key: Ключ кэша
+        """
+        self.memory.delete(key)
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.debug(f"⚠️ Ошибка удаления из кэша ответов LLM: {e}")
+
+    def _prune_locked(self, now: float) -> None:
+        """Удаляет истёкшие ответы и лишние сверх disk_max_entries (под блокировкой)."""
+        assert self._conn is not None
+        self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,)
+        )
+
+    def clear(self) -> None:
+        """Очищает оба уровня."""
+        self.memory.clear()
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM responses")
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.debug(f"⚠️ Ошибка очистки кэша ответов LLM: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики кэша: попадания по уровням, промахи, hit rate."""
+        with self._lock:
+            total = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / total if total else 0.0,
+                "memory_entries": len(self.memory),
+            }
+
+    def close(self) -> None:
+        """Закрывает соединение с диском."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# === Singleton ===
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """Возвращает глобальный кэш ответов LLM или None, если он отключён.
+
+    Returns:
+        LLMResponseCache или None
+    """
+    global _llm_cache
+
+    config = get_config()
+    if not config.llm_cache_enabled:
+        return None
+
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                disk_path = config.llm_cache_disk_path
+                _llm_cache = LLMResponseCache(
+                    memory_entries=config.llm_cache_memory_entries,
+                    disk_path=Path(disk_path) if disk_path else None,
+                    disk_max_entries=config.llm_cache_disk_max_entries
+                )
+    return _llm_cache
+
+
+def get_response_cache_ttl(stage: Optional[str], temperature: float, use_cache: Optional[bool]) -> int:
+    """TTL кэширования ответа для вызова LLM.
+
+    Args:
+        stage: Этап workflow (None — default)
+        temperature: Температура запроса
+        use_cache: True — кэшировать всегда, False — никогда,
+            None — только при temperature <= [llm_cache].max_temperature
+
+    Returns:
+        TTL в секундах, 0 — не кэшировать
+    """
+    if use_cache is False:
+        return 0
+
+    config = get_config()
+    if not config.llm_cache_enabled:
+        return 0
+    if use_cache is None and temperature > config.llm_cache_max_temperature:
+        return 0
+
+    ttl = config.get_llm_cache_ttl(stage or "default")
+    if ttl <= 0 and use_cache:
+        # Этап не кэшируется по умолчанию, но вызывающий код явно попросил
+        ttl = config.get_llm_cache_ttl("default")
+    return max(ttl, 0)
@@ -16,8 +16,17 @@ Reasoning Models:
 - Поддержка DeepSeek-R1, QwQ с <think> блоками
 - Автоматический парсинг reasoning через reasoning_utils
 
+Кэш ответов:
+- generate() и chat() отдают повторные ответы из LLMResponseCache
+  (при низкой температуре или cache=True, TTL по этапу workflow)
+
+Доступность Ollama:
+- Перед запросом проверяется кэшированный статус OllamaHealthMonitor (без сети),
+  реальные запросы сообщают монитору об успехе или ошибке соединения
+
 Асинхронный режим использует asyncio.to_thread() для совместимости с существующим кодом,
 а также может использовать httpx через OllamaConnectionPool для лучшей производительности.
+Стриминг (generate_stream) всегда идёт через OllamaConnectionPool без потока на вызов.
 """
 import asyncio
 import json
@@ -30,6 +39,8 @@ import concurrent.futures
 
 from pydantic import BaseModel, ValidationError
 
+from infrastructure.llm_cache import LLMResponseCache, get_llm_response_cache, get_response_cache_ttl
+from infrastructure.ollama_health import get_ollama_health_monitor
 from utils.logger import get_logger
 
 
@@ -119,6 +130,49 @@ class StreamChunk:
 T = TypeVar('T', bound=BaseModel)
 
 
+def _count_new_tags(text: str, prev_len: int, tag: str) -> int:
+    """Считает вхождения тега, которые заканчиваются после позиции prev_len.
+    
+    Позволяет инкрементально отслеживать <think>/</think> при стриминге,
+    не пересчитывая весь накопленный ответ на каждом токене.
+    
+    Args:
+        text: Накопленный текст
+        prev_len: Длина текста до добавления нового чанка
+        tag: Искомый тег (в нижнем регистре)
+        
+    Returns:
+        Количество новых вхождений тега
+    """
+    window_start = max(0, prev_len - len(tag) + 1)
+    return text[window_start:].lower().count(tag)
+
+
+def _is_retryable_stream_error(error: Exception) -> bool:
+    """Проверяет, можно ли повторить стриминг после ошибки.
+    
+    Повторяем при падении runner модели, нехватке ресурсов и 5xx ответах Ollama.
+    
+    Args:
+        error: Исключение стриминга
+        
+    Returns:
+        True если ошибку имеет смысл повторить
+    """
+    import httpx
+    
+    if isinstance(error, httpx.HTTPStatusError) and error.response.status_code >= 500:
+        return True
+    
+    error_msg = str(error)
+    return (
+        "model runner has unexpectedly stopped" in error_msg or
+        "resource limitations" in error_msg.lower() or
+        "internal error" in error_msg.lower() or
+        "status code: 500" in error_msg
+    )
+
+
 class LocalLLM:
     """Класс для работы с локальными моделями через Ollama API.
     
@@ -142,7 +196,8 @@ class LocalLLM:
         temperature: float = 0.25,
         top_p: float = 0.9,
         timeout: int = 120,
-        max_retries: int = 3
+        max_retries: int = 3,
+        stage: Optional[str] = None
     ) -> None:
         """Инициализация LocalLLM.
         
@@ -152,12 +207,14 @@ class LocalLLM:
             top_p: Параметр top_p для генерации
             timeout: Таймаут запроса в секундах (по умолчанию 120с)
             max_retries: Максимальное количество повторных попыток
+            stage: Этап workflow (определяет TTL кэша ответов)
         """
         self.model = model
         self.temperature = temperature
         self.top_p = top_p
         self.timeout = timeout
         self.max_retries = max_retries
+        self.stage = stage
     
     @classmethod
     def _get_executor(cls) -> concurrent.futures.ThreadPoolExecutor:
@@ -203,7 +260,75 @@ class LocalLLM:
         """
         delay = self.BASE_RETRY_DELAY * (2 ** attempt)
         return min(delay, self.MAX_RETRY_DELAY)
+    
+    def _response_cache(self, temperature: float, cache: Optional[bool]) -> tuple[Optional[LLMResponseCache], int]:
+        """Возвращает кэш ответов и TTL для вызова (None, 0 — не кэшировать)."""
+        ttl = get_response_cache_ttl(self.stage, temperature, cache)
+        if ttl <= 0:
+            return None, 0
+        return get_llm_response_cache(), ttl
 
+    def _generate_options(
+        self,
+        prompt: str,
+        temperature: Optional[float],
+        top_p: Optional[float],
+        num_predict: int,
+        kwargs: Dict[str, Any]
+    ) -> tuple[float, Dict[str, Any]]:
+        """Температура и options запроса generate."""
+        temp = temperature if temperature is not None else self.temperature
+        tp = top_p if top_p is not None else self.top_p
+        
+        options: Dict[str, Any] = {
+            "temperature": temp,
+            "top_p": tp,
+            "num_predict": num_predict
+        }
+        
+        # Добавляем дополнительные параметры если есть
+        options.update(kwargs.get("options", {}))
+        
+        # Для коротких задач (intent, planning) уменьшаем num_predict для скорости
+        if num_predict > 1024 and len(prompt) < 500:
+            options["num_predict"] = min(512, num_predict // 2)
+        return temp, options
+    
+    def _generate_cache_key(
+        self,
+        response_cache: LLMResponseCache,
+        prompt: str,
+        options: Dict[str, Any],
+        format: Optional[str],
+        kwargs: Dict[str, Any]
+    ) -> str:
+        """Ключ кэша ответа generate ("" — запрос не кэшируется)."""
+        try:
+            return response_cache.make_key(
+                "generate", self.model, prompt, options, format,
+                {k: v for k, v in kwargs.items() if k not in ("options", "format")}
+            )
+        except TypeError as e:
+            # Параметр без стабильного ключа — запрос идёт мимо кэша
+            logger.debug(f"⚠️ Запрос LLM не кэшируется: {e}")
+            return ""
+    
+    def _invalidate_generate_cache(
+        self,
+        prompt: str,
+        num_predict: int,
+        format: Optional[str],
+        cache: Optional[bool]
+    ) -> None:
+        """Удаляет из кэша ответ generate с этими параметрами."""
+        temp, options = self._generate_options(prompt, None, None, num_predict, {})
+        response_cache, _ = self._response_cache(temp, cache)
+        if response_cache is None:
+            return
+        cache_key = self._generate_cache_key(response_cache, prompt, options, format, {})
+        if cache_key:
+            response_cache.delete(cache_key)
+    
     def generate(
         self,
         prompt: str,
@@ -211,6 +336,7 @@ class LocalLLM:
         top_p: Optional[float] = None,
         num_predict: int = 4096,
         format: Optional[str] = None,
+        cache: Optional[bool] = None,
         **kwargs: Any
     ) -> str:
         """Генерирует текст на основе промпта.
@@ -221,39 +347,37 @@ class LocalLLM:
             top_p: Параметр top_p (переопределяет значение по умолчанию)
             num_predict: Максимальное количество токенов для генерации
             format: Формат ответа ("json" для принудительного JSON)
+            cache: Кэш ответов: True — использовать всегда, False — никогда,
+                None — только при низкой температуре
             **kwargs: Дополнительные параметры для ollama.generate
             
         Returns:
             Сгенерированный текст. Пустая строка в случае ошибки.
         """
-        temp = temperature if temperature is not None else self.temperature
-        tp = top_p if top_p is not None else self.top_p
-        
-        options: Dict[str, Any] = {
-            "temperature": temp,
-            "top_p": tp,
-            "num_predict": num_predict
-        }
-        
-        # Добавляем дополнительные параметры если есть
-        options.update(kwargs.get("options", {}))
+        temp, options = self._generate_options(prompt, temperature, top_p, num_predict, kwargs)
         
         last_error: Optional[Exception] = None
         
-        # Для коротких задач (intent, planning) уменьшаем num_predict для скорости
-        if num_predict > 1024 and len(prompt) < 500:
-            options["num_predict"] = min(512, num_predict // 2)
+        response_cache, cache_ttl = self._response_cache(temp, cache)
+        cache_key = ""
+        if response_cache is not None:
+            cache_key = self._generate_cache_key(response_cache, prompt, options, format, kwargs)
+            if not cache_key:
+                response_cache = None
+        if response_cache is not None:
+            cached_response = response_cache.get(cache_key)
+            if cached_response is not None:
+                logger.debug(f"💾 Ответ LLM из кэша ({self.stage or 'default'}, {len(cached_response)} символов)")
+                return cached_response
+        
+        # Кэшированный статус Ollama вместо ollama.list() перед каждым запросом
+        health = get_ollama_health_monitor()
+        if not health.is_available():
+            logger.warning("⚠️ Ollama недоступен, проверьте что сервис запущен")
+            return ""
         
         for attempt in range(self.max_retries + 1):
             try:
-                # Проверяем что Ollama доступен (только на первой попытке)
-                if attempt == 0:
-                    try:
-                        ollama.list()
-                    except Exception as e:
-                        logger.warning(f"⚠️ Ollama недоступен, проверьте что сервис запущен: {e}")
-                        return ""
-                
                 start_time = time.time()
                 
                 # Подготавливаем аргументы для ollama.generate
@@ -286,11 +410,14 @@ class LocalLLM:
                     logger.warning(f"⏱️ Таймаут LLM запроса после {elapsed:.1f}с")
                     raise LLMTimeoutError(f"Таймаут {self.timeout}с")
                 
+                health.record_success()
                 elapsed = time.time() - start_time
                 result = response.get("response", "").strip()
                 
                 if result:
                     logger.debug(f"✅ LLM ответ получен за {elapsed:.1f}с ({len(result)} символов)")
+                    if response_cache is not None:
+                        response_cache.set(cache_key, result, cache_ttl)
                     return result
                 else:
                     logger.warning(f"⚠️ Пустой ответ от LLM после {elapsed:.1f}с")
@@ -305,6 +432,9 @@ class LocalLLM:
                     
             except Exception as e:
                 last_error = e
+                health.record_failure(e)
+                if not health.is_available():
+                    break
                 backoff = self._calculate_backoff(attempt)
                 if attempt < self.max_retries:
                     logger.info(f"🔄 Retry {attempt + 1}/{self.max_retries} через {backoff:.1f}с после ошибки: {e}")
@@ -323,6 +453,7 @@ class LocalLLM:
         messages: list[Dict[str, str]],
         temperature: Optional[float] = None,
         top_p: Optional[float] = None,
+        cache: Optional[bool] = None,
         **kwargs: Any
     ) -> str:
         """Генерирует ответ в формате чата.
@@ -331,6 +462,8 @@ class LocalLLM:
             messages: Список сообщений в формате [{"role": "user", "content": "..."}]
             temperature: Температура генерации
             top_p: Параметр top_p
+            cache: Кэш ответов: True — использовать всегда, False — никогда,
+                None — только при низкой температуре
             **kwargs: Дополнительные параметры
             
         Returns:
@@ -345,6 +478,29 @@ class LocalLLM:
         }
         options.update(kwargs.get("options", {}))
         
+        response_cache, cache_ttl = self._response_cache(temp, cache)
+        cache_key = ""
+        if response_cache is not None:
+            try:
+                cache_key = response_cache.make_key(
+                    "chat", self.model, messages, options, kwargs.get("format"),
+                    {k: v for k, v in kwargs.items() if k not in ("options", "format")}
+                )
+            except TypeError as e:
+                # Параметр без стабильного ключа — запрос идёт мимо кэша
+                logger.debug(f"⚠️ Запрос LLM не кэшируется: {e}")
+                response_cache = None
+        if response_cache is not None:
+            cached_response = response_cache.get(cache_key)
+            if cached_response is not None:
+                logger.debug(f"💾 Ответ LLM chat из кэша ({self.stage or 'default'}, {len(cached_response)} символов)")
+                return cached_response
+        
+        health = get_ollama_health_monitor()
+        if not health.is_available():
+            logger.warning("⚠️ Ollama недоступен, проверьте что сервис запущен")
+            return ""
+        
         last_error: Optional[Exception] = None
         
         for attempt in range(self.max_retries + 1):
@@ -368,8 +524,11 @@ class LocalLLM:
                     logger.warning(f"⏱️ Таймаут chat запроса после {elapsed:.1f}с")
                     raise LLMTimeoutError(f"Таймаут {self.timeout}с")
                 
+                health.record_success()
                 result = response.get("message", {}).get("content", "").strip()
                 if result:
+                    if response_cache is not None:
+                        response_cache.set(cache_key, result, cache_ttl)
                     return result
                     
             except (LLMTimeoutError, concurrent.futures.TimeoutError):
@@ -382,6 +541,9 @@ class LocalLLM:
                     
             except Exception as e:
                 last_error = e
+                health.record_failure(e)
+                if not health.is_available():
+                    break
                 backoff = self._calculate_backoff(attempt)
                 if attempt < self.max_retries:
                     logger.info(f"🔄 Chat retry {attempt + 1}/{self.max_retries} через {backoff:.1f}с после ошибки: {e}")
@@ -402,7 +564,8 @@ class LocalLLM:
         prompt: str,
         response_model: Type[T],
         num_predict: int = 1024,
-        retries: int = 2
+        retries: int = 2,
+        cache: Optional[bool] = None
     ) -> T:
         """Генерирует структурированный ответ с Pydantic валидацией.
         
@@ -414,6 +577,8 @@ class LocalLLM:
             response_model: Pydantic модель для валидации ответа
             num_predict: Максимум токенов
             retries: Количество повторов при ошибке валидации
+            cache: Кэш ответов для первой попытки (как в generate); повторы
+                после ошибки валидации идут мимо кэша
             
         Returns:
             Провалидированный Pydantic объект
@@ -449,7 +614,8 @@ JSON:"""
                 response = self.generate(
                     prompt=enhanced_prompt,
                     num_predict=num_predict,
-                    format="json"  # Ollama принудительно возвращает JSON
+                    format="json",  # Ollama принудительно возвращает JSON
+                    cache=cache if attempt == 0 else False
                 )
                 
                 if not response:
@@ -485,6 +651,11 @@ JSON:"""
                 logger.error(f"❌ Structured output error: {e}")
                 if attempt >= retries:
                     break
+            
+            if attempt == 0:
+                # Первая попытка могла прийти из кэша: негодный ответ удаляем,
+                # иначе следующий вызов снова получит его же
+                self._invalidate_generate_cache(enhanced_prompt, num_predict, "json", cache)
         
         raise StructuredOutputError(
             f"Не удалось получить валидный {response_model.__name__} "
@@ -628,6 +799,10 @@ JSON:"""
         Использует Ollama streaming API для real-time отдачи чанков.
         Позволяет показывать <think> блоки и код по мере генерации.
         
+        Стрим читается напрямую из event loop через OllamaConnectionPool
+        (httpx async + keep-alive соединения), без отдельного потока и очереди
+        на каждый вызов.
+        
         Args:
             prompt: Текст промпта
             temperature: Температура генерации
@@ -646,6 +821,9 @@ JSON:"""
                 else:
                     yield code_event(chunk.content)
         """
+        from infrastructure.connection_pool import get_ollama_pool
+        from utils.model_checker import _is_reasoning_model
+        
         temp = temperature if temperature is not None else self.temperature
         tp = top_p if top_p is not None else self.top_p
         
@@ -656,206 +834,125 @@ JSON:"""
         }
         options.update(kwargs.get("options", {}))
         
-        generate_kwargs = {
-            "model": self.model,
-            "prompt": prompt,
-            "options": options,
-            "stream": True  # Включаем стриминг
-        }
-        
+        stream_kwargs: Dict[str, Any] = {}
         if format:
-            generate_kwargs["format"] = format
+            stream_kwargs["format"] = format
         
         for k, v in kwargs.items():
-            if k not in ("options", "format"):
-                generate_kwargs[k] = v
+            if k not in ("options", "format", "stream"):
+                stream_kwargs[k] = v
+        
+        # Для reasoning моделей даём больше времени (3x), для обычных - 2x
+        # (они генерируют длинные <think> блоки)
+        timeout_multiplier = 3 if _is_reasoning_model(self.model) else 2
+        max_stream_time = self.timeout * timeout_multiplier
         
         full_response = ""
-        in_thinking = False
+        think_opens = 0
+        think_closes = 0
+        
+        health = get_ollama_health_monitor()
+        if not health.is_available():
+            logger.warning("⚠️ Ollama недоступен, проверьте что сервис запущен")
+            yield StreamChunk(content="", is_thinking=False, is_done=True, full_response="")
+            return
         
         # Retry логика для стриминга
-        last_error: Optional[Exception] = None
         max_retries = min(self.max_retries, 2)  # Для стриминга меньше retry (2 вместо 3)
         
         for attempt in range(max_retries + 1):
+            stream_start_time = time.time()
             try:
-                # Ollama streaming API
-                # Запускаем в отдельном потоке чтобы не блокировать event loop
-                import queue
-                import threading
-                
-                chunk_queue: queue.Queue = queue.Queue()
-                error_holder: list = []
-                
-                def stream_worker():
-                    try:
-                        for chunk in ollama.generate(**generate_kwargs):
-                            chunk_queue.put(chunk)
-                        chunk_queue.put(None)  # Сигнал завершения
-                    except Exception as e:
-                        logger.debug(f"⚠️ Ошибка в stream_worker для модели {self.model}: {e}")
-                        error_holder.append(e)
-                        chunk_queue.put(None)
-                
-                thread = threading.Thread(target=stream_worker, daemon=True)
-                thread.start()
-                
-                wait_count = 0
-                last_log_time = asyncio.get_event_loop().time()
-                
-                stream_start_time = time.time()
-                # Для reasoning моделей увеличиваем таймаут (они генерируют <think> блоки)
-                # Используем правильную функцию проверки reasoning моделей
-                from utils.model_checker import _is_reasoning_model
-                is_reasoning = _is_reasoning_model(self.model)
-                # Для reasoning моделей даём больше времени (3x), для обычных - 2x
-                timeout_multiplier = 3 if is_reasoning else 2
-                max_stream_time = self.timeout * timeout_multiplier
-                
-                is_done = False
-                stream_success = False
+                pool = await get_ollama_pool()
                 
-                while True:
-                    # Проверяем общий timeout стриминга
-                    elapsed_stream = time.time() - stream_start_time
-                    if elapsed_stream > max_stream_time:
-                        logger.error(
-                            f"❌ Превышен общий timeout стриминга: {elapsed_stream:.1f}с "
-                            f"(максимум: {max_stream_time}с)"
-                        )
-                        # Добавляем ошибку в список (если список пуст, создаём его)
-                        if not error_holder:
-                            error_holder.append(LLMTimeoutError(
-                                f"Превышен общий timeout стриминга: {elapsed_stream:.1f}с"
-                            ))
-                        else:
-                            error_holder[0] = LLMTimeoutError(
-                                f"Превышен общий timeout стриминга: {elapsed_stream:.1f}с"
-                            )
-                        chunk_queue.put(None)  # Сигнал завершения
-                        break
-                    
-                    try:
-                        # Неблокирующее ожидание с таймаутом
-                        chunk = await asyncio.get_event_loop().run_in_executor(
-                            None,
-                            lambda: chunk_queue.get(timeout=0.5)
-                        )
-                        wait_count = 0  # Reset on successful get
-                    except queue.Empty:
-                        wait_count += 1
-                        # Логируем каждые 10 секунд ожидания
-                        current_time = asyncio.get_event_loop().time()
-                        if current_time - last_log_time > 10:
-                            elapsed_total = time.time() - stream_start_time
-                            logger.info(
-                                f"⏳ Ожидаю ответ от LLM... "
-                                f"(ожидание: {wait_count * 0.5:.0f}с, всего: {elapsed_total:.0f}с)"
-                            )
-                            last_log_time = current_time
-                        continue
-                    
-                    if chunk is None:
-                        # Стриминг завершён
-                        if error_holder and error_holder[0]:
-                            elapsed_total = time.time() - stream_start_time
-                            error = error_holder[0]
-                            error_msg = str(error)
-                            
-                            # Проверяем, можно ли повторить попытку
-                            is_retryable = (
-                                "model runner has unexpectedly stopped" in error_msg or
-                                "resource limitations" in error_msg.lower() or
-                                "internal error" in error_msg.lower() or
-                                "status code: 500" in error_msg
-                            )
+                # Общий дедлайн на весь стрим. Проверяется только на ожидании
+                # следующего чанка — пока потребитель обрабатывает yield,
+                # таймер не должен отменять его задачу
+                deadline = asyncio.get_running_loop().time() + max_stream_time
+                stream = pool.generate_stream(
+                    model=self.model,
+                    prompt=prompt,
+                    options=options,
+                    **stream_kwargs
+                )
+                try:
+                    while True:
+                        try:
+                            async with asyncio.timeout_at(deadline):
+                                chunk = await anext(stream)
+                        except StopAsyncIteration:
+                            break
+                        
+                        content = chunk.get("response", "")
+                        is_done = chunk.get("done", False)
+                        
+                        if content:
+                            prev_len = len(full_response)
+                            full_response += content
                             
-                            if is_retryable and attempt < max_retries:
-                                backoff = self._calculate_backoff(attempt)
-                                logger.warning(
-                                    f"⚠️ Ошибка стриминга после {elapsed_total:.1f}с: {error_msg[:100]}... "
-                                    f"Повторная попытка {attempt + 1}/{max_retries} через {backoff:.1f}с"
-                                )
-                                await asyncio.sleep(backoff)
-                                last_error = error
-                                break  # Выходим из внутреннего цикла для retry
+                            # Определяем находимся ли внутри <think> блока
+                            # Считаем только теги, закончившиеся в новом чанке
+                            # (тег может быть разрезан между чанками)
+                            think_opens += _count_new_tags(full_response, prev_len, "<think>")
+                            think_closes += _count_new_tags(full_response, prev_len, "</think>")
+                            in_thinking = think_opens > think_closes
                             
-                            # Если не можем повторить или достигли лимита
-                            # Проверяем, не падает ли модель постоянно
-                            if attempt >= max_retries:
-                                logger.error(
-                                    f"❌ Модель {self.model} постоянно падает после {max_retries + 1} попыток. "
-                                    f"Рекомендуется переключиться на другую модель."
-                                )
-                                # Поднимаем специальное исключение для переключения модели
-                                raise LLMModelUnavailableError(
-                                    f"Модель {self.model} недоступна после {max_retries + 1} попыток: {error_msg}",
-                                    model=self.model,
-                                    original_error=error
-                                )
-                            raise error
-                        # Успешное завершение без ошибок
-                        stream_success = True
-                        break
-                    
-                    content = chunk.get("response", "")
-                    is_done = chunk.get("done", False)
-                    
-                    if content:
-                        full_response += content
-                        
-                        # Определяем находимся ли внутри <think> блока
-                        # Простая эвристика: считаем открывающие/закрывающие теги
-                        think_opens = full_response.lower().count("<think>")
-                        think_closes = full_response.lower().count("</think>")
-                        in_thinking = think_opens > think_closes
+                            yield StreamChunk(
+                                content=content,
+                                is_thinking=in_thinking,
+                                is_done=is_done,
+                                full_response=full_response
+                            )
                         
-                        yield StreamChunk(
-                            content=content,
-                            is_thinking=in_thinking,
-                            is_done=is_done,
-                            full_response=full_response
-                        )
-                    
-                    if is_done:
-                        # Успешное завершение - выходим из retry цикла
-                        stream_success = True
-                        break
+                        if is_done:
+                            break
+                finally:
+                    # Закрываем HTTP стрим и возвращаем соединение в пул
+                    # (в том числе если потребитель прервал итерацию)
+                    await stream.aclose()
+                
+                health.record_success()
+                
+                # Успешное завершение - финальный чанк
+                if full_response:
+                    yield StreamChunk(
+                        content="",
+                        is_thinking=False,
+                        is_done=True,
+                        full_response=full_response
+                    )
+                return
+            
+            except TimeoutError:
+                elapsed_stream = time.time() - stream_start_time
+                logger.error(
+                    f"❌ Превышен общий timeout стриминга: {elapsed_stream:.1f}с "
+                    f"(максимум: {max_stream_time}с)"
+                )
+                # HTTP стрим уже закрыт (finally выше); обрезанный ответ не
+                # выдаём за полный — вызывающий код применит свой fallback
+                raise LLMTimeoutError(
+                    f"Превышен общий timeout стриминга: {elapsed_stream:.1f}с"
+                )
                 
-                # Если успешно завершили, выходим из retry цикла
-                if stream_success:
-                    # Финальный чанк
-                    if full_response:
-                        yield StreamChunk(
-                            content="",
-                            is_thinking=False,
-                            is_done=True,
-                            full_response=full_response
-                        )
-                    return  # Успешное завершение
-                    
             except Exception as e:
-                # Обрабатываем ошибки, которые не были обработаны выше
                 error_msg = str(e)
-                is_retryable = (
-                    "model runner has unexpectedly stopped" in error_msg or
-                    "resource limitations" in error_msg.lower() or
-                    "internal error" in error_msg.lower() or
-                    "status code: 500" in error_msg
-                )
+                is_retryable = _is_retryable_stream_error(e)
+                health.record_failure(e)
                 
                 if is_retryable and attempt < max_retries:
+                    elapsed_total = time.time() - stream_start_time
                     backoff = self._calculate_backoff(attempt)
                     logger.warning(
-                        f"⚠️ Ошибка стриминга: {error_msg[:100]}... "
+                        f"⚠️ Ошибка стриминга после {elapsed_total:.1f}с: {error_msg[:100]}... "
                         f"Повторная попытка {attempt + 1}/{max_retries} через {backoff:.1f}с"
                     )
                     await asyncio.sleep(backoff)
-                    last_error = e
                     continue  # Повторяем попытку
                 
                 # Финальная ошибка
-                # Если это ошибка недоступности модели, поднимаем специальное исключение
+                # Если модель постоянно падает, поднимаем специальное исключение
+                # для переключения на другую модель
                 if attempt >= max_retries and is_retryable:
                     logger.error(
                         f"❌ Модель {self.model} постоянно падает после {max_retries + 1} попыток. "
@@ -994,6 +1091,11 @@ class AsyncLocalLLM:
         """
         from infrastructure.connection_pool import get_ollama_pool
         
+        health = get_ollama_health_monitor()
+        if not health.is_available():
+            logger.warning("⚠️ Ollama недоступен, проверьте что сервис запущен")
+            return ""
+        
         pool = await get_ollama_pool()
         
         options = {
@@ -1008,8 +1110,10 @@ class AsyncLocalLLM:
                 prompt=prompt,
                 options=options
             )
+            health.record_success()
             return result.strip() if result else ""
         except Exception as e:
+            health.record_failure(e)
             logger.error(f"❌ AsyncLocalLLM ошибка: {e}", error=e)
             return ""
     
@@ -1033,6 +1137,11 @@ class AsyncLocalLLM:
         """
         from infrastructure.connection_pool import get_ollama_pool
         
+        health = get_ollama_health_monitor()
+        if not health.is_available():
+            logger.warning("⚠️ Ollama недоступен, проверьте что сервис запущен")
+            return ""
+        
         pool = await get_ollama_pool()
         
         payload = {
@@ -1047,9 +1156,11 @@ class AsyncLocalLLM:
         
         try:
             response = await pool.post("/api/chat", json=payload)
+            health.record_success()
             data = response.json()
             return data.get("message", {}).get("content", "").strip()
         except Exception as e:
+            health.record_failure(e)
             logger.error(f"❌ AsyncLocalLLM chat ошибка: {e}", error=e)
             return ""
 
@@ -1094,5 +1205,6 @@ def create_llm_for_stage(
         model=resolved_model,
         temperature=temperature,
         top_p=top_p,
-        timeout=timeout
+        timeout=timeout,
+        stage=stage
     )
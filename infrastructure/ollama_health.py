@@ -0,0 +1,252 @@
+"""Общий монитор доступности Ollama.
+
+Раньше LocalLLM.generate перед каждым запросом вызывал ollama.list() —
+лишний HTTP запрос со списком всех моделей, даже для коротких вызовов
+intent/advisor. Теперь статус хранится в одном CircuitBreaker и
+проверяется за O(1):
+
+- реальные запросы LocalLLM, AsyncLocalLLM и FastAdvisor сообщают об
+  успехе или ошибке соединения (пассивная проверка)
+- фоновый поток раз в probe_interval делает лёгкую пробу GET /api/version,
+  если за интервал не было успешных реальных запросов
+- после failure_threshold ошибок соединения подряд Ollama считается
+  недоступным: вызовы сразу возвращают пустой ответ, а через
+  recovery_timeout пропускается пробный запрос (HALF_OPEN)
+
+Использование:
+    monitor = get_ollama_health_monitor()
+    if not monitor.is_available():
+        return ""
+    ...
+    monitor.record_success()  # или monitor.record_failure(error)
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from infrastructure.circuit_breaker import CircuitBreaker, CircuitState
+from utils.config import get_config
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """Означает ли ошибка, что Ollama не отвечает (а не ошибку модели или таймаут генерации).
+
+    Args:
+        error: Исключение запроса
+
+    Returns:
+        True для ошибок соединения (в т.ч. обёрнутых через raise ... from)
+    """
+    current: Optional[BaseException] = error
+    while current is not None:
+        if isinstance(current, (ConnectionError, httpx.ConnectError, httpx.ConnectTimeout)):
+            return True
+        current = current.__cause__
+    return False
+
+
+class OllamaHealthMonitor:
+    """Кэшированный статус доступности Ollama поверх CircuitBreaker.
+
+    Потокобезопасен: CircuitBreaker не защищён блокировкой, поэтому все
+    обращения к нему идут под общим Lock.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        probe_interval: float = 15.0,
+        probe_timeout: float = 2.0,
+        failure_threshold: int = 2,
+        recovery_timeout: float = 5.0
+    ) -> None:
+        """Инициализация монитора (фоновая проба не запускается, см. start()).
+
+        Args:
+            base_url: URL Ollama API
+            probe_interval: Интервал фоновой пробы (секунды)
+            probe_timeout: Таймаут одной пробы (секунды)
+            failure_threshold: Ошибок соединения подряд до статуса "недоступен"
+            recovery_timeout: Пауза перед пробным запросом после сбоя (секунды)
+        """
+        if "://" not in base_url:
+            # OLLAMA_HOST часто задают без схемы (localhost:11434)
+            base_url = f"http://{base_url}"
+        self.base_url = base_url.rstrip("/")
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.breaker = CircuitBreaker(
+            name="ollama",
+            failure_threshold=failure_threshold,
+            recovery_timeout=recovery_timeout,
+            success_threshold=1
+        )
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_success = 0.0
+
+        # Метрики
+        self.checks = 0
+        self.rejected = 0
+        self.probes = 0
+        self.probe_failures = 0
+        self.probe_time_total = 0.0
+        self.last_probe_ms = 0.0
+
+    def is_available(self) -> bool:
+        """Можно ли отправлять запрос в Ollama (O(1), без сети).
+
+        Returns:
+            False если Ollama недавно не отвечал и время восстановления не вышло
+        """
+        with self._lock:
+            self.checks += 1
+            allowed = self.breaker.allow_request()
+            if not allowed:
+                self.rejected += 1
+            return allowed
+
+    def record_success(self) -> None:
+        """Учитывает успешный ответ Ollama."""
+        with self._lock:
+            self._last_success = time.monotonic()
+            if self.breaker.stats.state == CircuitState.OPEN:
+                # Ответ пришёл — пробный запрос уже не нужен
+                self.breaker.stats.state = CircuitState.HALF_OPEN
+            self.breaker.record_success()
+
+    def record_failure(self, error: BaseException) -> None:
+        """Учитывает ошибку запроса. Влияют на статус только ошибки соединения.
+
+        Args:
+            error: Исключение запроса
+        """
+        if not is_connection_error(error):
+            return
+        with self._lock:
+            self.breaker.record_failure()
+
+    def probe(self) -> bool:
+        """Проверяет Ollama лёгким запросом GET /api/version.
+
+        Returns:
+            True если Ollama ответил
+        """
+        start = time.perf_counter()
+        try:
+            response = httpx.get(f"{self.base_url}/api/version", timeout=self.probe_timeout)
+            response.raise_for_status()
+            ok = True
+        except Exception as e:
+            logger.debug(f"⚠️ Проба Ollama не прошла: {e}")
+            ok = False
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.probes += 1
+            self.probe_time_total += elapsed
+            self.last_probe_ms = elapsed * 1000
+            if ok:
+                self._last_success = time.monotonic()
+                if self.breaker.stats.state == CircuitState.OPEN:
+                    self.breaker.stats.state = CircuitState.HALF_OPEN
+                self.breaker.record_success()
+            else:
+                self.probe_failures += 1
+                self.breaker.record_failure()
+        return ok
+
+    def _next_probe_delay(self) -> float:
+        """Пауза до следующей пробы: после сбоя проверяем чаще."""
+        with self._lock:
+            if self.breaker.stats.state != CircuitState.CLOSED:
+                return min(self.probe_interval, self.breaker.recovery_timeout)
+        return self.probe_interval
+
+    def _run(self) -> None:
+        """Цикл фоновой пробы."""
+        delay = 0.0
+        while not self._stop.wait(delay):
+            with self._lock:
+                recently_ok = (
+                    self.breaker.stats.state == CircuitState.CLOSED
+                    and time.monotonic() - self._last_success < self.probe_interval
+                )
+            if not recently_ok:
+                self.probe()
+            delay = self._next_probe_delay()
+
+    def start(self) -> None:
+        """Запускает фоновую пробу (daemon поток, повторный вызов ничего не делает)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ollama-health", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает фоновую пробу."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=self.probe_timeout + 1)
+        self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики монитора.
+
+        checks — сколько раз статус проверен вместо запроса ollama.list(),
+        rejected — сколько вызовов сразу отклонено, пока Ollama недоступен.
+
+        Returns:
+            Словарь со статусом и метриками
+        """
+        with self._lock:
+            return {
+                "available": self.breaker.stats.state != CircuitState.OPEN,
+                "state": self.breaker.stats.state.value,
+                "checks": self.checks,
+                "rejected": self.rejected,
+                "probes": self.probes,
+                "probe_failures": self.probe_failures,
+                "avg_probe_ms": self.probe_time_total * 1000 / self.probes if self.probes else 0.0,
+                "last_probe_ms": self.last_probe_ms,
+            }
+
+
+# === Singleton ===
+
+_monitor: Optional[OllamaHealthMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_ollama_health_monitor() -> OllamaHealthMonitor:
+    """Возвращает глобальный монитор Ollama (фоновая проба запускается при первом обращении).
+
+    Returns:
+        OllamaHealthMonitor
+    """
+    global _monitor
+
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                config = get_config()
+                monitor = OllamaHealthMonitor(
+                    base_url=config.ollama_host,
+                    probe_interval=config.ollama_health_probe_interval,
+                    probe_timeout=config.ollama_health_probe_timeout,
+                    failure_threshold=config.ollama_health_failure_threshold,
+                    recovery_timeout=config.ollama_health_recovery_timeout
+                )
+                if config.ollama_health_background_probe:
+                    monitor.start()
+                _monitor = monitor
+    return _monitor
@@ -0,0 +1,274 @@
+"""Общий для процесса реестр индексов проектов (ContextEngine).
+
+Эндпоинт /api/index, ResearcherAgent и обработчик анализа работают с одним
+ContextEngine: индекс, построенный явной индексацией, переиспользуется
+этапом исследования следующей задачи, а не строится заново. Индексы
+проектов ключуются путём и расширениями (ContextEngine._get_cache_key),
+каждый проект индексируется под своей блокировкой, давно не использованные
+проекты выгружаются из памяти сверх [context_engine] max_index_memory_mb.
+
+Прогрев (warm_up) индексирует проект в фоновом потоке; повторный запрос
+прогрева того же проекта, пока он идёт, получает тот же Future.
+
+С [context_engine] watch_files прогрев запускает наблюдатель файлов проекта
+(infrastructure/project_watcher.py): изменённые файлы обновляются в
+ContextEngine, ProjectAnalyzer и инициализированных CodeRetriever без обхода
+проекта, а get_context наблюдаемого проекта не сверяет файлы вовсе.
+
+Использование:
+    registry = get_project_index_registry()
+    registry.warm_up("/path/to/project", [".py"])     # не блокирует
+    context = registry.engine.get_context(query, "/path/to/project", [".py"])
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from infrastructure.ast_analyzer import get_project_analyzer
+from infrastructure.code_retrieval import get_initialized_code_retrievers
+from infrastructure.context_engine import CodeChunk, ContextEngine
+from infrastructure.project_watcher import ProjectWatcher
+from utils.config import get_config
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+def normalize_extensions(extensions: Optional[List[str]]) -> List[str]:
+    """Приводит расширения к виду ['.js', '.py']: с точкой, без повторов, по порядку.
+
+    Args:
+        extensions: Расширения файлов (с точкой или без; None — ['.py'])
+
+    Returns:
+        Отсортированный список уникальных расширений
+    """
+    normalized = set()
+    for ext in extensions or ['.py']:
+        ext = ext.strip()
+        if ext:
+            normalized.add(ext if ext.startswith('.') else f'.{ext}')
+    return sorted(normalized) or ['.py']
+
+
+class ProjectIndexRegistry:
+    """Реестр индексов проектов поверх общего ContextEngine."""
+
+    def __init__(
+        self,
+        engine: ContextEngine,
+        warmup_workers: int = 1,
+        watch_options: Optional[Dict[str, Any]] = None,
+        max_watched_projects: int = 8
+    ) -> None:
+        """Инициализация реестра.
+
+        Args:
+            engine: Общий ContextEngine процесса
+            warmup_workers: Потоков фонового прогрева индексов
+            watch_options: Параметры ProjectWatcher (debounce, max_delay,
+                poll_interval, backend); None — наблюдатель файлов выключен
+            max_watched_projects: Наблюдаемых проектов одновременно (сверх —
+                наблюдение за давно прогретым проектом прекращается)
+        """
+        self.engine = engine
+        self._watch_options = watch_options
+        self._max_watched_projects = max(1, max_watched_projects)
+        # (путь, расширения) -> наблюдатель, от давно прогретых к недавним
+        self._watchers: "OrderedDict[Tuple[str, Tuple[str, ...]], ProjectWatcher]" = OrderedDict()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, warmup_workers),
+            thread_name_prefix="index-warmup"
+        )
+        self._lock = threading.Lock()
+        # (путь, расширения) -> идущий прогрев
+        self._warmups: Dict[Tuple[str, Tuple[str, ...]], Future] = {}
+
+    def warm_up(self, project_path: str, extensions: Optional[List[str]] = None) -> Future:
+        """Запускает индексацию проекта в фоне.
+
+        Args:
+            project_path: Путь к проекту
+            extensions: Расширения файлов для индексации
+
+        Returns:
+            Future с индексом {file_path: [chunks]} (ошибка индексации — в Future)
+        """
+        extensions = normalize_extensions(extensions)
+        key = (os.path.abspath(project_path), tuple(extensions))
+        with self._lock:
+            future = self._warmups.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(self._run_warm_up, key, extensions)
+            self._warmups[key] = future
+        return future
+
+    def _run_warm_up(
+        self,
+        key: Tuple[str, Tuple[str, ...]],
+        extensions: List[str]
+    ) -> Mapping[str, List[CodeChunk]]:
+        try:
+            # Наблюдатель запускается до полного обхода: изменения во время
+            # индексации не теряются
+            watching = self._watch_options is not None and self._start_watcher(key)
+            index = self.engine.index_project(key[0], extensions)
+            if watching:
+                self.engine.set_watched(key[0], extensions, True)
+            logger.debug(f"🔥 Индекс проекта {key[0]} прогрет: {len(index)} файлов")
+            return index
+        except Exception as e:
+            logger.warning(f"⚠️ Прогрев индекса {key[0]} не удался: {e}")
+            raise
+        finally:
+            # До завершения Future: ожидающий результат видит реестр без этого прогрева
+            with self._lock:
+                self._warmups.pop(key, None)
+
+    def _start_watcher(self, key: Tuple[str, Tuple[str, ...]]) -> bool:
+        """Запускает наблюдение за проектом (если ещё не запущено)."""
+        with self._lock:
+            watcher = self._watchers.get(key)
+            if watcher is not None and watcher.alive:
+                self._watchers.move_to_end(key)
+                return True
+            watcher = ProjectWatcher(
+                key[0],
+                list(key[1]),
+                on_changes=lambda paths: self._apply_changes(key, paths),
+                on_stopped=lambda: self._unwatch(key),
+                **self._watch_options
+            )
+            self._watchers[key] = watcher
+            evicted = []
+            while len(self._watchers) > self._max_watched_projects:
+                evicted.append(self._watchers.popitem(last=False))
+        for old_key, old_watcher in evicted:
+            old_watcher.stop()
+            self._mark_unwatched(old_key)
+        try:
+            watcher.start()
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось запустить наблюдение за {key[0]}: {e}")
+            self._unwatch(key)
+            return False
+        return True
+
+    def _apply_changes(self, key: Tuple[str, Tuple[str, ...]], paths: List[str]) -> None:
+        """Передаёт изменённые файлы проекта во все его индексы."""
+        project_path, extensions = key[0], list(key[1])
+        self.engine.update_files(project_path, extensions, paths)
+        analyzer = get_project_analyzer(project_path, create=False)
+        if analyzer is not None:
+            analyzer.update_files(project_path, paths)
+            # Анализатор может не обходить проект, только если видит все свои файлы
+            analyzer.watched = set(analyzer.extensions) <= set(extensions)
+        for retriever in get_initialized_code_retrievers():
+            retriever.update_files(project_path, paths, extensions)
+
+    def _unwatch(self, key: Tuple[str, Tuple[str, ...]]) -> None:
+        """Прекращает наблюдение: индексы проекта снова сверяют файлы сами."""
+        with self._lock:
+            watcher = self._watchers.pop(key, None)
+        if watcher is not None:
+            watcher.stop()
+        self._mark_unwatched(key)
+
+    def _mark_unwatched(self, key: Tuple[str, Tuple[str, ...]]) -> None:
+        self.engine.set_watched(key[0], list(key[1]), False)
+        analyzer = get_project_analyzer(key[0], create=False)
+        if analyzer is not None:
+            analyzer.watched = False
+
+    def index_project(
+        self,
+        project_path: str,
+        extensions: Optional[List[str]] = None
+    ) -> Mapping[str, List[CodeChunk]]:
+        """Индексирует проект (синхронно; идущий прогрев того же проекта переиспользуется).
+
+        Args:
+            project_path: Путь к проекту
+            extensions: Расширения файлов для индексации
+
+        Returns:
+            Словарь {file_path: [chunks]}
+        """
+        return self.warm_up(project_path, extensions).result()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика реестра: проекты в памяти, их объём, идущие прогревы и
+        свежесть наблюдаемых проектов (ProjectWatcher.get_stats по пути)."""
+        with self._lock:
+            warming = len(self._warmups)
+            watchers = list(self._watchers.items())
+        return {
+            "cached_projects": self.engine.cached_projects(),
+            "memory_bytes": self.engine.index_memory_bytes(),
+            "warming_up": warming,
+            "watched_projects": {
+                f"{path} {','.join(extensions)}": watcher.get_stats()
+                for (path, extensions), watcher in watchers
+            },
+        }
+
+    def shutdown(self) -> None:
+        """Останавливает наблюдателей и потоки прогрева (идущая индексация доделывается)."""
+        with self._lock:
+            watchers = list(self._watchers.values())
+            self._watchers.clear()
+        for watcher in watchers:
+            watcher.stop()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_registry: Optional[ProjectIndexRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_project_index_registry() -> ProjectIndexRegistry:
+    """Возвращает общий реестр индексов проектов (настройки из [context_engine])."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                config = get_config()
+                engine = ContextEngine(
+                    max_context_tokens=config.context_engine_max_context_tokens,
+                    max_chunk_tokens=config.context_engine_max_chunk_tokens,
+                    cache_dir=Path(config.context_engine_cache_directory),
+                    max_index_memory_mb=config.context_engine_max_index_memory_mb
+                )
+                watch_options = None
+                if config.context_engine_watch_files:
+                    watch_options = {
+                        "debounce": config.context_engine_watch_debounce_ms / 1000,
+                        "max_delay": config.context_engine_watch_max_delay_ms / 1000,
+                        "poll_interval": config.context_engine_watch_poll_interval,
+                        "backend": config.context_engine_watch_backend,
+                    }
+                _registry = ProjectIndexRegistry(
+                    engine,
+                    config.context_engine_warmup_workers,
+                    watch_options=watch_options,
+                    max_watched_projects=config.context_engine_max_watched_projects
+                )
+    return _registry
+
+
+def get_context_engine() -> ContextEngine:
+    """Возвращает общий ContextEngine процесса."""
+    return get_project_index_registry().engine
+
+
+def reset_project_index_registry() -> None:
+    """Останавливает и сбрасывает общий реестр (для shutdown и тестов)."""
+    global _registry
+    with _registry_lock:
+        if _registry is not None:
+            _registry.shutdown()
+        _registry = None
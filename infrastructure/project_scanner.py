@@ -0,0 +1,642 @@
+"""Общий сканер файлов проекта: один обход и один разбор на всех потребителей.
+
+ContextEngine, CodeRetriever, ProjectAnalyzer, адаптеры autonomous improver,
+эндпоинт /api/project-files и наблюдатель файлов получают список файлов
+проекта отсюда: обход через os.scandir с единым списком пропускаемых
+каталогов и учётом .gitignore. Повторный обход того же проекта
+переиспользует прошлый, если mtime каталогов и .gitignore не изменились
+(добавление, удаление и переименование файла меняют mtime каталога): вместо
+чтения каталогов и разбора .gitignore — только stat файлов.
+
+Разбор файлов (чтение, хэш содержимого, ast.parse) тоже общий: результат
+(хэш, FileAnalysis, функции для CodeRetriever) кэшируется по
+(путь, mtime, размер) и переиспользуется всеми потребителями. Большие пачки
+разбираются в пуле процессов: он создаётся при первой такой пачке и живёт
+до close() (у общего сканера — до выхода процесса).
+
+Использование:
+    scanner = get_project_scanner()
+    files = scanner.files("/path/to/project", [".py"])
+    parsed = scanner.parse(files)     # [ParsedFile | None] в порядке files
+"""
+from __future__ import annotations
+
+import ast
+import atexit
+import fnmatch
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from infrastructure.context_index import content_hash
+from utils.config import get_config
+from utils.logger import get_logger
+
+if TYPE_CHECKING:
+    from infrastructure.ast_analyzer import FileAnalysis
+
+logger = get_logger()
+
+# Каталоги, которые не обходятся никогда (скрытые каталоги и файлы — тоже)
+SKIP_DIRS = frozenset({'__pycache__', 'node_modules', 'venv', '__pypackages__', 'site-packages'})
+
+_MAX_PARSE_WORKERS = 8
+
+# Сколько последних обходов (корень, глубина, каталоги) хранится для переиспользования
+_MAX_CACHED_WALKS = 32
+
+
+@dataclass(frozen=True)
+class ScannedFile:
+    """Файл проекта на момент обхода."""
+    rel_path: str
+    path: str  # абсолютный путь
+    mtime_ns: int
+    size: int
+
+    @classmethod
+    def from_path(cls, path: str, root: Optional[str] = None) -> Optional[ScannedFile]:
+        """Сигнатура файла по пути (None — файла нет)."""
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        rel_path = os.path.relpath(path, root) if root else os.path.basename(path)
+        return cls(rel_path, path, stat.st_mtime_ns, stat.st_size)
+
+
+@dataclass
+class ProjectScan:
+    """Результат обхода проекта."""
+    root: str
+    files: List[ScannedFile]
+    # Каталоги глубже max_depth (не обходились), относительно корня
+    truncated_dirs: List[str] = field(default_factory=list)
+    # Обойдённые каталоги и прочитанные .gitignore -> mtime_ns (проверка актуальности)
+    watched_mtimes: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class ParsedFile:
+    """Результат разбора файла, общий для потребителей."""
+    content_hash: str
+    # Структура Python файла (None — не Python, не разобрался или разбор не запрошен)
+    analysis: Optional[FileAnalysis] = None
+    # Функции (код, описание) для индекса CodeRetriever
+    functions: List[Tuple[str, str]] = field(default_factory=list)
+    analyzed: bool = False
+
+
+# Строки с окончаниями, как их делит ast.get_source_segment (\r\n, \r, \n)
+_LINE_RE = re.compile(r'[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+$')
+
+
+def _source_segment(lines: List[str], node: Union[ast.FunctionDef, ast.AsyncFunctionDef]) -> Optional[str]:
+    """ast.get_source_segment по заранее разбитым строкам.
+
+    get_source_segment делит весь файл на строки при каждом вызове — на
+    файле с сотнями функций это квадратичное время.
+    """
+    end_lineno = node.end_lineno
+    end_col_offset = node.end_col_offset
+    if end_lineno is None or end_col_offset is None:
+        return None
+    lineno = node.lineno - 1
+    end_lineno -= 1
+    # Смещения колонок в AST — в байтах UTF-8
+    if lineno == end_lineno:
+        return lines[lineno].encode()[node.col_offset:end_col_offset].decode()
+    first = lines[lineno].encode()[node.col_offset:].decode()
+    last = lines[end_lineno].encode()[:end_col_offset].decode()
+    return ''.join([first, *lines[lineno + 1:end_lineno], last])
+
+
+def extract_functions(tree: ast.AST, content: str) -> List[Tuple[str, str]]:
+    """Функции файла для индекса CodeRetriever.
+
+    Args:
+        tree: Разобранный модуль
+        content: Исходный код файла
+
+    Returns:
+        Список (код функции, описание)
+    """
+    functions: List[Tuple[str, str]] = []
+    lines: Optional[List[str]] = None
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if lines is None:
+                lines = _LINE_RE.findall(content)
+            code = _source_segment(lines, node)
+            if code and len(code) > 30:
+                docstring = ast.get_docstring(node) or node.name
+                functions.append((code, docstring[:200]))
+    return functions
+
+
+def _parse_file(path: str, analyze: bool) -> Optional[ParsedFile]:
+    """Читает файл, считает хэш и (для .py) один раз разбирает AST.
+
+    Выполняется и в процессе-воркере: результат должен сериализоваться.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    parsed = ParsedFile(content_hash(data))
+    if not analyze or not path.endswith('.py'):
+        return parsed
+    parsed.analyzed = True
+    try:
+        content = data.decode('utf-8')
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return parsed
+    from infrastructure.ast_analyzer import ASTAnalyzer
+    parsed.analysis = ASTAnalyzer().analyze_tree(tree, content, path)
+    parsed.functions = extract_functions(tree, content)
+    return parsed
+
+
+def _parse_file_task(task: Tuple[str, bool]) -> Optional[ParsedFile]:
+    return _parse_file(*task)
+
+
+class _GitIgnore:
+    """Правила одного .gitignore (подмножество синтаксиса git)."""
+
+    def __init__(self, base: str, lines: Iterable[str]) -> None:
+        """Инициализация.
+
+        Args:
+            base: Каталог .gitignore относительно корня проекта ('' — корень)
+            lines: Строки файла
+        """
+        self.base = base
+        # (регулярное выражение, отрицание, только каталоги, якорь к base)
+        self.rules: List[Tuple[re.Pattern, bool, bool, bool]] = []
+        for line in lines:
+            line = line.rstrip('\n').rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            elif line.startswith('\\'):
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            anchored = '/' in line
+            self.rules.append((re.compile(self._translate(line.lstrip('/'))), negate, dir_only, anchored))
+
+    @staticmethod
+    def _translate(pattern: str) -> str:
+        """Шаблон gitignore -> регулярное выражение для пути через '/'."""
+        parts: List[str] = []
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith('**/', i):
+                parts.append('(?:.*/)?')
+                i += 3
+            elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+                parts.append('/.*')
+                i += 3
+            elif pattern.startswith('**', i):
+                parts.append('.*')
+                i += 2
+            elif pattern[i] == '*':
+                parts.append('[^/]*')
+                i += 1
+            elif pattern[i] == '?':
+                parts.append('[^/]')
+                i += 1
+            elif pattern[i] == '[':
+                end = pattern.find(']', i + 1)
+                if end == -1:
+                    parts.append(re.escape(pattern[i]))
+                    i += 1
+                else:
+                    parts.append(fnmatch.translate(pattern[i:end + 1])[4:-3])
+                    i = end + 1
+            else:
+                parts.append(re.escape(pattern[i]))
+                i += 1
+        return ''.join(parts) + r'\Z'
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """True/False — путь исключён/возвращён правилами файла, None — не затронут."""
+        if self.base:
+            rel_path = rel_path[len(self.base) + 1:]
+        name = rel_path.rsplit('/', 1)[-1]
+        result = None
+        for regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path if anchored else name):
+                result = not negate
+        return result
+
+
+class ProjectScanner:
+    """Обход и разбор файлов проектов с общими кэшами."""
+
+    def __init__(
+        self,
+        respect_gitignore: bool = True,
+        prefetch_ast: bool = True,
+        parse_workers: int = 0,
+        parallel_parse_min_files: int = 64,
+        cache_entries: int = 50000
+    ) -> None:
+        """Инициализация.
+
+        Args:
+            respect_gitignore: Не обходить файлы, исключённые .gitignore
+            prefetch_ast: Потребители, которым нужен только хэш (ContextEngine),
+                заодно разбирают AST для остальных
+            parse_workers: Процессов для разбора (0 — по числу ядер, до 8)
+            parallel_parse_min_files: С какого размера пачки разбор уходит в пул процессов
+            cache_entries: Файлов в кэше разбора (давно не использованные вытесняются)
+        """
+        self.respect_gitignore = respect_gitignore
+        self.prefetch_ast = prefetch_ast
+        self.parse_workers = parse_workers or min(os.cpu_count() or 1, _MAX_PARSE_WORKERS)
+        self.parallel_parse_min_files = parallel_parse_min_files
+        self.cache_entries = max(1, cache_entries)
+        self._lock = threading.Lock()
+        # (корень, max_depth, доп. каталоги) -> последний обход
+        self._walks: OrderedDict[Tuple[str, Optional[int], frozenset], ProjectScan] = OrderedDict()
+        # Корень -> правила .gitignore по каталогам (с последнего обхода)
+        self._ignores: Dict[str, Dict[str, _GitIgnore]] = {}
+        # Абсолютный путь -> (mtime_ns, размер, разбор), от давних к недавним
+        self._parsed: OrderedDict[str, Tuple[int, int, ParsedFile]] = OrderedDict()
+        # Пул процессов разбора (создаётся при первой большой пачке)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self.walks = 0
+        self.walk_reuses = 0
+        self.parse_hits = 0
+        self.parse_misses = 0
+
+    def walk(
+        self,
+        root: str,
+        max_depth: Optional[int] = None,
+        skip_dirs: Iterable[str] = (),
+        refresh: bool = False
+    ) -> ProjectScan:
+        """Обходит проект (или обновляет сигнатуры файлов прошлого обхода).
+
+        Args:
+            root: Корень проекта
+            max_depth: Глубина обхода каталогов (None — без ограничения)
+            skip_dirs: Дополнительные имена каталогов, которые не обходятся
+            refresh: Обойти заново, не проверяя прошлый обход
+
+        Returns:
+            ProjectScan с файлами в порядке обхода
+        """
+        root = os.path.abspath(root)
+        key = (root, max_depth, frozenset(skip_dirs))
+        with self._lock:
+            cached = self._walks.get(key)
+        if not refresh and cached is not None:
+            scan = self._revalidate(cached)
+            if scan is not None:
+                with self._lock:
+                    self.walk_reuses += 1
+                    self._remember_walk(key, scan)
+                return scan
+        scan = self._walk(root, max_depth, key[2])
+        with self._lock:
+            self.walks += 1
+            self._remember_walk(key, scan)
+        return scan
+
+    def _remember_walk(self, key: Tuple[str, Optional[int], frozenset], scan: ProjectScan) -> None:
+        self._walks[key] = scan
+        self._walks.move_to_end(key)
+        while len(self._walks) > _MAX_CACHED_WALKS:
+            self._walks.popitem(last=False)
+
+    @staticmethod
+    def _revalidate(cached: ProjectScan) -> Optional[ProjectScan]:
+        """Прошлый обход со свежими сигнатурами файлов (None — состав файлов мог измениться)."""
+        if not cached.watched_mtimes:
+            # Корень не читался: обход не переиспользуется
+            return None
+        for path, mtime_ns in cached.watched_mtimes.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime_ns:
+                    return None
+            except OSError:
+                return None
+        files: List[ScannedFile] = []
+        for file in cached.files:
+            try:
+                stat = os.stat(file.path)
+            except OSError:
+                return None
+            if stat.st_mtime_ns == file.mtime_ns and stat.st_size == file.size:
+                files.append(file)
+            else:
+                files.append(ScannedFile(file.rel_path, file.path, stat.st_mtime_ns, stat.st_size))
+        return ProjectScan(cached.root, files, cached.truncated_dirs, cached.watched_mtimes)
+
+    def files(self, root: str, extensions: Optional[Sequence[str]] = None) -> List[ScannedFile]:
+        """Файлы проекта с заданными расширениями (None — все)."""
+        scan = self.walk(root)
+        if extensions is None:
+            return list(scan.files)
+        suffixes = tuple(extensions)
+        return [file for file in scan.files if file.rel_path.endswith(suffixes)]
+
+    def files_under(self, root: str, rel_dir: str, extensions: Optional[Sequence[str]] = None) -> List[ScannedFile]:
+        """Файлы одного каталога проекта: обходится только он, с .gitignore каталогов выше.
+
+        Обход каталога не кэшируется и не заменяет обход проекта в кэше.
+
+        Args:
+            root: Корень проекта
+            rel_dir: Каталог относительно корня
+            extensions: Расширения файлов (None — все)
+
+        Returns:
+            Файлы под rel_dir с путями относительно корня проекта
+        """
+        scan = self._walk(os.path.abspath(root), None, frozenset(), rel_dir)
+        if extensions is None:
+            return scan.files
+        suffixes = tuple(extensions)
+        return [file for file in scan.files if file.rel_path.endswith(suffixes)]
+
+    def invalidate(self, root: Optional[str] = None) -> None:
+        """Сбрасывает кэш обходов проекта (None — всех проектов)."""
+        with self._lock:
+            if root is None:
+                self._walks.clear()
+                return
+            root = os.path.abspath(root)
+            for key in [key for key in self._walks if key[0] == root]:
+                del self._walks[key]
+
+    def _walk(self, root: str, max_depth: Optional[int], extra_skip: frozenset, rel_start: str = '') -> ProjectScan:
+        scan = ProjectScan(root, [])
+        ignores: Dict[str, _GitIgnore] = {}
+        start_rules: Tuple[_GitIgnore, ...] = ()
+        if rel_start:
+            # Обход каталога: действуют .gitignore каталогов выше него
+            rel_start = rel_start.replace(os.sep, '/').strip('/')
+            parts = rel_start.split('/')
+            if self.respect_gitignore:
+                for base in ('/'.join(parts[:i]) for i in range(len(parts))):
+                    ignore = self._load_gitignore(os.path.join(root, base, '.gitignore'), base)
+                    if ignore is not None:
+                        start_rules += (ignore,)
+        # (каталог, относительный путь, глубина, действующие .gitignore)
+        stack: List[Tuple[str, str, int, Tuple[_GitIgnore, ...]]] = [
+            (os.path.join(root, rel_start) if rel_start else root, rel_start, 0, start_rules)
+        ]
+        while stack:
+            dir_path, rel_dir, depth, rules = stack.pop()
+            try:
+                scan.watched_mtimes[dir_path] = os.stat(dir_path).st_mtime_ns
+                with os.scandir(dir_path) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError:
+                continue
+            gitignore = next((entry for entry in entries if entry.name == '.gitignore'), None)
+            if self.respect_gitignore and gitignore is not None:
+                try:
+                    scan.watched_mtimes[gitignore.path] = gitignore.stat().st_mtime_ns
+                except OSError:
+                    pass
+                ignore = self._load_gitignore(gitignore.path, rel_dir)
+                if ignore is not None:
+                    ignores[rel_dir] = ignore
+                    rules = rules + (ignore,)
+            subdirs = []
+            for entry in entries:
+                name = entry.name
+                if name.startswith('.'):
+                    continue
+                rel_path = f"{rel_dir}/{name}" if rel_dir else name
+                try:
+                    is_dir = entry.is_dir()
+                    if is_dir and (name in SKIP_DIRS or name in extra_skip or entry.is_symlink()):
+                        continue
+                    if rules and self._ignored(rules, rel_path, is_dir):
+                        continue
+                    if is_dir:
+                        if max_depth is not None and depth + 1 >= max_depth:
+                            scan.truncated_dirs.append(rel_path.replace('/', os.sep))
+                        else:
+                            subdirs.append((entry.path, rel_path, depth + 1, rules))
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        scan.files.append(
+                            ScannedFile(rel_path.replace('/', os.sep), entry.path, stat.st_mtime_ns, stat.st_size)
+                        )
+                except OSError:
+                    continue
+            # Стек: каталоги обходятся в алфавитном порядке
+            stack.extend(reversed(subdirs))
+        with self._lock:
+            if not rel_start:
+                self._ignores[root] = ignores
+            else:
+                # Правила каталога заменяют прежние правила под ним, остальные остаются
+                known = self._ignores.setdefault(root, {})
+                prefix = rel_start + '/'
+                for base in [base for base in known if base == rel_start or base.startswith(prefix)]:
+                    del known[base]
+                known.update(ignores)
+        return scan
+
+    @staticmethod
+    def _load_gitignore(path: str, base: str) -> Optional[_GitIgnore]:
+        try:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                ignore = _GitIgnore(base, f)
+        except OSError:
+            return None
+        return ignore if ignore.rules else None
+
+    @staticmethod
+    def _ignored(rules: Sequence[_GitIgnore], rel_path: str, is_dir: bool) -> bool:
+        # Более глубокий .gitignore главнее
+        for ignore in reversed(rules):
+            result = ignore.match(rel_path, is_dir)
+            if result is not None:
+                return result
+        return False
+
+    def is_ignored(self, root: str, rel_path: str) -> bool:
+        """Исключён ли путь правилами обхода (скрытые, SKIP_DIRS, .gitignore последнего обхода)."""
+        parts = rel_path.replace(os.sep, '/').split('/')
+        if any(part.startswith('.') or part in SKIP_DIRS for part in parts):
+            return True
+        if not self.respect_gitignore:
+            return False
+        with self._lock:
+            ignores = self._ignores.get(os.path.abspath(root), {})
+        if not ignores:
+            return False
+        for depth in range(1, len(parts) + 1):
+            prefix = '/'.join(parts[:depth])
+            rules = tuple(
+                ignores[base] for base in ('/'.join(parts[:i]) for i in range(depth))
+                if base in ignores
+            )
+            if rules and self._ignored(rules, prefix, depth < len(parts)):
+                return True
+        return False
+
+    def parse(self, files: Sequence[ScannedFile], analyze: bool = True) -> List[Optional[ParsedFile]]:
+        """Хэш и разбор файлов (из кэша по (путь, mtime, размер) или заново).
+
+        Args:
+            files: Файлы из files()/walk() или ScannedFile.from_path
+            analyze: Разобрать AST Python файлов (False — только хэш)
+
+        Returns:
+            ParsedFile в порядке files (None — файл не прочитался)
+        """
+        results: List[Optional[ParsedFile]] = [None] * len(files)
+        missing: List[int] = []
+        with self._lock:
+            for i, file in enumerate(files):
+                cached = self._parsed.get(file.path)
+                if (
+                    cached is not None
+                    and cached[0] == file.mtime_ns
+                    and cached[1] == file.size
+                    and (cached[2].analyzed or not analyze or not file.path.endswith('.py'))
+                ):
+                    self._parsed.move_to_end(file.path)
+                    results[i] = cached[2]
+                else:
+                    missing.append(i)
+            self.parse_hits += len(files) - len(missing)
+            self.parse_misses += len(missing)
+        if not missing:
+            return results
+
+        tasks = [(files[i].path, analyze) for i in missing]
+        if analyze and len(tasks) >= self.parallel_parse_min_files and self.parse_workers > 1:
+            parsed = self._parse_in_pool(tasks)
+        else:
+            parsed = [_parse_file(*task) for task in tasks]
+
+        with self._lock:
+            for i, result in zip(missing, parsed):
+                results[i] = result
+                if result is None:
+                    self._parsed.pop(files[i].path, None)
+                    continue
+                self._parsed[files[i].path] = (files[i].mtime_ns, files[i].size, result)
+                self._parsed.move_to_end(files[i].path)
+            while len(self._parsed) > self.cache_entries:
+                self._parsed.popitem(last=False)
+        return results
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: fork из процесса с потоками (uvicorn, пул embeddings) небезопасен
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.parse_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _parse_in_pool(self, tasks: List[Tuple[str, bool]]) -> List[Optional[ParsedFile]]:
+        """Разбор пачки в пуле процессов (при ошибке пула — в текущем процессе)."""
+        pool: Optional[ProcessPoolExecutor] = None
+        try:
+            pool = self._get_pool()
+            return list(pool.map(
+                _parse_file_task,
+                tasks,
+                chunksize=max(1, len(tasks) // (self.parse_workers * 4))
+            ))
+        except Exception as e:
+            if pool is not None and isinstance(e, BrokenProcessPool):
+                # Процесс пула упал: следующая пачка создаст пул заново
+                with self._pool_lock:
+                    if self._pool is pool:
+                        self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            logger.warning(f"⚠️ Пул разбора файлов недоступен ({e}), разбираю в текущем процессе")
+            return [_parse_file(*task) for task in tasks]
+
+    def close(self) -> None:
+        """Останавливает пул процессов разбора (кэши остаются)."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def analyze_file(self, path: str) -> Optional[FileAnalysis]:
+        """FileAnalysis Python файла из общего кэша разбора."""
+        file = ScannedFile.from_path(path)
+        if file is None:
+            return None
+        parsed = self.parse([file])[0]
+        return parsed.analysis if parsed is not None else None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счётчики обходов и кэша разбора."""
+        with self._lock:
+            return {
+                "walks": self.walks,
+                "walk_reuses": self.walk_reuses,
+                "parsed_files": len(self._parsed),
+                "parse_cache_hits": self.parse_hits,
+                "parse_cache_misses": self.parse_misses,
+            }
+
+
+_scanner: Optional[ProjectScanner] = None
+_scanner_lock = threading.Lock()
+
+
+def get_project_scanner() -> ProjectScanner:
+    """Возвращает общий сканер процесса (настройки из [project_scanner])."""
+    global _scanner
+    if _scanner is None:
+        with _scanner_lock:
+            if _scanner is None:
+                config = get_config()
+                scanner = ProjectScanner(
+                    respect_gitignore=config.project_scanner_respect_gitignore,
+                    prefetch_ast=config.project_scanner_prefetch_ast,
+                    parse_workers=config.project_scanner_parse_workers,
+                    parallel_parse_min_files=config.project_scanner_parallel_parse_min_files,
+                    cache_entries=config.project_scanner_cache_entries
+                )
+                # Процессы пула разбора не переживают процесс приложения
+                atexit.register(scanner.close)
+                _scanner = scanner
+    return _scanner
+
+
+def reset_project_scanner() -> None:
+    """Сбрасывает общий сканер (для тестов)."""
+    global _scanner
+    with _scanner_lock:
+        if _scanner is not None:
+            _scanner.close()
+        _scanner = None
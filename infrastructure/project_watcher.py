@@ -0,0 +1,310 @@
+"""Наблюдатель файлов проекта для живой переиндексации.
+
+Следит за файлами проекта и передаёт изменённые пути (относительно корня)
+пачками в callback — индексы (ContextEngine, CodeRetriever, ProjectAnalyzer)
+обновляют только эти файлы, без обхода всего проекта.
+
+Бэкенды:
+- watchfiles (inotify/FSEvents через Rust notify; ставится с uvicorn[standard])
+- polling — сравнение mtime/размера файлов раз в poll_interval, если
+  watchfiles не установлен или не смог запуститься
+
+Вместо watchdog используется watchfiles: он уже приходит в requirements.txt
+транзитивно через uvicorn[standard], новая зависимость не нужна.
+
+Всплески изменений (git checkout, форматирование проекта) склеиваются:
+пачка отдаётся, когда изменения затихли на debounce, но не позже max_delay
+от первого изменения. Удалённые и перемещённые каталоги разворачиваются
+в пути известных файлов под ними; изменение .gitignore — полный обход
+проекта (файлы могли стать отслеживаемыми или исключёнными).
+
+Использование:
+    watcher = ProjectWatcher("/path/to/project", [".py"], on_changes=apply)
+    watcher.start()
+    watcher.get_stats()   # отставание индекса, пачки, бэкенд
+    watcher.stop()
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from infrastructure.project_scanner import get_project_scanner
+from utils.logger import get_logger
+
+logger = get_logger()
+
+try:
+    import watchfiles
+except ImportError:  # pragma: no cover - watchfiles опционален
+    watchfiles = None
+
+
+class ProjectWatcher:
+    """Наблюдатель файлов одного проекта."""
+
+    def __init__(
+        self,
+        project_path: str,
+        extensions: List[str],
+        on_changes: Callable[[List[str]], None],
+        debounce: float = 0.3,
+        max_delay: float = 2.0,
+        poll_interval: float = 5.0,
+        backend: str = "auto",
+        on_stopped: Optional[Callable[[], None]] = None
+    ) -> None:
+        """Инициализация.
+
+        Args:
+            project_path: Корень проекта
+            extensions: Расширения отслеживаемых файлов
+            on_changes: Callback с пачкой изменённых путей (относительно корня);
+                вызывается из потока наблюдателя
+            debounce: Пачка отдаётся после стольких секунд без новых изменений
+            max_delay: ...но не позже стольких секунд от первого изменения
+            poll_interval: Период опроса файлов для бэкенда polling, секунды
+                (каждый опрос — stat всех файлов проекта)
+            backend: "auto" (watchfiles, если установлен), "watchfiles" или "polling"
+            on_stopped: Callback, если наблюдение прекратилось не по stop()
+                (индексы проекта снова должны сверять файлы сами)
+        """
+        self.project_path = os.path.abspath(project_path)
+        self.extensions = tuple(extensions)
+        self._on_changes = on_changes
+        self._on_stopped = on_stopped
+        self.debounce = debounce
+        self.max_delay = max(max_delay, debounce)
+        self.poll_interval = poll_interval
+        if backend == "auto":
+            backend = "watchfiles" if watchfiles is not None else "polling"
+        elif backend == "watchfiles" and watchfiles is None:
+            logger.warning("⚠️ watchfiles не установлен, наблюдатель файлов работает опросом")
+            backend = "polling"
+        self.backend = backend
+        # Известные файлы проекта: путь -> (mtime_ns, размер)
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        # Время первого ещё не применённого изменения (monotonic)
+        self._pending_since: Optional[float] = None
+        self._batches = 0
+        self._files_applied = 0
+        self._errors = 0
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+        self._last_applied_at: Optional[float] = None
+
+    def _is_watched(self, rel_path: str) -> bool:
+        return rel_path.endswith(self.extensions) and not get_project_scanner().is_ignored(self.project_path, rel_path)
+
+    def _scan(self, root: str) -> Dict[str, Tuple[int, int]]:
+        """mtime/размер отслеживаемых файлов под root (обход общего сканера, без чтения).
+
+        Для каталога внутри проекта обходится только он, а не весь проект.
+        """
+        scanner = get_project_scanner()
+        if root == self.project_path:
+            files = scanner.files(self.project_path, self.extensions)
+        else:
+            files = scanner.files_under(self.project_path, os.path.relpath(root, self.project_path), self.extensions)
+        return {file.rel_path: (file.mtime_ns, file.size) for file in files}
+
+    def start(self) -> None:
+        """Запускает наблюдение в фоновом потоке (снимок файлов делается сразу)."""
+        if self._thread is not None:
+            return
+        self._snapshot = self._scan(self.project_path)
+        self._thread = threading.Thread(target=self._run, name=f"watch:{os.path.basename(self.project_path)}", daemon=True)
+        self._thread.start()
+        logger.debug(f"👀 Наблюдение за {self.project_path} ({self.backend}), файлов: {len(self._snapshot)}")
+
+    def stop(self) -> None:
+        """Останавливает наблюдение."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    @property
+    def alive(self) -> bool:
+        """Поток наблюдения работает."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self) -> None:
+        try:
+            if self.backend == "watchfiles":
+                self._run_watchfiles()
+            else:
+                self._run_polling()
+        except Exception as e:
+            logger.error(f"❌ Наблюдение за {self.project_path} остановлено: {e}", error=e)
+        finally:
+            if not self._stop.is_set() and self._on_stopped is not None:
+                self._on_stopped()
+
+    def _run_polling(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            changed = self._poll()
+            if not changed:
+                continue
+            first_change = time.monotonic()
+            self._mark_pending(first_change)
+            # Дожидаемся, пока всплеск затихнет
+            while not self._stop.wait(self.debounce):
+                more = self._poll()
+                if not more:
+                    break
+                changed |= more
+                if time.monotonic() - first_change >= self.max_delay:
+                    break
+            self._apply(changed)
+
+    def _poll(self) -> Set[str]:
+        snapshot = self._scan(self.project_path)
+        previous = self._snapshot
+        self._snapshot = snapshot
+        changed = {path for path, signature in snapshot.items() if previous.get(path) != signature}
+        changed.update(path for path in previous if path not in snapshot)
+        return changed
+
+    def _run_watchfiles(self) -> None:
+        try:
+            for changes in watchfiles.watch(
+                self.project_path,
+                debounce=int(self.max_delay * 1000),
+                step=int(self.debounce * 1000),
+                stop_event=self._stop,
+                rust_timeout=1000,
+                raise_interrupt=False
+            ):
+                yielded_at = time.monotonic()
+                changed = self._changed_paths(full_path for _, full_path in changes)
+                self._mark_pending(self._first_change_time(changed, yielded_at))
+                if changed:
+                    self._apply(changed)
+                else:
+                    with self._stats_lock:
+                        self._pending_since = None
+        except Exception as e:
+            if self._stop.is_set():
+                return
+            # inotify недоступен (лимит watches, сетевая ФС) — переходим на опрос
+            logger.warning(f"⚠️ watchfiles остановился ({e}), наблюдение за {self.project_path} опросом")
+            self.backend = "polling"
+            self._snapshot = self._scan(self.project_path)
+            self._run_polling()
+
+    def _first_change_time(self, changed: Set[str], yielded_at: float) -> float:
+        """Оценка времени (monotonic) первого изменения пачки watchfiles.
+
+        watchfiles отдаёт пачку после debounce тишины, но не позже max_delay
+        от первого изменения: время первого изменения лежит в этом окне до
+        yielded_at. Внутри окна его уточняет самый ранний mtime изменённых
+        файлов (mtime скопированных с сохранением времени файлов может быть
+        сколь угодно старым — поэтому окно ограничивает оценку).
+        """
+        latest = yielded_at - self.debounce
+        earliest = yielded_at - self.max_delay
+        mtimes = [self._snapshot[path][0] for path in changed if path in self._snapshot]
+        if not mtimes:
+            return latest
+        # mtime — по часам системы, переводим в monotonic
+        estimate = min(mtimes) / 1e9 - (time.time() - time.monotonic())
+        return min(max(estimate, earliest), latest)
+
+    def _changed_paths(self, full_paths: Iterable[str]) -> Set[str]:
+        """Пути событий watchfiles -> изменённые отслеживаемые файлы."""
+        scanner = get_project_scanner()
+        changed: Set[str] = set()
+        rescan = False
+        for full_path in full_paths:
+            rel_path = os.path.relpath(full_path, self.project_path)
+            if os.path.basename(rel_path) == '.gitignore':
+                # .gitignore скрытый и в is_ignored не проходит, но меняет состав
+                # отслеживаемых файлов: обход проекта заново
+                parent = os.path.dirname(rel_path)
+                rescan = rescan or not parent or not scanner.is_ignored(self.project_path, parent)
+                continue
+            changed.update(self._expand(rel_path))
+        if rescan:
+            scanner.invalidate(self.project_path)
+            changed |= self._poll()
+        return changed
+
+    def _expand(self, rel_path: str) -> Iterable[str]:
+        """Путь события -> пути отслеживаемых файлов (каталог разворачивается)."""
+        if get_project_scanner().is_ignored(self.project_path, rel_path):
+            return ()
+        full_path = os.path.join(self.project_path, rel_path)
+        if os.path.isdir(full_path):
+            # Каталог появился (перемещение, распаковка): файлы под ним
+            found = self._scan(full_path)
+            self._snapshot.update(found)
+            return found
+        if os.path.exists(full_path):
+            if not self._is_watched(rel_path):
+                return ()
+            try:
+                stat = os.stat(full_path)
+                self._snapshot[rel_path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass
+            return (rel_path,)
+        # Путь удалён: файл или каталог с известными файлами
+        prefix = rel_path + os.sep
+        removed = [path for path in self._snapshot if path == rel_path or path.startswith(prefix)]
+        for path in removed:
+            del self._snapshot[path]
+        return removed
+
+    def _mark_pending(self, since: float) -> None:
+        with self._stats_lock:
+            if self._pending_since is None:
+                self._pending_since = since
+
+    def _apply(self, changed: Set[str]) -> None:
+        paths = sorted(changed)
+        try:
+            self._on_changes(paths)
+        except Exception as e:
+            logger.error(f"❌ Ошибка обновления индексов по изменениям {self.project_path}: {e}", error=e)
+            with self._stats_lock:
+                self._errors += 1
+        now = time.monotonic()
+        with self._stats_lock:
+            lag = now - self._pending_since if self._pending_since is not None else 0.0
+            self._pending_since = None
+            self._batches += 1
+            self._files_applied += len(paths)
+            self._last_lag = lag
+            self._max_lag = max(self._max_lag, lag)
+            self._last_applied_at = now
+        logger.debug(f"🔄 {self.project_path}: обновлено файлов {len(paths)}, отставание {lag * 1000:.0f}мс")
+
+    def get_stats(self) -> Dict[str, object]:
+        """Метрики свежести индексов проекта.
+
+        Returns:
+            backend, alive, tracked_files, batches, files_applied, errors,
+            pending_seconds (возраст неприменённых изменений, 0 — индекс
+            актуален), last_lag_ms/max_lag_ms (от изменения до обновления
+            индексов), seconds_since_update
+        """
+        now = time.monotonic()
+        with self._stats_lock:
+            return {
+                "backend": self.backend,
+                "alive": self.alive,
+                "tracked_files": len(self._snapshot),
+                "batches": self._batches,
+                "files_applied": self._files_applied,
+                "errors": self._errors,
+                "pending_seconds": round(now - self._pending_since, 3) if self._pending_since is not None else 0.0,
+                "last_lag_ms": round(self._last_lag * 1000, 1),
+                "max_lag_ms": round(self._max_lag * 1000, 1),
+                "seconds_since_update": (
+                    round(now - self._last_applied_at, 1) if self._last_applied_at is not None else None
+                ),
+            }
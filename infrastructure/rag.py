@@ -1,7 +1,12 @@
 """RAG-система на базе ChromaDB для локального поиска по документам."""
-from typing import List, Dict, Optional, Any, TYPE_CHECKING
+from typing import List, Dict, Optional, Any, Callable, Tuple, TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
 import os
+import threading
+import time
 import ollama
+from infrastructure.embedding_cache import EmbeddingCache, get_embedding_cache
 from utils.config import get_config
 from utils.logger import get_logger
 
@@ -18,6 +23,21 @@ except ImportError:
     CHROMADB_AVAILABLE = False
     logger.warning("⚠️ ChromaDB недоступен. RAG будет работать в режиме без векторной БД.")
 
+# Callback прогресса индексации: (обработано документов, всего документов)
+ProgressCallback = Callable[[int, int], None]
+
+# Документ, ожидающий записи в коллекцию: (id, текст, метаданные)
+PendingDocument = Tuple[str, str, Dict[str, str]]
+
+
+def document_id(text: str) -> str:
+    """ID документа по его содержимому (одинаков во всех процессах).
+
+    Коллекция пишется через upsert: ID решает, заменит ли документ уже
+    сохранённый — заменяется только документ с тем же текстом.
+    """
+    return f"doc_{hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()}"
+
 
 class RAGSystem:
     """Система поиска релевантных документов на базе ChromaDB и nomic-embed-text.
@@ -37,6 +57,17 @@ class RAGSystem:
         self.enabled = CHROMADB_AVAILABLE
         config = get_config()
         self.embedding_model = getattr(config, 'embedding_model', 'nomic-embed-text')
+        self.embedding_batch_size = max(1, getattr(config, 'rag_embedding_batch_size', 32))
+        self.embedding_concurrency = max(1, getattr(config, 'rag_embedding_concurrency', 4))
+        self.embedding_max_retries = max(0, getattr(config, 'rag_embedding_max_retries', 2))
+        
+        # Документы без embedding не пишутся в коллекцию (нулевой вектор портит поиск),
+        # а откладываются до retry_failed_documents()
+        self.failed_documents: List[PendingDocument] = []
+        self._failed_lock = threading.Lock()
+        # None — ещё не знаем, поддерживает ли сервер батчевый /api/embed
+        self._batch_embed_supported: Optional[bool] = None
+        self.embedding_cache: Optional[EmbeddingCache] = get_embedding_cache()
         
         # Типизация для Optional клиента и коллекции
         self.client: Any = None
@@ -86,32 +117,210 @@ class RAGSystem:
             
         Returns:
             Список чисел (вектор embedding)
+            
+        Raises:
+            Exception: Если Ollama не вернул embedding (вызывающий код решает,
+                что делать с документом — нулевой вектор в коллекцию не пишется)
+        """
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(self.embedding_model, text)
+            if cached is not None:
+                return cached
+        
+        response = ollama.embeddings(
+            model=self.embedding_model,
+            prompt=text
+        )
+        embedding = list(response["embedding"])
+        if self.embedding_cache is not None:
+            self.embedding_cache.put(self.embedding_model, text, embedding)
+        return embedding
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Получает embeddings для батча текстов одним запросом.
+        
+        Тексты, уже лежащие в кэше embeddings, в Ollama не отправляются.
+        Использует батчевый /api/embed. Если сервер Ollama его не знает
+        (старая версия), переключается на поштучный /api/embeddings.
+        
+        Args:
+            texts: Тексты батча
+            
+        Returns:
+            Список векторов в порядке текстов
+        """
+        if self.embedding_cache is None:
+            return self._request_embeddings(texts)
+        
+        embeddings = self.embedding_cache.get_many(self.embedding_model, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = self._request_embeddings([texts[i] for i in missing])
+            self.embedding_cache.put_many(self.embedding_model, [texts[i] for i in missing], computed)
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+        return embeddings  # type: ignore[return-value]  # все промахи заполнены выше
+
+    def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Запрашивает embeddings батча у Ollama (без кэша)."""
+        if self._batch_embed_supported is not False:
+            try:
+                response = ollama.embed(model=self.embedding_model, input=texts)
+                embeddings = [list(embedding) for embedding in response["embeddings"]]
+                if len(embeddings) != len(texts):
+                    raise ValueError(f"Ollama вернул {len(embeddings)} embeddings вместо {len(texts)}")
+                self._batch_embed_supported = True
+                return embeddings
+            except ollama.ResponseError as e:
+                # 404 без упоминания модели — эндпоинта нет, а не модели
+                if e.status_code != 404 or "model" in str(e.error).lower():
+                    raise
+                logger.info("ℹ️ Ollama не поддерживает /api/embed, использую поштучный /api/embeddings")
+                self._batch_embed_supported = False
+        return [
+            list(ollama.embeddings(model=self.embedding_model, prompt=text)["embedding"])
+            for text in texts
+        ]
+
+    def _embed_with_retry(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Получает embeddings батча с повторными попытками.
+        
+        Если батч так и не удалось посчитать, документы пробуются по одному,
+        чтобы один проблемный документ не терял весь батч.
+        
+        Args:
+            texts: Тексты батча
+            
+        Returns:
+            Векторы в порядке текстов, None для документов без embedding
+        """
+        last_error: Optional[Exception] = None
+        for attempt in range(self.embedding_max_retries + 1):
+            if attempt > 0:
+                time.sleep(0.5 * 2 ** (attempt - 1))
+            try:
+                return list(self._embed_batch(texts))
+            except Exception as e:
+                last_error = e
+                logger.warning(f"⚠️ Ошибка embeddings для батча из {len(texts)} документов (попытка {attempt + 1}): {e}")
+        
+        if len(texts) == 1:
+            logger.error(f"❌ Не удалось получить embedding документа: {last_error}", error=last_error)
+            return [None]
+        
+        results: List[Optional[List[float]]] = []
+        for text in texts:
+            try:
+                results.append(self._embed_batch([text])[0])
+            except Exception as e:
+                logger.error(f"❌ Не удалось получить embedding документа: {e}", error=e)
+                results.append(None)
+        return results
+
+    def _store_batch(self, batch: List[PendingDocument], embeddings: List[List[float]]) -> bool:
+        """Записывает батч документов с готовыми embeddings в коллекцию.
+        
+        upsert, а не add: ChromaDB пропускает add для существующего ID, и
+        изменённый чанк со стабильным ID ("файл:строки") остался бы старым.
+        
+        Returns:
+            True если запись прошла успешно
         """
         try:
-            response = ollama.embeddings(
-                model=self.embedding_model,
-                prompt=text
+            self.collection.upsert(
+                ids=[doc_id for doc_id, _, _ in batch],
+                embeddings=embeddings,
+                documents=[text for _, text, _ in batch],
+                metadatas=[metadata for _, _, metadata in batch]
             )
-            return response["embedding"]
+            return True
         except Exception as e:
-            logger.error(f"❌ Ошибка получения embedding: {e}", error=e)
-            # Возвращаем пустой embedding (нулевой вектор нужной размерности)
-            # nomic-embed-text обычно возвращает 768 измерений
-            return [0.0] * 768
+            logger.error(f"❌ Ошибка добавления документов в RAG: {e}", error=e)
+            return False
 
-    def add_documents(self, documents: List[str], metadatas: Optional[List[Dict[str, str]]] = None) -> None:
+    def _embed_and_store(
+        self,
+        items: List[PendingDocument],
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> int:
+        """Считает embeddings батчами с ограниченным параллелизмом и пишет их в коллекцию.
+        
+        Батчи считаются в пуле потоков (не больше embedding_concurrency запросов
+        к Ollama одновременно), запись в ChromaDB идёт из вызывающего потока
+        по мере готовности батчей. Документы без embedding и батчи, которые
+        не удалось записать, попадают в failed_documents.
+        
+        Returns:
+            Количество документов, записанных в коллекцию
+        """
+        batch_size = self.embedding_batch_size
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        total = len(items)
+        processed = 0
+        added = 0
+        failed: List[PendingDocument] = []
+        
+        workers = min(self.embedding_concurrency, len(batches))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-embed") as executor:
+            futures = {
+                executor.submit(self._embed_with_retry, [text for _, text, _ in batch]): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                embeddings = future.result()
+                
+                ready = [(item, vector) for item, vector in zip(batch, embeddings) if vector is not None]
+                failed.extend(item for item, vector in zip(batch, embeddings) if vector is None)
+                if ready:
+                    if self._store_batch([item for item, _ in ready], [vector for _, vector in ready]):
+                        added += len(ready)
+                    else:
+                        failed.extend(item for item, _ in ready)
+                
+                processed += len(batch)
+                if progress_callback is not None:
+                    progress_callback(processed, total)
+        
+        if failed:
+            with self._failed_lock:
+                self.failed_documents.extend(failed)
+            logger.warning(
+                f"⚠️ {len(failed)} из {total} документов не добавлены в RAG и отложены "
+                f"(повтор через retry_failed_documents)"
+            )
+        return added
+
+    def add_documents(
+        self,
+        documents: List[str],
+        metadatas: Optional[List[Dict[str, str]]] = None,
+        ids: Optional[List[str]] = None,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> int:
         """Добавляет документы в коллекцию.
         
+        Embeddings считаются батчами через /api/embed, несколько батчей
+        параллельно. Документы, для которых embedding получить не удалось,
+        не пишутся в коллекцию, а откладываются в failed_documents.
+        
         Args:
             documents: Список текстов документов
             metadatas: Опциональные метаданные для каждого документа
+            ids: Опциональные стабильные ID документов (по умолчанию — document_id
+                текста; одинаковые тексты записываются одним документом)
+            progress_callback: Опциональный callback (обработано, всего),
+                вызывается после каждого батча
+            
+        Returns:
+            Количество документов, добавленных в коллекцию
         """
         if not self.enabled or not self.collection:
             logger.debug("RAG без ChromaDB: документы не сохраняются")
-            return
+            return 0
         
         if not documents:
-            return
+            return 0
         
         if metadatas is None:
             metadatas = [{}] * len(documents)
@@ -119,25 +328,38 @@ class RAGSystem:
             metadatas = [{}] * len(documents)
         
         # Генерируем ID для документов
-        ids = [f"doc_{i}_{hash(doc) % 1000000}" for i, doc in enumerate(documents)]
+        if ids is None or len(ids) != len(documents):
+            ids = [document_id(doc) for doc in documents]
         
-        # Получаем embeddings для всех документов
-        embeddings: List[List[float]] = []
-        for doc in documents:
-            embedding = self._get_embedding(doc)
-            embeddings.append(embedding)
+        # upsert не принимает повторяющиеся ID в одном батче: остаётся последний
+        items = list({doc_id: (doc_id, doc, meta) for doc_id, doc, meta in zip(ids, documents, metadatas)}.values())
+        added = self._embed_and_store(items, progress_callback)
+        if added:
+            logger.info(f"✅ Добавлено {added} документов в RAG")
+        return added
+
+    def retry_failed_documents(self, progress_callback: Optional[ProgressCallback] = None) -> int:
+        """Повторно пытается добавить отложенные документы.
         
-        # Добавляем в коллекцию
-        try:
-            self.collection.add(
-                ids=ids,
-                embeddings=embeddings,
-                documents=documents,
-                metadatas=metadatas
-            )
-            logger.info(f"✅ Добавлено {len(documents)} документов в RAG")
-        except Exception as e:
-            logger.error(f"❌ Ошибка добавления документов в RAG: {e}", error=e)
+        Args:
+            progress_callback: Опциональный callback (обработано, всего)
+            
+        Returns:
+            Количество документов, добавленных в коллекцию
+        """
+        if not self.enabled or not self.collection:
+            return 0
+        
+        with self._failed_lock:
+            pending, self.failed_documents = self.failed_documents, []
+        if not pending:
+            return 0
+        
+        logger.info(f"🔄 Повторно добавляю {len(pending)} отложенных документов в RAG")
+        added = self._embed_and_store(pending, progress_callback)
+        if added:
+            logger.info(f"✅ Добавлено {added} отложенных документов в RAG")
+        return added
 
     def get_relevant_context(self, query: str, n_results: int = 4) -> str:
         """Находит релевантный контекст по запросу.
@@ -174,10 +174,9 @@ class ReasoningStreamManager:
             data["summary"] = get_thinking_summary(chunk.content, max_length=150)
         
         json_data = json.dumps(data, ensure_ascii=False)
-        event_id = str(datetime.now().timestamp())
         
+        # Без строки id: — ID событию даёт EventStore при отправке клиенту
         lines = [
-            f"id: {event_id}",
             f"event: {event_type}",
             f"data: {json_data}",
             ""
@@ -500,15 +499,17 @@ class ReasoningStreamManager:
             yield ("done", final_response)
             
         except Exception as e:
-            # Пробрасываем LLMModelUnavailableError наверх для обработки в агенте
-            from infrastructure.local_llm import LLMModelUnavailableError
-            if isinstance(e, LLMModelUnavailableError):
+            # Пробрасываем LLMModelUnavailableError и LLMTimeoutError наверх для
+            # обработки в агенте (обрезанный по таймауту ответ — не результат)
+            from infrastructure.local_llm import LLMModelUnavailableError, LLMTimeoutError
+            if isinstance(e, (LLMModelUnavailableError, LLMTimeoutError)):
                 # Если был thinking блок, отправляем событие прерывания
                 if thinking_started and not thinking_completed:
                     elapsed = int((datetime.now() - start_time).total_seconds() * 1000)
+                    interrupted = "[таймаут]" if isinstance(e, LLMTimeoutError) else "[модель недоступна]"
                     try:
                         event = await self.create_thinking_event(ThinkingChunk(
-                            content=thinking_buffer or "[модель недоступна]",
+                            content=thinking_buffer or interrupted,
                             status=ThinkingStatus.INTERRUPTED,
                             stage=stage,
                             elapsed_ms=elapsed,
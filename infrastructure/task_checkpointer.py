@@ -2,13 +2,38 @@
 
 Позволяет сохранять и восстанавливать состояние workflow после падения backend
 или обновления страницы frontend.
+
+Checkpoint пишется после каждого узла workflow, поэтому запись сделана
+дешёвой:
+- state.json — снимок состояния, переписывается только при компактизации
+- state-{generation}.log — append-only журнал изменений: после этапа
+  дописываются только поля, изменившиеся с прошлого checkpoint
+- каждые compact_every записей журнал сворачивается в новый снимок;
+  снимок ссылается на поколение своего журнала, поэтому падение во время
+  компактизации не смешивает старый журнал с новым снимком
+- файлы снимков и метаданных пишутся атомарно (временный файл + rename)
+- fsync журналов выполняется пачкой раз в fsync_interval и сразу при
+  смене статуса задачи (completed, failed, paused)
+- запись на диск и в индекс идёт в отдельном потоке (background_writes),
+  в event loop остаётся только сериализация
+- список задач хранится в индексе SQLite (TaskIndex): списки, история
+  с пагинацией и очистка старых задач — индексированные запросы, без
+  обхода директорий задач
 """
+import atexit
 import json
+import os
 import shutil
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 
 from infrastructure.workflow_state import AgentState
 from utils.logger import get_logger
@@ -16,6 +41,21 @@ from utils.logger import get_logger
 
 logger = get_logger()
 
+# Запись журнала: длина и crc32 полезной нагрузки, затем JSON
+_LOG_RECORD_HEADER = struct.Struct(">II")
+
+_INDEX_FILE = "index.sqlite"
+# Индекс в JSON из прежних версий (переносится в SQLite при первом запуске)
+_LEGACY_INDEX_FILE = "index.json"
+_SNAPSHOT_FILE = "state.json"
+_METADATA_FILE = "metadata.json"
+
+# Статусы незавершённых задач
+_ACTIVE_STATUSES = ("running", "paused")
+
+# Ключ снимка с поколением журнала (в AgentState не попадает)
+_GENERATION_KEY = "_log_generation"
+
 
 @dataclass
 class TaskMetadata:
@@ -34,41 +74,243 @@ class TaskMetadata:
     
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> "TaskMetadata":
-        return cls(**data)
+        # В metadata.json могут быть дополнительные поля (error у failed задач)
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+def _atomic_write(path: Path, data: str, sync: bool = False) -> None:
+    """Записывает файл целиком через временный файл и rename."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(data)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_log(path: Path) -> list[dict[str, Any]]:
+    """Читает записи журнала; оборванный или повреждённый хвост отбрасывается."""
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return []
+    
+    records: list[dict[str, Any]] = []
+    offset = 0
+    while offset + _LOG_RECORD_HEADER.size <= len(data):
+        length, crc = _LOG_RECORD_HEADER.unpack_from(data, offset)
+        start = offset + _LOG_RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            logger.warning(f"⚠️ Журнал checkpoint {path} оборван, прочитано записей: {len(records)}")
+            break
+        records.append(json.loads(payload))
+        offset = start + length
+    return records
+
+
+class TaskIndex:
+    """Индекс задач в SQLite (статус, время обновления, модель, этап).
+    
+    Списки задач, история с пагинацией и очистка истёкших задач идут
+    индексированными запросами, без обхода директорий checkpoint.
+    Потокобезопасен (одно соединение под Lock).
+    """
+    
+    _COLUMNS = (
+        "task_id", "task_text", "created_at", "updated_at",
+        "last_stage", "status", "iteration", "model", "error"
+    )
+    
+    def __init__(self, path: Path) -> None:
+        """Открывает (или создаёт) индекс.
+        
+        Args:
+            path: Файл SQLite
+        """
+        self.path = path
+        self.created = not path.exists()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Индекс восстанавливается из metadata.json, fsync на каждую задачу не нужен
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "task_id TEXT PRIMARY KEY, task_text TEXT NOT NULL, "
+            "created_at TEXT NOT NULL, updated_at TEXT NOT NULL, "
+            "last_stage TEXT NOT NULL, status TEXT NOT NULL, "
+            "iteration INTEGER NOT NULL, model TEXT, error TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_updated ON tasks (updated_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_updated ON tasks (status, updated_at)")
+        self._conn.commit()
+    
+    def upsert(self, metadata: dict[str, Any]) -> None:
+        """Добавляет задачу или обновляет её (created_at не меняется)."""
+        row = tuple(metadata.get(column) for column in self._COLUMNS)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tasks (task_id, task_text, created_at, updated_at, last_stage, "
+                "status, iteration, model, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(task_id) DO UPDATE SET task_text = excluded.task_text, "
+                "updated_at = excluded.updated_at, last_stage = excluded.last_stage, "
+                "status = excluded.status, iteration = excluded.iteration, "
+                "model = excluded.model, error = excluded.error",
+                row
+            )
+            self._conn.commit()
+    
+    def get(self, task_id: str) -> Optional[dict[str, Any]]:
+        """Метаданные задачи (None если её нет в индексе)."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return self._row_to_metadata(row) if row is not None else None
+    
+    def delete(self, task_ids: list[str]) -> None:
+        """Удаляет задачи из индекса."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM tasks WHERE task_id = ?", [(t,) for t in task_ids])
+            self._conn.commit()
+    
+    def query(
+        self,
+        statuses: Optional[tuple[str, ...]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> list[dict[str, Any]]:
+        """Задачи, новые первые.
+        
+        Args:
+            statuses: Только задачи с этими статусами (None — все)
+            limit: Размер страницы (None — без ограничения)
+            offset: Смещение страницы
+        """
+        query = "SELECT * FROM tasks"
+        params: list[Any] = []
+        if statuses:
+            query += f" WHERE status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+        query += " ORDER BY updated_at DESC LIMIT ? OFFSET ?"
+        params.extend([-1 if limit is None else limit, offset])
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row_to_metadata(row) for row in rows]
+    
+    def count(self, statuses: Optional[tuple[str, ...]] = None) -> int:
+        """Количество задач (с фильтром по статусам)."""
+        query = "SELECT COUNT(*) FROM tasks"
+        params: tuple[str, ...] = ()
+        if statuses:
+            query += f" WHERE status IN ({', '.join('?' * len(statuses))})"
+            params = statuses
+        with self._lock:
+            return int(self._conn.execute(query, params).fetchone()[0])
+    
+    def expired(self, statuses: tuple[str, ...], cutoff: str) -> list[str]:
+        """ID задач с указанными статусами, не обновлявшихся с cutoff (по индексу)."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT task_id FROM tasks WHERE status IN ({', '.join('?' * len(statuses))}) "
+                "AND updated_at < ?",
+                (*statuses, cutoff)
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def task_ids(self) -> set[str]:
+        """ID всех задач индекса."""
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT task_id FROM tasks")}
+    
+    @staticmethod
+    def _row_to_metadata(row: sqlite3.Row) -> dict[str, Any]:
+        """Строка таблицы → словарь метаданных (без пустого error)."""
+        metadata = dict(row)
+        if not metadata.get("error"):
+            metadata.pop("error", None)
+        return metadata
+    
+    def close(self) -> None:
+        """Закрывает соединение."""
+        with self._lock:
+            self._conn.close()
 
 
 class TaskCheckpointer:
-    """Менеджер checkpoint для сохранения состояния задач в JSON-файлы.
+    """Менеджер checkpoint для сохранения состояния задач.
     
     Структура хранения:
     .task_checkpoints/
+      index.sqlite        # TaskIndex: метаданные всех задач для списков
       {task_id}/
         metadata.json     # TaskMetadata
-        state.json        # AgentState (сериализованный)
+        state.json        # Снимок AgentState (сериализованный)
+        state-{gen}.log   # Изменения AgentState после снимка
     """
     
     def __init__(
-        self, 
+        self,
         checkpoint_dir: str = ".task_checkpoints",
-        max_age_hours: int = 24
+        max_age_hours: int = 24,
+        compact_every: int = 16,
+        fsync_interval: float = 1.0,
+        background_writes: bool = False
     ) -> None:
         """Инициализация TaskCheckpointer.
         
         Args:
             checkpoint_dir: Директория для хранения checkpoint
             max_age_hours: Максимальный возраст checkpoint в часах (старые удаляются)
+            compact_every: Записей журнала до сворачивания в новый снимок
+            fsync_interval: Интервал пакетного fsync журналов (секунды)
+            background_writes: Писать на диск в отдельном потоке
+                (save_checkpoint не ждёт диска; flush() дожидается записи)
         """
         self.checkpoint_dir = Path(checkpoint_dir)
         self.max_age_hours = max_age_hours
+        self.compact_every = max(1, compact_every)
+        self.fsync_interval = fsync_interval
         self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
         
+        # Поля последнего checkpoint каждой задачи (для вычисления изменений)
+        self._lock = threading.Lock()
+        self._last_fields: dict[str, dict[str, tuple[Any, str]]] = {}
+        self._generations: dict[str, str] = {}
+        self._log_records: dict[str, int] = {}
+        # Последние метаданные задачи (смена статуса без чтения индекса)
+        self._metadata: dict[str, dict[str, Any]] = {}
+        # created_at первого checkpoint задачи (заполняет поток записи)
+        self._created_at: dict[str, str] = {}
+        
+        # Состояние записи (под _io_lock)
+        self._io_lock = threading.Lock()
+        self._dirty_logs: set[Path] = set()
+        self._last_sync = time.monotonic()
+        
+        self._executor: Optional[ThreadPoolExecutor] = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+            if background_writes else None
+        )
+        
+        # Метрики
+        self.snapshots_written = 0
+        self.deltas_written = 0
+        self.bytes_written = 0
+        
+        self.index = TaskIndex(self.checkpoint_dir / _INDEX_FILE)
+        if self.index.created:
+            self._build_index()
+        
         # Очистка старых checkpoint при инициализации
         self._cleanup_old_checkpoints()
     
     def _get_task_dir(self, task_id: str) -> Path:
         """Возвращает директорию для конкретной задачи."""
         return self.checkpoint_dir / task_id
-    
+
     def _serialize_state(self, state: AgentState) -> dict[str, Any]:
         """Сериализует AgentState в JSON-совместимый dict.
         
@@ -196,6 +438,7 @@ class TaskCheckpointer:
             "tests": data.get("tests", ""),
             "code": data.get("code", ""),
             "validation_results": data.get("validation_results", {}),
+            "validation_fingerprints": data.get("validation_fingerprints"),
             "debug_result": data.get("debug_result"),
             "reflection_result": data.get("reflection_result"),
             "critic_report": data.get("critic_report"),
@@ -208,77 +451,272 @@ class TaskCheckpointer:
         
         return state
     
+    # === Индекс задач ===
+    
+    def _build_index(self) -> None:
+        """Заполняет новый индекс: из index.json прежних версий или по metadata.json задач."""
+        legacy_path = self.checkpoint_dir / _LEGACY_INDEX_FILE
+        entries: dict[str, dict[str, Any]] = {}
+        if legacy_path.exists():
+            try:
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+            except Exception as e:
+                logger.warning(f"⚠️ Прежний индекс checkpoint не читается, перестраиваю: {e}")
+        
+        if not entries:
+            for task_dir in self.checkpoint_dir.iterdir():
+                metadata = self._read_metadata_file(task_dir)
+                if metadata is not None:
+                    entries[task_dir.name] = metadata
+        
+        for task_id, metadata in entries.items():
+            try:
+                self.index.upsert({**metadata, "task_id": task_id})
+            except Exception as e:
+                logger.debug(f"⚠️ Задача {task_id} не добавлена в индекс: {e}")
+        legacy_path.unlink(missing_ok=True)
+        if entries:
+            logger.info(f"📇 Индекс checkpoint построен: {len(entries)} задач")
+    
+    @staticmethod
+    def _read_metadata_file(task_dir: Path) -> Optional[dict[str, Any]]:
+        """Читает metadata.json задачи (None если его нет или он не читается)."""
+        metadata_path = task_dir / _METADATA_FILE
+        if not task_dir.is_dir() or not metadata_path.exists():
+            return None
+        try:
+            with open(metadata_path, "r", encoding="utf-8") as f:
+                metadata: dict[str, Any] = json.load(f)
+            return metadata
+        except Exception as e:
+            logger.debug(f"⚠️ Ошибка загрузки метаданных задачи из {metadata_path}: {e}")
+            return None
+    
+    # === Запись ===
+    
+    def _encode_state(
+        self,
+        state: AgentState,
+        previous: Optional[dict[str, tuple[Any, str]]] = None
+    ) -> dict[str, tuple[Any, str]]:
+        """Сериализует каждое поле AgentState в JSON строку.
+        
+        Args:
+            state: Состояние
+            previous: Поля прошлого checkpoint задачи: строка, которая
+                осталась тем же объектом, заново не кодируется
+        
+        Returns:
+            {поле: (значение, JSON)}
+        """
+        try:
+            serialized = self._serialize_state(state)
+        except Exception as serialize_error:
+            # Fallback: сохраняем минимум для восстановления
+            logger.warning(f"⚠️ Fallback сериализация: {serialize_error}")
+            serialized = self._serialize_state_minimal(state)
+        
+        encoded: dict[str, tuple[Any, str]] = {}
+        for key, value in serialized.items():
+            last = previous.get(key) if previous else None
+            if last is not None and isinstance(value, str) and last[0] is value:
+                encoded[key] = last
+            else:
+                encoded[key] = (value, json.dumps(value, ensure_ascii=False))
+        return encoded
+    
+    @staticmethod
+    def _join_fields(encoded: dict[str, str]) -> str:
+        """Собирает JSON объект из уже сериализованных полей."""
+        return "{" + ", ".join(f"{json.dumps(k, ensure_ascii=False)}: {v}" for k, v in encoded.items()) + "}"
+    
     def save_checkpoint(
-        self, 
-        task_id: str, 
-        state: AgentState, 
+        self,
+        task_id: str,
+        state: AgentState,
         stage: str,
         status: str = "running"
     ) -> None:
         """Сохраняет checkpoint после выполнения этапа.
         
+        Записываются только поля, изменившиеся с прошлого checkpoint задачи.
+        Сериализация выполняется сразу (state дальше меняется узлами),
+        запись на диск — в фоне при background_writes.
+        
         Args:
             task_id: ID задачи
             state: Текущее состояние AgentState
             stage: Название завершенного этапа
             status: Статус задачи (running, paused, completed, failed)
         """
-        task_dir = self._get_task_dir(task_id)
-        task_dir.mkdir(parents=True, exist_ok=True)
-        
         now = datetime.now().isoformat()
+        with self._lock:
+            previous = self._last_fields.get(task_id)
+        encoded = self._encode_state(state, previous)
         
-        # Загружаем существующие метаданные или создаем новые
-        metadata_path = task_dir / "metadata.json"
-        if metadata_path.exists():
-            with open(metadata_path, "r", encoding="utf-8") as f:
-                existing = json.load(f)
-                created_at = existing.get("created_at", now)
-        else:
-            created_at = now
-        
-        # Сохраняем метаданные
         metadata = TaskMetadata(
             task_id=task_id,
             task_text=state.get("task", "")[:200],  # Ограничиваем длину
-            created_at=created_at,
+            created_at=now,
             updated_at=now,
             last_stage=stage,
             status=status,
             iteration=state.get("iteration", 0),
             model=state.get("model")
-        )
-        
-        with open(metadata_path, "w", encoding="utf-8") as f:
-            json.dump(metadata.to_dict(), f, ensure_ascii=False, indent=2)
-        
-        # Сохраняем состояние с fallback на минимальные данные
-        state_path = task_dir / "state.json"
-        
-        try:
-            serialized = self._serialize_state(state)
-        except Exception as serialize_error:
-            # Fallback: сохраняем минимум для восстановления
-            logger.warning(f"⚠️ Fallback сериализация: {serialize_error}")
-            serialized = self._serialize_state_minimal(state)
-        
-        with open(state_path, "w", encoding="utf-8") as f:
-            json.dump(serialized, f, ensure_ascii=False, indent=2)
+        ).to_dict()
         
+        with self._lock:
+            self._metadata[task_id] = metadata
+            records = self._log_records.get(task_id, 0)
+            snapshot: Optional[str] = None
+            delta: Optional[bytes] = None
+            
+            if previous is None or records + 1 >= self.compact_every:
+                # Первый checkpoint задачи в этом процессе или журнал вырос — новый снимок
+                generation = f"{time.time_ns():x}"
+                self._generations[task_id] = generation
+                self._log_records[task_id] = 0
+                snapshot = self._join_fields(
+                    {**{k: v[1] for k, v in encoded.items()}, _GENERATION_KEY: json.dumps(generation)}
+                )
+            else:
+                generation = self._generations[task_id]
+                changed = {
+                    k: v[1] for k, v in encoded.items()
+                    if k not in previous or (previous[k][1] is not v[1] and previous[k][1] != v[1])
+                }
+                removed = [k for k in previous if k not in encoded]
+                if changed or removed:
+                    self._log_records[task_id] = records + 1
+                    delta = (
+                        '{"stage": ' + json.dumps(stage) + ', "set": ' + self._join_fields(changed)
+                        + ', "del": ' + json.dumps(removed) + "}"
+                    ).encode("utf-8", "surrogatepass")
+            self._last_fields[task_id] = encoded
+        
+        self._submit(
+            self._write_checkpoint, task_id, metadata, generation, snapshot, delta,
+            status != "running"
+        )
         logger.info(f"💾 Checkpoint сохранён: task={task_id[:8]}..., stage={stage}, status={status}")
     
+    def _submit(self, func: Any, *args: Any) -> None:
+        """Выполняет запись в фоновом потоке или сразу."""
+        if self._executor is not None:
+            self._executor.submit(func, *args)
+        else:
+            func(*args)
+    
+    def _write_checkpoint(
+        self,
+        task_id: str,
+        metadata: dict[str, Any],
+        generation: str,
+        snapshot: Optional[str],
+        delta: Optional[bytes],
+        durable: bool
+    ) -> None:
+        """Пишет индекс, метаданные и снимок или запись журнала (поток записи)."""
+        with self._io_lock:
+            try:
+                self._index_metadata(task_id, metadata)
+                task_dir = self._get_task_dir(task_id)
+                task_dir.mkdir(parents=True, exist_ok=True)
+                
+                if snapshot is not None:
+                    _atomic_write(task_dir / _SNAPSHOT_FILE, snapshot, sync=True)
+                    # Журналы прошлых поколений снимком уже учтены
+                    for old_log in task_dir.glob("state-*.log"):
+                        self._dirty_logs.discard(old_log)
+                        old_log.unlink(missing_ok=True)
+                    self.snapshots_written += 1
+                    self.bytes_written += len(snapshot)
+                elif delta is not None:
+                    log_path = task_dir / f"state-{generation}.log"
+                    with open(log_path, "ab") as f:
+                        f.write(_LOG_RECORD_HEADER.pack(len(delta), zlib.crc32(delta)) + delta)
+                    self._dirty_logs.add(log_path)
+                    self.deltas_written += 1
+                    self.bytes_written += len(delta)
+                
+                metadata_json = json.dumps(metadata, ensure_ascii=False, indent=2)
+                _atomic_write(task_dir / _METADATA_FILE, metadata_json, sync=durable)
+                self.bytes_written += len(metadata_json)
+                self._sync_locked(force=durable)
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось записать checkpoint {task_id[:8]}...: {e}")
+    
+    def _index_metadata(self, task_id: str, metadata: dict[str, Any]) -> None:
+        """Обновляет задачу в индексе (поток записи).
+        
+        created_at задачи — от первого checkpoint: индекс его не меняет,
+        после перезапуска он читается из индекса один раз и запоминается.
+        """
+        self.index.upsert(metadata)
+        with self._lock:
+            created_at = self._created_at.get(task_id)
+        if created_at is None:
+            existing = self.index.get(task_id)
+            created_at = existing["created_at"] if existing is not None else metadata["created_at"]
+            with self._lock:
+                self._created_at[task_id] = created_at
+        metadata["created_at"] = created_at
+    
+    def _sync_locked(self, force: bool = False) -> None:
+        """Пакетный fsync журналов (под _io_lock)."""
+        if not force and time.monotonic() - self._last_sync < self.fsync_interval:
+            return
+        for log_path in self._dirty_logs:
+            try:
+                fd = os.open(log_path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except FileNotFoundError:
+                pass
+        self._dirty_logs.clear()
+        self._last_sync = time.monotonic()
+    
+    def _sync(self) -> None:
+        """Принудительный fsync журналов."""
+        with self._io_lock:
+            try:
+                self._sync_locked(force=True)
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось синхронизировать checkpoint: {e}")
+    
+    def flush(self) -> None:
+        """Дожидается записи всех checkpoint и синхронизирует их с диском."""
+        if self._executor is not None:
+            self._executor.submit(self._sync).result()
+        else:
+            self._sync()
+    
+    def close(self) -> None:
+        """Записывает всё незаписанное, останавливает поток записи и закрывает индекс."""
+        self.flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.index.close()
+    
+    # === Чтение ===
+    
     def load_checkpoint(self, task_id: str) -> tuple[AgentState, TaskMetadata] | None:
         """Загружает checkpoint для задачи.
         
         Args:
             task_id: ID задачи
-            
+        
         Returns:
             Tuple (AgentState, TaskMetadata) или None если checkpoint не найден
         """
+        self.flush()
         task_dir = self._get_task_dir(task_id)
-        metadata_path = task_dir / "metadata.json"
-        state_path = task_dir / "state.json"
+        metadata_path = task_dir / _METADATA_FILE
+        state_path = task_dir / _SNAPSHOT_FILE
         
         if not metadata_path.exists() or not state_path.exists():
             logger.warning(f"⚠️ Checkpoint не найден: {task_id}")
@@ -291,81 +729,86 @@ class TaskCheckpointer:
             
             with open(state_path, "r", encoding="utf-8") as f:
                 state_dict = json.load(f)
+            
+            # Снимки до появления журнала поколения не имеют
+            generation = state_dict.pop(_GENERATION_KEY, None)
+            if generation is not None:
+                for record in _read_log(task_dir / f"state-{generation}.log"):
+                    state_dict.update(record.get("set", {}))
+                    for key in record.get("del", []):
+                        state_dict.pop(key, None)
             state = self._deserialize_state(state_dict)
             
             logger.info(f"📂 Checkpoint загружен: task={task_id[:8]}..., last_stage={metadata.last_stage}")
             return state, metadata
-            
+        
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки checkpoint: {e}", error=e)
             return None
     
-    def list_active_tasks(self) -> list[TaskMetadata]:
-        """Возвращает список незавершенных задач.
+    def list_active_tasks(self, limit: Optional[int] = None, offset: int = 0) -> list[TaskMetadata]:
+        """Возвращает список незавершенных задач (новые первые).
+        
+        Args:
+            limit: Размер страницы (None — все)
+            offset: Смещение страницы
         
         Returns:
             Список TaskMetadata для задач со статусом running или paused
         """
-        active_tasks: list[TaskMetadata] = []
-        
-        if not self.checkpoint_dir.exists():
-            return active_tasks
-        
-        for task_dir in self.checkpoint_dir.iterdir():
-            if not task_dir.is_dir():
-                continue
-            
-            metadata_path = task_dir / "metadata.json"
-            if not metadata_path.exists():
-                continue
-            
-            try:
-                with open(metadata_path, "r", encoding="utf-8") as f:
-                    metadata_dict = json.load(f)
-                metadata = TaskMetadata.from_dict(metadata_dict)
-                
-                # Включаем только активные задачи
-                if metadata.status in ("running", "paused"):
-                    active_tasks.append(metadata)
-                    
-            except Exception as e:
-                logger.warning(f"⚠️ Не удалось прочитать metadata для {task_dir.name}: {e}")
-                continue
-        
-        # Сортируем по времени обновления (новые первые)
-        active_tasks.sort(key=lambda x: x.updated_at, reverse=True)
-        
-        return active_tasks
+        rows = self.index.query(_ACTIVE_STATUSES, limit=limit, offset=offset)
+        return [TaskMetadata.from_dict(row) for row in rows]
     
-    def list_all_tasks(self) -> list[TaskMetadata]:
-        """Возвращает список всех задач (включая завершенные).
+    def list_all_tasks(self, limit: Optional[int] = None, offset: int = 0) -> list[TaskMetadata]:
+        """Возвращает список всех задач, включая завершенные (новые первые).
+        
+        Args:
+            limit: Размер страницы (None — все)
+            offset: Смещение страницы
         
         Returns:
             Список TaskMetadata
         """
-        all_tasks: list[TaskMetadata] = []
-        
-        if not self.checkpoint_dir.exists():
-            return all_tasks
+        rows = self.index.query(limit=limit, offset=offset)
+        return [TaskMetadata.from_dict(row) for row in rows]
+    
+    def count_tasks(self, active_only: bool = False) -> int:
+        """Количество задач в индексе.
         
-        for task_dir in self.checkpoint_dir.iterdir():
-            if not task_dir.is_dir():
-                continue
-            
-            metadata_path = task_dir / "metadata.json"
-            if not metadata_path.exists():
-                continue
-            
-            try:
-                with open(metadata_path, "r", encoding="utf-8") as f:
-                    metadata_dict = json.load(f)
-                all_tasks.append(TaskMetadata.from_dict(metadata_dict))
-            except Exception as e:
-                logger.debug(f"⚠️ Ошибка загрузки метаданных задачи из {metadata_path}: {e}")
-                continue
+        Args:
+            active_only: Только running и paused
+        """
+        return self.index.count(_ACTIVE_STATUSES if active_only else None)
+    
+    # === Статус задачи ===
+    
+    def _set_status(self, task_id: str, status: str, error: str = "") -> bool:
+        """Меняет статус задачи в индексе и metadata.json.
         
-        all_tasks.sort(key=lambda x: x.updated_at, reverse=True)
-        return all_tasks
+        Returns:
+            True если задача найдена
+        """
+        with self._lock:
+            metadata = self._metadata.get(task_id)
+        if metadata is None:
+            # Задача из прошлого запуска: её метаданные есть только в индексе
+            metadata = self.index.get(task_id)
+            if metadata is None:
+                return False
+        metadata = {**metadata, "status": status, "updated_at": datetime.now().isoformat()}
+        if error:
+            metadata["error"] = error[:500]  # Ограничиваем длину
+        
+        with self._lock:
+            self._metadata[task_id] = metadata
+            generation = self._generations.get(task_id, "")
+            if status in ("completed", "failed"):
+                # Завершённая задача больше не пишет изменения
+                self._last_fields.pop(task_id, None)
+                self._metadata.pop(task_id, None)
+        
+        self._submit(self._write_checkpoint, task_id, metadata, generation, None, None, True)
+        return True
     
     def mark_completed(self, task_id: str) -> None:
         """Помечает задачу как завершенную.
@@ -373,25 +816,8 @@ class TaskCheckpointer:
         Args:
             task_id: ID задачи
         """
-        task_dir = self._get_task_dir(task_id)
-        metadata_path = task_dir / "metadata.json"
-        
-        if not metadata_path.exists():
-            return
-        
-        try:
-            with open(metadata_path, "r", encoding="utf-8") as f:
-                metadata_dict = json.load(f)
-            
-            metadata_dict["status"] = "completed"
-            metadata_dict["updated_at"] = datetime.now().isoformat()
-            
-            with open(metadata_path, "w", encoding="utf-8") as f:
-                json.dump(metadata_dict, f, ensure_ascii=False, indent=2)
-            
+        if self._set_status(task_id, "completed"):
             logger.info(f"✅ Задача помечена как завершенная: {task_id[:8]}...")
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось обновить статус задачи: {e}")
     
     def mark_failed(self, task_id: str, error: str = "") -> None:
         """Помечает задачу как проваленную.
@@ -400,27 +826,8 @@ class TaskCheckpointer:
             task_id: ID задачи
             error: Сообщение об ошибке
         """
-        task_dir = self._get_task_dir(task_id)
-        metadata_path = task_dir / "metadata.json"
-        
-        if not metadata_path.exists():
-            return
-        
-        try:
-            with open(metadata_path, "r", encoding="utf-8") as f:
-                metadata_dict = json.load(f)
-            
-            metadata_dict["status"] = "failed"
-            metadata_dict["updated_at"] = datetime.now().isoformat()
-            if error:
-                metadata_dict["error"] = error[:500]  # Ограничиваем длину
-            
-            with open(metadata_path, "w", encoding="utf-8") as f:
-                json.dump(metadata_dict, f, ensure_ascii=False, indent=2)
-            
+        if self._set_status(task_id, "failed", error):
             logger.info(f"❌ Задача помечена как проваленная: {task_id[:8]}...")
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось обновить статус задачи: {e}")
     
     def mark_paused(self, task_id: str) -> None:
         """Помечает задачу как приостановленную (для возобновления).
@@ -428,35 +835,30 @@ class TaskCheckpointer:
         Args:
             task_id: ID задачи
         """
-        task_dir = self._get_task_dir(task_id)
-        metadata_path = task_dir / "metadata.json"
-        
-        if not metadata_path.exists():
-            return
-        
-        try:
-            with open(metadata_path, "r", encoding="utf-8") as f:
-                metadata_dict = json.load(f)
-            
-            metadata_dict["status"] = "paused"
-            metadata_dict["updated_at"] = datetime.now().isoformat()
-            
-            with open(metadata_path, "w", encoding="utf-8") as f:
-                json.dump(metadata_dict, f, ensure_ascii=False, indent=2)
-            
+        if self._set_status(task_id, "paused"):
             logger.info(f"⏸️ Задача приостановлена: {task_id[:8]}...")
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось обновить статус задачи: {e}")
+    
+    def _forget(self, task_ids: list[str]) -> None:
+        """Убирает задачи из индекса и состояния в памяти."""
+        self.index.delete(task_ids)
+        with self._lock:
+            for task_id in task_ids:
+                self._last_fields.pop(task_id, None)
+                self._generations.pop(task_id, None)
+                self._log_records.pop(task_id, None)
+                self._metadata.pop(task_id, None)
+                self._created_at.pop(task_id, None)
     
     def delete_checkpoint(self, task_id: str) -> bool:
         """Удаляет checkpoint задачи.
         
         Args:
             task_id: ID задачи
-            
+        
         Returns:
             True если удалено успешно, False если не найдено
         """
+        self.flush()
         task_dir = self._get_task_dir(task_id)
         
         if not task_dir.exists():
@@ -464,6 +866,7 @@ class TaskCheckpointer:
         
         try:
             shutil.rmtree(task_dir)
+            self._forget([task_id])
             logger.info(f"🗑️ Checkpoint удалён: {task_id[:8]}...")
             return True
         except Exception as e:
@@ -471,48 +874,55 @@ class TaskCheckpointer:
             return False
     
     def _cleanup_old_checkpoints(self) -> None:
-        """Удаляет checkpoint старше max_age_hours."""
+        """Удаляет checkpoint старше max_age_hours.
+        
+        Истёкшие задачи выбираются запросом по индексу (status, updated_at),
+        без чтения их файлов. Директории вне индекса (созданные вручную или
+        другим процессом) находятся сравнением имён с индексом и либо
+        попадают в индекс, либо удаляются.
+        """
         if not self.checkpoint_dir.exists():
             return
         
         cutoff = datetime.now() - timedelta(hours=self.max_age_hours)
-        removed_count = 0
         
-        for task_dir in self.checkpoint_dir.iterdir():
-            if not task_dir.is_dir():
-                continue
-            
-            metadata_path = task_dir / "metadata.json"
-            if not metadata_path.exists():
-                # Удаляем директорию без метаданных
-                try:
-                    shutil.rmtree(task_dir)
-                    removed_count += 1
-                except Exception as e:
-                    logger.debug(f"⚠️ Ошибка удаления старого checkpoint {task_dir}: {e}")
-                continue
-            
+        # Удаляем старые завершенные/проваленные задачи
+        removed = self.index.expired(("completed", "failed"), cutoff.isoformat())
+        for task_id in removed:
+            shutil.rmtree(self._get_task_dir(task_id), ignore_errors=True)
+        
+        indexed = self.index.task_ids()
+        with os.scandir(self.checkpoint_dir) as entries:
+            orphans = [Path(e.path) for e in entries if e.is_dir() and e.name not in indexed]
+        
+        for task_dir in orphans:
+            metadata = self._read_metadata_file(task_dir)
             try:
-                with open(metadata_path, "r", encoding="utf-8") as f:
-                    metadata_dict = json.load(f)
-                
-                updated_at = datetime.fromisoformat(metadata_dict.get("updated_at", ""))
+                if metadata is None:
+                    # Удаляем директорию без метаданных
+                    shutil.rmtree(task_dir)
+                    removed.append(task_dir.name)
+                    continue
                 
-                # Удаляем старые завершенные/проваленные задачи
-                if updated_at < cutoff and metadata_dict.get("status") in ("completed", "failed"):
+                updated_at = datetime.fromisoformat(metadata.get("updated_at", ""))
+                if updated_at < cutoff and metadata.get("status") in ("completed", "failed"):
                     shutil.rmtree(task_dir)
-                    removed_count += 1
-                    
+                    removed.append(task_dir.name)
+                else:
+                    self.index.upsert({**metadata, "task_id": task_dir.name})
             except Exception as e:
                 logger.debug(f"⚠️ Ошибка удаления старого checkpoint {task_dir}: {e}")
                 continue
         
-        if removed_count > 0:
-            logger.info(f"🧹 Очищено старых checkpoint: {removed_count}")
+        self._forget(removed)
+        
+        if removed:
+            logger.info(f"🧹 Очищено старых checkpoint: {len(removed)}")
 
 
 # Глобальный экземпляр (Singleton)
 _checkpointer: TaskCheckpointer | None = None
+_checkpointer_lock = threading.Lock()
 
 
 def get_task_checkpointer() -> TaskCheckpointer:
@@ -524,16 +934,24 @@ def get_task_checkpointer() -> TaskCheckpointer:
     global _checkpointer
     
     if _checkpointer is None:
-        from utils.config import get_config
-        config = get_config()
-        
-        checkpoint_dir = getattr(config, "persistence_checkpoint_directory", ".task_checkpoints")
-        max_age = getattr(config, "persistence_max_checkpoint_age_hours", 24)
-        
-        _checkpointer = TaskCheckpointer(
-            checkpoint_dir=checkpoint_dir,
-            max_age_hours=max_age
-        )
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                from utils.config import get_config
+                config = get_config()
+                
+                checkpoint_dir = getattr(config, "persistence_checkpoint_directory", ".task_checkpoints")
+                max_age = getattr(config, "persistence_max_checkpoint_age_hours", 24)
+                
+                checkpointer = TaskCheckpointer(
+                    checkpoint_dir=checkpoint_dir,
+                    max_age_hours=max_age,
+                    compact_every=config.persistence_compact_every,
+                    fsync_interval=config.persistence_fsync_interval,
+                    background_writes=config.persistence_background_writes
+                )
+                # Незаписанные checkpoint не теряются при штатной остановке
+                atexit.register(checkpointer.close)
+                _checkpointer = checkpointer
     
     return _checkpointer
 
@@ -541,4 +959,6 @@ def get_task_checkpointer() -> TaskCheckpointer:
 def reset_task_checkpointer() -> None:
     """Сбрасывает глобальный TaskCheckpointer (для тестов)."""
     global _checkpointer
+    if _checkpointer is not None:
+        _checkpointer.close()
     _checkpointer = None
@@ -0,0 +1,180 @@
+"""Кэш результатов validate_code по содержимому кода и тестов.
+
+В цикле debugger → fixer → validator fixer часто возвращает тот же код
+или код, отличающийся только пробелами и комментариями, а тесты не
+меняются. Такой код не валидируется повторно: ключ — отпечаток
+(validation_fingerprint) нормализованного кода и тестов.
+
+- Нормализация — ast.dump: пробелы, пустые строки и обычные комментарии
+  не влияют на отпечаток. Комментарии-директивы (# type:, # nosec,
+  # noqa, # pragma) меняют результат mypy/bandit и входят в отпечаток
+- Код с синтаксической ошибкой сравнивается по тексту
+- Хранилище — тот же двухуровневый кэш (память + SQLite), что и для
+  ответов LLM, поэтому повторный запуск задачи попадает в кэш и после
+  перезапуска
+
+Номера строк в выводе pytest/mypy закэшированного результата относятся
+к варианту кода, который валидировался первым.
+
+Использование:
+    cache = get_validation_cache()
+    fingerprint = validation_fingerprint(code, tests)
+    results = cache.get(fingerprint, fail_fast=True) if cache else None
+"""
+import ast
+import hashlib
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from infrastructure.cache import make_cache_key
+from infrastructure.llm_cache import LLMResponseCache
+from utils.config import get_config
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Меняется при изменении формата результатов validate_code или набора проверок
+_CACHE_VERSION = 1
+
+# Комментарии, от которых зависит результат mypy и bandit
+_PRAGMA_RE = re.compile(r"#\s*((?:type|nosec|noqa|pragma)\b.*)$", re.MULTILINE)
+
+
+def _normalize_source(source: str) -> str:
+    """Нормализованное представление исходника для отпечатка."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return "raw:" + source.strip()
+    pragmas = "\n".join(match.strip() for match in _PRAGMA_RE.findall(source))
+    return "ast:" + ast.dump(tree) + "\npragmas:" + pragmas
+
+
+def validation_fingerprint(code_str: str, test_str: Optional[str] = None) -> str:
+    """Отпечаток кода и тестов, не зависящий от форматирования и комментариев.
+
+    Args:
+        code_str: Код
+        test_str: Тесты (None — без тестов)
+
+    Returns:
+        Хэш (blake2b, 128 бит)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(_normalize_source(code_str).encode("utf-8", "surrogatepass"))
+    digest.update(b"\0tests\0")
+    if test_str is not None:
+        digest.update(_normalize_source(test_str).encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+class ValidationResultCache:
+    """Кэш результатов validate_code (память + SQLite)."""
+
+    def __init__(
+        self,
+        memory_entries: int = 256,
+        disk_path: Optional[Path] = None,
+        disk_max_entries: int = 5000,
+        ttl: int = 604800
+    ) -> None:
+        """Инициализация кэша.
+
+        Args:
+            memory_entries: Ёмкость уровня в памяти
+            disk_path: Путь к файлу SQLite (None — только память)
+            disk_max_entries: Максимум результатов на диске
+            ttl: Время жизни результата (секунды)
+        """
+        self.ttl = ttl
+        self._store = LLMResponseCache(
+            memory_entries=memory_entries,
+            disk_path=disk_path,
+            disk_max_entries=disk_max_entries
+        )
+
+    @staticmethod
+    def make_key(fingerprint: str, fail_fast: bool) -> str:
+        """Ключ кэша: отпечаток, режим и настройки, влияющие на результат."""
+        config = get_config()
+        return make_cache_key(
+            _CACHE_VERSION, fingerprint, fail_fast, config.pytest_timeout
+        )
+
+    def get(self, fingerprint: str, fail_fast: bool = False) -> Optional[Dict[str, Any]]:
+        """Возвращает результаты валидации или None.
+
+        Args:
+            fingerprint: Отпечаток из validation_fingerprint()
+            fail_fast: Режим validate_code
+
+        Returns:
+            Копия результатов validate_code или None
+        """
+        value = self._store.get(self.make_key(fingerprint, fail_fast))
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+
+    def set(self, fingerprint: str, results: Dict[str, Any], fail_fast: bool = False) -> None:
+        """Сохраняет результаты валидации.
+
+        Args:
+            fingerprint: Отпечаток из validation_fingerprint()
+            results: Результаты validate_code
+            fail_fast: Режим validate_code
+        """
+        self._store.set(
+            self.make_key(fingerprint, fail_fast),
+            json.dumps(results, ensure_ascii=False),
+            ttl=self.ttl
+        )
+
+    def clear(self) -> None:
+        """Очищает оба уровня."""
+        self._store.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики кэша: попадания по уровням, промахи, hit rate."""
+        return self._store.get_stats()
+
+    def close(self) -> None:
+        """Закрывает соединение с диском."""
+        self._store.close()
+
+
+# === Singleton ===
+
+_validation_cache: Optional[ValidationResultCache] = None
+_validation_cache_lock = threading.Lock()
+
+
+def get_validation_cache() -> Optional[ValidationResultCache]:
+    """Возвращает глобальный кэш результатов валидации или None, если он отключён.
+
+    Returns:
+        ValidationResultCache или None
+    """
+    global _validation_cache
+
+    config = get_config()
+    if not config.validation_cache_enabled:
+        return None
+
+    if _validation_cache is None:
+        with _validation_cache_lock:
+            if _validation_cache is None:
+                disk_path = config.validation_cache_disk_path
+                _validation_cache = ValidationResultCache(
+                    memory_entries=config.validation_cache_memory_entries,
+                    disk_path=Path(disk_path) if disk_path else None,
+                    disk_max_entries=config.validation_cache_disk_max_entries,
+                    ttl=config.validation_cache_ttl
+                )
+    return _validation_cache
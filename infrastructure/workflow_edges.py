@@ -60,6 +60,16 @@ def should_continue_self_healing(state: AgentState) -> str:
         )
         return "finish"
     
+    # Fixer вернул код, который уже валидировался (с точностью до
+    # форматирования и комментариев): следующие итерации дадут тот же результат
+    fingerprints = state.get("validation_fingerprints") or []
+    if iteration > 0 and len(fingerprints) >= 2 and fingerprints[-1] and fingerprints[-1] in fingerprints[:-1]:
+        logger.warning(
+            "⚠️ Исправление вернуло уже проверенный код, цикл не продвигается. "
+            "Завершаем цикл self-healing"
+        )
+        return "finish"
+    
     # Проверяем не превышен ли лимит итераций
     if iteration >= max_iterations:
         logger.info(f"⏱️ Достигнут лимит итераций ({max_iterations}), завершаем цикл")
@@ -772,12 +772,21 @@ async def validator_node(state: AgentState) -> AgentState:
     """Узел для валидации кода (pytest, mypy, bandit)."""
     logger.info("🔍 Валидирую код...")
     
+    # Проверки идут параллельно; при провале pytest дебаггеру нужна только
+    # эта причина, поэтому mypy/bandit не дожидаемся (fail_fast)
     validation_results = await asyncio.to_thread(
         validate_code,
         code_str=state.get("code", ""),
-        test_str=state.get("tests") or None
+        test_str=state.get("tests") or None,
+        fail_fast=True
     )
     state["validation_results"] = validation_results
+    # История отпечатков: по ней should_continue_self_healing видит,
+    # что fixer вернул уже проверенный код
+    state["validation_fingerprints"] = [
+        *(state.get("validation_fingerprints") or []),
+        validation_results.get("fingerprint", "")
+    ]
     
     if validation_results.get("all_passed", False):
         logger.info("✅ Валидация пройдена")
@@ -35,6 +35,7 @@ class AgentState(TypedDict):
     tests: str  # Тесты от TestGenerator
     code: str  # Код от Coder
     validation_results: Dict[str, Any]  # Результаты валидации
+    validation_fingerprints: Optional[List[str]]  # Отпечатки кода+тестов каждой валидации (по итерациям)
     debug_result: Optional[DebugResult]  # Результат Debugger
     reflection_result: Optional[ReflectionResult]  # Результат Reflection
     critic_report: Optional[CriticReport]  # Результат Critic агента
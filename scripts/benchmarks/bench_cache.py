@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Микробенчмарк кэша результатов (infrastructure/cache.py).
+
+Сравнивает старый SimpleCache (сортировка всех ключей и удаление половины
+при переполнении, ключ через json.dumps(str(args)) + md5) с LRU кэшем:
+пропускная способность set/get на заполненном кэше, хвостовые задержки set,
+hit rate на skewed нагрузке и скорость генерации ключа для длинных промптов.
+
+Использование:
+    python scripts/benchmarks/bench_cache.py
+    python scripts/benchmarks/bench_cache.py --size 10000 --ops 200000
+"""
+import argparse
+import gc
+import hashlib
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from infrastructure.cache import SimpleCache, make_cache_key
+
+
+class LegacyCache:
+    """Старый SimpleCache: вытеснение половины записей через сортировку."""
+    
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.cache: Dict[str, Any] = {}
+    
+    def get(self, key: str) -> Any:
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        value, created_at, ttl = entry
+        if time.time() - created_at > ttl:
+            del self.cache[key]
+            return None
+        return value
+    
+    def set(self, key: str, value: Any, ttl: int = 3600) -> None:
+        if len(self.cache) >= self.max_size:
+            sorted_keys = sorted(self.cache.keys(), key=lambda k: self.cache[k][1])
+            for k in sorted_keys[:len(self.cache) // 2]:
+                del self.cache[k]
+        self.cache[key] = (value, time.time(), ttl)
+
+
+def legacy_key(func_name: str, args: tuple, kwargs: dict) -> str:
+    key_data = json.dumps({
+        'func': func_name,
+        'args': str(args),
+        'kwargs': str(sorted(kwargs.items()))
+    }, sort_keys=True, default=str)
+    return hashlib.md5(key_data.encode()).hexdigest()
+
+
+def run_workload(cache: Any, keys: List[str]) -> Dict[str, float]:
+    """get, при промахе set — как в декораторе @cached."""
+    set_latencies: List[float] = []
+    hits = 0
+    # Паузы сборщика мусора не относятся к алгоритму вытеснения
+    gc.collect()
+    gc.disable()
+    start = time.perf_counter()
+    for key in keys:
+        if cache.get(key) is not None:
+            hits += 1
+            continue
+        t0 = time.perf_counter()
+        cache.set(key, key)
+        set_latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    gc.enable()
+    set_latencies.sort()
+    return {
+        "ops_per_sec": len(keys) / elapsed,
+        "hit_rate": hits / len(keys),
+        "set_p99_us": set_latencies[int(len(set_latencies) * 0.99)] * 1e6,
+        "set_max_ms": set_latencies[-1] * 1e3,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Микробенчмарк кэша результатов")
+    parser.add_argument("--size", type=int, default=10_000, help="Ёмкость кэша")
+    parser.add_argument("--ops", type=int, default=200_000, help="Количество обращений")
+    args = parser.parse_args()
+    
+    # Распределение Zipf (s=0.9) по 10x ёмкости кэша: горячие ключи повторяются часто,
+    # хвост постоянно переполняет кэш
+    rng = random.Random(42)
+    universe = args.size * 10
+    weights = [1.0 / (rank ** 0.9) for rank in range(1, universe + 1)]
+    keys = [f"key-{i}" for i in rng.choices(range(universe), weights=weights, k=args.ops)]
+    
+    print(f"\n📊 Кэш на {args.size} записей, {args.ops} обращений (skewed)\n")
+    for name, cache in (("Старый SimpleCache", LegacyCache(args.size)), ("LRU SimpleCache", SimpleCache(args.size))):
+        stats = run_workload(cache, keys)
+        print(
+            f"{name:20s} {stats['ops_per_sec'] / 1000:8.0f}k оп/с  hit rate {stats['hit_rate']:.1%}  "
+            f"set p99 {stats['set_p99_us']:6.1f}мкс  set max {stats['set_max_ms']:6.2f}мс"
+        )
+    
+    prompt = "Напиши функцию сортировки. " * 2000  # ~50 КБ промпт
+    call_args = (prompt, "qwen2.5-coder:7b")
+    call_kwargs = {"temperature": 0.2, "num_predict": 512}
+    n = 2000
+    start = time.perf_counter()
+    for _ in range(n):
+        legacy_key("generate", call_args, call_kwargs)
+    legacy = (time.perf_counter() - start) / n
+    start = time.perf_counter()
+    for _ in range(n):
+        make_cache_key("module", "generate", call_args, call_kwargs)
+    new = (time.perf_counter() - start) / n
+    print(f"\nКлюч для промпта {len(prompt) // 1024} КБ: json+md5 {legacy * 1e6:.0f}мкс, blake2b по частям {new * 1e6:.0f}мкс")
+
+
+if __name__ == "__main__":
+    main()
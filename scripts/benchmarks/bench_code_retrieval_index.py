@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Бенчмарк индексации проекта в CodeRetriever.
+
+Синтетический проект (по умолчанию 1000 файлов x 10 функций) индексируется
+старым способом (encode + upsert на каждую функцию), затем новым: полная
+индексация, повторная без изменений и повторная после правки 1% файлов.
+
+SentenceTransformer и ChromaDB заменены фейками со стоимостью вызова, близкой
+к реальной на CPU: накладные расходы на вызов плюс стоимость на текст.
+Поэтому бенчмарк показывает выигрыш от батчей и инкрементальности, а не
+скорость конкретной модели.
+
+Использование:
+    python scripts/benchmarks/bench_code_retrieval_index.py
+    python scripts/benchmarks/bench_code_retrieval_index.py --files 200 --functions 20
+"""
+import argparse
+import ast
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, List
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from infrastructure.code_retrieval import CodeRetriever
+
+
+class FakeEncoder:
+    """SentenceTransformer с моделью стоимости: call_cost + item_cost * N."""
+    
+    def __init__(self, call_cost: float, item_cost: float) -> None:
+        self.call_cost = call_cost
+        self.item_cost = item_cost
+        self.encoded = 0
+    
+    def encode(self, texts: Any, batch_size: int = 32) -> Any:
+        batch = [texts] if isinstance(texts, str) else list(texts)
+        time.sleep(self.call_cost + self.item_cost * len(batch))
+        self.encoded += len(batch)
+        vectors = [[float(len(text)), 1.0] for text in batch]
+        
+        class _Result:
+            def tolist(self) -> Any:
+                return vectors[0] if isinstance(texts, str) else vectors
+        return _Result()
+
+
+class FakeCollection:
+    """Коллекция ChromaDB со стоимостью вызова."""
+    
+    def __init__(self, call_cost: float) -> None:
+        self.call_cost = call_cost
+        self.ids: set = set()
+    
+    def upsert(self, ids: List[str], **kwargs: Any) -> None:
+        time.sleep(self.call_cost)
+        self.ids.update(ids)
+    
+    def delete(self, ids: List[str]) -> None:
+        time.sleep(self.call_cost)
+        self.ids.difference_update(ids)
+
+
+def make_project(root: Path, files: int, functions: int) -> None:
+    """Создаёт синтетический проект."""
+    for f in range(files):
+        package = root / f"pkg{f // 100}"
+        package.mkdir(exist_ok=True)
+        body = "\n\n".join(
+            f'def func_{f}_{i}(value):\n    """Функция {i} файла {f}."""\n    return value * {i + 1} + {f}\n'
+            for i in range(functions)
+        )
+        (package / f"module_{f}.py").write_text(body)
+
+
+def legacy_index(retriever: CodeRetriever, project: Path) -> int:
+    """Старый index_project: ast.parse последовательно, encode+upsert на каждую функцию."""
+    indexed = 0
+    for file_path in project.rglob("*.py"):
+        content = file_path.read_text(encoding="utf-8")
+        tree = ast.parse(content)
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                code = ast.get_source_segment(content, node)
+                if code and len(code) > 30:
+                    docstring = ast.get_docstring(node) or node.name
+                    retriever._index_code(
+                        code=code,
+                        description=docstring[:200],
+                        source="local",
+                        file_path=str(file_path.relative_to(project)),
+                        language="python"
+                    )
+                    indexed += 1
+    return indexed
+
+
+def make_retriever(chroma_path: Path, args: argparse.Namespace) -> CodeRetriever:
+    retriever = CodeRetriever(chroma_path=str(chroma_path))
+    retriever._embedding_cache = None
+    retriever._embedding_model = FakeEncoder(args.encode_call_cost, args.encode_item_cost)
+    retriever._collection = FakeCollection(args.upsert_call_cost)
+    return retriever
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк индексации CodeRetriever")
+    parser.add_argument("--files", type=int, default=1000, help="Количество файлов")
+    parser.add_argument("--functions", type=int, default=10, help="Функций в файле")
+    parser.add_argument("--encode-call-cost", type=float, default=0.004, help="Накладные расходы encode на вызов, с")
+    parser.add_argument("--encode-item-cost", type=float, default=0.0005, help="Стоимость encode на текст, с")
+    parser.add_argument("--upsert-call-cost", type=float, default=0.003, help="Стоимость вызова upsert/delete, с")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        project = Path(tmp) / "project"
+        project.mkdir()
+        make_project(project, args.files, args.functions)
+        total = args.files * args.functions
+        print(f"\n📊 Проект: {args.files} файлов, {total} функций\n")
+        
+        retriever = make_retriever(Path(tmp) / "legacy", args)
+        start = time.perf_counter()
+        legacy_index(retriever, project)
+        print(f"Старая индексация:                     {time.perf_counter() - start:.2f}с")
+        
+        retriever = make_retriever(Path(tmp) / "chroma", args)
+        start = time.perf_counter()
+        retriever.index_project(str(project))
+        print(f"Новая полная индексация:               {time.perf_counter() - start:.2f}с")
+        
+        start = time.perf_counter()
+        retriever.index_project(str(project))
+        print(f"Повторная без изменений:               {time.perf_counter() - start:.2f}с")
+        
+        changed = list(project.rglob("*.py"))[: max(1, args.files // 100)]
+        for file_path in changed:
+            file_path.write_text(file_path.read_text() + "\n\ndef added_function(value):\n    return value - 12345\n")
+        encoded_before = retriever._embedding_model.encoded
+        start = time.perf_counter()
+        indexed = retriever.index_project(str(project))
+        print(f"Повторная после правки {len(changed)} файлов:      {time.perf_counter() - start:.2f}с "
+              f"(закодировано {retriever._embedding_model.encoded - encoded_before}, в индексе {indexed})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Бенчмарк ранжирования чанков в Context Engine.
+
+Сравнивает старый RelevanceScorer (повторная токенизация всех чанков на
+каждый термин запроса и на каждую оценку) с BM25 по инвертированному
+индексу на синтетическом корпусе из 50k чанков.
+
+Использование:
+    python scripts/benchmarks/bench_context_scoring.py
+    python scripts/benchmarks/bench_context_scoring.py --chunks 10000 --legacy-queries 1
+"""
+import argparse
+import itertools
+import math
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from infrastructure.context_engine import BM25Index, CodeChunk, RelevanceScorer
+
+QUERIES = [
+    "config manager load settings",
+    "parse http request headers",
+    "database connection pool retry",
+    "cache eviction ttl",
+    "user authentication token",
+]
+
+VOCABULARY = (
+    "config manager load settings parse http request headers database connection "
+    "pool retry cache eviction ttl user authentication token stream event queue "
+    "worker process handler router model agent index chunk score context file path "
+    "value result error status session message buffer timeout limit"
+).split()
+
+
+def legacy_tokenize(text: str) -> List[str]:
+    """Токенизация старого RelevanceScorer (без предкомпилированных regex)."""
+    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
+    text = text.replace('_', ' ').lower()
+    tokens = re.findall(r'\b\w+\b', text)
+    stop_words = {'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'to', 'of', 'in', 'on', 'at', 'for', 'with', 'by'}
+    return [t for t in tokens if len(t) > 2 and t not in stop_words]
+
+
+def legacy_score(query: str, chunks: List[CodeChunk]) -> list:
+    """Старый алгоритм: IDF и TF через токенизацию каждого чанка на каждый запрос."""
+    terms = legacy_tokenize(query)
+    idf = {}
+    for term in terms:
+        df = sum(
+            1 for c in chunks
+            if term in legacy_tokenize(c.content) or term in legacy_tokenize(c.name)
+            or term in legacy_tokenize(c.signature)
+        )
+        idf[term] = math.log((len(chunks) - df + 0.5) / (df + 0.5) + 1.0) if df else math.log(len(chunks) + 1.0)
+    scored = []
+    for c in chunks:
+        chunk_terms = legacy_tokenize(f"{c.name} {c.signature} {c.docstring} {c.content}")
+        total = len(chunk_terms) + 1
+        score = sum(chunk_terms.count(t) / total * idf[t] for t in terms)
+        scored.append((score, c))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return scored
+
+
+def make_corpus(size: int) -> List[CodeChunk]:
+    """Генерирует синтетические чанки: функции из случайных слов словаря."""
+    rng = random.Random(42)
+    chunks = []
+    for i in range(size):
+        words = rng.choices(VOCABULARY, k=rng.randint(20, 120))
+        name = "_".join(rng.choices(VOCABULARY, k=2))
+        body = "\n".join(f"    {a}_{b} = {c}({d})" for a, b, c, d in zip(*[iter(words)] * 4))
+        chunks.append(CodeChunk(
+            id=f"f{i % 500}.py:{i}",
+            file_path=f"f{i % 500}.py",
+            start_line=1,
+            end_line=10,
+            content=f"def {name}():\n{body}",
+            chunk_type="function",
+            name=name,
+            signature=f"def {name}()",
+        ))
+    return chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк ранжирования Context Engine")
+    parser.add_argument("--chunks", type=int, default=50_000, help="Размер корпуса")
+    parser.add_argument("--legacy-queries", type=int, default=1, help="Запросов для старого алгоритма (он медленный)")
+    parser.add_argument("--top", type=int, default=20, help="Сколько лучших чанков забирает потребитель")
+    args = parser.parse_args()
+    
+    chunks = make_corpus(args.chunks)
+    print(f"\n📊 Корпус: {len(chunks)} чанков\n")
+    
+    scorer = RelevanceScorer()
+    start = time.perf_counter()
+    index = BM25Index()
+    by_file: dict[str, list] = {}
+    for chunk in chunks:
+        by_file.setdefault(chunk.file_path, []).append(chunk)
+    for file_path, file_chunks in by_file.items():
+        index.add_group(file_path, [scorer.chunk_terms(c) for c in file_chunks])
+    build_time = time.perf_counter() - start
+    print(f"Построение инвертированного индекса (один раз при индексации): {build_time:.2f}с")
+    
+    bm25_times = []
+    for query in QUERIES:
+        start = time.perf_counter()
+        ranked = scorer.rank(query, index, lambda group, pos: by_file[group][pos])
+        list(itertools.islice(ranked, args.top))
+        bm25_times.append(time.perf_counter() - start)
+    
+    legacy_times = []
+    for query in QUERIES[:args.legacy_queries]:
+        start = time.perf_counter()
+        legacy_score(query, chunks)[:args.top]
+        legacy_times.append(time.perf_counter() - start)
+    
+    print(f"Старый RelevanceScorer: {statistics.mean(legacy_times):.2f}с на запрос ({len(legacy_times)} запр.)")
+    print(f"BM25 по индексу:       {statistics.mean(bm25_times) * 1000:.1f}мс на запрос "
+          f"(top-{args.top}, {len(bm25_times)} запр.)")
+    print(f"Ускорение: x{statistics.mean(legacy_times) / statistics.mean(bm25_times):.0f}")
+
+
+if __name__ == "__main__":
+    main()
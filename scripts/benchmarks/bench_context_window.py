@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Бенчмарк упаковки истории диалога: по числу сообщений против бюджета токенов.
+
+Строит диалог с типичными короткими репликами и одним вставленным файлом
+(2000 строк) и сравнивает контекст chat режима:
+- прежний: последние max_context_messages сообщений
+- новый: суммаризация + самые новые сообщения в окне context_window_tokens
+  минус tokens_chat
+
+Время prefill в Ollama растёт с числом токенов промпта, поэтому главная
+метрика — токены контекста. Дополнительно измеряется время упаковки
+(первый вызов и повторный с закэшированными счётчиками сообщений).
+
+Использование:
+    python scripts/benchmarks/bench_context_window.py
+    python scripts/benchmarks/bench_context_window.py --model qwen2.5-coder:7b --turns 40
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from agents.conversation import Conversation  # noqa: E402
+from utils.config import get_config  # noqa: E402
+from utils.logger import get_logger  # noqa: E402
+from utils.tokenizer import MESSAGE_TOKEN_OVERHEAD, get_tokenizer  # noqa: E402
+
+logger = get_logger()
+
+PASTED_FILE = "\n".join(f"    result_{i} = compute(value_{i}, factor={i % 7})  # строка {i}" for i in range(2000))
+
+
+def _context_tokens(context: list, model: str) -> int:
+    tokenizer = get_tokenizer(model)
+    return sum(tokenizer.count(m["content"]) + MESSAGE_TOKEN_OVERHEAD for m in context)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк упаковки истории диалога")
+    parser.add_argument("--model", default="qwen2.5-coder:7b", help="Модель (семейство токенизатора)")
+    parser.add_argument("--turns", type=int, default=20, help="Реплик после вставленного файла")
+    args = parser.parse_args()
+
+    config = get_config()
+    budget = config.interaction_context_window_tokens - config.llm_tokens_chat
+    tokenizer = get_tokenizer(args.model)
+    print(f"Модель: {args.model}, токенизатор: {tokenizer.name}, бюджет истории: {budget} токенов")
+
+    conv = Conversation(id="bench")
+    conv.summary = "Пользователь разбирает модуль расчётов, обсуждали функцию compute и её аргументы."
+    conv.add_message("user", f"Вот файл, найди ошибку:\n{PASTED_FILE}")
+    conv.add_message("assistant", "Ошибка в строке 120: factor не проверяется на ноль. " * 5)
+    for i in range(args.turns):
+        conv.add_message("user" if i % 2 == 0 else "assistant", f"Уточнение {i}: а что с обработкой граничных случаев? " * 3)
+
+    # Прежний вариант: последние max_context_messages сообщений (файл попадает, пока в окне)
+    max_messages = config.interaction_max_context_messages
+    for turns_after in (2, args.turns):
+        legacy_conv = Conversation(id="legacy", messages=conv.messages[:2 + turns_after], summary=conv.summary)
+        legacy = legacy_conv.get_context_for_llm(max_messages)
+        packed = legacy_conv.get_context_for_llm(max_messages, token_budget=budget, model=args.model)
+        print(f"\nРеплик после файла: {turns_after}")
+        print(f"  по числу сообщений: {len(legacy)} сообщений, {_context_tokens(legacy, args.model)} токенов")
+        print(f"  по бюджету токенов: {len(packed)} сообщений, {_context_tokens(packed, args.model)} токенов")
+
+    fresh = Conversation(id="timing", messages=[
+        type(m)(id=m.id, role=m.role, content=m.content, timestamp=m.timestamp) for m in conv.messages
+    ], summary=conv.summary)
+    start = time.perf_counter()
+    fresh.get_context_for_llm(max_messages, token_budget=budget, model=args.model)
+    cold_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for _ in range(100):
+        fresh.get_context_for_llm(max_messages, token_budget=budget, model=args.model)
+    warm_ms = (time.perf_counter() - start) * 1000 / 100
+    print(f"\nУпаковка: первый вызов {cold_ms:.2f}мс, повторный {warm_ms:.3f}мс (счётчики закэшированы)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Бенчмарк хранилищ ConversationMemory: SQLite (WAL) против JSON файлов.
+
+Заполняет историю из N диалогов по M сообщений и измеряет:
+- время add_message в длинном диалоге (JSON переписывает файл целиком,
+  SQLite дописывает строку)
+- старт ConversationMemory (прежний вариант читал все JSON файлы)
+- список диалогов для /api/conversations (все и страница 20) и первое
+  обращение к диалогу
+
+Использование:
+    python scripts/benchmarks/bench_conversation_memory.py
+    python scripts/benchmarks/bench_conversation_memory.py --conversations 2000 --messages 40
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from agents.conversation import ConversationMemory  # noqa: E402
+from utils.logger import get_logger  # noqa: E402
+
+logger = get_logger()
+
+MESSAGE = "Объясни, как работает функция и где в ней ошибка. " * 10
+
+
+def _fill(memory: ConversationMemory, conversations: int, messages: int) -> None:
+    """Создаёт историю диалогов."""
+    for c in range(conversations):
+        for m in range(messages):
+            memory.add_message(f"conv-{c:05d}", "user" if m % 2 == 0 else "assistant", MESSAGE, auto_summarize=False)
+
+
+def _bench(backend: str, conversations: int, messages: int, appends: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = ConversationMemory(persist_dir=tmp, storage_backend=backend, max_conversations=conversations + 10)
+        _fill(memory, conversations, messages)
+
+        # Дописывание в длинный диалог
+        timings = []
+        for i in range(appends):
+            start = time.perf_counter()
+            memory.add_message("conv-00000", "user", MESSAGE, auto_summarize=False)
+            timings.append((time.perf_counter() - start) * 1000)
+        memory.close()
+
+        start = time.perf_counter()
+        restarted = ConversationMemory(persist_dir=tmp, storage_backend=backend, max_conversations=conversations + 10)
+        open_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        items = restarted.list_conversations()
+        list_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        page = restarted.list_conversations(limit=20)
+        total = restarted.count_conversations()
+        page_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        conv = restarted.get_conversation("conv-00001")
+        load_ms = (time.perf_counter() - start) * 1000
+        restarted.close()
+
+        print(f"\n{backend}:")
+        print(f"  add_message в диалог из {messages + appends} сообщений: "
+              f"медиана {statistics.median(timings):.2f}мс, p95 {sorted(timings)[int(len(timings) * 0.95)]:.2f}мс")
+        print(f"  старт ConversationMemory: {open_ms:.1f}мс")
+        print(f"  список всех диалогов: {list_ms:.1f}мс ({len(items)})")
+        print(f"  страница 20 + count: {page_ms:.2f}мс ({len(page)} из {total})")
+        print(f"  первое обращение к диалогу: {load_ms:.2f}мс ({len(conv.messages) if conv else 0} сообщений)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк хранилищ ConversationMemory")
+    parser.add_argument("--conversations", type=int, default=500, help="Диалогов в истории")
+    parser.add_argument("--messages", type=int, default=40, help="Сообщений в диалоге")
+    parser.add_argument("--appends", type=int, default=100, help="Замеров add_message")
+    args = parser.parse_args()
+
+    print(f"История: {args.conversations} диалогов × {args.messages} сообщений")
+    for backend in ("json", "sqlite"):
+        _bench(backend, args.conversations, args.messages, args.appends)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Бенчмарк EventStore под нагрузкой множества стриминговых сессий.
+
+Заполняет хранилище N сессиями по M событий (чанки thinking/кода) и
+измеряет:
+- save_event (кольцевой буфер, без пересчёта по всем событиям)
+- создание новой сессии при достигнутом лимите (вытеснение LRU)
+- get_events по ссылкам узла (как в workflow_handler)
+- cleanup_all_old_events
+
+Бэкенд sqlite (общий для воркеров) измеряется на временном файле.
+
+Использование:
+    python scripts/benchmarks/bench_event_store.py
+    python scripts/benchmarks/bench_event_store.py --sessions 1000 --events 2000
+    python scripts/benchmarks/bench_event_store.py --backend sqlite --sessions 50
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from infrastructure.event_backend import MemoryEventBackend, SQLiteEventBackend  # noqa: E402
+from infrastructure.event_store import EventStore  # noqa: E402
+from utils.logger import get_logger  # noqa: E402
+
+logger = get_logger()
+
+CHUNK = "def handler(request):\n    return process(request)\n"
+
+
+def _ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+async def _bench(sessions: int, events: int, new_sessions: int) -> None:
+    EventStore._instances.clear()
+    EventStore._events.clear()
+    EventStore._event_queues.clear()
+    EventStore._max_sessions = sessions
+
+    stores = []
+    start = time.perf_counter()
+    for s in range(sessions):
+        store = await EventStore.get_for_session(f"session-{s:05d}")
+        for _ in range(events):
+            await store.save_event("code_chunk", CHUNK)
+        stores.append(store)
+    fill_ms = _ms(start)
+    total = sessions * events
+    print(f"Заполнение: {total} событий за {fill_ms:.0f}мс ({fill_ms * 1000 / total:.2f}мкс/событие)")
+
+    # Ссылки узла: последние 50 событий сессии
+    store = stores[-1]
+    refs = [e.event_id for e in (await store.get_all_events())[-50:]]
+    start = time.perf_counter()
+    for _ in range(100):
+        await store.get_events(refs)
+    print(f"get_events (50 ссылок): {_ms(start) / 100:.3f}мс")
+
+    # Новые сессии при достигнутом лимите: каждая вытесняет самую старую
+    timings = []
+    for s in range(new_sessions):
+        start = time.perf_counter()
+        await EventStore.get_for_session(f"new-{s:05d}")
+        timings.append(_ms(start))
+    print(f"Новая сессия при лимите: медиана {statistics.median(timings):.3f}мс, max {max(timings):.3f}мс")
+
+    start = time.perf_counter()
+    await EventStore.cleanup_all_old_events()
+    print(f"cleanup_all_old_events: {_ms(start):.1f}мс")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк EventStore")
+    parser.add_argument("--sessions", type=int, default=200, help="Сессий (лимит хранилища)")
+    parser.add_argument("--events", type=int, default=1000, help="Событий в сессии")
+    parser.add_argument("--new-sessions", type=int, default=50, help="Замеров создания сессии при лимите")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory", help="Бэкенд событий")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.backend == "sqlite":
+            EventStore.set_backend(SQLiteEventBackend(Path(tmp) / "events.sqlite", args.events))
+        else:
+            EventStore.set_backend(MemoryEventBackend(EventStore._events, args.events))
+        print(f"Бэкенд: {args.backend}")
+        asyncio.run(_bench(args.sessions, args.events, args.new_sessions))
+        EventStore.set_backend(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Бенчмарк кэша ответов LocalLLM.
+
+Эмулирует повторный запуск задачи: одни и те же промпты этапов intent,
+planning и critic отправляются дважды. Первый прогон идёт в модель,
+второй — из кэша ответов (память), третий — из дискового уровня после
+"перезапуска" процесса. Ollama эмулируется фейковым сервером с заданной
+скоростью генерации.
+
+Использование:
+    python scripts/benchmarks/bench_llm_cache.py
+    python scripts/benchmarks/bench_llm_cache.py --prompts 20 --tokens 64 --delay 0.005
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.benchmarks.fake_ollama import FakeOllamaServer
+
+
+def _run(llm_by_stage: dict, prompts: List[str]) -> List[float]:
+    """Прогоняет промпты по всем этапам, возвращает задержки вызовов."""
+    latencies = []
+    for stage, llm in llm_by_stage.items():
+        for prompt in prompts:
+            start = time.perf_counter()
+            llm.generate(f"[{stage}] {prompt}")
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк кэша ответов LLM")
+    parser.add_argument("--prompts", type=int, default=10, help="Промптов на этап")
+    parser.add_argument("--tokens", type=int, default=32, help="Токенов в ответе фейковой модели")
+    parser.add_argument("--delay", type=float, default=0.01, help="Задержка на токен, с")
+    args = parser.parse_args()
+    
+    prompts = [f"Задача {i}: добавь обработку ошибок в модуль {i}" for i in range(args.prompts)]
+    
+    with FakeOllamaServer(tokens=args.tokens, token_delay=args.delay) as server:
+        # Клиент ollama читает OLLAMA_HOST при импорте
+        os.environ["OLLAMA_HOST"] = server.url
+        import infrastructure.local_llm as local_llm
+        from infrastructure.llm_cache import LLMResponseCache
+        
+        stages = ("intent", "planning", "critic")
+        llm_by_stage = {
+            stage: local_llm.LocalLLM(model="fake:latest", temperature=0.0, stage=stage)
+            for stage in stages
+        }
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            disk_path = Path(tmp) / "responses.sqlite"
+            cache = LLMResponseCache(disk_path=disk_path)
+            local_llm.get_llm_response_cache = lambda: cache
+            
+            print(f"\n📊 {len(stages)} этапа x {args.prompts} промптов, "
+                  f"модель: {args.tokens} токенов x {args.delay * 1000:.0f}мс\n")
+            
+            runs = [("Первый запуск (модель)", _run(llm_by_stage, prompts)),
+                    ("Повтор (память)", _run(llm_by_stage, prompts))]
+            
+            # "Перезапуск": новый кэш с тем же файлом, память пуста
+            cache.close()
+            cache = LLMResponseCache(disk_path=disk_path)
+            runs.append(("После перезапуска (диск)", _run(llm_by_stage, prompts)))
+            
+            for name, latencies in runs:
+                total = sum(latencies)
+                print(f"{name}: всего {total:.3f}с, медиана {statistics.median(latencies) * 1000:.2f}мс")
+            print(f"Ускорение повтора: x{sum(runs[0][1]) / sum(runs[1][1]):.0f}")
+            print(f"Статистика кэша после перезапуска: {cache.get_stats()}")
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Бенчмарк стриминга LocalLLM.generate_stream.
+
+Сравнивает старый путь (поток + queue.Queue на каждый стрим, опрос очереди
+из event loop) с текущим (async httpx стрим через OllamaConnectionPool)
+на 1, 8 и 32 одновременных стримах против фейкового Ollama сервера.
+
+Метрики:
+- TTFT — время до первого токена (среднее и p95 по стримам)
+- tok/s — суммарная пропускная способность всех стримов
+- threads — пик количества потоков процесса
+
+Использование:
+    python scripts/benchmarks/bench_llm_streaming.py
+    python scripts/benchmarks/bench_llm_streaming.py --tokens 128 --delay 0.005
+"""
+import argparse
+import asyncio
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.benchmarks.fake_ollama import FakeOllamaServer
+
+CONCURRENCY_LEVELS = (1, 8, 32)
+
+
+async def legacy_generate_stream(model: str, prompt: str) -> AsyncIterator[dict[str, Any]]:
+    """Старая реализация: отдельный поток на стрим и опрос очереди через executor."""
+    import ollama
+    
+    chunk_queue: queue.Queue = queue.Queue()
+    
+    def stream_worker() -> None:
+        try:
+            for chunk in ollama.generate(model=model, prompt=prompt, stream=True):
+                chunk_queue.put(chunk)
+        finally:
+            chunk_queue.put(None)
+    
+    threading.Thread(target=stream_worker, daemon=True).start()
+    loop = asyncio.get_event_loop()
+    while True:
+        try:
+            chunk = await loop.run_in_executor(None, lambda: chunk_queue.get(timeout=0.5))
+        except queue.Empty:
+            continue
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def pooled_generate_stream(model: str, prompt: str) -> AsyncIterator[dict[str, Any]]:
+    """Текущая реализация через LocalLLM.generate_stream."""
+    from infrastructure.local_llm import LocalLLM
+    
+    llm = LocalLLM(model=model, timeout=60)
+    async for chunk in llm.generate_stream(prompt):
+        if chunk.content:
+            yield {"response": chunk.content}
+
+
+async def _run_level(
+    stream_fn: Callable[[str, str], AsyncIterator[dict[str, Any]]],
+    concurrency: int
+) -> dict[str, float]:
+    """Запускает concurrency одновременных стримов и собирает метрики."""
+    ttfts: list[float] = []
+    total_tokens = 0
+    peak_threads = threading.active_count()
+    
+    async def one_stream() -> None:
+        nonlocal total_tokens, peak_threads
+        start = time.perf_counter()
+        first = True
+        async for chunk in stream_fn("fake", "benchmark prompt"):
+            if chunk.get("response"):
+                if first:
+                    ttfts.append(time.perf_counter() - start)
+                    first = False
+                total_tokens += 1
+            peak_threads = max(peak_threads, threading.active_count())
+    
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one_stream() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+    
+    ttfts.sort()
+    return {
+        "ttft_avg_ms": statistics.mean(ttfts) * 1000,
+        "ttft_p95_ms": ttfts[max(0, int(len(ttfts) * 0.95) - 1)] * 1000,
+        "tokens_per_sec": total_tokens / wall,
+        "peak_threads": peak_threads,
+    }
+
+
+async def _bench(stream_fn: Callable[[str, str], AsyncIterator[dict[str, Any]]]) -> dict[int, dict[str, float]]:
+    """Прогревает соединения и прогоняет все уровни конкурентности."""
+    await _run_level(stream_fn, max(CONCURRENCY_LEVELS))
+    return {level: await _run_level(stream_fn, level) for level in CONCURRENCY_LEVELS}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк стриминга LocalLLM")
+    parser.add_argument("--tokens", type=int, default=64, help="Токенов в одном ответе")
+    parser.add_argument("--delay", type=float, default=0.02, help="Задержка между токенами (с), 0.02 ≈ 50 tok/s как у 7B модели")
+    args = parser.parse_args()
+    
+    with FakeOllamaServer(tokens=args.tokens, token_delay=args.delay) as server:
+        os.environ["OLLAMA_HOST"] = server.url
+        os.environ["OLLAMA_BASE_URL"] = server.url
+        # Размер пула — из конфига (по умолчанию 10): стримы сверх него
+        # не должны ждать окончания чужих генераций
+        
+        results = {
+            "thread+queue (старый)": asyncio.run(_bench(legacy_generate_stream)),
+            "httpx pool (новый)": asyncio.run(_bench(pooled_generate_stream)),
+        }
+    
+    print(f"\n📊 Стриминг: {args.tokens} токенов/ответ, {args.delay * 1000:.1f}мс между токенами\n")
+    print(f"{'реализация':<24}{'стримов':>8}{'TTFT avg':>12}{'TTFT p95':>12}{'tok/s':>10}{'потоков':>9}")
+    for name, levels in results.items():
+        for level, m in levels.items():
+            print(
+                f"{name:<24}{level:>8}{m['ttft_avg_ms']:>10.1f}мс{m['ttft_p95_ms']:>10.1f}мс"
+                f"{m['tokens_per_sec']:>10.0f}{m['peak_threads']:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Бенчмарк накладных расходов проверки доступности Ollama.
+
+Сравнивает короткие вызовы LocalLLM.generate (как у intent/advisor) со
+старой проверкой ollama.list() перед каждым запросом и с кэшированным
+статусом OllamaHealthMonitor. Ollama эмулируется фейковым сервером,
+ответ — один токен, поэтому видна именно стоимость лишнего запроса.
+
+Использование:
+    python scripts/benchmarks/bench_ollama_health.py
+    python scripts/benchmarks/bench_ollama_health.py --calls 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.benchmarks.fake_ollama import FakeOllamaServer
+
+
+def _measure(call: Callable[[], None], calls: int) -> List[float]:
+    """Задержки вызовов в миллисекундах."""
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк проверки доступности Ollama")
+    parser.add_argument("--calls", type=int, default=200, help="Количество вызовов generate")
+    args = parser.parse_args()
+    
+    with FakeOllamaServer(tokens=1, token_delay=0.0) as server:
+        # Клиент ollama читает OLLAMA_HOST при импорте
+        os.environ["OLLAMA_HOST"] = server.url
+        import ollama
+        from infrastructure.local_llm import LocalLLM
+        from infrastructure.ollama_health import get_ollama_health_monitor
+        
+        monitor = get_ollama_health_monitor()
+        llm = LocalLLM(model="fake:latest", temperature=0.7)
+        
+        def legacy_call() -> None:
+            # Старый путь: полный список моделей перед каждым запросом
+            ollama.list()
+            llm.generate("классифицируй запрос")
+        
+        def monitored_call() -> None:
+            llm.generate("классифицируй запрос")
+        
+        # Прогрев соединений
+        _measure(monitored_call, 10)
+        
+        print(f"\n📊 {args.calls} коротких вызовов generate\n")
+        legacy = _measure(legacy_call, args.calls)
+        monitored = _measure(monitored_call, args.calls)
+        
+        for name, latencies in (("ollama.list() + generate", legacy), ("HealthMonitor + generate", monitored)):
+            print(f"{name}: медиана {statistics.median(latencies):.2f}мс, "
+                  f"p95 {sorted(latencies)[int(len(latencies) * 0.95)]:.2f}мс")
+        saved = statistics.median(legacy) - statistics.median(monitored)
+        print(f"Экономия на вызов: {saved:.2f}мс ({saved / statistics.median(legacy) * 100:.0f}%)")
+        print(f"Статистика монитора: {monitor.get_stats()}")
+        monitor.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Бенчмарк обхода и разбора проекта: свой rglob у каждого потребителя против общего сканера.
+
+Прежняя схема — пять потребителей (ContextEngine, CodeRetriever,
+ProjectAnalyzer, PythonAdapter, /api/project-files) сами обходят проект,
+читают файлы, считают хэши и разбирают AST. Новая — один обход
+ProjectScanner и один разбор (в пуле процессов), остальные потребители
+получают файлы и AST из кэша.
+
+Использование:
+    python scripts/benchmarks/bench_project_scan.py
+    python scripts/benchmarks/bench_project_scan.py --project /path/to/project --workers 4
+"""
+import argparse
+import ast
+import os
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from infrastructure.ast_analyzer import ASTAnalyzer  # noqa: E402
+from infrastructure.context_index import content_hash  # noqa: E402
+from infrastructure.project_scanner import ProjectScanner  # noqa: E402
+from utils.logger import get_logger  # noqa: E402
+
+logger = get_logger()
+
+SKIP = ('.venv', '__pycache__', '.git', 'node_modules')
+
+
+def _legacy_extract_functions(content: str) -> list:
+    """Прежний _extract_functions CodeRetriever (get_source_segment на каждую функцию)."""
+    functions = []
+    for node in ast.walk(ast.parse(content)):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            code = ast.get_source_segment(content, node)
+            if code and len(code) > 30:
+                functions.append((code, (ast.get_docstring(node) or node.name)[:200]))
+    return functions
+
+
+def _rglob(project: Path):
+    return [path for path in project.rglob("*.py") if not any(skip in str(path) for skip in SKIP)]
+
+
+def _legacy(project: Path) -> int:
+    """Каждый потребитель обходит проект и разбирает файлы сам."""
+    analyzer = ASTAnalyzer()
+    parses = 0
+    # ContextEngine: обход, чтение, хэш
+    for path in _rglob(project):
+        content_hash(path.read_bytes())
+    # CodeRetriever: обход, чтение, хэш, разбор
+    for path in _rglob(project):
+        data = path.read_bytes()
+        content_hash(data)
+        try:
+            _legacy_extract_functions(data.decode("utf-8"))
+            parses += 1
+        except (SyntaxError, ValueError):
+            pass
+    # ProjectAnalyzer и PythonAdapter: обход и разбор
+    for _ in range(2):
+        for path in _rglob(project):
+            analyzer.analyze_file(path)
+            parses += 1
+    # /api/project-files: свой обход каталогов
+    for _ in os.walk(project):
+        pass
+    return parses
+
+
+def _shared(project: Path, workers: int) -> int:
+    """Один обход и один разбор на всех потребителей."""
+    scanner = ProjectScanner(parse_workers=workers)
+    try:
+        for _ in range(5):
+            files = scanner.files(str(project), [".py"])
+            scanner.parse(files)
+    finally:
+        scanner.close()
+    return scanner.get_stats()["parse_cache_misses"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк общего сканера проекта")
+    parser.add_argument("--project", default=str(project_root), help="Проект для обхода")
+    parser.add_argument("--workers", type=int, default=0, help="Процессов разбора (0 — по числу ядер)")
+    args = parser.parse_args()
+
+    project = Path(args.project).resolve()
+    print(f"Проект: {project}, ядер: {os.cpu_count()}")
+
+    start = time.perf_counter()
+    parses = _legacy(project)
+    legacy = time.perf_counter() - start
+    print(f"свой обход у каждого   {legacy:>7.2f}с  разборов AST: {parses}")
+
+    start = time.perf_counter()
+    parses = _shared(project, args.workers)
+    shared = time.perf_counter() - start
+    print(f"общий сканер           {shared:>7.2f}с  разборов AST: {parses}  x{legacy / shared:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Бенчмарк запуска pytest при валидации кода.
+
+Сравнивает utils.validation.run_pytest со старым запуском нового
+процесса pytest на каждую валидацию и с пулом прогретых воркеров
+(utils.pytest_pool). Моделирует цикл debugger → fixer → validator:
+последовательные итерации одной задачи и несколько задач одновременно.
+
+Использование:
+    python scripts/benchmarks/bench_pytest_validation.py
+    python scripts/benchmarks/bench_pytest_validation.py --iterations 20 --tasks 4
+"""
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+CODE = '''def fibonacci(n: int) -> int:
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+'''
+
+TESTS = '''import pytest
+
+@pytest.mark.parametrize("n,expected", [(0, 0), (1, 1), (10, 55), (20, 6765)])
+def test_fibonacci(n, expected):
+    assert fibonacci(n) == expected
+'''
+
+
+def _sequential(iterations: int) -> List[float]:
+    """Задержки последовательных валидаций (секунды)."""
+    from utils.validation import run_pytest
+    
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        success, output = run_pytest(CODE, TESTS)
+        latencies.append(time.perf_counter() - start)
+        assert success, output
+    return latencies
+
+
+def _concurrent(tasks: int, iterations: int) -> float:
+    """Общее время tasks задач по iterations валидаций параллельно."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=tasks) as executor:
+        list(executor.map(lambda _: _sequential(iterations), range(tasks)))
+    return time.perf_counter() - start
+
+
+def _run_mode(name: str, pool_factory: Callable[[], Optional[object]], args: argparse.Namespace) -> tuple:
+    import utils.validation as validation
+    
+    validation.get_pytest_pool = pool_factory
+    # Прогрев: первый вызов поднимает воркеры пула
+    _sequential(1)
+    latencies = _sequential(args.iterations)
+    total = _concurrent(args.tasks, args.iterations)
+    median = statistics.median(latencies)
+    print(f"{name}: медиана {median * 1000:.0f}мс, p95 {sorted(latencies)[int(len(latencies) * 0.95)] * 1000:.0f}мс; "
+          f"{args.tasks} задач x {args.iterations} итераций: {total:.2f}с")
+    return median, total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк запуска pytest для валидации")
+    parser.add_argument("--iterations", type=int, default=10, help="Валидаций на задачу")
+    parser.add_argument("--tasks", type=int, default=2, help="Одновременных задач")
+    args = parser.parse_args()
+    
+    from utils.pytest_pool import PytestWorkerPool
+    
+    print(f"\n📊 {args.iterations} валидаций подряд, затем {args.tasks} задач одновременно\n")
+    
+    legacy = _run_mode("Новый процесс pytest", lambda: None, args)
+    
+    pool = PytestWorkerPool(size=args.tasks, max_jobs_per_worker=50)
+    pool.warm_up()
+    pooled = _run_mode("Пул прогретых воркеров", lambda: pool, args)
+    print(f"Ускорение: x{legacy[0] / pooled[0]:.1f} на валидацию, x{legacy[1] / pooled[1]:.1f} на параллельные задачи")
+    print(f"Статистика пула: {pool.get_stats()}")
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Бенчмарк записи документов в RAG.
+
+Сравнивает старый путь RAGSystem.add_documents (один запрос /api/embeddings
+на документ, последовательно) с батчевым пайплайном (/api/embed батчами,
+несколько батчей параллельно), а также повторную индексацию чанков этого
+репозитория с персистентным кэшем embeddings. Ollama эмулируется фейковым
+сервером, ChromaDB заменён коллекцией в памяти, поэтому измеряется только
+стадия embeddings.
+
+Использование:
+    python scripts/benchmarks/bench_rag_embeddings.py
+    python scripts/benchmarks/bench_rag_embeddings.py --docs 500 --embed-delay 0.02
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, List
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.benchmarks.fake_ollama import FakeOllamaServer
+
+
+class MemoryCollection:
+    """Коллекция в памяти вместо ChromaDB."""
+    
+    def __init__(self) -> None:
+        self.count = 0
+    
+    def add(self, ids: List[str], embeddings: List[Any], documents: List[str], metadatas: List[Any]) -> None:
+        self.count += len(ids)
+
+    upsert = add
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк embeddings для RAG")
+    parser.add_argument("--docs", type=int, default=2000, help="Количество документов")
+    parser.add_argument("--embed-delay", type=float, default=0.01, help="Задержка сервера на запрос, с")
+    parser.add_argument("--embed-item-delay", type=float, default=0.002, help="Задержка сервера на документ, с")
+    parser.add_argument("--batch-size", type=int, default=32, help="Размер батча")
+    parser.add_argument("--concurrency", type=int, default=4, help="Параллельных батчей")
+    args = parser.parse_args()
+    
+    documents = [f"def function_{i}(value):\n    return value * {i}\n" for i in range(args.docs)]
+    
+    with FakeOllamaServer(embed_delay=args.embed_delay, embed_item_delay=args.embed_item_delay) as server:
+        # Клиент ollama читает OLLAMA_HOST при импорте
+        os.environ["OLLAMA_HOST"] = server.url
+        from infrastructure.rag import RAGSystem
+        
+        from infrastructure.context_engine import ContextEngine
+        from infrastructure.embedding_cache import EmbeddingCache
+        
+        rag = RAGSystem(collection_name="bench", persist_directory=str(project_root / ".chromadb_bench"))
+        rag.enabled = True
+        rag.embedding_cache = None
+        
+        print(f"\n📊 {args.docs} документов, сервер: {args.embed_delay * 1000:.0f}мс на запрос + "
+              f"{args.embed_item_delay * 1000:.0f}мс на документ\n")
+        
+        # Старый путь: по одному запросу на документ
+        rag.collection = MemoryCollection()
+        start = time.perf_counter()
+        embeddings = [rag._get_embedding(doc) for doc in documents]
+        rag.collection.add(
+            ids=[str(i) for i in range(len(documents))],
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=[{}] * len(documents)
+        )
+        legacy = time.perf_counter() - start
+        print(f"Последовательно /api/embeddings: {legacy:.2f}с ({args.docs / legacy:.0f} док/с)")
+        
+        # Новый путь: батчи /api/embed в пуле потоков
+        rag.collection = MemoryCollection()
+        rag.embedding_batch_size = args.batch_size
+        rag.embedding_concurrency = args.concurrency
+        start = time.perf_counter()
+        added = rag.add_documents(documents)
+        batched = time.perf_counter() - start
+        print(f"Батчи /api/embed (batch={args.batch_size}, x{args.concurrency}): "
+              f"{batched:.2f}с ({args.docs / batched:.0f} док/с), записано {added}")
+        print(f"Ускорение: x{legacy / batched:.1f}")
+        
+        # Повторная индексация репозитория с кэшем embeddings
+        with tempfile.TemporaryDirectory() as tmp:
+            index = ContextEngine(cache_dir=Path(tmp) / "context").index_project(str(project_root))
+            chunks = [chunk.content for file_chunks in index.values() for chunk in file_chunks]
+            rag.embedding_cache = EmbeddingCache(cache_dir=Path(tmp) / "embeddings")
+            print(f"\n📚 Чанки репозитория: {len(chunks)}")
+            for run in ("Первая индексация", "Повторная индексация"):
+                rag.collection = MemoryCollection()
+                misses_before = rag.embedding_cache.misses
+                start = time.perf_counter()
+                rag.add_documents(chunks)
+                elapsed = time.perf_counter() - start
+                computed = rag.embedding_cache.misses - misses_before
+                print(f"{run}: {elapsed:.2f}с, посчитано embeddings: {computed} из {len(chunks)}")
+            rag.embedding_cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Бенчмарк кодирования SSE событий: событий в секунду на ядро.
+
+Кодирует N токенных событий code_chunk (как в стриме кода) и сравнивает:
+- прежний async send_event: список строк, копия data с timestamp,
+  json.dumps с новым JSONEncoder на вызов, join
+- SSEManager.encode_event с бэкендом json и orjson (если установлен)
+- encode_event после склейки чанков окна (coalesce_chunk_events)
+
+Время — процессорное (time.process_time), т.е. на одно ядро.
+
+Использование:
+    python scripts/benchmarks/bench_sse_encoder.py
+    python scripts/benchmarks/bench_sse_encoder.py --events 200000 --window 16
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend import sse_manager  # noqa: E402
+from backend.sse_manager import SSEManager  # noqa: E402
+from infrastructure.event_backend import Event  # noqa: E402
+from infrastructure.event_dispatcher import coalesce_chunk_events  # noqa: E402
+from utils.logger import get_logger  # noqa: E402
+
+logger = get_logger()
+
+TOKENS = ["def", " handler", "(request", "):\n", "    return", " process", "(request", ")\n"]
+
+
+async def _legacy_send_event(event_type, data, event_id=None) -> str:
+    """Прежняя реализация SSEManager.send_event."""
+    if event_id is None:
+        event_id = str(datetime.now().timestamp())
+    lines = []
+    lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    data_with_timestamp = {**data, "timestamp": datetime.now().isoformat()}
+    json_data = json.dumps(data_with_timestamp, ensure_ascii=False)
+    lines.append(f"data: {json_data}")
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def _report(name: str, events: int, frames: int, cpu: float, baseline: float) -> float:
+    rate = events / cpu
+    print(f"{name:<28} {rate:>12,.0f} событий/с  кадров {frames:>8}  x{rate / baseline if baseline else 1:.1f}")
+    return rate
+
+
+async def _legacy(chunks) -> int:
+    for chunk in chunks:
+        await _legacy_send_event("code_chunk", {"chunk": chunk})
+    return len(chunks)
+
+
+async def _send_event(chunks) -> int:
+    for chunk in chunks:
+        await SSEManager.send_event("code_chunk", {"chunk": chunk})
+    return len(chunks)
+
+
+def _encode(chunks) -> int:
+    for chunk in chunks:
+        SSEManager.encode_event("code_chunk", {"chunk": chunk})
+    return len(chunks)
+
+
+def _encode_coalesced(events, window: int) -> int:
+    frames = 0
+    for start in range(0, len(events), window):
+        for event in coalesce_chunk_events(events[start:start + window]):
+            SSEManager.encode_event(event.event_type, {"chunk": event.data}, event.event_id)
+            frames += 1
+    return frames
+
+
+def _measure(func, *args):
+    start = time.process_time()
+    result = func(*args)
+    if asyncio.iscoroutine(result):
+        result = asyncio.run(result)
+    return result, time.process_time() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк кодирования SSE событий")
+    parser.add_argument("--events", type=int, default=100000, help="Токенных событий")
+    parser.add_argument("--window", type=int, default=8, help="Чанков, пришедших за окно склейки")
+    args = parser.parse_args()
+
+    chunks = [TOKENS[i % len(TOKENS)] for i in range(args.events)]
+    events = [Event(str(i), "code_chunk", chunk, datetime.now(), "bench", i) for i, chunk in enumerate(chunks, 1)]
+    print(f"Событий code_chunk: {args.events}")
+
+    frames, cpu = _measure(_legacy, chunks)
+    baseline = _report("прежний send_event", args.events, frames, cpu, 0)
+
+    backends = ["json"] + (["orjson"] if sse_manager.orjson is not None else [])
+    for backend in backends:
+        sse_manager.set_json_backend(backend)
+        frames, cpu = _measure(_send_event, chunks)
+        _report(f"send_event ({backend})", args.events, frames, cpu, baseline)
+        frames, cpu = _measure(_encode, chunks)
+        _report(f"encode_event ({backend})", args.events, frames, cpu, baseline)
+        frames, cpu = _measure(_encode_coalesced, events, args.window)
+        _report(f"склейка по {args.window} ({backend})", args.events, frames, cpu, baseline)
+    sse_manager.set_json_backend("json")
+
+
+if __name__ == "__main__":
+    main()
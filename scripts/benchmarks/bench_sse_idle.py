@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Бенчмарк простаивающих SSE подписок: CPU процесса API без событий.
+
+Открывает N подписок на очереди сессий без событий (открытые вкладки,
+ожидающие LLM) и измеряет процессорное время за D секунд:
+- прежний вариант: asyncio.wait_for(queue.get(), timeout=0.01) в цикле
+  с проверкой heartbeat — 100 таймеров в секунду на подписку
+- новый: iter_event_batches (ожидание без таймаута) и общий HeartbeatWheel
+
+Использование:
+    python scripts/benchmarks/bench_sse_idle.py
+    python scripts/benchmarks/bench_sse_idle.py --subscribers 200 --seconds 5
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from infrastructure.event_dispatcher import HEARTBEAT, HeartbeatWheel, iter_event_batches  # noqa: E402
+from utils.logger import get_logger  # noqa: E402
+
+logger = get_logger()
+
+HEARTBEAT_INTERVAL = 15.0
+
+
+async def _polling_subscriber(queue: asyncio.Queue, stop: asyncio.Event, counters: dict) -> None:
+    """Прежний цикл stream_events_realtime."""
+    last_heartbeat = time.time()
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(queue.get(), timeout=0.01)
+            counters["events"] += 1
+            last_heartbeat = time.time()
+        except asyncio.TimeoutError:
+            counters["wakeups"] += 1
+            if time.time() - last_heartbeat > HEARTBEAT_INTERVAL:
+                counters["heartbeats"] += 1
+                last_heartbeat = time.time()
+
+
+async def _event_driven_subscriber(queue: asyncio.Queue, wheel: HeartbeatWheel, counters: dict) -> None:
+    async for batch in iter_event_batches(queue, wheel=wheel):
+        counters["wakeups"] += 1
+        for item in batch:
+            counters["heartbeats" if item is HEARTBEAT else "events"] += 1
+
+
+async def _measure(mode: str, subscribers: int, seconds: float) -> None:
+    counters = {"events": 0, "heartbeats": 0, "wakeups": 0}
+    queues = [asyncio.Queue() for _ in range(subscribers)]
+    stop = asyncio.Event()
+    wheel = HeartbeatWheel(interval=HEARTBEAT_INTERVAL)
+    if mode == "polling":
+        tasks = [asyncio.create_task(_polling_subscriber(q, stop, counters)) for q in queues]
+    else:
+        tasks = [asyncio.create_task(_event_driven_subscriber(q, wheel, counters)) for q in queues]
+    await asyncio.sleep(0.1)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.sleep(seconds)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    wheel.stop()
+    print(f"{mode}: CPU {cpu / wall:.1%} ядра, пробуждений {counters['wakeups']}, heartbeat {counters['heartbeats']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк простаивающих SSE подписок")
+    parser.add_argument("--subscribers", type=int, default=200, help="Открытых подписок")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Длительность замера")
+    args = parser.parse_args()
+
+    print(f"Подписок без событий: {args.subscribers}, {args.seconds:.0f}с")
+    for mode in ("polling", "event-driven"):
+        asyncio.run(_measure(mode, args.subscribers, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
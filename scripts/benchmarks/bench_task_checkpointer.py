@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Бенчмарк TaskCheckpointer: журнал изменений против полной перезаписи.
+
+Прогоняет типичную задачу через этапы workflow (intent → ... → fixer) с
+реалистичными размерами полей и сравнивает с прежней схемой записи
+(чтение metadata.json и перезапись metadata.json + state.json с indent=2
+на каждом этапе):
+- время save_checkpoint в вызывающем потоке (то, что блокирует event loop)
+- объём записанных данных на задачу
+- list_all_tasks для N задач (индекс SQLite против обхода директорий),
+  страница истории и очистка старых задач
+
+Использование:
+    python scripts/benchmarks/bench_task_checkpointer.py
+    python scripts/benchmarks/bench_task_checkpointer.py --tasks 20 --history 5000
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.logger import get_logger  # noqa: E402
+
+logger = get_logger()
+
+STAGES = ["intent", "planner", "researcher", "test_generator", "coder", "validator",
+          "debugger", "fixer", "validator", "debugger", "fixer", "validator", "reflection", "critic"]
+
+
+def _evolve(state: Dict[str, Any], stage: str, step: int) -> None:
+    """Изменения state, которые делает узел этапа."""
+    if stage == "intent":
+        state["intent_result"] = {"type": "create", "confidence": 0.9, "description": "x" * 200}
+    elif stage == "planner":
+        state["plan"] = "План шаг " * 600
+    elif stage == "researcher":
+        state["context"] = "контекст " * 6000
+    elif stage == "test_generator":
+        state["tests"] = "def test_x():\n    assert f() == 1\n" * 60
+    elif stage in ("coder", "fixer"):
+        state["code"] = f"# v{step}\n" + "def f():\n    return 1\n" * 150
+        state["iteration"] = step
+    elif stage == "validator":
+        state["validation_results"] = {"pytest": {"success": False, "output": "E assert " * 400}}
+    elif stage == "debugger":
+        state["debug_result"] = {"error_type": "logic", "analysis": "анализ " * 300}
+    else:
+        state[f"{stage}_result"] = {"score": 0.8, "notes": "n" * 500}
+
+
+def _legacy_save(root: Path, task_id: str, state: Dict[str, Any], stage: str, serialize: Any) -> int:
+    """Прежняя запись checkpoint (для сравнения). Возвращает записанные байты."""
+    task_dir = root / task_id
+    task_dir.mkdir(parents=True, exist_ok=True)
+    now = datetime.now().isoformat()
+    metadata_path = task_dir / "metadata.json"
+    created_at = now
+    if metadata_path.exists():
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            created_at = json.load(f).get("created_at", now)
+    metadata = {"task_id": task_id, "task_text": state["task"][:200], "created_at": created_at,
+                "updated_at": now, "last_stage": stage, "status": "running",
+                "iteration": state.get("iteration", 0), "model": None}
+    metadata_json = json.dumps(metadata, ensure_ascii=False, indent=2)
+    state_json = json.dumps(serialize(state), ensure_ascii=False, indent=2)
+    metadata_path.write_text(metadata_json, encoding="utf-8")
+    (task_dir / "state.json").write_text(state_json, encoding="utf-8")
+    logger.info(f"💾 Checkpoint сохранён: task={task_id[:8]}..., stage={stage}, status=running")
+    return len(metadata_json) + len(state_json)
+
+
+def _run_tasks(save, tasks: int) -> List[float]:
+    """Прогоняет задачи через этапы, возвращает задержки save (секунды)."""
+    latencies = []
+    for t in range(tasks):
+        state: Dict[str, Any] = {"task": f"Задача {t}", "task_id": f"task-{t}", "iteration": 0}
+        for step, stage in enumerate(STAGES):
+            _evolve(state, stage, step)
+            start = time.perf_counter()
+            save(f"task-{t}", state, stage)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк TaskCheckpointer")
+    parser.add_argument("--tasks", type=int, default=30, help="Задач для прогона этапов")
+    parser.add_argument("--history", type=int, default=2000, help="Задач в истории для list_all_tasks")
+    args = parser.parse_args()
+    
+    from infrastructure.task_checkpointer import TaskCheckpointer
+    
+    print(f"\n📊 {args.tasks} задач × {len(STAGES)} этапов\n")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_root = Path(tmp) / "legacy"
+        legacy_bytes = [0]
+        # Та же сериализация объектов state, что и в TaskCheckpointer
+        serializer = TaskCheckpointer(checkpoint_dir=str(Path(tmp) / "serializer"))
+        
+        def legacy(task_id: str, state: Dict[str, Any], stage: str) -> None:
+            legacy_bytes[0] += _legacy_save(legacy_root, task_id, state, stage, serializer._serialize_state)
+        
+        legacy_lat = _run_tasks(legacy, args.tasks)
+        
+        checkpointer = TaskCheckpointer(checkpoint_dir=str(Path(tmp) / "log"), background_writes=True)
+        log_lat = _run_tasks(lambda task_id, state, stage: checkpointer.save_checkpoint(task_id, state, stage), args.tasks)
+        flush_start = time.perf_counter()
+        checkpointer.close()
+        flush_ms = (time.perf_counter() - flush_start) * 1000
+        
+        print(f"Прежняя запись: медиана {statistics.median(legacy_lat) * 1000:.2f}мс, "
+              f"p95 {sorted(legacy_lat)[int(len(legacy_lat) * 0.95)] * 1000:.2f}мс, "
+              f"записано {legacy_bytes[0] / args.tasks / 1024:.0f} КБ на задачу")
+        print(f"Журнал изменений (в потоке вызова): медиана {statistics.median(log_lat) * 1000:.2f}мс, "
+              f"p95 {sorted(log_lat)[int(len(log_lat) * 0.95)] * 1000:.2f}мс, "
+              f"записано {checkpointer.bytes_written / args.tasks / 1024:.0f} КБ на задачу "
+              f"(снимков {checkpointer.snapshots_written}, записей журнала {checkpointer.deltas_written}, "
+              f"дозапись на close {flush_ms:.0f}мс)")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        checkpointer = TaskCheckpointer(checkpoint_dir=tmp, background_writes=True)
+        for i in range(args.history):
+            checkpointer.save_checkpoint(f"h-{i}", {"task": f"История {i}", "task_id": f"h-{i}"}, "critic", "completed")  # type: ignore[arg-type]
+        checkpointer.close()
+        
+        start = time.perf_counter()
+        legacy_tasks = []
+        for task_dir in root.iterdir():
+            metadata_path = task_dir / "metadata.json"
+            if task_dir.is_dir() and metadata_path.exists():
+                with open(metadata_path, "r", encoding="utf-8") as f:
+                    legacy_tasks.append(json.load(f))
+        legacy_tasks.sort(key=lambda x: x["updated_at"], reverse=True)
+        scan_ms = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        restarted = TaskCheckpointer(checkpoint_dir=tmp)
+        open_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        indexed = restarted.list_all_tasks()
+        list_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        page = restarted.list_all_tasks(limit=20, offset=100)
+        total = restarted.count_tasks()
+        page_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        restarted._cleanup_old_checkpoints()
+        cleanup_ms = (time.perf_counter() - start) * 1000
+        restarted.close()
+        
+        print(f"\nИстория из {args.history} задач:")
+        print(f"  обход директорий (прежний list_all_tasks): {scan_ms:.0f}мс")
+        print(f"  индекс SQLite, все задачи: {list_ms:.1f}мс ({len(indexed)} задач)")
+        print(f"  индекс SQLite, страница 20 + count: {page_ms:.2f}мс ({len(page)} из {total})")
+        print(f"  старт TaskCheckpointer с очисткой: {open_ms:.0f}мс, очистка без истёкших: {cleanup_ms:.1f}мс")
+
+if __name__ == "__main__":
+    main()
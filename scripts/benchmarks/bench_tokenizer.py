@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Бенчмарк сервиса подсчёта токенов (utils.tokenizer).
+
+Повторяет нагрузку ContextEngine: чанки проекта считаются при индексации,
+а затем заново при каждой сборке контекста. Сравниваются:
+- count без памяти (каждый вызов — encode)
+- count с памятью по хэшу содержимого (повторные сборки)
+- count_batch (промахи одним encode_batch)
+
+И точность: эвристика estimate_tokens против токенизатора модели.
+Без библиотеки tokenizers и tokenizer.json ([tokenizer] directory или кэш
+HuggingFace) считается эвристика — память для неё не используется.
+
+Использование:
+    python scripts/benchmarks/bench_tokenizer.py
+    python scripts/benchmarks/bench_tokenizer.py --model llama3.1:8b --chunks 2000 --rounds 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.logger import get_logger  # noqa: E402
+from utils.token_counter import estimate_tokens  # noqa: E402
+from utils.tokenizer import Tokenizer, get_tokenizer  # noqa: E402
+
+logger = get_logger()
+
+
+def _chunks(count: int) -> list:
+    """Чанки кода из файлов проекта (по 40 строк)."""
+    chunks = []
+    for path in sorted(project_root.glob("**/*.py")):
+        if ".venv" in path.parts or "venv" in path.parts:
+            continue
+        lines = path.read_text(encoding="utf-8", errors="ignore").split("\n")
+        for i in range(0, len(lines), 40):
+            chunk = "\n".join(lines[i:i + 40])
+            if chunk.strip():
+                chunks.append(chunk)
+            if len(chunks) >= count:
+                return chunks
+    return chunks
+
+
+def _timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк подсчёта токенов")
+    parser.add_argument("--model", default="qwen2.5-coder:7b", help="Модель Ollama")
+    parser.add_argument("--chunks", type=int, default=1000, help="Чанков кода")
+    parser.add_argument("--rounds", type=int, default=3, help="Повторных сборок контекста")
+    args = parser.parse_args()
+
+    chunks = _chunks(args.chunks)
+    shared = get_tokenizer(args.model)
+    print(f"Токенизатор: {shared.name}, чанков: {len(chunks)}")
+    if not shared.exact:
+        logger.warning("⚠️ tokenizer.json не найден — измеряется эвристика, память не используется")
+
+    backend = shared._backend
+    plain = Tokenizer(shared.family, backend, memo_entries=0)
+    memo = Tokenizer(shared.family, backend, memo_entries=len(chunks) * 2)
+    batch = Tokenizer(shared.family, backend, memo_entries=len(chunks) * 2)
+
+    def repeat(tokenizer: Tokenizer) -> None:
+        for _ in range(args.rounds + 1):
+            for chunk in chunks:
+                tokenizer.count(chunk)
+
+    def repeat_batch(tokenizer: Tokenizer) -> None:
+        for _ in range(args.rounds + 1):
+            tokenizer.count_batch(chunks)
+
+    print(f"\nИндексация + {args.rounds} сборки контекста:")
+    print(f"  count без памяти: {_timed(lambda: repeat(plain)):.1f}мс")
+    print(f"  count с памятью:  {_timed(lambda: repeat(memo)):.1f}мс "
+          f"(hit rate {memo.get_stats()['memo_hit_rate']:.0%})")
+    print(f"  count_batch:      {_timed(lambda: repeat_batch(batch)):.1f}мс")
+
+    if shared.exact:
+        exact = sum(plain.count_batch(chunks))
+        estimated = sum(estimate_tokens(chunk) for chunk in chunks)
+        print(f"\nТокенов: {exact} (токенизатор), {estimated} (эвристика, "
+              f"ошибка {(estimated - exact) / exact:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
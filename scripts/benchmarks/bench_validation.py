@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Бенчмарк полной валидации кода (pytest + mypy + bandit).
+
+Сравнивает последовательный запуск проверок (каждая в своей временной
+директории, как раньше делал validate_code) с параллельным validate_code
+над общим workspace, а также fail_fast на коде с падающими тестами
+(как в validator_node). pytest в обоих случаях идёт через пул прогретых
+воркеров, поэтому разница — только в порядке запуска проверок.
+
+Использование:
+    python scripts/benchmarks/bench_validation.py
+    python scripts/benchmarks/bench_validation.py --runs 10
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+CODE = '''def fibonacci(n: int) -> int:
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+'''
+
+TESTS = '''def test_fibonacci() -> None:
+    assert fibonacci(10) == 55
+'''
+
+FAILING_TESTS = '''def test_fibonacci() -> None:
+    assert fibonacci(10) == 56
+'''
+
+
+def _measure(call: Callable[[], object], runs: int) -> List[float]:
+    """Задержки вызовов (секунды)."""
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк полной валидации кода")
+    parser.add_argument("--runs", type=int, default=5, help="Запусков на режим")
+    args = parser.parse_args()
+    
+    from utils.validation import check_bandit, check_mypy, run_pytest, validate_code
+    
+    def sequential(tests: str) -> None:
+        run_pytest(CODE, tests)
+        check_mypy(CODE)
+        check_bandit(CODE)
+    
+    # Прогрев пула pytest и файлового кэша инструментов
+    validate_code(CODE, TESTS, use_cache=False)
+    
+    print(f"\n📊 {args.runs} запусков на режим\n")
+    modes = [
+        ("Последовательно (3 временные директории)", lambda: sequential(TESTS)),
+        ("Параллельно (общий workspace)", lambda: validate_code(CODE, TESTS, use_cache=False)),
+        ("Падающий тест, последовательно", lambda: sequential(FAILING_TESTS)),
+        ("Падающий тест, fail_fast", lambda: validate_code(CODE, FAILING_TESTS, fail_fast=True, use_cache=False)),
+    ]
+    medians = []
+    for name, call in modes:
+        latencies = _measure(call, args.runs)
+        medians.append(statistics.median(latencies))
+        print(f"{name}: медиана {medians[-1] * 1000:.0f}мс")
+    print(f"Ускорение: x{medians[0] / medians[1]:.1f} (успешная валидация), "
+          f"x{medians[2] / medians[3]:.1f} (провал pytest с fail_fast)")
+
+
+if __name__ == "__main__":
+    main()
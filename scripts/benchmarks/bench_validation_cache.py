@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Бенчмарк кэша результатов валидации в цикле self-healing.
+
+Моделирует цикл debugger → fixer → validator, в котором fixer каждый раз
+возвращает тот же код с другим форматированием и комментариями (частый
+случай на практике). Сравнивает валидацию без кэша, с кэшем в памяти и
+после "перезапуска" (новый экземпляр кэша над тем же файлом SQLite).
+
+Использование:
+    python scripts/benchmarks/bench_validation_cache.py
+    python scripts/benchmarks/bench_validation_cache.py --iterations 5
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+CODE = '''def fibonacci(n: int) -> int:
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+'''
+
+TESTS = '''def test_fibonacci() -> None:
+    assert fibonacci(10) == 56
+'''
+
+
+def _variants(count: int) -> List[str]:
+    """Один и тот же код с разным форматированием и комментариями."""
+    return [f"# Исправление {i}\n" + CODE.replace("a, b = 0, 1", "a, b = 0,  1" + "  # init" * (i % 2)) for i in range(count)]
+
+
+def _loop(variants: List[str], use_cache: bool) -> float:
+    """Время цикла валидаций (секунды)."""
+    from utils.validation import validate_code
+    
+    start = time.perf_counter()
+    for code in variants:
+        validate_code(code, TESTS, fail_fast=True, use_cache=use_cache)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк кэша результатов валидации")
+    parser.add_argument("--iterations", type=int, default=3, help="Итераций self-healing в цикле")
+    parser.add_argument("--runs", type=int, default=3, help="Повторов цикла без кэша")
+    args = parser.parse_args()
+    
+    from infrastructure.validation_cache import ValidationResultCache
+    from utils import validation
+    
+    variants = _variants(args.iterations)
+    # Прогрев пула pytest и кэша mypy
+    validation.validate_code(CODE, TESTS, use_cache=False)
+    
+    uncached = statistics.median(_loop(variants, use_cache=False) for _ in range(args.runs))
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        disk_path = Path(tmp) / "results.sqlite"
+        cache = ValidationResultCache(disk_path=disk_path)
+        validation.get_validation_cache = lambda: cache
+        cached = _loop(variants, use_cache=True)
+        cache.close()
+        
+        # Повторный запуск задачи после перезапуска процесса
+        cache = ValidationResultCache(disk_path=disk_path)
+        validation.get_validation_cache = lambda: cache
+        restarted = _loop(variants, use_cache=True)
+        print(f"Статистика кэша после перезапуска: {cache.get_stats()}")
+        cache.close()
+    
+    print(f"\n📊 Цикл из {args.iterations} валидаций одного и того же кода\n")
+    print(f"Без кэша: {uncached * 1000:.0f}мс")
+    print(f"С кэшем (первый запуск задачи): {cached * 1000:.0f}мс")
+    print(f"С кэшем (после перезапуска, SQLite): {restarted * 1000:.1f}мс")
+    print(f"Ускорение цикла: x{uncached / cached:.1f}, повторного запуска: x{uncached / max(restarted, 1e-6):.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Фейковый Ollama сервер для бенчмарков.
+
+Минимальная реализация HTTP/1.1 (keep-alive, chunked) на asyncio streams,
+без внешних зависимостей. Эмулирует endpoints, которые использует проект:
+
+- GET  /api/tags — список моделей
+- POST /api/generate — генерация (stream и без stream)
+- POST /api/chat — чат (без stream)
+- GET  /api/version — версия (проба доступности)
+- POST /api/embeddings — embedding одного текста
+- POST /api/embed — батчевые embeddings
+
+Скорость "модели" задаётся числом токенов и задержкой между ними, поэтому
+бенчмарк измеряет накладные расходы клиента, а не железо. Стоимость
+embeddings — фиксированная задержка на запрос плюс задержка на каждый текст.
+
+Использование:
+    from scripts.benchmarks.fake_ollama import FakeOllamaServer
+
+    with FakeOllamaServer(tokens=64, token_delay=0.005) as server:
+        os.environ["OLLAMA_HOST"] = server.url
+        ...
+"""
+import asyncio
+import json
+import multiprocessing
+import socket
+import time
+from typing import Any, Optional
+
+
+def _free_port() -> int:
+    """Возвращает свободный TCP порт на localhost."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _write_chunk(writer: asyncio.StreamWriter, payload: dict[str, Any]) -> None:
+    """Отправляет одну JSON строку как HTTP chunk."""
+    data = (json.dumps(payload) + "\n").encode()
+    writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+    await writer.drain()
+
+
+# Размерность фейковых embeddings (как у nomic-embed-text)
+EMBEDDING_DIM = 768
+
+
+def _fake_embedding(text: str) -> list[float]:
+    """Детерминированный ненулевой вектор для текста."""
+    seed = (sum(text.encode()) % 97) + 1
+    return [((seed * (i + 1)) % 101) / 101.0 for i in range(EMBEDDING_DIM)]
+
+
+async def _write_json(writer: asyncio.StreamWriter, payload: dict[str, Any]) -> None:
+    """Отправляет JSON ответ с Content-Length."""
+    response = json.dumps(payload).encode()
+    writer.write(
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+        + f"Content-Length: {len(response)}\r\n\r\n".encode() + response
+    )
+    await writer.drain()
+
+
+async def _handle(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    tokens: int,
+    token_delay: float,
+    embed_delay: float,
+    embed_item_delay: float
+) -> None:
+    """Обрабатывает keep-alive соединение: запросы идут один за другим."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, _ = request_line.decode().split(" ", 2)
+            
+            headers: dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode().partition(":")
+                headers[key.strip().lower()] = value.strip()
+            
+            body = b""
+            if "content-length" in headers:
+                body = await reader.readexactly(int(headers["content-length"]))
+            request = json.loads(body) if body else {}
+            model = request.get("model", "fake")
+            
+            if method == "GET" and path == "/api/tags":
+                response = json.dumps({"models": [{"name": "fake:latest", "size": 0}]}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(response)}\r\n\r\n".encode() + response
+                )
+                await writer.drain()
+                continue
+            
+            if method == "GET" and path == "/api/version":
+                await _write_json(writer, {"version": "0.0.0-fake"})
+                continue
+            
+            if path == "/api/generate" and request.get("stream", True):
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                    b"Transfer-Encoding: chunked\r\n\r\n"
+                )
+                for i in range(tokens):
+                    if token_delay:
+                        await asyncio.sleep(token_delay)
+                    await _write_chunk(writer, {"model": model, "response": f"t{i} ", "done": False})
+                await _write_chunk(writer, {"model": model, "response": "", "done": True})
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+                continue
+            
+            if path == "/api/embeddings":
+                await asyncio.sleep(embed_delay + embed_item_delay)
+                await _write_json(writer, {"embedding": _fake_embedding(request.get("prompt", ""))})
+                continue
+            
+            if path == "/api/embed":
+                texts = request.get("input", [])
+                if isinstance(texts, str):
+                    texts = [texts]
+                await asyncio.sleep(embed_delay + embed_item_delay * len(texts))
+                await _write_json(writer, {"model": model, "embeddings": [_fake_embedding(t) for t in texts]})
+                continue
+            
+            if path in ("/api/generate", "/api/chat"):
+                if token_delay:
+                    await asyncio.sleep(token_delay * tokens)
+                text = " ".join(f"t{i}" for i in range(tokens))
+                if path == "/api/chat":
+                    payload = {"model": model, "message": {"role": "assistant", "content": text}, "done": True}
+                else:
+                    payload = {"model": model, "response": text, "done": True}
+                response = json.dumps(payload).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(response)}\r\n\r\n".encode() + response
+                )
+                await writer.drain()
+                continue
+            
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+def _serve(port: int, tokens: int, token_delay: float, embed_delay: float, embed_item_delay: float) -> None:
+    """Точка входа процесса сервера."""
+    async def main() -> None:
+        server = await asyncio.start_server(
+            lambda r, w: _handle(r, w, tokens, token_delay, embed_delay, embed_item_delay),
+            "127.0.0.1",
+            port,
+            backlog=1024
+        )
+        async with server:
+            await server.serve_forever()
+    
+    asyncio.run(main())
+
+
+class FakeOllamaServer:
+    """Фейковый Ollama в отдельном процессе (не конкурирует за GIL с клиентом)."""
+    
+    def __init__(
+        self,
+        tokens: int = 64,
+        token_delay: float = 0.005,
+        embed_delay: float = 0.0,
+        embed_item_delay: float = 0.0
+    ) -> None:
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.embed_delay = embed_delay
+        self.embed_item_delay = embed_item_delay
+        self.port = _free_port()
+        self._process: Optional[multiprocessing.Process] = None
+    
+    @property
+    def url(self) -> str:
+        """Базовый URL сервера."""
+        return f"http://127.0.0.1:{self.port}"
+    
+    def start(self) -> None:
+        """Запускает сервер и ждёт, пока он начнёт принимать соединения."""
+        self._process = multiprocessing.Process(
+            target=_serve,
+            args=(self.port, self.tokens, self.token_delay, self.embed_delay, self.embed_item_delay),
+            daemon=True
+        )
+        self._process.start()
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.2):
+                    return
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("Фейковый Ollama сервер не запустился")
+    
+    def stop(self) -> None:
+        """Останавливает сервер."""
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(timeout=5)
+            self._process = None
+    
+    def __enter__(self) -> "FakeOllamaServer":
+        self.start()
+        return self
+    
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
@@ -200,3 +200,23 @@ def cleanup_event_store():
     if EventStore._cleanup_task and not EventStore._cleanup_task.done():
         EventStore._cleanup_task.cancel()
         EventStore._cleanup_task = None
+
+
+@pytest.fixture(autouse=True)
+def disable_llm_response_cache(monkeypatch):
+    """Отключает глобальный кэш ответов LLM: ответы моков не должны переходить между тестами."""
+    monkeypatch.setattr("infrastructure.local_llm.get_llm_response_cache", lambda: None)
+
+
+@pytest.fixture(autouse=True)
+def disable_validation_cache(monkeypatch):
+    """Отключает глобальный кэш валидации: результаты моков не должны переходить между тестами."""
+    monkeypatch.setattr("utils.validation.get_validation_cache", lambda: None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_ollama_health(monkeypatch):
+    """Свежий монитор Ollama без фоновой пробы: статус не должен переходить между тестами."""
+    from infrastructure import ollama_health
+    
+    monkeypatch.setattr(ollama_health, "_monitor", ollama_health.OllamaHealthMonitor("http://localhost:11434"))
@@ -46,6 +46,7 @@ def create_agent_state(**overrides) -> AgentState:
         "tests": "",
         "code": "",
         "validation_results": {},
+        "validation_fingerprints": [],
         "debug_result": None,
         "reflection_result": None,
         "iteration": 0,
@@ -324,19 +324,18 @@ class TestIndexProject:
     
     @patch('backend.routers.agent.validate_directory_path')
     @patch('pathlib.Path')
-    @patch('infrastructure.context_engine.ContextEngine')
-    @patch('asyncio.to_thread')
+    @patch('infrastructure.project_index_registry.get_project_index_registry')
     @pytest.mark.backend
 
     def test_index_project_success(
         self,
-        mock_to_thread,
-        mock_context_engine,
+        mock_get_registry,
         mock_path,
         mock_validate,
         client
     ):
         """Тест индексации проекта."""
+        from concurrent.futures import Future
         mock_validate.return_value = "/test/project"
         
         # Мокаем Path.exists() и is_dir()
@@ -345,14 +344,10 @@ class TestIndexProject:
         mock_path_instance.is_dir.return_value = True
         mock_path.return_value = mock_path_instance
         
-        mock_engine_instance = Mock()
-        mock_engine_instance.index_project.return_value = {"file1.py": []}
-        mock_context_engine.return_value = mock_engine_instance
-        
-        async def mock_to_thread_func(func, *args, **kwargs):
-            return func(*args, **kwargs)
-        
-        mock_to_thread.side_effect = mock_to_thread_func
+        # Индексация идёт через общий реестр индексов проектов
+        future = Future()
+        future.set_result({"file1.py": []})
+        mock_get_registry.return_value.warm_up.return_value = future
         
         response = client.post(
             "/api/index",
@@ -366,6 +361,7 @@ class TestIndexProject:
         assert response.status_code == 200
         data = response.json()
         assert "status" in data or "message" in data or "files_indexed" in data
+        mock_get_registry.return_value.warm_up.assert_called_once_with("/test/project", [".js", ".py"])
     
     @pytest.mark.backend
 
@@ -545,3 +541,30 @@ class TestGetStreamParams:
         )
         
         assert response.status_code in [200, 400, 422, 503]
+
+
+class TestTaskCheckpointEndpoints:
+    """Тесты для /api/tasks/{task_id}: чтение checkpoint вне event loop."""
+    
+    @pytest.mark.backend
+    async def test_checkpoint_io_runs_in_worker_thread(self):
+        """load/delete_checkpoint (flush + fsync) не блокируют event loop."""
+        import threading
+        from fastapi import HTTPException
+        from backend.routers.agent import delete_task, get_task_details
+        
+        loop_thread = threading.get_ident()
+        threads = []
+        checkpointer = Mock()
+        checkpointer.load_checkpoint.side_effect = lambda task_id: threads.append(threading.get_ident())
+        checkpointer.delete_checkpoint.side_effect = lambda task_id: threads.append(threading.get_ident()) or True
+        
+        with patch('backend.routers.agent.get_config', return_value=Mock(persistence_enabled=True)), \
+             patch('backend.routers.agent.get_task_checkpointer', return_value=checkpointer):
+            with pytest.raises(HTTPException):
+                # load_checkpoint вернул None → 404
+                await get_task_details("task")
+            assert (await delete_task("task"))["status"] == "success"
+        
+        assert len(threads) == 2
+        assert loop_thread not in threads
@@ -1,6 +1,9 @@
 """Тесты для SSE manager."""
+import json
+
 import pytest
 from unittest.mock import Mock, patch
+from backend import sse_manager as sse_manager_module
 from backend.sse_manager import SSEManager, get_sse_manager
 
 
@@ -17,8 +20,9 @@ class TestSendEvent:
             data={"message": "test message"}
         )
         
-        assert "id:" in event
-        assert "event: test" in event
+        # Без ID хранилища строки id: нет
+        assert "id:" not in event
+        assert event.startswith("event: test")
         assert "data:" in event
         assert "test message" in event
         assert event.endswith("\n\n")
@@ -251,3 +255,61 @@ class TestGetSSEManager:
         
         assert manager1 is manager2
         assert isinstance(manager1, SSEManager)
+
+
+class TestEncodeEvent:
+    """Тесты для синхронного encode_event."""
+
+    @staticmethod
+    def _parse(event):
+        lines = event.split("\n")
+        event_id = lines.pop(0)[len("id: "):] if lines[0].startswith("id: ") else None
+        return event_id, lines[0][len("event: "):], json.loads(lines[1][len("data: "):])
+
+    @pytest.mark.backend
+    def test_encode_event_matches_previous_format(self):
+        """Формат совпадает с прежним json.dumps(..., ensure_ascii=False)."""
+        data = {"chunk": "привет\n\"мир\"", "nested": {"a": [1, 2.5, None, True]}}
+        event = SSEManager.encode_event("code_chunk", data, event_id="7")
+
+        event_id, event_type, payload = self._parse(event)
+        assert (event_id, event_type) == ("7", "code_chunk")
+        assert event.endswith("\n\n")
+        assert payload.pop("timestamp")
+        assert payload == data
+        assert json.dumps(data, ensure_ascii=False)[:-1] in event
+        # data не изменяется
+        assert "timestamp" not in data
+
+    @pytest.mark.backend
+    def test_encode_event_without_store_id_has_no_id_line(self):
+        """Кадры вне EventStore (heartbeat, чанки) не сдвигают Last-Event-ID клиента."""
+        event_id, event_type, payload = self._parse(SSEManager.encode_event("heartbeat", {"status": "alive"}))
+        assert (event_id, event_type) == (None, "heartbeat")
+        assert payload["status"] == "alive"
+
+    @pytest.mark.backend
+    def test_encode_event_overwrites_explicit_timestamp(self):
+        # Как и прежде: timestamp события — время кодирования, а не переданный
+        event = SSEManager.encode_event("test", {"timestamp": "old", "a": 1})
+        payload = self._parse(event)[2]
+        assert payload["a"] == 1
+        assert payload["timestamp"] != "old"
+
+    @pytest.mark.backend
+    def test_orjson_backend(self):
+        pytest.importorskip("orjson")
+        try:
+            assert sse_manager_module.set_json_backend("orjson") == "orjson"
+            data = {"chunk": "def f():\n    return 'ы'", 1: "x"}
+            payload = self._parse(SSEManager.encode_event("code_chunk", data))[2]
+            assert payload.pop("timestamp")
+            assert payload == {"chunk": data["chunk"], "1": "x"}
+        finally:
+            sse_manager_module.set_json_backend("json")
+
+    @pytest.mark.backend
+    def test_orjson_backend_falls_back_without_package(self):
+        with patch.object(sse_manager_module, "orjson", None):
+            assert sse_manager_module.set_json_backend("orjson") == "json"
+        sse_manager_module.set_json_backend("json")
@@ -0,0 +1,222 @@
+"""Тесты для кэша результатов (SimpleCache и декораторы)."""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from infrastructure.cache import SimpleCache, async_cached, cached, make_cache_key
+
+
+class TestSimpleCache:
+    """Тесты для класса SimpleCache."""
+    
+    def test_lru_eviction_keeps_hot_entries(self):
+        """При переполнении вытесняется давно не использованная запись."""
+        cache = SimpleCache(max_size=3)
+        for key in ("a", "b", "c"):
+            cache.set(key, key.upper())
+        assert cache.get("a") == "A"  # "a" становится свежей
+        
+        cache.set("d", "D")
+        
+        assert cache.get("b") is None
+        assert [cache.get(k) for k in ("a", "c", "d")] == ["A", "C", "D"]
+        assert cache.get_stats()["evictions"] == 1
+    
+    def test_ttl_expiration(self):
+        """Истёкшая запись не возвращается и удаляется."""
+        cache = SimpleCache()
+        cache.set("old", "value", ttl=-1)
+        cache.set("fresh", "value", ttl=60)
+        
+        assert cache.get("old") is None
+        assert cache.get("fresh") == "value"
+        assert len(cache) == 1
+        assert cache.get_stats()["expirations"] == 1
+    
+    def test_byte_limit(self):
+        """Лимит по объёму вытесняет записи и не принимает гигантские значения."""
+        cache = SimpleCache(max_size=100, max_bytes=2000)
+        cache.set("a", "x" * 800)
+        cache.set("b", "y" * 800)
+        cache.set("c", "z" * 800)
+        
+        assert cache.get("a") is None
+        assert cache.get("c") is not None
+        assert cache.total_bytes <= 2000
+        
+        cache.set("huge", "h" * 10_000)
+        assert cache.get("huge") is None
+        assert cache.get("c") is not None
+    
+    def test_stats(self):
+        """Счётчики попаданий и промахов."""
+        cache = SimpleCache()
+        cache.set("k", 1)
+        cache.get("k")
+        cache.get("missing")
+        
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+    
+    def test_make_cache_key_distinguishes_objects_with_same_str(self):
+        """Ключ не совпадает для значений с одинаковым строковым представлением."""
+        assert make_cache_key("1") != make_cache_key(1)
+        assert make_cache_key(("a", "b")) != make_cache_key("('a', 'b')")
+    
+    def test_make_cache_key_ignores_dict_order(self):
+        """Порядок ключей словаря не влияет на ключ кэша."""
+        assert make_cache_key({"a": 1, "b": [2.5, None]}) == make_cache_key({"b": [2.5, None], "a": 1})
+        assert make_cache_key({"a": 1}) != make_cache_key({"a": 2})
+    
+    def test_make_cache_key_rejects_arbitrary_objects(self):
+        """Экземпляры произвольных классов не дают ключа."""
+        with pytest.raises(TypeError):
+            make_cache_key(object())
+
+
+class TestCacheDecorators:
+    """Тесты декораторов @cached и @async_cached."""
+    
+    @pytest.fixture(autouse=True)
+    def isolated_cache(self):
+        """Отдельный кэш на тест."""
+        cache = SimpleCache()
+        with patch("infrastructure.cache.get_cache", return_value=cache):
+            yield cache
+    
+    def test_cached(self):
+        """Повторный вызов с теми же аргументами берётся из кэша."""
+        calls = []
+        
+        @cached(ttl=60)
+        def square(x):
+            calls.append(x)
+            return x * x
+        
+        assert square(3) == 9
+        assert square(3) == 9
+        assert square(4) == 16
+        assert calls == [3, 4]
+    
+    def test_cached_method_is_keyed_by_instance(self):
+        """Разные экземпляры не делят запись, повтор на том же экземпляре — из кэша."""
+        calls = []
+        
+        class Service:
+            def __init__(self, prefix):
+                self.prefix = prefix
+            
+            @cached(ttl=60)
+            def lookup(self, query):
+                calls.append((self.prefix, query))
+                return f"{self.prefix}{query}"
+        
+        first, second = Service("1:"), Service("2:")
+        assert first.lookup("a") == "1:a"
+        assert second.lookup("a") == "2:a"
+        assert first.lookup("a") == "1:a"
+        assert calls == [("1:", "a"), ("2:", "a")]
+    
+    def test_cached_classmethod_is_keyed_by_class(self):
+        calls = []
+        
+        class Base:
+            @classmethod
+            @cached(ttl=60)
+            def name(cls):
+                calls.append(cls)
+                return cls.__name__
+        
+        class Child(Base):
+            pass
+        
+        assert Base.name() == "Base"
+        assert Child.name() == "Child"
+        assert Base.name() == "Base"
+        assert calls == [Base, Child]
+    
+    def test_cached_unkeyable_args_bypass_cache(self):
+        """Аргумент без стабильного ключа — вызов без кэша, а не ошибка."""
+        calls = []
+        
+        @cached(ttl=60)
+        def describe(value):
+            calls.append(value)
+            return "ok"
+        
+        marker = object()
+        assert describe(marker) == "ok"
+        assert describe(marker) == "ok"
+        assert len(calls) == 2
+    
+    async def test_async_cached_single_flight(self):
+        """Одновременные вызовы с одинаковыми аргументами выполняют функцию один раз."""
+        calls = []
+        
+        @async_cached(ttl=60)
+        async def fetch(x):
+            calls.append(x)
+            await asyncio.sleep(0.01)
+            return x * 2
+        
+        results = await asyncio.gather(*(fetch(5) for _ in range(10)))
+        
+        assert results == [10] * 10
+        assert calls == [5]
+    
+    async def test_async_cached_propagates_errors(self):
+        """Ошибка не кэшируется и доходит до всех ожидающих."""
+        calls = []
+        
+        @async_cached(ttl=60)
+        async def fail():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+        
+        results = await asyncio.gather(fail(), fail(), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        
+        with pytest.raises(ValueError):
+            await fail()
+        assert len(calls) == 2
+    
+    async def test_async_cached_leader_cancel_does_not_cancel_followers(self):
+        """Отмена первого вызова не отменяет ожидающих: вызов повторяется один раз."""
+        calls = []
+        
+        @async_cached(ttl=60)
+        async def fetch(x):
+            calls.append(x)
+            await asyncio.sleep(0.05)
+            return x * 3
+        
+        leader = asyncio.create_task(fetch(7))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(fetch(7)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        
+        assert await asyncio.gather(*followers) == [21] * 3
+        assert leader.cancelled()
+        assert calls == [7, 7]
+    
+    async def test_async_cached_follower_cancel_keeps_leader(self):
+        """Отмена ожидающего не отменяет общий вызов."""
+        @async_cached(ttl=60)
+        async def fetch(x):
+            await asyncio.sleep(0.02)
+            return x + 1
+        
+        leader = asyncio.create_task(fetch(1))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(fetch(1))
+        await asyncio.sleep(0)
+        follower.cancel()
+        
+        assert await leader == 2
+        with pytest.raises(asyncio.CancelledError):
+            await follower
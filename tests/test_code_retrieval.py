@@ -1,4 +1,5 @@
 """Тесты для Code Retrieval (Phase 4)."""
+import hashlib
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 
@@ -240,3 +241,130 @@ class TestGetCodeRetriever:
         assert result is not None
         assert isinstance(result, CodeRetriever)
         assert result._embedding_model_name == "test-model"
+
+
+class TestCodeRetrieverEmbeddingCache:
+    """Тесты использования кэша embeddings в CodeRetriever."""
+    
+    def test_encode_uses_cache(self, tmp_path):
+        """Повторный текст не пересчитывается моделью."""
+        from infrastructure.embedding_cache import EmbeddingCache
+        
+        retriever = CodeRetriever(embedding_model="test-model")
+        retriever._embedding_cache = EmbeddingCache(cache_dir=tmp_path)
+        retriever._embedding_model = MagicMock()
+        retriever._embedding_model.encode.return_value.tolist.return_value = [0.25, 0.5]
+        
+        try:
+            assert retriever._encode("def f(): pass") == [0.25, 0.5]
+            assert retriever._encode("def f(): pass") == [0.25, 0.5]
+        finally:
+            retriever._embedding_cache.close()
+        
+        assert retriever._embedding_model.encode.call_count == 1
+
+
+class _FakeEncoder:
+    """Фейковый SentenceTransformer: считает закодированные тексты."""
+    
+    def __init__(self):
+        self.encoded: list[str] = []
+    
+    def encode(self, texts, batch_size=32):
+        self.encoded.extend(texts)
+        result = MagicMock()
+        result.tolist.return_value = [[float(len(text)), 1.0] for text in texts]
+        return result
+
+
+class TestIncrementalIndexProject:
+    """Тесты инкрементальной индексации проекта."""
+    
+    @pytest.fixture
+    def retriever(self, tmp_path):
+        """CodeRetriever с фейковыми моделью и коллекцией."""
+        retriever = CodeRetriever(chroma_path=str(tmp_path / "chroma"))
+        retriever._embedding_cache = None
+        retriever._embedding_model = _FakeEncoder()
+        retriever._collection = MagicMock()
+        return retriever
+    
+    @pytest.fixture
+    def project(self, tmp_path):
+        """Проект из двух файлов с функциями."""
+        project = tmp_path / "project"
+        project.mkdir()
+        (project / "a.py").write_text(
+            "def first(value):\n    return value + 1000\n\n"
+            "def second(value):\n    return value * 2000\n"
+        )
+        (project / "b.py").write_text("def third(value):\n    return value - 3000\n")
+        return project
+    
+    @staticmethod
+    def _upserted(retriever):
+        return [doc_id for call in retriever._collection.upsert.call_args_list for doc_id in call.kwargs["ids"]]
+    
+    @staticmethod
+    def _deleted(retriever):
+        return [doc_id for call in retriever._collection.delete.call_args_list for doc_id in call.kwargs["ids"]]
+    
+    def test_unchanged_project_is_skipped(self, retriever, project):
+        """Повторная индексация без изменений ничего не кодирует."""
+        assert retriever.index_project(str(project)) == 3
+        assert len(self._upserted(retriever)) == 3
+        assert retriever._collection.upsert.call_count == 1  # один батч
+        
+        retriever._collection.reset_mock()
+        retriever._embedding_model.encoded.clear()
+        
+        assert retriever.index_project(str(project)) == 3
+        retriever._collection.upsert.assert_not_called()
+        retriever._collection.delete.assert_not_called()
+        assert retriever._embedding_model.encoded == []
+    
+    def test_changed_and_removed_functions(self, retriever, project):
+        """Кодируются только новые функции, векторы удалённых удаляются."""
+        retriever.index_project(str(project))
+        first_ids = set(self._upserted(retriever))
+        retriever._collection.reset_mock()
+        retriever._embedding_model.encoded.clear()
+        
+        (project / "a.py").write_text(
+            "def first(value):\n    return value + 1000\n\n"
+            "def fourth(value):\n    return value / 4000\n"
+        )
+        (project / "b.py").unlink()
+        
+        assert retriever.index_project(str(project)) == 2
+        assert len(retriever._embedding_model.encoded) == 1
+        assert "fourth" in retriever._embedding_model.encoded[0]
+        deleted = set(self._deleted(retriever))
+        assert len(deleted) == 2 and deleted <= first_ids
+    
+    def test_first_index_deletes_legacy_ids(self, retriever, project):
+        """Векторы прежнего формата (ID = md5 кода) удаляются при первой индексации."""
+        retriever.index_project(str(project))
+        documents = retriever._collection.upsert.call_args.kwargs["documents"]
+        legacy = {hashlib.md5(code.encode()).hexdigest() for code in documents}
+        legacy_calls = [call for call in retriever._collection.delete.call_args_list if "where" in call.kwargs]
+        assert {doc_id for call in legacy_calls for doc_id in call.kwargs["ids"]} == legacy
+        assert all(call.kwargs["where"] == {"source": "local"} for call in legacy_calls)
+        
+        retriever._collection.reset_mock()
+        (project / "c.py").write_text("def fifth(value):\n    return value % 5000\n")
+        retriever.index_project(str(project))
+        retriever._collection.delete.assert_not_called()
+    
+    def test_same_file_in_two_projects_gets_distinct_ids(self, retriever, project, tmp_path):
+        """Одинаковые файлы по одному пути в разных проектах не делят ID."""
+        import shutil
+        
+        copy = tmp_path / "copy"
+        shutil.copytree(project, copy)
+        retriever.index_project(str(project))
+        first_ids = set(self._upserted(retriever))
+        retriever._collection.reset_mock()
+        
+        retriever.index_project(str(copy))
+        assert first_ids.isdisjoint(self._upserted(retriever))
@@ -3,6 +3,7 @@ import pytest
 import tempfile
 from pathlib import Path
 from infrastructure.context_engine import (
+    BM25Index,
     CodeChunker,
     RelevanceScorer,
     ContextComposer,
@@ -193,6 +194,45 @@ class TestRelevanceScorer:
         assert scored[0].score > 0
         assert "authenticate" in scored[0].matched_keywords
 
+    
+    def test_score_length_normalization(self):
+        """При равной частоте термина короткий чанк релевантнее длинного."""
+        scorer = RelevanceScorer()
+        filler = " ".join(f"word{i}" for i in range(200))
+        chunks = [
+            CodeChunk(id="long", file_path="a.py", start_line=1, end_line=50,
+                      content=f"parser {filler}", chunk_type="module", name="a"),
+            CodeChunk(id="short", file_path="b.py", start_line=1, end_line=2,
+                      content="parser here", chunk_type="module", name="b"),
+        ]
+        
+        scored = scorer.score_chunks("parser", chunks)
+        
+        assert scored[0].chunk.id == "short"
+
+
+class TestBM25Index:
+    """Тесты инвертированного индекса."""
+    
+    def test_replace_and_remove_group(self):
+        """Замена и удаление группы обновляют postings."""
+        scorer = RelevanceScorer()
+        index = BM25Index()
+        chunk = CodeChunk(id="1", file_path="a.py", start_line=1, end_line=1,
+                          content="def alpha(): pass", chunk_type="function", name="alpha")
+        other = CodeChunk(id="2", file_path="b.py", start_line=1, end_line=1,
+                          content="def beta(): pass", chunk_type="function", name="beta")
+        index.add_group("a.py", [scorer.chunk_terms(chunk)])
+        index.add_group("b.py", [scorer.chunk_terms(other)])
+        
+        index.add_group("a.py", [scorer.chunk_terms(other)])
+        assert [r for r in index.search(["alpha"]) if r[2] > 0] == []
+        
+        index.remove_group("b.py")
+        results = list(index.search(["beta"]))
+        assert len(index) == 1
+        assert results[0][0] == "a.py" and results[0][2] > 0
+
 
 class TestContextComposer:
     """Тесты для ContextComposer."""
@@ -328,3 +368,77 @@ class TestContextEngine:
         
         # Проверяем, что .py файлы не попали в индекс
         assert all(path.endswith('.txt') for path in index.keys())
+
+
+class TestPersistentIndex:
+    """Тесты персистентного инкрементального индекса."""
+    
+    def test_index_survives_restart(self, sample_project: Path, tmp_path: Path):
+        """Индекс загружается с диска новым экземпляром без перечанковки."""
+        cache_dir = tmp_path / "cache"
+        index1 = ContextEngine(cache_dir=cache_dir).index_project(str(sample_project))
+        
+        engine2 = ContextEngine(cache_dir=cache_dir)
+        engine2.chunker.chunk_file = lambda *args: pytest.fail("файл не должен перечанковываться")
+        index2 = engine2.index_project(str(sample_project))
+        
+        assert set(index2) == set(index1)
+        assert [c.name for c in index2["config.py"]] == [c.name for c in index1["config.py"]]
+    
+    def test_only_changed_file_rechunked(self, sample_project: Path, tmp_path: Path):
+        """Изменённый файл перечанковывается, удалённый исчезает из индекса."""
+        import os
+        
+        engine = ContextEngine(cache_dir=tmp_path / "cache")
+        engine.index_project(str(sample_project))
+        
+        utils_file = sample_project / "utils.py"
+        utils_file.write_text("def renamed_helper(x: int) -> int:\n    return x\n")
+        os.utime(utils_file, ns=(1, 1))
+        (sample_project / "config.py").unlink()
+        
+        chunked = []
+        original = engine.chunker.chunk_file
+        engine.chunker.chunk_file = lambda path, content: chunked.append(path) or original(path, content)
+        index = engine.index_project(str(sample_project))
+        
+        assert chunked == ["utils.py"]
+        assert "config.py" not in index
+        assert index["utils.py"][0].name == "renamed_helper"
+    
+    def test_touched_file_not_rechunked(self, sample_project: Path, tmp_path: Path):
+        """Файл с новым mtime, но тем же содержимым не перечанковывается."""
+        import os
+        
+        engine = ContextEngine(cache_dir=tmp_path / "cache")
+        engine.index_project(str(sample_project))
+        os.utime(sample_project / "utils.py", ns=(1, 1))
+        
+        engine.chunker.chunk_file = lambda *args: pytest.fail("файл не должен перечанковываться")
+        index = engine.index_project(str(sample_project))
+        
+        assert "utils.py" in index
+    
+    def test_cold_project_evicted_over_memory_limit(self, sample_project: Path, tmp_path: Path):
+        """Сверх лимита памяти давно не использованный проект выгружается и читается с диска."""
+        other = tmp_path / "other_project"
+        other.mkdir()
+        (other / "main.py").write_text("def main() -> None:\n    print('hi')\n")
+        
+        engine = ContextEngine(cache_dir=tmp_path / "cache", max_index_memory_mb=0.0001)
+        engine.index_project(str(sample_project))
+        engine.index_project(str(other))
+        
+        # Лимит меньше одного проекта: в памяти остаётся только последний
+        assert engine.cached_projects() == 1
+        assert engine.index_memory_bytes() > 0
+        
+        engine.chunker.chunk_file = lambda *args: pytest.fail("файл не должен перечанковываться")
+        assert "config.py" in engine.index_project(str(sample_project))
+    
+    def test_cache_key_normalizes_path_and_extensions(self, sample_project: Path, tmp_path: Path, monkeypatch):
+        engine = ContextEngine(cache_dir=tmp_path / "cache")
+        monkeypatch.chdir(sample_project.parent)
+        assert engine._get_cache_key("test_project", [".py", ".js", ".py"]) == engine._get_cache_key(
+            str(sample_project), [".js", ".py"]
+        )
@@ -0,0 +1,88 @@
+"""Тесты для персистентного кэша embeddings."""
+from pathlib import Path
+
+import pytest
+
+from infrastructure.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache(tmp_path: Path):
+    """Кэш embeddings во временной директории."""
+    cache = EmbeddingCache(cache_dir=tmp_path, max_entries=3)
+    yield cache
+    cache.close()
+
+
+class TestEmbeddingCache:
+    """Тесты для класса EmbeddingCache."""
+    
+    def test_get_put_and_stats(self, cache):
+        """Промах, запись, попадание и метрики."""
+        assert cache.get("model", "hello") is None
+        cache.put("model", "hello", [0.5, -1.0, 2.0])
+        
+        assert cache.get("model", "hello") == [0.5, -1.0, 2.0]
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+    
+    def test_models_are_separated(self, cache):
+        """Один и тот же текст у разных моделей — разные записи."""
+        cache.put("model-a", "text", [1.0, 2.0])
+        cache.put("model-b", "text", [3.0, 4.0, 5.0])
+        
+        assert cache.get("model-a", "text") == [1.0, 2.0]
+        assert cache.get("model-b", "text") == [3.0, 4.0, 5.0]
+    
+    def test_lru_eviction(self, cache):
+        """При переполнении вытесняется давно не использованная запись."""
+        cache.put_many("model", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+        assert cache.get("model", "a") == [1.0]  # "a" становится свежей
+        
+        cache.put("model", "d", [4.0])
+        
+        assert cache.get("model", "b") is None
+        assert cache.get_many("model", ["a", "c", "d"]) == [[1.0], [3.0], [4.0]]
+        assert cache.get_stats()["evictions"] == 1
+    
+    def test_persistence_across_instances(self, tmp_path: Path):
+        """Записи и LRU порядок переживают перезапуск."""
+        first = EmbeddingCache(cache_dir=tmp_path, max_entries=2)
+        first.put_many("model", ["a", "b"], [[1.0, 1.0], [2.0, 2.0]])
+        first.get("model", "a")
+        first.close()
+        
+        second = EmbeddingCache(cache_dir=tmp_path, max_entries=2)
+        try:
+            assert second.get("model", "b") == [2.0, 2.0]
+            second.put("model", "c", [3.0, 3.0])
+            # "a" использовалась раньше, чем "b" прочитана во втором экземпляре
+            assert second.get("model", "a") is None
+            assert second.get("model", "c") == [3.0, 3.0]
+        finally:
+            second.close()
+    
+    def test_processes_sharing_directory_do_not_overwrite_slots(self, tmp_path: Path):
+        """Два экземпляра на одном каталоге (как два воркера) не делят один слот."""
+        first = EmbeddingCache(cache_dir=tmp_path, max_entries=4)
+        second = EmbeddingCache(cache_dir=tmp_path, max_entries=4)
+        try:
+            first.put("model", "text A", [1.0, 1.0])
+            second.put("model", "text B", [2.0, 2.0])
+            
+            assert first.get("model", "text A") == [1.0, 1.0]
+            assert first.get("model", "text B") == [2.0, 2.0]
+            assert second.get("model", "text A") == [1.0, 1.0]
+            
+            # Вытеснение в одном экземпляре видно другому ("text A" свежее "text B")
+            second.put_many("model", ["c", "d", "e"], [[3.0, 3.0], [4.0, 4.0], [5.0, 5.0]])
+            assert first.get_many("model", ["text A", "c", "d", "e"]) == [
+                [1.0, 1.0], [3.0, 3.0], [4.0, 4.0], [5.0, 5.0]
+            ]
+            assert first.get("model", "text B") is None
+            assert first.get_stats()["entries"] == 4
+        finally:
+            first.close()
+            second.close()
@@ -0,0 +1,307 @@
+"""Тесты бэкендов EventStore: память процесса и SQLite, общий для воркеров."""
+import asyncio
+import multiprocessing
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from infrastructure import event_store as event_store_module
+from infrastructure.event_backend import MemoryEventBackend, SQLiteEventBackend
+
+
+def _publish(path, worker, count):
+    """Воркер: публикует count событий в общую сессию."""
+    backend = SQLiteEventBackend(path)
+    for i in range(count):
+        backend.append("shared", "code_chunk", {"worker": worker, "i": i}, datetime.now())
+    backend.close()
+
+
+def _tail(path, expected, results):
+    """Воркер: читает сессию с последнего полученного номера, пока не получит expected событий."""
+    backend = SQLiteEventBackend(path)
+    seen = []
+    last_seq = None
+    deadline = time.monotonic() + 30
+    while len(seen) < expected and time.monotonic() < deadline:
+        events = backend.get_events_after("shared", last_seq)
+        if events:
+            seen.extend((e.seq, e.data["worker"], e.data["i"]) for e in events)
+            last_seq = events[-1].seq
+        else:
+            time.sleep(0.01)
+    backend.close()
+    results.put(seen)
+
+
+class TestSQLiteEventBackend:
+    """Тесты SQLite бэкенда, общего для воркеров."""
+    
+    @pytest.mark.infrastructure
+    def test_two_workers_publish_and_tail(self, tmp_path):
+        path = tmp_path / "events.sqlite"
+        SQLiteEventBackend(path).close()
+        ctx = multiprocessing.get_context("fork")
+        results = ctx.Queue()
+        count = 200
+    
+        tail = ctx.Process(target=_tail, args=(path, 2 * count, results))
+        publishers = [ctx.Process(target=_publish, args=(path, worker, count)) for worker in (1, 2)]
+        tail.start()
+        for process in publishers:
+            process.start()
+        for process in publishers:
+            process.join(30)
+        seen = results.get(timeout=30)
+        tail.join(30)
+    
+        assert all(process.exitcode == 0 for process in publishers + [tail])
+        # Номера монотонны для всех процессов, события каждого воркера — по порядку
+        assert len(seen) == 2 * count
+        assert [seq for seq, _, _ in seen] == sorted({seq for seq, _, _ in seen})
+        for worker in (1, 2):
+            assert [i for _, w, i in seen if w == worker] == list(range(count))
+    
+    @pytest.mark.infrastructure
+    def test_sqlite_backend_operations(self, tmp_path):
+        backend = SQLiteEventBackend(tmp_path / "events.sqlite", max_events_per_session=10)
+        old = backend.append("s1", "thinking", "event: thinking\ndata: {}\n\n", datetime.now() - timedelta(hours=2))
+        ids = [backend.append("s1", "plan_chunk", {"n": i}, datetime.now()).event_id for i in range(3)]
+        backend.append("s2", "plan_chunk", "другая сессия", datetime.now())
+    
+        assert backend.get_event("s1", old.event_id).data == "event: thinking\ndata: {}\n\n"
+        assert [e.data["n"] for e in backend.get_events("s1", [ids[2], "missing", ids[0]])] == [2, 0]
+        assert backend.get_events("s2", ids) == []
+        assert [e.data["n"] for e in backend.get_events_after("s1", int(ids[0]))] == [1, 2]
+    
+        # Устаревшие события удаляются, опустевшие сессии возвращаются
+        assert backend.delete_expired(datetime.now() - timedelta(hours=1)) == []
+        assert backend.get_event("s1", old.event_id) is None
+        backend.delete_session("s1")
+        assert backend.get_events_after("s1", None) == []
+        assert backend.delete_expired(datetime.now() + timedelta(seconds=1)) == ["s2"]
+        backend.close()
+    
+    @pytest.mark.infrastructure
+    def test_sqlite_backend_trims_session(self, tmp_path):
+        backend = SQLiteEventBackend(tmp_path / "events.sqlite", max_events_per_session=10)
+        for i in range(128):
+            backend.append("s1", "code_chunk", i, datetime.now())
+        assert [e.data for e in backend.get_events_after("s1", None)][:1] == [118]
+        backend.close()
+
+
+class TestEventStoreBackends:
+    """Тесты EventStore поверх бэкендов: сессии, вытеснение, освобождение."""
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_event_store_resumes_on_another_worker(self, tmp_path):
+        """Клиент переподключился к другому воркеру: события читаются из общего SQLite."""
+        store_cls = event_store_module.EventStore
+        path = tmp_path / "events.sqlite"
+        store_cls.set_backend(SQLiteEventBackend(path))
+        try:
+            store = await store_cls.get_for_session("task-1")
+            first = await store.save_event("thinking", "начало")
+            await store.save_event("code_chunk", "def f(): pass")
+    
+            other_worker = SQLiteEventBackend(path)
+            resumed = other_worker.get_events_after("task-1", int(first))
+            assert [(e.event_type, e.data) for e in resumed] == [("code_chunk", "def f(): pass")]
+            other_worker.close()
+    
+            await store_cls.cleanup_session("task-1")
+            assert await store.get_all_events() == []
+        finally:
+            store_cls.set_backend(None)
+    
+    @pytest.mark.infrastructure
+    def test_memory_backend_is_process_local(self):
+        backend = MemoryEventBackend()
+        event = backend.append("s1", "thinking", {"a": 1}, datetime.now())
+        # Данные не сериализуются
+        assert backend.get_event("s1", event.event_id).data is event.data
+        assert MemoryEventBackend().get_event("s1", event.event_id) is None
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_sqlite_operations_run_off_event_loop(self, tmp_path):
+        """Запись в SQLite идёт в потоке событий, а не в event loop."""
+        store_cls = event_store_module.EventStore
+        backend = SQLiteEventBackend(tmp_path / "events.sqlite")
+        threads = []
+        append = backend.append
+    
+        def recording_append(*args):
+            threads.append(threading.current_thread().name)
+            return append(*args)
+    
+        backend.append = recording_append
+        store_cls.set_backend(backend)
+        try:
+            store = await store_cls.get_for_session("task-thread")
+            ids = [await store.save_event("code_chunk", i) for i in range(3)]
+            assert [int(event_id) for event_id in ids] == sorted(int(event_id) for event_id in ids)
+            assert threads and all(name.startswith("event-store") for name in threads)
+            await store_cls.cleanup_session("task-thread")
+        finally:
+            store_cls.set_backend(None)
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_released_session_is_tailed_from_another_worker(self, tmp_path):
+        """События переживают конец стрима; продолжение читает запись другого воркера."""
+        store_cls = event_store_module.EventStore
+        path = tmp_path / "events.sqlite"
+        store_cls.set_backend(SQLiteEventBackend(path))
+        other_worker = SQLiteEventBackend(path)
+        try:
+            store = await store_cls.get_for_session("task-2")
+            first = await store.save_event("stream_start", {"task_id": "task-2"})
+            await store.save_event("code_chunk", "def f():")
+            await store_cls.release_session("task-2")
+            # Очередь удалена, экземпляр остаётся в LRU (считается в лимите сессий)
+            assert "task-2" not in store_cls._event_queues
+            assert "task-2" in store_cls._instances
+            assert len(await store.get_all_events()) == 2
+    
+            async def publish_later():
+                await asyncio.sleep(0.05)
+                other_worker.append("task-2", "code_chunk", "    pass", datetime.now())
+                other_worker.append("task-2", event_store_module.STREAM_END, {}, datetime.now())
+    
+            publisher = asyncio.create_task(publish_later())
+            tailed = [
+                (event.event_type, event.data)
+                async for event in store.tail_events(first, poll_interval=0.01, idle_timeout=5)
+                if event is not None
+            ]
+            await publisher
+            assert tailed == [
+                ("code_chunk", "def f():"), ("code_chunk", "    pass"), (event_store_module.STREAM_END, {})
+            ]
+            await store_cls.cleanup_session("task-2")
+        finally:
+            other_worker.close()
+            store_cls.set_backend(None)
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_released_memory_sessions_stay_bounded(self, monkeypatch):
+        """Буферы освобождённых сессий считаются в лимите сессий и вытесняются."""
+        store_cls = event_store_module.EventStore
+        monkeypatch.setattr(store_cls, "_max_sessions", 3)
+        sessions = [f"released-{i}" for i in range(6)]
+        try:
+            for session_id in sessions:
+                store = await store_cls.get_for_session(session_id)
+                await store.save_event("code_chunk", session_id)
+                await store_cls.release_session(session_id)
+            assert len(store_cls._instances) <= 3
+            assert set(store_cls._events) == set(store_cls._instances) == set(sessions[3:])
+        finally:
+            for session_id in sessions:
+                await store_cls.cleanup_session(session_id)
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_sqlite_eviction_keeps_shared_rows(self, tmp_path, monkeypatch):
+        """Вытеснение по LRU не удаляет строки, которые дочитывает другой воркер."""
+        store_cls = event_store_module.EventStore
+        monkeypatch.setattr(store_cls, "_max_sessions", 1)
+        path = tmp_path / "events.sqlite"
+        store_cls.set_backend(SQLiteEventBackend(path))
+        other_worker = SQLiteEventBackend(path)
+        try:
+            store = await store_cls.get_for_session("old")
+            await store.save_event("code_chunk", "def f(): pass")
+            await store_cls.get_for_session("new")
+            assert "old" not in store_cls._instances
+            assert [e.data for e in other_worker.get_events_after("old", None)] == ["def f(): pass"]
+            await store_cls.cleanup_session("old")
+            await store_cls.cleanup_session("new")
+        finally:
+            other_worker.close()
+            store_cls.set_backend(None)
+
+
+class TestResumeWorkflowStream:
+    """Тесты продолжения SSE стрима по Last-Event-ID."""
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_resume_workflow_stream_sends_store_ids(self):
+        """Продолжение стрима отдаёт события после Last-Event-ID с ID хранилища."""
+        from backend.routers.agent_handlers import resume_workflow_stream
+    
+        store = await event_store_module.get_event_store("task-3")
+        first = await store.save_event("stream_start", {"task_id": "task-3"})
+        chunk = await store.save_event("code_chunk", "x = 1")
+        end = await store.save_event(event_store_module.STREAM_END, {"task_id": "task-3"})
+        try:
+            frames = [frame async for frame in resume_workflow_stream("task-3", first)]
+            assert [frame.split("\n", 1)[0] for frame in frames] == [f"id: {chunk}", f"id: {end}"]
+            assert "event: code_chunk" in frames[0]
+        finally:
+            await event_store_module.EventStore.cleanup_session("task-3")
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_pre_encoded_frames_get_store_id(self):
+        """Готовые SSE строки (thinking, progress, error) получают ID хранилища вместо своего."""
+        from backend.routers.agent_handlers.workflow_handler import _event_to_sse
+        from backend.sse_manager import SSEManager
+        from infrastructure.reasoning_stream import ReasoningStreamManager, ThinkingChunk, ThinkingStatus
+    
+        thinking = await ReasoningStreamManager().create_thinking_event(ThinkingChunk(
+            content="думаю", status=ThinkingStatus.IN_PROGRESS, stage="coding", elapsed_ms=1, total_chars=5
+        ))
+        progress = await SSEManager.stream_stage_progress(stage="coding", progress=50)
+        for event_type, data in (("thinking_in_progress", thinking), ("progress", progress),
+                                 ("progress", f"id: 99\n{progress}"), ("error", {"message": "сбой"})):
+            frame = await _event_to_sse(event_store_module.Event(
+                event_id="7", event_type=event_type, data=data, timestamp=datetime.now(), session_id="task-4"
+            ))
+            lines = frame.split("\n")
+            assert lines[0] == "id: 7"
+            assert lines[1].startswith("event: ")
+            assert frame.count("id: ") == 1
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_resume_replays_frames_sent_by_handler(self):
+        """Кадры, отправленные handler напрямую (этапы, результат), сохраняются для продолжения стрима."""
+        from backend.routers.agent_handlers import resume_workflow_stream
+        from backend.routers.agent_handlers.workflow_handler import SSE_FRAME
+        from backend.sse_manager import SSEManager
+    
+        store_cls = event_store_module.EventStore
+        store = await event_store_module.get_event_store("task-5")
+        queue = store_cls.get_event_queue("task-5")
+        first = await store.save_event("stream_start", {"task_id": "task-5"})
+        result = await SSEManager.stream_final_result(task_id="task-5", results={"code": "x = 1"}, metrics={})
+        frame_id = await store.save_event(SSE_FRAME, result, realtime=False)
+        # Кадр уже отправлен самим handler: в его очередь реального времени не попадает
+        assert queue.qsize() == 1
+        store_cls.remove_event_queue("task-5")
+        await store.save_event(event_store_module.STREAM_END, {"task_id": "task-5"})
+        try:
+            frames = [frame async for frame in resume_workflow_stream("task-5", first)]
+            assert frames[0] == f"id: {frame_id}\n{result}"
+            assert "task-5" not in store_cls._event_queues
+        finally:
+            await store_cls.cleanup_session("task-5")
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_resume_unknown_task_is_404_without_session(self):
+        from fastapi import HTTPException
+        from backend.routers.agent import resume_task_stream
+    
+        with pytest.raises(HTTPException) as error:
+            await resume_task_stream("missing-task", last_event_id=None, after=None)
+        assert error.value.status_code == 404
+        assert "missing-task" not in event_store_module.EventStore._instances
@@ -0,0 +1,150 @@
+"""Тесты доставки событий EventStore подписчикам: пачки и общий heartbeat."""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from infrastructure import event_store as event_store_module
+from infrastructure.event_backend import Event
+from infrastructure.event_dispatcher import HEARTBEAT, HeartbeatWheel, coalesce_chunk_events, iter_event_batches
+
+
+def _event(seq, event_type, data):
+    return Event(str(seq), event_type, data, datetime.now(), "s1", seq)
+
+
+class TestEventBatches:
+    """Тесты пачек событий и общего heartbeat таймера."""
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_ready_events_come_in_one_batch(self):
+        queue: asyncio.Queue = asyncio.Queue()
+        wheel = HeartbeatWheel(interval=60)
+        for i in range(5):
+            queue.put_nowait(i)
+    
+        batches = iter_event_batches(queue, wheel=wheel, max_batch=3)
+        assert await batches.__anext__() == [0, 1, 2]
+        assert await batches.__anext__() == [3, 4]
+        assert len(wheel) == 1
+        await batches.aclose()
+        assert len(wheel) == 0
+        wheel.stop()
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_idle_subscriptions_share_one_heartbeat_timer(self):
+        wheel = HeartbeatWheel(interval=0.2, tick=0.05)
+        queues = [asyncio.Queue() for _ in range(50)]
+        for queue in queues:
+            wheel.register(queue)
+        task = wheel._task
+    
+        await asyncio.sleep(0.3)
+        # Все простаивающие подписки получили heartbeat от одной задачи колеса
+        assert all(queue.get_nowait() is HEARTBEAT for queue in queues)
+        assert wheel._task is task
+    
+        for queue in queues:
+            wheel.unregister(queue)
+        await asyncio.sleep(0.1)
+        # Без подписок колесо останавливается
+        assert task.done()
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_active_subscription_gets_no_heartbeat(self):
+        wheel = HeartbeatWheel(interval=0.2, tick=0.05)
+        queue: asyncio.Queue = asyncio.Queue()
+        batches = iter_event_batches(queue, wheel=wheel)
+    
+        received = []
+        for i in range(6):
+            queue.put_nowait(f"event-{i}")
+            received.extend(await batches.__anext__())
+            await asyncio.sleep(0.05)
+        assert HEARTBEAT not in received
+    
+        # Простой дольше интервала — heartbeat
+        assert await asyncio.wait_for(batches.__anext__(), timeout=1) == [HEARTBEAT]
+        await batches.aclose()
+        wheel.stop()
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_linger_collects_events_into_one_batch(self):
+        queue: asyncio.Queue = asyncio.Queue()
+        wheel = HeartbeatWheel(interval=60)
+        batches = iter_event_batches(queue, wheel=wheel, linger=0.1)
+    
+        async def produce():
+            for i in range(5):
+                queue.put_nowait(i)
+                await asyncio.sleep(0.01)
+    
+        producer = asyncio.create_task(produce())
+        assert await batches.__anext__() == [0, 1, 2, 3, 4]
+        await producer
+        await batches.aclose()
+        wheel.stop()
+
+
+class TestEventStoreSubscribers:
+    """Тесты рассылки событий подписчикам сессии."""
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_event_store_publishes_to_all_subscribers(self):
+        store_cls = event_store_module.EventStore
+        store_cls._instances.clear()
+        store_cls._events.clear()
+        store_cls._event_queues.clear()
+    
+        store = await store_cls.get_for_session("fanout")
+        primary = store_cls.get_event_queue("fanout")
+        extra = store_cls.subscribe("fanout")
+        await store.save_event("code_chunk", "x = 1")
+    
+        assert primary.get_nowait().data == "x = 1"
+        assert extra.get_nowait().data == "x = 1"
+    
+        store_cls.unsubscribe("fanout", extra)
+        await store.save_event("code_chunk", "x = 2")
+        assert extra.empty()
+        await store_cls.cleanup_session("fanout")
+
+
+class TestCoalesceChunkEvents:
+    """Тесты склейки подряд идущих чанков."""
+    
+    @pytest.mark.infrastructure
+    def test_coalesce_chunk_events(self):
+        batch = [
+            _event(1, "code_chunk", "def "),
+            _event(2, "code_chunk", "f():"),
+            _event(3, "code_chunk", " pass"),
+            HEARTBEAT,
+            _event(4, "plan_chunk", "1."),
+            _event(5, "test_chunk", "assert"),
+            _event(6, "test_chunk", " f()"),
+            _event(7, "thinking", "event: thinking\ndata: {}\n\n"),
+            _event(8, "thinking", "event: thinking\ndata: {}\n\n"),
+            _event(9, "code_chunk", {"not": "str"}),
+            _event(10, "code_chunk", "x"),
+        ]
+        result = coalesce_chunk_events(batch)
+    
+        assert [(e.event_type, e.data) if e is not HEARTBEAT else e for e in result] == [
+            ("code_chunk", "def f(): pass"),
+            HEARTBEAT,
+            ("plan_chunk", "1."),
+            ("test_chunk", "assert f()"),
+            ("thinking", "event: thinking\ndata: {}\n\n"),
+            ("thinking", "event: thinking\ndata: {}\n\n"),
+            ("code_chunk", {"not": "str"}),
+            ("code_chunk", "x"),
+        ]
+        # Склеенное событие несёт ID последнего чанка
+        assert (result[0].event_id, result[0].seq) == ("3", 3)
+        assert result[2] is batch[4]
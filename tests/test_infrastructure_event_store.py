@@ -3,6 +3,7 @@ import pytest
 import asyncio
 from datetime import datetime, timedelta
 from unittest.mock import Mock, patch, AsyncMock
+from infrastructure import event_store as event_store_module
 from infrastructure.event_store import EventStore, Event
 
 
@@ -521,3 +522,65 @@ class TestEventStoreIsolation:
         assert len(events2) == 1
         assert events1[0].data["content"] == "session1"
         assert events2[0].data["content"] == "session2"
+
+
+class TestEventStoreRingBuffer:
+    """Тесты кольцевого буфера, монотонных ID и LRU сессий.
+    
+    Класс берётся из модуля в момент теста: другие тесты перезагружают модули.
+    """
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_buffer_keeps_newest_events(self):
+        """Переполненный буфер вытесняет самые старые события."""
+        store_cls = event_store_module.EventStore
+        store_cls._instances.clear()
+        store_cls._events.clear()
+        
+        with patch.object(store_cls._get_backend(), "max_events_per_session", 3):
+            store = await store_cls.get_for_session("ring-session")
+            event_ids = [await store.save_event("code_chunk", i) for i in range(5)]
+        
+        events = await store.get_all_events()
+        assert [e.data for e in events] == [2, 3, 4]
+        assert await store.get_event(event_ids[0]) is None
+        assert (await store.get_event(event_ids[4])).data == 4
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_monotonic_ids_and_resume(self):
+        """ID событий возрастают, get_events_after продолжает после Last-Event-ID."""
+        store_cls = event_store_module.EventStore
+        store_cls._instances.clear()
+        store_cls._events.clear()
+        
+        store = await store_cls.get_for_session("resume-session")
+        other = await store_cls.get_for_session("other-session")
+        first = await store.save_event("thinking", "a")
+        await other.save_event("thinking", "x")
+        second = await store.save_event("thinking", "b")
+        third = await store.save_event("thinking", "c")
+        
+        assert int(first) < int(second) < int(third)
+        assert [e.data for e in await store.get_events_after(first)] == ["b", "c"]
+        assert await store.get_events_after(third) == []
+        assert len(await store.get_events_after(None)) == 3
+        assert [e.data for e in await store.get_events([third, "missing", first])] == ["c", "a"]
+    
+    @pytest.mark.asyncio
+    @pytest.mark.infrastructure
+    async def test_lru_evicts_least_recently_used(self):
+        """Сохранение события продлевает жизнь сессии при вытеснении."""
+        store_cls = event_store_module.EventStore
+        store_cls._instances.clear()
+        store_cls._events.clear()
+        store_cls._event_queues.clear()
+        
+        with patch.object(store_cls, "_max_sessions", 2):
+            old = await store_cls.get_for_session("lru-1")
+            await store_cls.get_for_session("lru-2")
+            await old.save_event("thinking", "still streaming")
+            await store_cls.get_for_session("lru-3")
+        
+        assert list(store_cls._instances) == ["lru-1", "lru-3"]
@@ -0,0 +1,77 @@
+"""Тесты общего реестра индексов проектов."""
+import threading
+from pathlib import Path
+
+import pytest
+
+from agents.researcher import ResearcherAgent
+from infrastructure.context_engine import ContextEngine
+from infrastructure.project_index_registry import ProjectIndexRegistry, normalize_extensions
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    project_dir = tmp_path / "project"
+    project_dir.mkdir()
+    (project_dir / "billing.py").write_text(
+        "def calculate_invoice_total(items: list) -> float:\n    return sum(items)\n"
+    )
+    return project_dir
+
+
+@pytest.fixture
+def registry(tmp_path: Path):
+    registry = ProjectIndexRegistry(ContextEngine(cache_dir=tmp_path / "cache"))
+    yield registry
+    registry.shutdown()
+
+
+class TestProjectIndexRegistry:
+    """Тесты общего реестра индексов проектов."""
+    
+    @pytest.mark.infrastructure
+    def test_normalize_extensions(self):
+        assert normalize_extensions(["py", ".js", " .py "]) == [".js", ".py"]
+        assert normalize_extensions(None) == [".py"]
+    
+    @pytest.mark.infrastructure
+    def test_concurrent_warm_up_shares_one_indexing(self, registry, project):
+        started = threading.Event()
+        release = threading.Event()
+        original = registry.engine.index_project
+        calls = []
+    
+        def slow_index(*args, **kwargs):
+            calls.append(args)
+            started.set()
+            release.wait(5)
+            return original(*args, **kwargs)
+    
+        registry.engine.index_project = slow_index
+        first = registry.warm_up(str(project), ["py"])
+        assert started.wait(5)
+        second = registry.warm_up(str(project) + "/", [".py"])
+        assert second is first
+        assert registry.get_stats()["warming_up"] == 1
+    
+        release.set()
+        assert "billing.py" in first.result(5)
+        assert len(calls) == 1
+    
+    @pytest.mark.infrastructure
+    def test_researcher_reuses_warmed_index(self, registry, project):
+        registry.index_project(str(project), [".py"])
+        assert registry.get_stats()["cached_projects"] == 1
+    
+        # Этап исследования берёт готовый индекс: файлы не перечанковываются
+        registry.engine.chunker.chunk_file = lambda *args: pytest.fail("файл не должен перечанковываться")
+        researcher = ResearcherAgent(rag_system=object(), context_engine=registry.engine)
+        context = researcher._search_codebase("invoice total", str(project), ["py"])
+        assert "calculate_invoice_total" in context
+    
+    @pytest.mark.infrastructure
+    def test_warm_up_error_is_reported_in_future(self, registry, tmp_path):
+        future = registry.warm_up(str(tmp_path / "missing"))
+        with pytest.raises(ValueError):
+            future.result(5)
+        assert registry.get_stats()["warming_up"] == 0
@@ -0,0 +1,149 @@
+"""Тесты общего сканера файлов проекта."""
+import os
+from pathlib import Path
+
+import pytest
+
+from infrastructure import project_scanner
+from infrastructure.ast_analyzer import ProjectAnalyzer
+from infrastructure.context_engine import ContextEngine
+from infrastructure.project_scanner import ProjectScanner, ScannedFile
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    project_dir = tmp_path / "project"
+    for directory in ("pkg", "build", "logs", ".hidden", "node_modules/lib"):
+        (project_dir / directory).mkdir(parents=True)
+    (project_dir / "billing.py").write_text(
+        "import pkg.shipping\n\n"
+        "def calculate_invoice_total(items: list) -> float:\n    return sum(items)\n"
+    )
+    (project_dir / "pkg" / "shipping.py").write_text(
+        "def estimate_delivery_days(distance: int) -> int:\n    return distance // 100\n"
+    )
+    (project_dir / "pkg" / "generated.py").write_text("VALUE = 1\n")
+    (project_dir / "build" / "out.py").write_text("VALUE = 2\n")
+    (project_dir / "logs" / "run.log").write_text("log\n")
+    (project_dir / "logs" / "keep.log").write_text("log\n")
+    (project_dir / ".hidden" / "secret.py").write_text("VALUE = 3\n")
+    (project_dir / "node_modules" / "lib" / "index.js").write_text("module.exports = 1\n")
+    (project_dir / ".gitignore").write_text("# сборка\nbuild/\n*.log\n!keep.log\n")
+    (project_dir / "pkg" / ".gitignore").write_text("generated.py\n")
+    return project_dir
+
+
+def _rel_paths(files) -> set:
+    return {file.rel_path.replace(os.sep, "/") for file in files}
+
+
+class TestProjectWalk:
+    """Тесты обхода файлов проекта."""
+    
+    @pytest.mark.infrastructure
+    def test_walk_honours_gitignore_and_skip_dirs(self, project):
+        scanner = ProjectScanner()
+        assert _rel_paths(scanner.files(str(project))) == {"billing.py", "pkg/shipping.py", "logs/keep.log"}
+        assert _rel_paths(scanner.files(str(project), [".py"])) == {"billing.py", "pkg/shipping.py"}
+    
+        assert scanner.is_ignored(str(project), os.path.join("build", "new.py"))
+        assert scanner.is_ignored(str(project), os.path.join("pkg", "generated.py"))
+        assert scanner.is_ignored(str(project), os.path.join(".git", "HEAD"))
+        assert not scanner.is_ignored(str(project), os.path.join("pkg", "orders.py"))
+    
+        unfiltered = ProjectScanner(respect_gitignore=False)
+        assert "build/out.py" in _rel_paths(unfiltered.files(str(project)))
+    
+    @pytest.mark.infrastructure
+    def test_walk_reuse_sees_edits_and_new_files(self, project):
+        scanner = ProjectScanner()
+        scanner.files(str(project))
+        assert scanner.get_stats()["walks"] == 1
+    
+        (project / "billing.py").write_text("def calculate_invoice_total(items):\n    return 0\n")
+        files = {file.rel_path: file for file in scanner.files(str(project))}
+        assert scanner.get_stats()["walk_reuses"] == 1
+        assert files["billing.py"].size == (project / "billing.py").stat().st_size
+    
+        (project / "pkg" / "orders.py").write_text("VALUE = 4\n")
+        assert "pkg/orders.py" in _rel_paths(scanner.files(str(project)))
+        assert scanner.get_stats()["walks"] == 2
+    
+        (project / ".gitignore").write_text("")
+        assert "build/out.py" in _rel_paths(scanner.files(str(project)))
+    
+    @pytest.mark.infrastructure
+    def test_files_under_walks_only_subtree_with_parent_gitignore(self, project):
+        scanner = ProjectScanner()
+        assert _rel_paths(scanner.files_under(str(project), "pkg", [".py"])) == {"pkg/shipping.py"}
+        # *.log и !keep.log из .gitignore корня действуют и при обходе одного каталога
+        assert _rel_paths(scanner.files_under(str(project), "logs")) == {"logs/keep.log"}
+        assert _rel_paths(scanner.files_under(str(project), "missing")) == set()
+        assert scanner.get_stats()["walks"] == 0
+        assert scanner.is_ignored(str(project), os.path.join("pkg", "generated.py"))
+    
+    @pytest.mark.infrastructure
+    def test_walk_max_depth_reports_truncated_dirs(self, project):
+        scan = ProjectScanner().walk(str(project), max_depth=1)
+        assert _rel_paths(scan.files) == {"billing.py"}
+        assert set(scan.truncated_dirs) == {"logs", "pkg"}
+
+
+class TestParseCache:
+    """Тесты общего кэша разбора файлов."""
+    
+    @pytest.mark.infrastructure
+    def test_parse_cache_is_keyed_by_path_mtime_and_size(self, project):
+        scanner = ProjectScanner()
+        files = scanner.files(str(project), [".py"])
+        first = scanner.parse(files)
+        assert scanner.parse(files) == first
+        assert scanner.get_stats()["parse_cache_hits"] == 2
+    
+        billing = next(file for file in first if file.analysis and file.analysis.file_path.endswith("billing.py"))
+        assert billing.functions[0][1] == "calculate_invoice_total"
+    
+        (project / "billing.py").write_text("def calculate_invoice_total(items):\n    return len(items) * 2\n")
+        updated = scanner.parse(scanner.files(str(project), [".py"]))
+        assert scanner.get_stats()["parse_cache_misses"] == 3
+        assert {parsed.content_hash for parsed in updated} != {parsed.content_hash for parsed in first}
+    
+    @pytest.mark.infrastructure
+    def test_hash_only_parse_is_upgraded_on_ast_request(self, project):
+        scanner = ProjectScanner()
+        file = ScannedFile.from_path(str(project / "billing.py"))
+        assert scanner.parse([file], analyze=False)[0].analysis is None
+        assert scanner.parse([file])[0].analysis is not None
+        assert scanner.parse([file], analyze=False)[0].analysis is not None
+    
+    @pytest.mark.infrastructure
+    def test_parse_in_process_pool_matches_in_process(self, project):
+        files = ProjectScanner().files(str(project), [".py"])
+        expected = ProjectScanner().parse(files)
+        scanner = ProjectScanner(parse_workers=2, parallel_parse_min_files=1)
+        try:
+            assert scanner.parse(files) == expected
+            pool = scanner._pool
+            (project / "billing.py").write_text("def calculate_invoice_total(items):\n    return 1\n")
+            (project / "pkg" / "shipping.py").write_text("def estimate_delivery_days(distance):\n    return 1\n")
+            scanner.parse(scanner.files(str(project), [".py"]))
+            # Пул процессов переиспользуется между пачками
+            assert scanner._pool is pool
+        finally:
+            scanner.close()
+        assert scanner._pool is None
+    
+    @pytest.mark.infrastructure
+    def test_consumers_share_one_parse(self, project, tmp_path, monkeypatch):
+        scanner = ProjectScanner()
+        monkeypatch.setattr(project_scanner, "_scanner", scanner)
+    
+        ContextEngine(cache_dir=tmp_path / "cache").index_project(str(project), [".py"])
+        parsed = scanner.get_stats()["parse_cache_misses"]
+        assert parsed == 2
+    
+        result = ProjectAnalyzer().analyze_project(project)
+        assert result["files_analyzed"] == 2
+        stats = scanner.get_stats()
+        assert stats["parse_cache_misses"] == parsed
+        assert stats["walks"] == 1
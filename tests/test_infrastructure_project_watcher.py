@@ -0,0 +1,223 @@
+"""Тесты наблюдателя файлов и живой переиндексации проектов."""
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from infrastructure import ast_analyzer, project_scanner
+from infrastructure.context_engine import ContextEngine
+from infrastructure.project_index_registry import ProjectIndexRegistry
+from infrastructure.project_watcher import ProjectWatcher
+
+POLL_OPTIONS = {"debounce": 0.05, "max_delay": 0.5, "poll_interval": 0.05, "backend": "polling"}
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    project_dir = tmp_path / "project"
+    (project_dir / "pkg").mkdir(parents=True)
+    (project_dir / "billing.py").write_text(
+        "def calculate_invoice_total(items: list) -> float:\n    return sum(items)\n"
+    )
+    (project_dir / "pkg" / "shipping.py").write_text(
+        "def estimate_delivery_days(distance: int) -> int:\n    return distance // 100\n"
+    )
+    return project_dir
+
+
+class _Collector:
+    """Собирает пачки изменений из потока наблюдателя."""
+
+    def __init__(self) -> None:
+        self.paths = set()
+        self.batches = 0
+        self._event = threading.Event()
+
+    def __call__(self, paths) -> None:
+        self.paths.update(paths)
+        self.batches += 1
+        self._event.set()
+
+    def wait(self, timeout: float = 5.0) -> bool:
+        result = self._event.wait(timeout)
+        self._event.clear()
+        return result
+
+
+def _wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+class TestProjectWatcher:
+    """Тесты наблюдателя файлов проекта."""
+    
+    @pytest.mark.infrastructure
+    def test_polling_watcher_reports_edit_create_and_delete(self, project):
+        collector = _Collector()
+        watcher = ProjectWatcher(str(project), [".py"], collector, **POLL_OPTIONS)
+        watcher.start()
+        try:
+            time.sleep(0.02)
+            (project / "billing.py").write_text("def calculate_invoice_total(items):\n    return 0\n")
+            (project / "orders.py").write_text("def place_order():\n    pass\n")
+            (project / "notes.txt").write_text("не отслеживается")
+            os.remove(project / "pkg" / "shipping.py")
+            assert _wait_for(lambda: len(collector.paths) >= 3)
+        finally:
+            watcher.stop()
+    
+        assert collector.paths == {"billing.py", "orders.py", os.path.join("pkg", "shipping.py")}
+        stats = watcher.get_stats()
+        assert stats["backend"] == "polling"
+        assert stats["files_applied"] == 3
+        assert stats["pending_seconds"] == 0.0
+    
+    @pytest.mark.infrastructure
+    def test_burst_of_changes_is_applied_in_few_batches(self, project):
+        collector = _Collector()
+        watcher = ProjectWatcher(str(project), [".py"], collector, **POLL_OPTIONS)
+        watcher.start()
+        try:
+            for i in range(20):
+                (project / f"module_{i}.py").write_text(f"VALUE = {i}\n")
+            assert _wait_for(lambda: len(collector.paths) == 20)
+        finally:
+            watcher.stop()
+        assert collector.batches < 20
+    
+    @pytest.mark.infrastructure
+    def test_deleted_directory_expands_to_known_files(self, project):
+        watcher = ProjectWatcher(str(project), [".py"], lambda paths: None, backend="polling")
+        watcher._snapshot = watcher._scan(str(project))
+        shutil.rmtree(project / "pkg")
+        assert list(watcher._expand("pkg")) == [os.path.join("pkg", "shipping.py")]
+        assert os.path.join("pkg", "shipping.py") not in watcher._snapshot
+        assert list(watcher._expand(os.path.join(".git", "HEAD"))) == []
+    
+    @pytest.mark.infrastructure
+    def test_new_directory_is_scanned_without_walking_project(self, project, monkeypatch):
+        scanner = project_scanner.ProjectScanner()
+        monkeypatch.setattr(project_scanner, "_scanner", scanner)
+        watcher = ProjectWatcher(str(project), [".py"], lambda paths: None, backend="polling")
+        watcher._snapshot = watcher._scan(str(project))
+        walks = scanner.get_stats()["walks"]
+    
+        (project / "orders").mkdir()
+        (project / "orders" / "api.py").write_text("def place_order():\n    pass\n")
+        (project / "orders" / "README.md").write_text("не отслеживается")
+        assert list(watcher._expand("orders")) == [os.path.join("orders", "api.py")]
+        assert os.path.join("orders", "api.py") in watcher._snapshot
+        assert scanner.get_stats()["walks"] == walks
+    
+    @pytest.mark.infrastructure
+    def test_gitignore_change_rescans_project(self, project):
+        watcher = ProjectWatcher(str(project), [".py"], lambda paths: None, backend="polling")
+        watcher._snapshot = watcher._scan(str(project))
+    
+        (project / ".gitignore").write_text("billing.py\n")
+        assert watcher._changed_paths([str(project / ".gitignore")]) == {"billing.py"}
+        assert "billing.py" not in watcher._snapshot
+    
+        (project / ".gitignore").write_text("")
+        assert watcher._changed_paths([str(project / ".gitignore")]) == {"billing.py"}
+        assert "billing.py" in watcher._snapshot
+        # .gitignore в исключённом каталоге обход не запускает
+        assert watcher._changed_paths([str(project / "node_modules" / ".gitignore")]) == set()
+    
+    @pytest.mark.infrastructure
+    def test_watchfiles_lag_includes_debounce_window(self, project, monkeypatch):
+        """Пачка watchfiles приходит после debounce тишины: отставание не меньше debounce."""
+        from types import SimpleNamespace
+        from infrastructure import project_watcher
+    
+        def run_batch(rel_path: str) -> float:
+            def fake_watch(path, **kwargs):
+                yield {(1, str(project / rel_path))}
+    
+            monkeypatch.setattr(project_watcher, "watchfiles", SimpleNamespace(watch=fake_watch))
+            watcher = ProjectWatcher(str(project), [".py"], lambda paths: None, debounce=0.2, max_delay=1.0, backend="watchfiles")
+            watcher._snapshot = watcher._scan(str(project))
+            watcher._run_watchfiles()
+            return watcher.get_stats()["last_lag_ms"]
+    
+        (project / "billing.py").write_text("def calculate_invoice_total(items):\n    return 0\n")
+        assert run_batch("billing.py") >= 200
+    
+        # Файл скопирован с сохранением старого mtime: оценка ограничена max_delay
+        hour_ago = time.time() - 3600
+        os.utime(project / "billing.py", (hour_ago, hour_ago))
+        assert 1000 <= run_batch("billing.py") < 1500
+
+
+class TestLiveReindexing:
+    """Тесты живой переиндексации по изменениям файлов."""
+    
+    @pytest.mark.infrastructure
+    def test_context_engine_update_files_without_rescan(self, project, tmp_path):
+        engine = ContextEngine(cache_dir=tmp_path / "cache")
+        engine.index_project(str(project), [".py"])
+        engine.set_watched(str(project), [".py"], True)
+    
+        (project / "orders.py").write_text("def place_order_with_discount():\n    pass\n")
+        # Наблюдаемый проект get_context не сверяет: новый файл виден только после update_files
+        assert "place_order_with_discount" not in engine.get_context("place order discount", str(project), [".py"])
+    
+        engine.update_files(str(project), [".py"], ["orders.py", os.path.join("pkg", "shipping.py")])
+        index = engine.index_project(str(project), [".py"])
+        assert "orders.py" in index
+        assert "place_order_with_discount" in engine.get_context("place order discount", str(project), [".py"])
+    
+    @pytest.mark.infrastructure
+    def test_registry_watcher_updates_indexes(self, project, tmp_path):
+        registry = ProjectIndexRegistry(ContextEngine(cache_dir=tmp_path / "cache"), watch_options=POLL_OPTIONS)
+        analyzer = ast_analyzer.get_project_analyzer(str(project))
+        analyzer.analyze_project(str(project))
+        try:
+            registry.warm_up(str(project), [".py"]).result(5)
+            (project / "orders.py").write_text("import billing\n\ndef place_order_with_discount():\n    pass\n")
+            os.remove(project / "billing.py")
+    
+            key = f"{os.path.abspath(project)} .py"
+            assert _wait_for(lambda: registry.get_stats()["watched_projects"][key]["files_applied"] >= 2)
+    
+            context = registry.engine.get_context("place order discount", str(project), [".py"])
+            assert "place_order_with_discount" in context
+            assert "calculate_invoice_total" not in context
+            assert analyzer.watched
+            assert analyzer.get_file_analysis("orders.py") is not None
+            assert analyzer.get_file_analysis("billing.py") is None
+        finally:
+            registry.shutdown()
+        assert registry.get_stats()["watched_projects"] == {}
+    
+    @pytest.mark.infrastructure
+    def test_project_analyzer_reparses_only_changed_files(self, project):
+        analyzer = ast_analyzer.ProjectAnalyzer()
+        scanner = ast_analyzer.get_project_scanner()
+    
+        def parsed() -> int:
+            return scanner.get_stats()["parse_cache_misses"]
+    
+        assert analyzer.analyze_project(project)["files_analyzed"] == 2
+        before = parsed()
+        analyzer.analyze_project(project)
+        assert parsed() == before
+    
+        (project / "billing.py").write_text("def calculate_invoice_total(items):\n    return len(items)\n")
+        os.remove(project / "pkg" / "shipping.py")
+        result = analyzer.analyze_project(project)
+        assert parsed() == before + 1
+        assert result["files_analyzed"] == 1
+    
+        (project / "orders.py").write_text("def place_order():\n    pass\n")
+        analyzer.update_files(str(project), ["orders.py"])
+        assert parsed() == before + 2
+        assert analyzer.get_file_analysis("orders.py") is not None
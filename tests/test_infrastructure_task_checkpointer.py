@@ -2,6 +2,7 @@
 import pytest
 import json
 import tempfile
+import threading
 import shutil
 from pathlib import Path
 from datetime import datetime, timedelta
@@ -339,3 +340,168 @@ class TestTaskCheckpointerSerialization:
             
             assert serialized["plan"] is None
             assert serialized["code"] is None
+
+
+class TestTaskCheckpointerLog:
+    """Тесты для журнала изменений и индекса задач."""
+    
+    @pytest.mark.infrastructure
+    def test_only_changed_fields_are_appended(self):
+        """После снимка в журнал пишутся только изменённые поля."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpointer = TaskCheckpointer(checkpoint_dir=tmpdir)
+            state = AgentState(task="Task", task_id="t1", plan="p" * 10000, code="")
+            checkpointer.save_checkpoint("t1", state, "planner")
+            
+            state["code"] = "def f(): pass"
+            checkpointer.save_checkpoint("t1", state, "coder")
+            
+            logs = list(checkpointer._get_task_dir("t1").glob("state-*.log"))
+            assert len(logs) == 1
+            # Большой неизменённый plan в журнал не попал
+            assert logs[0].stat().st_size < 200
+            
+            loaded_state, metadata = checkpointer.load_checkpoint("t1")
+            assert loaded_state["code"] == "def f(): pass"
+            assert loaded_state["plan"] == "p" * 10000
+            assert metadata.last_stage == "coder"
+    
+    @pytest.mark.infrastructure
+    def test_compaction_replaces_log_with_snapshot(self):
+        """Журнал сворачивается в снимок каждые compact_every записей."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpointer = TaskCheckpointer(checkpoint_dir=tmpdir, compact_every=3)
+            state = AgentState(task="Task", task_id="t1", iteration=0)
+            for i in range(5):
+                state["iteration"] = i
+                checkpointer.save_checkpoint("t1", state, "fixer")
+            
+            assert checkpointer.snapshots_written == 2
+            loaded_state, _ = checkpointer.load_checkpoint("t1")
+            assert loaded_state["iteration"] == 4
+    
+    @pytest.mark.infrastructure
+    def test_torn_log_tail_is_ignored(self):
+        """Оборванная последняя запись журнала не ломает загрузку."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpointer = TaskCheckpointer(checkpoint_dir=tmpdir)
+            state = AgentState(task="Task", task_id="t1", code="v1")
+            checkpointer.save_checkpoint("t1", state, "coder")
+            state["code"] = "v2"
+            checkpointer.save_checkpoint("t1", state, "fixer")
+            
+            log_path = next(checkpointer._get_task_dir("t1").glob("state-*.log"))
+            with open(log_path, "ab") as f:
+                f.write(b"\x00\x00\x10\x00garbage")
+            
+            loaded_state, _ = checkpointer.load_checkpoint("t1")
+            assert loaded_state["code"] == "v2"
+    
+    @pytest.mark.infrastructure
+    def test_index_survives_restart_and_status_changes(self):
+        """Список задач читается из индекса, статусы сохраняются."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpointer = TaskCheckpointer(checkpoint_dir=tmpdir, background_writes=True)
+            for i in range(3):
+                checkpointer.save_checkpoint(f"task-{i}", AgentState(task=f"Task {i}", task_id=f"task-{i}"), "intent")
+            checkpointer.mark_completed("task-0")
+            checkpointer.mark_failed("task-1", "boom")
+            checkpointer.close()
+            
+            restarted = TaskCheckpointer(checkpoint_dir=tmpdir)
+            assert (Path(tmpdir) / "index.sqlite").exists()
+            assert len(restarted.list_all_tasks()) == 3
+            assert [t.task_id for t in restarted.list_active_tasks()] == ["task-2"]
+    
+    @pytest.mark.infrastructure
+    def test_index_is_written_on_writer_thread(self):
+        """save_checkpoint и смена статуса не пишут в индекс в вызывающем потоке."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpointer = TaskCheckpointer(checkpoint_dir=tmpdir, background_writes=True)
+            threads = []
+            upsert = checkpointer.index.upsert
+            get = checkpointer.index.get
+            
+            def record(func):
+                def wrapper(*args):
+                    threads.append(threading.current_thread().name)
+                    return func(*args)
+                return wrapper
+            
+            checkpointer.index.upsert = record(upsert)
+            checkpointer.index.get = record(get)
+            state = AgentState(task="Task", task_id="t1")
+            checkpointer.save_checkpoint("t1", state, "intent")
+            checkpointer.save_checkpoint("t1", {**state, "code": "x = 1"}, "coder")
+            checkpointer.mark_paused("t1")
+            checkpointer.flush()
+            
+            assert threads and all(name.startswith("checkpoint") for name in threads)
+            metadata = get("t1")
+            assert metadata["status"] == "paused"
+            _, loaded = checkpointer.load_checkpoint("t1")
+            assert loaded.created_at == metadata["created_at"]
+            checkpointer.close()
+    
+    @pytest.mark.infrastructure
+    def test_legacy_checkpoint_without_index_is_indexed(self):
+        """Checkpoint без index.json (старый формат) попадают в индекс."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task_dir = Path(tmpdir) / "legacy"
+            task_dir.mkdir()
+            now = datetime.now().isoformat()
+            metadata = TaskMetadata("legacy", "Old", now, now, "coder", "paused", 1)
+            (task_dir / "metadata.json").write_text(json.dumps(metadata.to_dict()))
+            (task_dir / "state.json").write_text(json.dumps({"task": "Old", "code": "x = 1"}))
+            
+            checkpointer = TaskCheckpointer(checkpoint_dir=tmpdir)
+            assert [t.task_id for t in checkpointer.list_active_tasks()] == ["legacy"]
+            loaded_state, _ = checkpointer.load_checkpoint("legacy")
+            assert loaded_state["code"] == "x = 1"
+    
+    @pytest.mark.infrastructure
+    def test_pagination_and_counts(self):
+        """Страницы истории идут по updated_at, новые первые."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpointer = TaskCheckpointer(checkpoint_dir=tmpdir)
+            for i in range(5):
+                checkpointer.save_checkpoint(f"task-{i}", AgentState(task=f"Task {i}", task_id=f"task-{i}"), "intent")
+            checkpointer.mark_completed("task-4")
+            
+            first_page = checkpointer.list_all_tasks(limit=2)
+            second_page = checkpointer.list_all_tasks(limit=2, offset=2)
+            assert [t.task_id for t in first_page] == ["task-4", "task-3"]
+            assert [t.task_id for t in second_page] == ["task-2", "task-1"]
+            assert checkpointer.count_tasks() == 5
+            assert checkpointer.count_tasks(active_only=True) == 4
+            assert len(checkpointer.list_active_tasks(limit=10)) == 4
+    
+    @pytest.mark.infrastructure
+    def test_cleanup_uses_index(self):
+        """Истёкшие задачи из индекса удаляются вместе с директориями."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpointer = TaskCheckpointer(checkpoint_dir=tmpdir, max_age_hours=1)
+            checkpointer.save_checkpoint("old", AgentState(task="Old", task_id="old"), "critic", "completed")
+            checkpointer.save_checkpoint("old-running", AgentState(task="Old", task_id="old-running"), "coder")
+            old_time = (datetime.now() - timedelta(hours=2)).isoformat()
+            for task_id in ("old", "old-running"):
+                checkpointer.index.upsert({**checkpointer.index.get(task_id), "updated_at": old_time})
+            
+            checkpointer._cleanup_old_checkpoints()
+            
+            assert not checkpointer._get_task_dir("old").exists()
+            assert checkpointer.index.get("old") is None
+            # Незавершённые задачи не удаляются, даже старые
+            assert checkpointer._get_task_dir("old-running").exists()
+    
+    @pytest.mark.infrastructure
+    def test_legacy_json_index_is_migrated(self):
+        """index.json прежней версии переносится в SQLite."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            now = datetime.now().isoformat()
+            legacy = {"t1": TaskMetadata("t1", "Task", now, now, "coder", "running", 2).to_dict()}
+            (Path(tmpdir) / "index.json").write_text(json.dumps(legacy))
+            
+            checkpointer = TaskCheckpointer(checkpoint_dir=tmpdir)
+            assert [t.task_id for t in checkpointer.list_active_tasks()] == ["t1"]
+            assert not (Path(tmpdir) / "index.json").exists()
@@ -0,0 +1,79 @@
+"""Тесты для двухуровневого кэша ответов LLM."""
+import time
+
+import pytest
+
+from infrastructure.llm_cache import LLMResponseCache, get_response_cache_ttl
+
+
+class TestLLMResponseCache:
+    """Тесты двухуровневого кэша ответов LLM."""
+    
+    @pytest.mark.infrastructure
+    def test_key_depends_on_all_parts(self):
+        base = LLMResponseCache.make_key("generate", "m", "p", {"temperature": 0.1}, None, {})
+        assert base == LLMResponseCache.make_key("generate", "m", "p", {"temperature": 0.1}, None, {})
+        assert base != LLMResponseCache.make_key("chat", "m", "p", {"temperature": 0.1}, None, {})
+        assert base != LLMResponseCache.make_key("generate", "m2", "p", {"temperature": 0.1}, None, {})
+        assert base != LLMResponseCache.make_key("generate", "m", "p", {"temperature": 0.2}, None, {})
+        assert base != LLMResponseCache.make_key("generate", "m", "p", {"temperature": 0.1}, "json", {})
+    
+    @pytest.mark.infrastructure
+    def test_disk_tier_survives_restart(self, tmp_path):
+        path = tmp_path / "responses.sqlite"
+        cache = LLMResponseCache(disk_path=path)
+        cache.set("k", "ответ", ttl=60)
+        cache.close()
+    
+        restarted = LLMResponseCache(disk_path=path)
+        assert restarted.get("k") == "ответ"
+        assert restarted.get("k") == "ответ"
+        stats = restarted.get_stats()
+        # Первое попадание с диска поднимает ответ в память
+        assert stats["disk_hits"] == 1
+        assert stats["memory_hits"] == 1
+        restarted.close()
+    
+    @pytest.mark.infrastructure
+    def test_expired_entries_are_misses(self, tmp_path):
+        cache = LLMResponseCache(disk_path=tmp_path / "responses.sqlite")
+        cache.set("k", "ответ", ttl=0)
+        time.sleep(0.01)
+        assert cache.get("k") is None
+        assert cache.get_stats()["misses"] == 1
+        cache.close()
+    
+    @pytest.mark.infrastructure
+    def test_memory_only_mode(self):
+        cache = LLMResponseCache(disk_path=None)
+        cache.set("k", "ответ", ttl=60)
+        assert cache.get("k") == "ответ"
+        assert cache.get("missing") is None
+        cache.clear()
+        assert cache.get("k") is None
+    
+    @pytest.mark.infrastructure
+    def test_delete_removes_both_tiers(self, tmp_path):
+        path = tmp_path / "responses.sqlite"
+        cache = LLMResponseCache(disk_path=path)
+        cache.set("k", "ответ", ttl=60)
+        cache.delete("k")
+        assert cache.get("k") is None
+        cache.close()
+        
+        restarted = LLMResponseCache(disk_path=path)
+        assert restarted.get("k") is None
+        restarted.close()
+    
+    @pytest.mark.infrastructure
+    def test_ttl_rules(self):
+        # Явный отказ и высокая температура — без кэша
+        assert get_response_cache_ttl("intent", 0.1, False) == 0
+        assert get_response_cache_ttl("intent", 0.9, None) == 0
+        # Обычная генерация (temperature агентов по умолчанию) — без кэша
+        assert get_response_cache_ttl("intent", 0.25, None) == 0
+        # Детерминированный вызов — TTL этапа
+        assert get_response_cache_ttl("intent", 0.0, None) > 0
+        # Этап с TTL 0 кэшируется только по явному запросу
+        assert get_response_cache_ttl("coding", 0.0, None) == 0
+        assert get_response_cache_ttl("coding", 0.9, True) > 0
@@ -1,4 +1,6 @@
 """Тесты для LocalLLM."""
+import asyncio
+
 import pytest
 from infrastructure.local_llm import LocalLLM
 
@@ -20,3 +22,333 @@ class TestLocalLLM:
         
         llm_max = LocalLLM(model="test", temperature=1.0)
         assert llm_max.temperature == 1.0
+
+
+class _FakePool:
+    """Фейковый OllamaConnectionPool для тестов стриминга."""
+    
+    def __init__(self, attempts):
+        # attempts: список сценариев, каждый — список чанков или исключение
+        self.attempts = list(attempts)
+        self.calls = []
+        self.closed = 0
+    
+    async def generate_stream(self, **kwargs):
+        self.calls.append(kwargs)
+        scenario = self.attempts.pop(0)
+        try:
+            for item in scenario:
+                if isinstance(item, Exception):
+                    raise item
+                if isinstance(item, float):
+                    # Пауза модели между чанками (секунды)
+                    await asyncio.sleep(item)
+                    continue
+                yield item
+        finally:
+            self.closed += 1
+
+
+class TestLocalLLMStreaming:
+    """Тесты async стриминга через connection pool."""
+    
+    @pytest.fixture
+    def fake_pool(self, monkeypatch):
+        def _install(attempts):
+            pool = _FakePool(attempts)
+            
+            async def _get_pool():
+                return pool
+            
+            monkeypatch.setattr("infrastructure.connection_pool.get_ollama_pool", _get_pool)
+            return pool
+        return _install
+    
+    async def test_stream_uses_pool_and_tracks_thinking(self, fake_pool):
+        """Чанки идут из пула, <think> блок определяется даже при разрезанном теге."""
+        pool = fake_pool([[
+            {"response": "<thi", "done": False},
+            {"response": "nk>план", "done": False},
+            {"response": "</think>", "done": False},
+            {"response": "код", "done": True},
+        ]])
+        llm = LocalLLM(model="test-model", timeout=5)
+        
+        chunks = [c async for c in llm.generate_stream("prompt", format="json")]
+        
+        assert [c.is_thinking for c in chunks[:-1]] == [False, True, False, False]
+        assert chunks[-1].is_done and chunks[-1].full_response == "<think>план</think>код"
+        assert pool.calls[0]["options"]["num_predict"] == 4096
+        assert pool.calls[0]["format"] == "json"
+        assert pool.closed == 1
+    
+    async def test_stream_retries_on_runner_crash(self, fake_pool, monkeypatch):
+        """Падение runner модели повторяется, после успеха отдаётся результат."""
+        monkeypatch.setattr(LocalLLM, "BASE_RETRY_DELAY", 0.0)
+        fake_pool([
+            [RuntimeError("Ollama: model runner has unexpectedly stopped")],
+            [{"response": "ok", "done": True}],
+        ])
+        llm = LocalLLM(model="test-model", timeout=5)
+        
+        chunks = [c async for c in llm.generate_stream("prompt")]
+        
+        assert chunks[-1].full_response == "ok"
+    
+    async def test_stream_raises_model_unavailable(self, fake_pool, monkeypatch):
+        """Постоянно падающая модель поднимает LLMModelUnavailableError."""
+        from infrastructure.local_llm import LLMModelUnavailableError
+        
+        monkeypatch.setattr(LocalLLM, "BASE_RETRY_DELAY", 0.0)
+        crash = RuntimeError("Ollama: model runner has unexpectedly stopped")
+        fake_pool([[crash], [crash], [crash]])
+        llm = LocalLLM(model="test-model", timeout=5)
+        
+        with pytest.raises(LLMModelUnavailableError):
+            async for _ in llm.generate_stream("prompt"):
+                pass
+    
+    async def test_stream_deadline_raises_timeout(self, fake_pool):
+        """Истёкший общий дедлайн стрима поднимает LLMTimeoutError, а не обрезанный ответ."""
+        from infrastructure.local_llm import LLMTimeoutError
+        
+        pool = fake_pool([[{"response": "def f(", "done": False}, 5.0, {"response": "): pass", "done": True}]])
+        llm = LocalLLM(model="test-model", timeout=0.05)
+        
+        chunks = []
+        with pytest.raises(LLMTimeoutError):
+            async for chunk in llm.generate_stream("prompt"):
+                chunks.append(chunk)
+        
+        assert [c.content for c in chunks] == ["def f("]
+        assert not any(c.is_done for c in chunks)
+        assert pool.closed == 1
+
+
+class TestOllamaConnectionPoolStreaming:
+    """Тесты стриминга OllamaConnectionPool."""
+
+    async def test_streams_beyond_pool_size_get_first_chunk(self):
+        import asyncio
+        import httpx
+        from infrastructure.connection_pool import OllamaConnectionPool
+
+        finish = asyncio.Event()
+
+        async def body():
+            yield b'{"response": "a"}\n'
+            await finish.wait()
+            yield b'{"response": "", "done": true}\n'
+
+        pool = OllamaConnectionPool("http://ollama", pool_size=2)
+        pool.client = httpx.AsyncClient(
+            base_url="http://ollama",
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, content=body()))
+        )
+        streams = [pool.generate_stream(model="m", prompt="p") for _ in range(3)]
+        try:
+            # Третий стрим не ждёт окончания генерации первых двух
+            first = await asyncio.wait_for(asyncio.gather(*(anext(s) for s in streams)), timeout=2)
+            assert [chunk["response"] for chunk in first] == ["a", "a", "a"]
+            assert pool.semaphore._value == 2
+            assert pool.stream_semaphore._value == 2
+            finish.set()
+            for stream in streams:
+                assert [chunk async for chunk in stream][-1]["done"] is True
+        finally:
+            await pool.close()
+
+    def test_pool_from_closed_loop_is_closed(self, monkeypatch):
+        import asyncio
+        import weakref
+        import infrastructure.connection_pool as connection_pool
+
+        monkeypatch.setattr(connection_pool, "_pools", weakref.WeakKeyDictionary())
+
+        closed_loop = asyncio.new_event_loop()
+        first = closed_loop.run_until_complete(connection_pool.get_ollama_pool())
+        closed_loop.close()
+
+        async def reopen():
+            pool = await connection_pool.get_ollama_pool()
+            assert first.client is None
+            assert closed_loop not in connection_pool._pools
+            await connection_pool.close_ollama_pool()
+            return pool
+
+        second = asyncio.run(reopen())
+        assert second is not first
+        assert second.client is None
+
+    def test_running_loops_keep_separate_pools(self, monkeypatch):
+        import asyncio
+        import threading
+        import weakref
+        import infrastructure.connection_pool as connection_pool
+
+        monkeypatch.setattr(connection_pool, "_pools", weakref.WeakKeyDictionary())
+
+        other_loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            other = asyncio.run_coroutine_threadsafe(
+                connection_pool.get_ollama_pool(), other_loop
+            ).result(timeout=5)
+
+            async def use_pool():
+                pool = await connection_pool.get_ollama_pool()
+                assert pool is await connection_pool.get_ollama_pool()
+                await connection_pool.close_ollama_pool()
+                return pool
+
+            current = asyncio.run(use_pool())
+            assert current is not other
+            assert current.client is None
+            # Пул работающего loop не закрыт чужим loop
+            assert other.client is not None
+        finally:
+            asyncio.run_coroutine_threadsafe(
+                connection_pool.close_ollama_pool(), other_loop
+            ).result(timeout=5)
+            other_loop.call_soon_threadsafe(other_loop.stop)
+            thread.join(timeout=5)
+            other_loop.close()
+        assert other.client is None
+
+
+class TestLocalLLMResponseCache:
+    """Тесты кэша ответов LocalLLM.generate/chat."""
+    
+    @pytest.fixture
+    def response_cache(self, monkeypatch, tmp_path):
+        from infrastructure.llm_cache import LLMResponseCache
+        
+        cache = LLMResponseCache(disk_path=tmp_path / "responses.sqlite")
+        monkeypatch.setattr("infrastructure.local_llm.get_llm_response_cache", lambda: cache)
+        yield cache
+        cache.close()
+    
+    @pytest.fixture
+    def fake_ollama(self, monkeypatch):
+        calls = {"generate": 0, "chat": 0}
+        
+        def _generate(**kwargs):
+            calls["generate"] += 1
+            return {"response": f"ответ {calls['generate']}"}
+        
+        def _chat(**kwargs):
+            calls["chat"] += 1
+            return {"message": {"content": f"чат {calls['chat']}"}}
+        
+        monkeypatch.setattr("infrastructure.local_llm.ollama.generate", _generate)
+        monkeypatch.setattr("infrastructure.local_llm.ollama.chat", _chat)
+        return calls
+    
+    def test_repeated_prompt_served_from_cache(self, response_cache, fake_ollama):
+        llm = LocalLLM(model="test-model", temperature=0.0, stage="intent")
+        
+        assert llm.generate("классифицируй запрос") == "ответ 1"
+        assert llm.generate("классифицируй запрос") == "ответ 1"
+        assert llm.generate("другой запрос") == "ответ 2"
+        assert fake_ollama["generate"] == 2
+        assert response_cache.get_stats()["memory_hits"] == 1
+    
+    def test_high_temperature_not_cached(self, response_cache, fake_ollama):
+        llm = LocalLLM(model="test-model", temperature=0.7, stage="intent")
+        
+        llm.generate("промпт")
+        llm.generate("промпт")
+        assert fake_ollama["generate"] == 2
+    
+    def test_cache_flag_overrides_temperature_and_stage(self, response_cache, fake_ollama):
+        # coding по умолчанию не кэшируется, но cache=True включает кэш
+        llm = LocalLLM(model="test-model", temperature=0.7, stage="coding")
+        
+        llm.generate("промпт")
+        llm.generate("промпт")
+        assert fake_ollama["generate"] == 2
+        
+        llm.generate("промпт", cache=True)
+        llm.generate("промпт", cache=True)
+        assert fake_ollama["generate"] == 3
+        
+        llm_low = LocalLLM(model="test-model", temperature=0.0, stage="intent")
+        llm_low.generate("x", cache=False)
+        llm_low.generate("x", cache=False)
+        assert fake_ollama["generate"] == 5
+    
+    def test_options_are_part_of_key(self, response_cache, fake_ollama):
+        llm = LocalLLM(model="test-model", temperature=0.0, stage="intent")
+        
+        llm.generate("промпт")
+        llm.generate("промпт", format="json")
+        llm.generate("промпт", temperature=0.2)
+        assert fake_ollama["generate"] == 3
+    
+    def test_invalid_structured_response_is_evicted(self, response_cache, fake_ollama, monkeypatch):
+        from pydantic import BaseModel
+        
+        class Answer(BaseModel):
+            value: int
+        
+        responses = iter(['{"value": "не число"}', '{"value": 1}', '{"value": 2}'])
+        
+        def _generate(**kwargs):
+            fake_ollama["generate"] += 1
+            return {"response": next(responses)}
+        
+        monkeypatch.setattr("infrastructure.local_llm.ollama.generate", _generate)
+        llm = LocalLLM(model="test-model", temperature=0.0, stage="intent")
+        
+        # Негодный ответ попал в кэш, повтор (мимо кэша) успешен
+        assert llm.generate_structured("промпт", Answer).value == 1
+        # Негодный ответ удалён: первая попытка снова идёт в модель
+        assert llm.generate_structured("промпт", Answer).value == 2
+        assert fake_ollama["generate"] == 3
+    
+    def test_chat_cached(self, response_cache, fake_ollama):
+        llm = LocalLLM(model="test-model", temperature=0.0, stage="planning")
+        messages = [{"role": "user", "content": "привет"}]
+        
+        assert llm.chat(messages) == "чат 1"
+        assert llm.chat(messages) == "чат 1"
+        assert fake_ollama["chat"] == 1
+    
+    def test_repeated_intent_prompt_served_from_cache(self, response_cache, fake_ollama, monkeypatch):
+        from agents.intent import IntentAgent
+        
+        # Ответ подходит и structured output, и legacy парсингу
+        monkeypatch.setattr(
+            "infrastructure.local_llm.ollama.generate",
+            lambda **kwargs: fake_ollama.update(generate=fake_ollama["generate"] + 1) or {
+                "response": '{"intent": "create", "confidence": 0.9, "complexity": "simple"}'
+            }
+        )
+        
+        def classify(query: str):
+            # Новый агент: без его собственного кэша результатов
+            agent = IntentAgent(lazy_llm=True)
+            agent._llm = LocalLLM(model="test-model", temperature=agent.temperature, stage="intent")
+            return agent.determine_intent(query)
+        
+        assert classify("напиши функцию сортировки списка").type == "create"
+        assert classify("напиши функцию сортировки списка").type == "create"
+        assert fake_ollama["generate"] == 1
+        assert response_cache.get_stats()["memory_hits"] == 1
+    
+    def test_repeated_planner_prompt_served_from_cache(self, response_cache, fake_ollama, monkeypatch):
+        from agents.planner import PlannerAgent
+        
+        monkeypatch.setattr(
+            "agents.base.create_llm_for_stage",
+            lambda stage, model=None, temperature=0.25, **kwargs: LocalLLM(
+                model="test-model", temperature=temperature, stage=stage
+            )
+        )
+        planner = PlannerAgent(model="test-model")
+        
+        task = "сделай REST api сервис для учёта заказов с авторизацией"
+        first = planner.create_plan(task, "create")
+        assert planner.create_plan(task, "create") == first
+        assert fake_ollama["generate"] == 1
@@ -1,4 +1,6 @@
 """Тесты для MemoryAgent."""
+from unittest.mock import Mock
+
 import pytest
 from agents.memory import MemoryAgent
 
@@ -16,3 +18,38 @@ class TestMemoryAgent:
         assert agent is not None
         assert hasattr(agent, 'memory_rag')
         assert hasattr(agent, 'collection_name')
+    
+    def test_save_retries_failed_documents(self):
+        """После успешной записи отложенные документы RAG дописываются."""
+        rag = Mock()
+        rag.add_documents.return_value = 1
+        rag.failed_documents = [("doc_0", "опыт", {})]
+        agent = MemoryAgent(rag_system=rag)
+        reflection = Mock(
+            overall_score=0.9, planning_score=0.9, research_score=0.9,
+            testing_score=0.9, coding_score=0.9, analysis="ok"
+        )
+        
+        agent.save_task_experience("задача", "create", reflection)
+        
+        rag.retry_failed_documents.assert_called_once()
+    
+    def test_save_passes_content_id(self):
+        """Опыт пишется с ID по содержимому, а не по номеру в вызове."""
+        from infrastructure.rag import document_id
+        
+        rag = Mock()
+        rag.add_documents.return_value = 1
+        rag.failed_documents = []
+        agent = MemoryAgent(rag_system=rag)
+        reflection = Mock(
+            overall_score=0.9, planning_score=0.9, research_score=0.9,
+            testing_score=0.9, coding_score=0.9, analysis="ok"
+        )
+        
+        agent.save_task_experience("первая задача", "create", reflection)
+        agent.save_task_experience("вторая задача", "create", reflection)
+        
+        calls = [call.kwargs for call in rag.add_documents.call_args_list]
+        assert [kwargs["ids"] for kwargs in calls] == [[document_id(kwargs["documents"][0])] for kwargs in calls]
+        assert calls[0]["ids"] != calls[1]["ids"]
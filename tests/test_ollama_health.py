@@ -0,0 +1,132 @@
+"""Тесты для монитора доступности Ollama."""
+import time
+
+import httpx
+import pytest
+
+from infrastructure import ollama_health
+from infrastructure.local_llm import LocalLLM
+from infrastructure.ollama_health import OllamaHealthMonitor, is_connection_error
+
+
+def _connection_error() -> Exception:
+    return ConnectionError("Failed to connect to Ollama")
+
+
+class TestOllamaHealthMonitor:
+    """Тесты общего монитора здоровья Ollama."""
+    
+    @pytest.mark.infrastructure
+    def test_connection_errors_detected(self):
+        assert is_connection_error(ConnectionError("refused"))
+        assert is_connection_error(httpx.ConnectError("refused"))
+    
+        try:
+            try:
+                raise httpx.ConnectError("refused")
+            except httpx.ConnectError as e:
+                raise RuntimeError("Не удалось подключиться к Ollama") from e
+        except RuntimeError as wrapped:
+            assert is_connection_error(wrapped)
+    
+        assert not is_connection_error(ValueError("model not found"))
+        assert not is_connection_error(httpx.ReadTimeout("slow model"))
+    
+    @pytest.mark.infrastructure
+    def test_opens_after_consecutive_connection_failures(self):
+        monitor = OllamaHealthMonitor("localhost:11434", failure_threshold=2, recovery_timeout=60)
+        assert monitor.base_url == "http://localhost:11434"
+        assert monitor.is_available()
+    
+        monitor.record_failure(ValueError("model not found"))
+        monitor.record_failure(_connection_error())
+        assert monitor.is_available()
+    
+        monitor.record_failure(_connection_error())
+        assert not monitor.is_available()
+        stats = monitor.get_stats()
+        assert stats["state"] == "open"
+        assert stats["rejected"] == 1
+    
+    @pytest.mark.infrastructure
+    def test_recovers_after_timeout_and_success(self):
+        monitor = OllamaHealthMonitor("http://x", failure_threshold=1, recovery_timeout=0.5)
+        monitor.record_failure(_connection_error())
+        assert not monitor.is_available()
+    
+        time.sleep(0.6)
+        # Время восстановления вышло — пропускаем пробный запрос
+        assert monitor.is_available()
+        monitor.record_success()
+        assert monitor.get_stats()["state"] == "closed"
+    
+    @pytest.mark.infrastructure
+    def test_probe_updates_status(self, monkeypatch):
+        monitor = OllamaHealthMonitor("http://x", failure_threshold=1, recovery_timeout=60)
+    
+        def _down(url, timeout):
+            raise httpx.ConnectError("refused")
+    
+        monkeypatch.setattr(ollama_health.httpx, "get", _down)
+        assert not monitor.probe()
+        assert not monitor.is_available()
+    
+        monkeypatch.setattr(ollama_health.httpx, "get", lambda url, timeout: httpx.Response(200, request=httpx.Request("GET", url)))
+        assert monitor.probe()
+        assert monitor.is_available()
+        stats = monitor.get_stats()
+        assert stats["probes"] == 2
+        assert stats["probe_failures"] == 1
+
+
+class TestLocalLLMHealth:
+    """LocalLLM использует монитор вместо ollama.list()."""
+    
+    @pytest.fixture
+    def calls(self, monkeypatch):
+        calls = {"generate": 0}
+        
+        def _list():
+            raise AssertionError("ollama.list() не должен вызываться перед генерацией")
+        
+        def _generate(**kwargs):
+            calls["generate"] += 1
+            return {"response": "ok"}
+        
+        monkeypatch.setattr("infrastructure.local_llm.ollama.list", _list)
+        monkeypatch.setattr("infrastructure.local_llm.ollama.generate", _generate)
+        return calls
+    
+    @pytest.mark.infrastructure
+    def test_generate_skips_list_probe(self, calls):
+        llm = LocalLLM(model="test-model", temperature=0.7)
+        
+        assert llm.generate("привет") == "ok"
+        assert calls["generate"] == 1
+        assert ollama_health.get_ollama_health_monitor().get_stats()["checks"] == 1
+    
+    @pytest.mark.infrastructure
+    def test_generate_fails_fast_when_unavailable(self, calls):
+        monitor = ollama_health.get_ollama_health_monitor()
+        for _ in range(monitor.breaker.failure_threshold):
+            monitor.record_failure(_connection_error())
+        
+        llm = LocalLLM(model="test-model", temperature=0.7)
+        assert llm.generate("привет") == ""
+        assert calls["generate"] == 0
+    
+    @pytest.mark.infrastructure
+    def test_connection_errors_stop_retries(self, monkeypatch):
+        attempts = []
+        
+        def _generate(**kwargs):
+            attempts.append(kwargs)
+            raise _connection_error()
+        
+        monkeypatch.setattr("infrastructure.local_llm.ollama.generate", _generate)
+        monkeypatch.setattr(LocalLLM, "_calculate_backoff", lambda self, attempt: 0)
+        
+        llm = LocalLLM(model="test-model", temperature=0.7, max_retries=5)
+        assert llm.generate("привет") == ""
+        # Ретраи прекращаются, как только монитор признал Ollama недоступным
+        assert len(attempts) == ollama_health.get_ollama_health_monitor().breaker.failure_threshold
@@ -0,0 +1,73 @@
+"""Тесты для пула прогретых процессов pytest."""
+import os
+
+import pytest
+
+from utils import validation
+from utils.pytest_pool import PytestWorkerError, PytestWorkerPool
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="пул pytest работает только с fork")
+
+CODE = "X = []\n\ndef push():\n    X.append(1)\n    return len(X)\n"
+TESTS = "def test_push():\n    assert push() == 1\n"
+
+
+def _write_job(tmp_path, name: str, code: str, tests: str) -> str:
+    workdir = tmp_path / name / "work"
+    workdir.mkdir(parents=True)
+    (workdir / "code.py").write_text(code, encoding="utf-8")
+    (workdir / "test_code.py").write_text("from code import *\n" + tests, encoding="utf-8")
+    (workdir / "__init__.py").write_text("", encoding="utf-8")
+    return str(workdir)
+
+
+@pytest.fixture
+def pool():
+    pool = PytestWorkerPool(size=1, max_jobs_per_worker=2)
+    yield pool
+    pool.close()
+
+
+class TestPytestWorkerPool:
+    """Тесты пула прогретых процессов pytest."""
+    
+    @pytest.mark.utils
+    def test_jobs_are_isolated_and_workers_recycled(self, pool, tmp_path):
+        for i in range(3):
+            # Состояние модуля code из прошлого задания не должно сохраниться
+            result = pool.run(_write_job(tmp_path, f"job{i}", CODE, TESTS), ["test_code.py", "-q"], timeout=30)
+            assert result.returncode == 0, result.output
+            assert "1 passed" in result.output
+    
+        stats = pool.get_stats()
+        assert stats["jobs"] == 3
+        assert stats["workers_recycled"] >= 1
+    
+    @pytest.mark.utils
+    def test_failures_and_timeouts(self, pool, tmp_path):
+        failing = pool.run(
+            _write_job(tmp_path, "fail", CODE, "def test_push():\n    assert push() == 2\n"),
+            ["test_code.py", "-q"], timeout=30
+        )
+        assert failing.returncode == 1
+        assert "assert 1 == 2" in failing.output
+    
+        hanging = pool.run(
+            _write_job(tmp_path, "hang", "import time\n", "def test_sleep():\n    time.sleep(60)\n"),
+            ["test_code.py", "-q"], timeout=1
+        )
+        assert hanging.timed_out
+    
+        # После таймаута воркер продолжает обслуживать задания
+        result = pool.run(_write_job(tmp_path, "after", CODE, TESTS), ["test_code.py", "-q"], timeout=30)
+        assert result.returncode == 0
+    
+    @pytest.mark.utils
+    def test_run_pytest_falls_back_without_pool(self, monkeypatch):
+        class _BrokenPool:
+            def run(self, *args, **kwargs):
+                raise PytestWorkerError("воркеры pytest не запускаются")
+    
+        monkeypatch.setattr(validation, "get_pytest_pool", lambda: _BrokenPool())
+        success, output = validation.run_pytest(CODE, TESTS)
+        assert success, output
@@ -1,8 +1,23 @@
 """Тесты для RAG системы."""
 import pytest
+from unittest.mock import MagicMock, patch
 from infrastructure.rag import RAGSystem
 
 
+class _FakeCollection:
+    """Коллекция с семантикой ChromaDB: add пропускает существующие ID, upsert заменяет."""
+    
+    def __init__(self):
+        self.documents = {}
+    
+    def add(self, ids, embeddings, documents, metadatas):
+        for doc_id, document in zip(ids, documents):
+            self.documents.setdefault(doc_id, document)
+    
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.documents.update(zip(ids, documents))
+
+
 class TestRAG:
     """Тесты для класса RAGSystem."""
     
@@ -15,3 +30,112 @@ class TestRAG:
         """Тест инициализации RAGSystem."""
         assert rag is not None
         assert hasattr(rag, 'collection')
+
+
+class TestRAGEmbeddingPipeline:
+    """Тесты батчевого пайплайна embeddings в add_documents."""
+    
+    @pytest.fixture
+    def rag(self):
+        """RAGSystem с фейковой коллекцией (ChromaDB в тестах не нужен)."""
+        rag = RAGSystem(collection_name="test_collection", persist_directory=".chromadb_test")
+        rag.enabled = True
+        rag.collection = MagicMock()
+        rag.embedding_batch_size = 2
+        rag.embedding_concurrency = 2
+        rag.embedding_max_retries = 0
+        rag.embedding_cache = None
+        return rag
+    
+    def test_add_documents_batches_and_reports_progress(self, rag):
+        """Документы уходят батчами в /api/embed, прогресс доходит до конца."""
+        calls = []
+        
+        def fake_embed(model, input):
+            calls.append(list(input))
+            return {"embeddings": [[float(len(text))] for text in input]}
+        
+        progress = []
+        with patch("infrastructure.rag.ollama.embed", side_effect=fake_embed):
+            added = rag.add_documents(
+                ["a", "bb", "ccc", "dddd", "eeeee"],
+                progress_callback=lambda done, total: progress.append((done, total))
+            )
+        
+        assert added == 5
+        assert sorted(len(batch) for batch in calls) == [1, 2, 2]
+        # Прогресс — после каждого батча
+        assert len(progress) == 3
+        assert progress == sorted(progress)
+        assert progress[-1] == (5, 5)
+        stored = [
+            text
+            for call in rag.collection.upsert.call_args_list
+            for text in call.kwargs["documents"]
+        ]
+        assert sorted(stored) == ["a", "bb", "ccc", "dddd", "eeeee"]
+    
+    def test_failed_documents_are_queued_not_zero_vectors(self, rag):
+        """Документ без embedding откладывается, а не пишется нулевым вектором."""
+        def fake_embed(model, input):
+            if "bad" in input:
+                raise RuntimeError("context length exceeded")
+            return {"embeddings": [[1.0] for _ in input]}
+        
+        with patch("infrastructure.rag.ollama.embed", side_effect=fake_embed):
+            added = rag.add_documents(["good", "bad", "fine"])
+        
+        assert added == 2
+        assert [text for _, text, _ in rag.failed_documents] == ["bad"]
+        for call in rag.collection.upsert.call_args_list:
+            assert "bad" not in call.kwargs["documents"]
+            assert all(any(vector) for vector in call.kwargs["embeddings"])
+        
+        with patch("infrastructure.rag.ollama.embed", return_value={"embeddings": [[1.0]]}):
+            assert rag.retry_failed_documents() == 1
+        assert rag.failed_documents == []
+    
+    def test_cached_embeddings_skip_ollama(self, rag, tmp_path):
+        """Повторное добавление того же текста берёт embeddings из кэша."""
+        from infrastructure.embedding_cache import EmbeddingCache
+        
+        rag.embedding_cache = EmbeddingCache(cache_dir=tmp_path)
+        calls = []
+        
+        def fake_embed(model, input):
+            calls.append(list(input))
+            return {"embeddings": [[1.0, 2.0] for _ in input]}
+        
+        try:
+            with patch("infrastructure.rag.ollama.embed", side_effect=fake_embed):
+                rag.add_documents(["a", "b"])
+                rag.add_documents(["a", "b", "c"])
+        finally:
+            rag.embedding_cache.close()
+        
+        assert sorted(text for call in calls for text in call) == ["a", "b", "c"]
+    
+    def test_default_ids_are_content_digests(self, rag):
+        """ID по умолчанию не зависят от позиции и процесса: разные тексты не заменяют друг друга."""
+        from infrastructure.rag import document_id
+        
+        rag.collection = _FakeCollection()
+        with patch("infrastructure.rag.ollama.embed", side_effect=lambda model, input: {"embeddings": [[1.0] for _ in input]}):
+            rag.add_documents(["первый опыт"])
+            rag.add_documents(["второй опыт"])
+            # Повтор текста в одном вызове — один документ
+            assert rag.add_documents(["третий опыт", "третий опыт"]) == 1
+        
+        assert sorted(rag.collection.documents.values()) == ["второй опыт", "первый опыт", "третий опыт"]
+        assert document_id("первый опыт") in rag.collection.documents
+        assert document_id("первый опыт") == document_id("первый опыт") != document_id("второй опыт")
+    
+    def test_readded_document_with_same_id_replaces_content(self, rag):
+        """Изменённый чанк под тем же стабильным ID заменяет старый текст."""
+        rag.collection = _FakeCollection()
+        
+        with patch("infrastructure.rag.ollama.embed", return_value={"embeddings": [[1.0]]}):
+            rag.add_documents(["def total(): return 1"], ids=["billing.py:1-1"])
+            rag.add_documents(["def total(): return 2"], ids=["billing.py:1-1"])
+        
+        assert rag.collection.documents == {"billing.py:1-1": "def total(): return 2"}
@@ -285,6 +285,27 @@ def hello():
         
         # Не должно быть событий
         assert len(events) == 0
+    
+    @pytest.mark.asyncio
+    async def test_stream_from_llm_propagates_timeout(self):
+        """Таймаут стрима пробрасывается, а не отдаётся обрезанным ответом в done."""
+        from infrastructure.local_llm import LLMTimeoutError, StreamChunk
+        
+        class TimeoutLLM:
+            model = "test-model"
+            
+            async def generate_stream(self, prompt, **kwargs):
+                yield StreamChunk(content="<think>план", is_thinking=True, is_done=False, full_response="<think>план")
+                raise LLMTimeoutError("Превышен общий timeout стриминга")
+        
+        manager = ReasoningStreamManager()
+        events = []
+        with pytest.raises(LLMTimeoutError):
+            async for event in manager.stream_from_llm(TimeoutLLM(), "prompt", stage="planning"):
+                events.append(event)
+        
+        assert all(kind != "done" for kind, _ in events)
+        assert "thinking_interrupted" in events[-1][1]
 
 
 class TestSingleton:
@@ -343,8 +364,7 @@ class TestSSEEventFormat:
         event = await manager.create_thinking_event(chunk)
         
         # Проверяем структуру SSE
-        assert event.startswith("id: ")
-        assert "\nevent: " in event
+        assert event.startswith("event: ")
         assert "\ndata: " in event
         assert event.endswith("\n\n")
     
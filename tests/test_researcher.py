@@ -37,3 +37,26 @@ class TestResearcherAgent:
         assert agent.rag == mock_rag
         assert agent.memory == mock_memory
         assert agent.context_engine == mock_context
+    
+    def test_index_project_embeds_chunks_with_progress(self):
+        """index_project передаёт чанки в RAG и прокидывает callback прогресса."""
+        from infrastructure.context_engine import CodeChunk
+        
+        chunk = CodeChunk(
+            id="a.py:1-2", file_path="a.py", start_line=1, end_line=2,
+            content="def f():\n    pass", chunk_type="function", name="f"
+        )
+        mock_rag = Mock()
+        mock_rag.add_documents.return_value = 1
+        mock_context = Mock()
+        mock_context.index_project.return_value = {"a.py": [chunk]}
+        agent = ResearcherAgent(rag_system=mock_rag, context_engine=mock_context)
+        
+        def callback(done, total):
+            return None
+        
+        assert agent.index_project("/project", embed_in_rag=True, progress_callback=callback) == 1
+        kwargs = mock_rag.add_documents.call_args.kwargs
+        assert kwargs["documents"] == [chunk.content]
+        assert kwargs["ids"] == ["a.py:1-2"]
+        assert kwargs["progress_callback"] is callback
@@ -248,7 +248,8 @@ class TestGenerateWithFallback:
                 prompt="test",
                 response_model=TestResponse,
                 num_predict=2048,
-                retries=3
+                retries=3,
+                cache=None
             )
 
 
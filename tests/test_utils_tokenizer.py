@@ -0,0 +1,197 @@
+"""Тесты подсчёта токенов по семейству модели и упаковки контекста по бюджету."""
+from types import SimpleNamespace
+
+import pytest
+
+from agents.chat import ChatAgent
+from agents.conversation import Conversation
+from utils import tokenizer as tokenizer_module
+from utils.token_counter import estimate_tokens, estimate_workflow_tokens
+from utils.tokenizer import (
+    MESSAGE_TOKEN_OVERHEAD,
+    Tokenizer,
+    count_tokens,
+    get_tokenizer,
+    model_family,
+    reset_tokenizers,
+    take_recent_within_budget,
+)
+
+
+class _WordBackend:
+    """Токенизатор-заглушка: токен на слово, считает вызовы."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text, add_special_tokens=False):
+        self.calls += 1
+        words = text.split()
+        offsets = []
+        position = 0
+        for word in words:
+            start = text.index(word, position)
+            position = start + len(word)
+            offsets.append((start, position))
+        return SimpleNamespace(ids=words, offsets=offsets)
+
+    def encode_batch(self, texts, add_special_tokens=False):
+        self.calls += 1
+        return [SimpleNamespace(ids=text.split()) for text in texts]
+
+
+@pytest.fixture
+def word_tokenizer(monkeypatch):
+    backend = _WordBackend()
+    reset_tokenizers()
+    monkeypatch.setattr(tokenizer_module, "_load_backend", lambda family: backend)
+    yield backend
+    reset_tokenizers()
+
+
+class TestTokenizer:
+    """Тесты подсчёта токенов по семейству модели."""
+    
+    @pytest.mark.utils
+    @pytest.mark.parametrize("model,family", [
+        ("qwen2.5-coder:7b", "qwen"),
+        ("deepseek-r1:7b", "qwen"),
+        ("llama3.1:8b", "llama3"),
+        ("codellama:13b", "llama2"),
+        ("hf.co/bartowski/gemma-2-9b-it-GGUF", "gemma"),
+        ("phi3:mini", "phi3"),
+        ("unknown-model", "default"),
+        (None, "default"),
+    ])
+    def test_model_family(self, model, family):
+        assert model_family(model) == family
+    
+    @pytest.mark.utils
+    def test_falls_back_to_heuristic(self, monkeypatch):
+        reset_tokenizers()
+        monkeypatch.setattr(tokenizer_module, "_load_backend", lambda family: None)
+        tokenizer = get_tokenizer("qwen2.5-coder:7b")
+        assert not tokenizer.exact
+        assert tokenizer.count("def add(a, b): return a + b") == estimate_tokens("def add(a, b): return a + b")
+        reset_tokenizers()
+    
+    @pytest.mark.utils
+    def test_counts_are_memoized_by_content(self):
+        backend = _WordBackend()
+        tokenizer = Tokenizer("qwen", backend, memo_entries=2)
+        assert tokenizer.count("a b c") == 3
+        assert tokenizer.count("a b c") == 3
+        assert backend.calls == 1
+        assert tokenizer.get_stats()["memo_hits"] == 1
+    
+        # LRU: самый старый текст вытесняется
+        tokenizer.count("d")
+        tokenizer.count("e f")
+        tokenizer.count("a b c")
+        assert backend.calls == 4
+    
+    @pytest.mark.utils
+    def test_count_batch_encodes_missing_once(self):
+        backend = _WordBackend()
+        tokenizer = Tokenizer("qwen", backend)
+        tokenizer.count("x y")
+        assert tokenizer.count_batch(["x y", "", "p q r", "p q r"]) == [2, 0, 3, 3]
+        # Одно encode + один encode_batch с единственным уникальным промахом
+        assert backend.calls == 2
+        assert tokenizer.count_batch(["p q r"]) == [3]
+        assert backend.calls == 2
+    
+    @pytest.mark.utils
+    def test_prefix_chars(self):
+        exact = Tokenizer("qwen", _WordBackend())
+        assert exact.prefix_chars("one two three four", 2) == len("one two")
+        assert exact.prefix_chars("one two", 5) == len("one two")
+    
+        heuristic = Tokenizer("default")
+        text = "x" * 400
+        assert heuristic.prefix_chars(text, 1000) == len(text)
+        assert heuristic.count(text[:heuristic.prefix_chars(text, 10)]) <= 10
+    
+    @pytest.mark.utils
+    def test_workflow_tokens_use_model_tokenizer(self, word_tokenizer):
+        assert count_tokens("один два три", model="qwen2.5-coder:7b") == 3
+        tokens = estimate_workflow_tokens(
+            task="a b", plan="c d e", context="", tests="t", code="c c",
+            prompts_used=["p"], model="qwen2.5-coder:7b"
+        )
+        # 2 + 3 + 1 + 2 + 1 и накладные расходы на генерацию кода (+1)
+        assert tokens == 10
+
+
+class TestContextPacking:
+    """Тесты упаковки истории диалога по бюджету токенов."""
+    
+    @pytest.mark.utils
+    def test_take_recent_within_budget(self):
+        assert take_recent_within_budget([5, 1, 2, 3], 6, lambda x: x) == [1, 2, 3]
+        # Большой элемент отсекает все более старые
+        assert take_recent_within_budget([1, 100, 2], 50, lambda x: x) == [2]
+        assert take_recent_within_budget([10], 5, lambda x: x) == []
+    
+    @pytest.mark.utils
+    def test_context_packed_by_tokens_with_cached_counts(self, word_tokenizer):
+        pasted_file = "line " * 5000
+        conv = _conversation("вопрос один", pasted_file, "вопрос два", "ответ два")
+        conv.summary = "кратко"
+    
+        context = conv.get_context_for_llm(max_messages=10, token_budget=100, model="qwen2.5-coder:7b")
+        assert context[0]["role"] == "system"
+        assert [m["content"] for m in context[1:]] == ["вопрос два", "ответ два"]
+    
+        calls = word_tokenizer.calls
+        conv.get_context_for_llm(max_messages=10, token_budget=100, model="qwen2.5-coder:7b")
+        # Счётчики сообщений закэшированы, суммаризация — в памяти токенизатора
+        assert word_tokenizer.calls == calls
+        assert conv.messages[-1].token_count(get_tokenizer("qwen2.5-coder:7b")) == 2 + MESSAGE_TOKEN_OVERHEAD
+    
+        # Без бюджета — прежнее поведение (по числу сообщений)
+        assert len(conv.get_context_for_llm(max_messages=10)) == 5
+    
+    @pytest.mark.utils
+    def test_chat_agent_packs_history_into_window(self, word_tokenizer):
+        agent = ChatAgent.__new__(ChatAgent)
+        agent.llm = SimpleNamespace(model="llama3.1:8b")
+        agent.model = "llama3.1:8b"
+        agent.max_tokens = 50
+        agent.context_window = 120
+        history = [
+            {"role": "system", "content": "Краткое содержание: обсуждали парсер"},
+            {"role": "user", "content": "старое " * 200},
+            {"role": "assistant", "content": "свежий ответ"},
+        ]
+    
+        messages = agent._build_messages("новый вопрос", history, "Ты помощник.")
+        assert messages[0]["role"] == "system"
+        assert "обсуждали парсер" in messages[0]["content"]
+        assert [m["content"] for m in messages[1:]] == ["свежий ответ", "новый вопрос"]
+    
+    @pytest.mark.utils
+    def test_chat_agent_sends_context_window_as_num_ctx(self, word_tokenizer):
+        agent = ChatAgent.__new__(ChatAgent)
+        calls = []
+        agent.llm = SimpleNamespace(model="llama3.1:8b", chat=lambda **kwargs: calls.append(kwargs) or "ответ")
+        agent.model = "llama3.1:8b"
+        agent.max_tokens = 50
+        agent.context_window = 120
+        agent._web_search_cache = {}
+    
+        assert agent.chat("как написать функцию", use_cache=False).content == "ответ"
+        assert calls[0]["options"] == {"num_ctx": 120}
+    
+    @pytest.mark.utils
+    def test_message_token_cache_is_not_serialized(self):
+        conv = _conversation("вопрос")
+        conv.messages[0].token_count(Tokenizer("default"))
+        assert "_token_counts" not in conv.messages[0].to_dict()
+
+
+def _conversation(*contents):
+    conv = Conversation(id="c1")
+    for i, content in enumerate(contents):
+        conv.add_message("user" if i % 2 == 0 else "assistant", content)
+    return conv
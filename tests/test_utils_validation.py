@@ -0,0 +1,78 @@
+"""Тесты для параллельной валидации кода (utils.validation)."""
+import sys
+import threading
+import time
+
+import pytest
+
+from utils import validation
+from utils.validation import validate_code
+
+GOOD_CODE = "def add(a: int, b: int) -> int:\n    return a + b\n"
+GOOD_TESTS = "def test_add() -> None:\n    assert add(1, 2) == 3\n"
+
+
+class TestValidateCode:
+    """Тесты параллельной валидации кода."""
+    
+    @pytest.mark.utils
+    def test_run_tool_cancel_kills_process(self, tmp_path):
+        cancel = threading.Event()
+        threading.Timer(0.1, cancel.set).start()
+    
+        start = time.monotonic()
+        result = validation._run_tool([sys.executable, "-c", "import time; time.sleep(30)"], cwd=tmp_path, timeout=30, cancel=cancel)
+        assert result is None
+        assert time.monotonic() - start < 5
+    
+    @pytest.mark.utils
+    def test_checks_run_in_parallel(self, monkeypatch):
+        def _slow_check(code_file, cancel=None):
+            time.sleep(0.5)
+            return True, ""
+    
+        monkeypatch.setattr(validation, "_mypy_on", _slow_check)
+        monkeypatch.setattr(validation, "_bandit_on", _slow_check)
+    
+        start = time.monotonic()
+        results = validate_code(GOOD_CODE)
+        assert results["all_passed"]
+        # Две проверки по 0.5с идут одновременно
+        assert time.monotonic() - start < 0.9
+    
+    @pytest.mark.utils
+    def test_fail_fast_skips_remaining_checks(self, monkeypatch):
+        def _cancellable_check(code_file, cancel=None):
+            # Завершается только по отмене
+            assert cancel is not None and cancel.wait(10)
+            return None
+    
+        monkeypatch.setattr(validation, "_mypy_on", _cancellable_check)
+        monkeypatch.setattr(validation, "_bandit_on", _cancellable_check)
+        monkeypatch.setattr(validation, "_pytest_in_workspace", lambda workdir: (False, "FAILED test_code.py::test_add"))
+    
+        results = validate_code(GOOD_CODE, GOOD_TESTS, fail_fast=True)
+        assert not results["all_passed"]
+        assert results["pytest"] == {"success": False, "output": "FAILED test_code.py::test_add"}
+        assert results["mypy"]["skipped"] and results["bandit"]["skipped"]
+    
+    @pytest.mark.utils
+    def test_syntax_error_short_circuits(self, monkeypatch):
+        def _unexpected(*args, **kwargs):
+            raise AssertionError("инструменты не должны запускаться")
+    
+        monkeypatch.setattr(validation, "_mypy_on", _unexpected)
+        monkeypatch.setattr(validation, "_bandit_on", _unexpected)
+    
+        results = validate_code("def add(:\n", GOOD_TESTS, fail_fast=True)
+        assert not results["all_passed"]
+        assert "Синтаксические ошибки" in results["pytest"]["output"]
+        assert results["mypy"]["skipped"]
+    
+    @pytest.mark.utils
+    def test_shared_workspace_end_to_end(self):
+        results = validate_code(GOOD_CODE, GOOD_TESTS)
+        assert results["pytest"]["success"], results["pytest"]["output"]
+        assert results["mypy"]["success"], results["mypy"]["errors"]
+        assert results["bandit"]["success"]
+        assert results["all_passed"]
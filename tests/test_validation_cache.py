@@ -0,0 +1,107 @@
+"""Тесты для кэша результатов валидации и остановки зацикленного self-healing."""
+import pytest
+
+from infrastructure.validation_cache import ValidationResultCache, validation_fingerprint
+from infrastructure.workflow_edges import should_continue_self_healing
+from utils import validation
+from utils.validation import validate_code
+
+CODE = "def add(a: int, b: int) -> int:\n    return a + b\n"
+TESTS = "def test_add() -> None:\n    assert add(1, 2) == 3\n"
+
+
+class TestValidationFingerprint:
+    """Тесты отпечатка кода для кэша валидации."""
+    
+    @pytest.mark.infrastructure
+    def test_fingerprint_ignores_formatting_and_comments(self):
+        reformatted = "# сложение\ndef add(a: int,   b: int) -> int:\n\n    return a + b  # сумма\n"
+        assert validation_fingerprint(CODE, TESTS) == validation_fingerprint(reformatted, TESTS)
+        assert validation_fingerprint(CODE, TESTS) != validation_fingerprint(CODE.replace("+", "-"), TESTS)
+        assert validation_fingerprint(CODE, TESTS) != validation_fingerprint(CODE, None)
+    
+    @pytest.mark.infrastructure
+    def test_fingerprint_keeps_tool_pragmas(self):
+        # "# type: ignore" и "# nosec" меняют результат mypy и bandit
+        assert validation_fingerprint(CODE) != validation_fingerprint(CODE.replace("a + b", "a + b  # type: ignore"))
+        assert validation_fingerprint(CODE) != validation_fingerprint(CODE.replace("a + b", "a + b  # nosec"))
+    
+    @pytest.mark.infrastructure
+    def test_fingerprint_of_invalid_syntax_uses_text(self):
+        assert validation_fingerprint("def f(:") != validation_fingerprint("def g(:")
+
+
+class TestValidationResultCache:
+    """Тесты кэша результатов валидации."""
+    
+    @pytest.mark.infrastructure
+    def test_cache_survives_restart(self, tmp_path):
+        path = tmp_path / "results.sqlite"
+        cache = ValidationResultCache(disk_path=path)
+        cache.set("fp", {"all_passed": True}, fail_fast=True)
+        cache.close()
+    
+        restarted = ValidationResultCache(disk_path=path)
+        assert restarted.get("fp", fail_fast=True) == {"all_passed": True}
+        # Результат без fail_fast содержит все проверки — это другой ключ
+        assert restarted.get("fp", fail_fast=False) is None
+        restarted.close()
+    
+    @pytest.mark.infrastructure
+    def test_validate_code_reuses_result_for_reformatted_code(self, monkeypatch):
+        calls = []
+    
+        def _fake_run(code_str, test_str, fail_fast):
+            calls.append(code_str)
+            return {
+                "pytest": {"success": False, "output": "assert 4 == 3"},
+                "mypy": {"success": True, "errors": ""},
+                "bandit": {"success": True, "issues": ""},
+                "all_passed": False
+            }
+    
+        cache = ValidationResultCache()
+        monkeypatch.setattr(validation, "get_validation_cache", lambda: cache)
+        monkeypatch.setattr(validation, "_run_validation", _fake_run)
+    
+        first = validate_code(CODE, TESTS, fail_fast=True)
+        second = validate_code("# fix\n" + CODE, TESTS, fail_fast=True)
+        assert len(calls) == 1
+        assert first["cached"] is False and second["cached"] is True
+        assert second["fingerprint"] == first["fingerprint"]
+        assert second["pytest"]["output"] == "assert 4 == 3"
+    
+    @pytest.mark.infrastructure
+    def test_transient_failures_are_not_cached(self, monkeypatch):
+        calls = []
+    
+        def _timeout_run(code_str, test_str, fail_fast):
+            calls.append(code_str)
+            return {
+                "pytest": {"success": False, "output": "Таймаут выполнения тестов (>30 сек)"},
+                "mypy": {"success": True, "errors": ""},
+                "bandit": {"success": True, "issues": ""},
+                "all_passed": False
+            }
+    
+        cache = ValidationResultCache()
+        monkeypatch.setattr(validation, "get_validation_cache", lambda: cache)
+        monkeypatch.setattr(validation, "_run_validation", _timeout_run)
+    
+        validate_code(CODE, TESTS)
+        validate_code(CODE, TESTS)
+        assert len(calls) == 2
+    
+    @pytest.mark.infrastructure
+    def test_self_healing_stops_on_repeated_code(self):
+        state = {
+            "validation_results": {"all_passed": False},
+            "iteration": 2,
+            "max_iterations": 5,
+            "code": CODE,
+            "validation_fingerprints": ["a", "b", "a"],
+        }
+        assert should_continue_self_healing(state) == "finish"
+    
+        state["validation_fingerprints"] = ["a", "b", "c"]
+        assert should_continue_self_healing(state) == "continue"
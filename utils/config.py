@@ -480,6 +480,170 @@ class Config:
         """Максимальное количество результатов из RAG."""
         return self._config_data.get("rag", {}).get("max_results", 5)
     
+    @property
+    def rag_embedding_batch_size(self) -> int:
+        """Размер батча документов для одного запроса embeddings."""
+        return self._config_data.get("rag", {}).get("embedding_batch_size", 32)
+    
+    @property
+    def rag_embedding_concurrency(self) -> int:
+        """Количество батчей embeddings, считаемых параллельно."""
+        return self._config_data.get("rag", {}).get("embedding_concurrency", 4)
+    
+    @property
+    def rag_embedding_max_retries(self) -> int:
+        """Повторные попытки для батча embeddings при ошибке."""
+        return self._config_data.get("rag", {}).get("embedding_max_retries", 2)
+    
+    # === Result Cache Settings ===
+    
+    @property
+    def cache_max_entries(self) -> int:
+        """Максимальное количество записей в общем кэше результатов."""
+        return self._config_data.get("cache", {}).get("max_entries", 1000)
+    
+    @property
+    def cache_max_memory_mb(self) -> int:
+        """Лимит объёма общего кэша результатов в МБ (0 — без лимита)."""
+        return self._config_data.get("cache", {}).get("max_memory_mb", 64)
+    
+    # === LLM Response Cache Settings ===
+    
+    @property
+    def llm_cache_enabled(self) -> bool:
+        """Включён ли кэш ответов LLM."""
+        return self._config_data.get("llm_cache", {}).get("enabled", True)
+    
+    @property
+    def llm_cache_max_temperature(self) -> float:
+        """Максимальная температура, при которой ответы кэшируются автоматически."""
+        return self._config_data.get("llm_cache", {}).get("max_temperature", 0.0)
+    
+    @property
+    def llm_cache_memory_entries(self) -> int:
+        """Ёмкость уровня кэша ответов LLM в памяти."""
+        return self._config_data.get("llm_cache", {}).get("memory_entries", 500)
+    
+    @property
+    def llm_cache_disk_path(self) -> str:
+        """Файл дискового уровня кэша ответов LLM (пустая строка — без диска)."""
+        return self._config_data.get("llm_cache", {}).get("disk_path", ".llm_cache/responses.sqlite")
+    
+    @property
+    def llm_cache_disk_max_entries(self) -> int:
+        """Максимум ответов LLM на диске."""
+        return self._config_data.get("llm_cache", {}).get("disk_max_entries", 20_000)
+    
+    def get_llm_cache_ttl(self, stage: str) -> int:
+        """TTL кэша ответов LLM для этапа workflow.
+        
+        Args:
+            stage: Название этапа (intent, planning, coding, etc.)
+            
+        Returns:
+            TTL в секундах, 0 — этап не кэшируется
+        """
+        ttls = self._config_data.get("llm_cache", {}).get("ttl", {})
+        return ttls.get(stage, ttls.get("default", 3600))
+    
+    # === Validation Settings ===
+    
+    @property
+    def pytest_timeout(self) -> int:
+        """Таймаут одного запуска pytest при валидации (секунды)."""
+        return self._config_data.get("validation", {}).get("pytest_timeout", 30)
+    
+    @property
+    def pytest_pool_enabled(self) -> bool:
+        """Использовать ли пул прогретых процессов pytest."""
+        return self._config_data.get("validation", {}).get("pytest_pool_enabled", True)
+    
+    @property
+    def pytest_pool_size(self) -> int:
+        """Количество прогретых воркеров pytest."""
+        return self._config_data.get("validation", {}).get("pytest_pool_size", 2)
+    
+    @property
+    def pytest_pool_max_jobs_per_worker(self) -> int:
+        """Заданий на воркер pytest до его замены."""
+        return self._config_data.get("validation", {}).get("pytest_pool_max_jobs_per_worker", 50)
+    
+    @property
+    def mypy_cache_dir(self) -> str:
+        """Общий кэш mypy для валидаций (пустая строка — кэш на каждый запуск)."""
+        return self._config_data.get("validation", {}).get("mypy_cache_dir", ".validation_cache/mypy")
+    
+    # === Validation Cache Settings ===
+    
+    @property
+    def validation_cache_enabled(self) -> bool:
+        """Включён ли кэш результатов валидации."""
+        return self._config_data.get("validation_cache", {}).get("enabled", True)
+    
+    @property
+    def validation_cache_memory_entries(self) -> int:
+        """Ёмкость уровня кэша результатов валидации в памяти."""
+        return self._config_data.get("validation_cache", {}).get("memory_entries", 256)
+    
+    @property
+    def validation_cache_disk_path(self) -> str:
+        """Файл дискового уровня кэша результатов валидации (пустая строка — без диска)."""
+        return self._config_data.get("validation_cache", {}).get("disk_path", ".validation_cache/results.sqlite")
+    
+    @property
+    def validation_cache_disk_max_entries(self) -> int:
+        """Максимум результатов валидации на диске."""
+        return self._config_data.get("validation_cache", {}).get("disk_max_entries", 5000)
+    
+    @property
+    def validation_cache_ttl(self) -> int:
+        """Время жизни результата валидации в кэше (секунды)."""
+        return self._config_data.get("validation_cache", {}).get("ttl", 604800)
+    
+    # === Ollama Health Settings ===
+    
+    @property
+    def ollama_health_background_probe(self) -> bool:
+        """Включена ли фоновая проба доступности Ollama."""
+        return self._config_data.get("ollama_health", {}).get("background_probe", True)
+    
+    @property
+    def ollama_health_probe_interval(self) -> float:
+        """Интервал фоновой пробы Ollama (секунды)."""
+        return float(self._config_data.get("ollama_health", {}).get("probe_interval", 15.0))
+    
+    @property
+    def ollama_health_probe_timeout(self) -> float:
+        """Таймаут пробы Ollama (секунды)."""
+        return float(self._config_data.get("ollama_health", {}).get("probe_timeout", 2.0))
+    
+    @property
+    def ollama_health_failure_threshold(self) -> int:
+        """Ошибок соединения подряд до перевода Ollama в недоступные."""
+        return self._config_data.get("ollama_health", {}).get("failure_threshold", 2)
+    
+    @property
+    def ollama_health_recovery_timeout(self) -> float:
+        """Пауза перед пробным запросом после сбоя Ollama (секунды)."""
+        return float(self._config_data.get("ollama_health", {}).get("recovery_timeout", 5.0))
+    
+    # === Embedding Cache Settings ===
+    
+    @property
+    def embedding_cache_enabled(self) -> bool:
+        """Включён ли персистентный кэш embeddings."""
+        return self._config_data.get("embedding_cache", {}).get("enabled", True)
+    
+    @property
+    def embedding_cache_directory(self) -> str:
+        """Директория для файлов кэша embeddings."""
+        return self._config_data.get("embedding_cache", {}).get("directory", ".embedding_cache")
+    
+    @property
+    def embedding_cache_max_entries(self) -> int:
+        """Максимальное количество векторов на модель в кэше embeddings."""
+        return self._config_data.get("embedding_cache", {}).get("max_entries", 100_000)
+    
     # === Interaction Settings ===
     
     @property
@@ -512,16 +676,97 @@ class Config:
         """Максимум сообщений в контексте до суммаризации."""
         return self._config_data.get("interaction", {}).get("max_context_messages", 20)
     
+    @property
+    def interaction_background_summarization(self) -> bool:
+        """Суммаризировать диалоги в фоновом потоке."""
+        return self._config_data.get("interaction", {}).get("background_summarization", True)
+    
     @property
     def interaction_persist_conversations(self) -> bool:
         """Сохранять историю диалогов на диск."""
         return self._config_data.get("interaction", {}).get("persist_conversations", True)
     
+    @property
+    def interaction_conversation_storage(self) -> str:
+        """Хранилище диалогов: sqlite или json."""
+        return self._config_data.get("interaction", {}).get("conversation_storage", "sqlite")
+    
     @property
     def llm_tokens_chat(self) -> int:
         """Максимум токенов для ответа в режиме chat."""
         return self._config_data.get("interaction", {}).get("tokens_chat", 2048)
     
+    @property
+    def interaction_context_window_tokens(self) -> int:
+        """Контекстное окно модели (num_ctx) для упаковки истории диалога."""
+        return self._config_data.get("interaction", {}).get("context_window_tokens", 8192)
+    
+    # === Tokenizer ===
+    
+    @property
+    def tokenizer_directory(self) -> str:
+        """Директория локальных tokenizer.json ({семейство}.json)."""
+        return self._config_data.get("tokenizer", {}).get("directory", ".tokenizers")
+    
+    @property
+    def tokenizer_allow_download(self) -> bool:
+        """Скачивать tokenizer.json с HuggingFace."""
+        return self._config_data.get("tokenizer", {}).get("allow_download", False)
+    
+    @property
+    def tokenizer_memo_entries(self) -> int:
+        """Ёмкость памяти счётчиков токенов по хэшу текста (на семейство)."""
+        return self._config_data.get("tokenizer", {}).get("memo_entries", 20000)
+    
+    @property
+    def tokenizer_repos(self) -> dict[str, str]:
+        """Семейство токенизатора → репозиторий HuggingFace."""
+        return dict(self._config_data.get("tokenizer", {}).get("repos", {}))
+    
+    # === Event Store ===
+    
+    @property
+    def event_store_backend(self) -> str:
+        """Бэкенд событий EventStore: memory или sqlite."""
+        return self._config_data.get("event_store", {}).get("backend", "memory")
+    
+    @property
+    def event_store_sqlite_path(self) -> str:
+        """Файл SQLite для бэкенда событий sqlite."""
+        return self._config_data.get("event_store", {}).get("sqlite_path", "output/event_store.sqlite")
+    
+    @property
+    def event_store_max_sessions(self) -> int:
+        """Максимум одновременных сессий в EventStore (LRU)."""
+        return self._config_data.get("event_store", {}).get("max_sessions", 1000)
+    
+    @property
+    def event_store_max_events_per_session(self) -> int:
+        """Ёмкость кольцевого буфера событий сессии."""
+        return self._config_data.get("event_store", {}).get("max_events_per_session", 5000)
+    
+    @property
+    def event_store_event_ttl_minutes(self) -> int:
+        """Время жизни событий EventStore (минуты)."""
+        return self._config_data.get("event_store", {}).get("event_ttl_minutes", 60)
+    
+    @property
+    def event_store_heartbeat_interval(self) -> float:
+        """Интервал heartbeat SSE без событий (секунды)."""
+        return float(self._config_data.get("event_store", {}).get("heartbeat_interval", 15.0))
+    
+    # === Streaming ===
+    
+    @property
+    def sse_json_backend(self) -> str:
+        """JSON бэкенд кодирования SSE событий: json или orjson."""
+        return self._config_data.get("streaming", {}).get("sse_json_backend", "json")
+    
+    @property
+    def sse_coalesce_window_ms(self) -> float:
+        """Окно склейки подряд идущих чанков в один SSE кадр (мс, 0 — без ожидания)."""
+        return float(self._config_data.get("streaming", {}).get("sse_coalesce_window_ms", 20))
+    
     # === Hardware Limits ===
     
     @property
@@ -566,6 +811,73 @@ class Config:
         """Расширения файлов по умолчанию для индексации."""
         return self._config_data.get("context_engine", {}).get("default_extensions", [".py"])
     
+    @property
+    def context_engine_max_index_memory_mb(self) -> float:
+        """Лимит индексов проектов в памяти (МБ, 0 — без лимита)."""
+        return float(self._config_data.get("context_engine", {}).get("max_index_memory_mb", 256))
+    
+    @property
+    def context_engine_warmup_workers(self) -> int:
+        """Потоков фонового прогрева индексов проектов."""
+        return int(self._config_data.get("context_engine", {}).get("warmup_workers", 1))
+    
+    @property
+    def context_engine_watch_files(self) -> bool:
+        """Наблюдать за файлами прогретых проектов и обновлять индексы по изменениям."""
+        return self._config_data.get("context_engine", {}).get("watch_files", False)
+    
+    @property
+    def context_engine_watch_backend(self) -> str:
+        """Бэкенд наблюдателя файлов: auto, watchfiles или polling."""
+        return self._config_data.get("context_engine", {}).get("watch_backend", "auto")
+    
+    @property
+    def context_engine_watch_debounce_ms(self) -> float:
+        """Пачка изменений применяется после стольких мс без новых изменений."""
+        return float(self._config_data.get("context_engine", {}).get("watch_debounce_ms", 300))
+    
+    @property
+    def context_engine_watch_max_delay_ms(self) -> float:
+        """Максимальная задержка применения пачки изменений (мс)."""
+        return float(self._config_data.get("context_engine", {}).get("watch_max_delay_ms", 2000))
+    
+    @property
+    def context_engine_watch_poll_interval(self) -> float:
+        """Период опроса файлов для бэкенда polling (секунды)."""
+        return float(self._config_data.get("context_engine", {}).get("watch_poll_interval", 5.0))
+    
+    @property
+    def context_engine_max_watched_projects(self) -> int:
+        """Наблюдаемых проектов одновременно."""
+        return int(self._config_data.get("context_engine", {}).get("max_watched_projects", 8))
+    
+    # === Project Scanner Settings ===
+    
+    @property
+    def project_scanner_respect_gitignore(self) -> bool:
+        """Не обходить файлы, исключённые .gitignore."""
+        return self._config_data.get("project_scanner", {}).get("respect_gitignore", True)
+    
+    @property
+    def project_scanner_prefetch_ast(self) -> bool:
+        """ContextEngine заодно разбирает AST для других потребителей сканера."""
+        return self._config_data.get("project_scanner", {}).get("prefetch_ast", True)
+    
+    @property
+    def project_scanner_parse_workers(self) -> int:
+        """Процессов для разбора AST (0 — по числу ядер)."""
+        return int(self._config_data.get("project_scanner", {}).get("parse_workers", 0))
+    
+    @property
+    def project_scanner_parallel_parse_min_files(self) -> int:
+        """С какого числа файлов разбор уходит в пул процессов."""
+        return int(self._config_data.get("project_scanner", {}).get("parallel_parse_min_files", 64))
+    
+    @property
+    def project_scanner_cache_entries(self) -> int:
+        """Файлов в кэше разбора сканера."""
+        return int(self._config_data.get("project_scanner", {}).get("cache_entries", 50000))
+    
     # === Debug / Logging Settings ===
     
     @property
@@ -741,6 +1053,21 @@ class Config:
         """Максимальный возраст checkpoint в часах."""
         return self._config_data.get("persistence", {}).get("max_checkpoint_age_hours", 24)
     
+    @property
+    def persistence_background_writes(self) -> bool:
+        """Писать checkpoint на диск в отдельном потоке."""
+        return self._config_data.get("persistence", {}).get("background_writes", True)
+    
+    @property
+    def persistence_compact_every(self) -> int:
+        """Записей журнала checkpoint до сворачивания в снимок."""
+        return self._config_data.get("persistence", {}).get("compact_every", 16)
+    
+    @property
+    def persistence_fsync_interval(self) -> float:
+        """Интервал пакетного fsync журналов checkpoint (секунды)."""
+        return self._config_data.get("persistence", {}).get("fsync_interval", 1.0)
+    
     @property
     def persistence_auto_pause_on_disconnect(self) -> bool:
         """Автоматически помечать задачи как paused при потере соединения."""
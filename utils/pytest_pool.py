@@ -0,0 +1,336 @@
+"""Пул прогретых процессов pytest для валидации кода.
+
+Запуск нового процесса pytest на каждую валидацию стоит ~1с (старт
+интерпретатора, импорт pytest и плагинов), а цикл debugger → fixer →
+validator повторяет валидацию до max_iterations раз на задачу. Пул держит
+процессы utils/pytest_worker.py, в которых pytest уже импортирован;
+каждое задание выполняется в fork такого процесса в своей временной
+директории, с тем же таймаутом и той же изоляцией, что и отдельный запуск.
+
+- Воркеры создаются лениво (и прогреваются в фоне при создании пула)
+- После max_jobs_per_worker заданий воркер заменяется новым
+- Упавший или зависший воркер убивается и заменяется
+- Пул работает только на POSIX (нужен fork); иначе get_pytest_pool()
+  возвращает None и run_pytest запускает pytest как раньше
+
+Использование:
+    pool = get_pytest_pool()
+    if pool is not None:
+        result = pool.run(workdir, ["test_code.py", "-v"], timeout=30)
+"""
+import atexit
+import json
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from utils.config import get_config
+from utils.logger import get_logger
+
+logger = get_logger()
+
+_WORKER_SCRIPT = Path(__file__).with_name("pytest_worker.py")
+
+# Время на старт и прогрев воркера (секунды)
+_STARTUP_TIMEOUT = 60.0
+
+# Запас сверх таймаута задания: воркер сам убивает задание по таймауту,
+# а этот запас нужен, если завис сам воркер
+_RESPONSE_GRACE = 10.0
+
+
+class PytestWorkerError(Exception):
+    """Воркер pytest не запустился или перестал отвечать."""
+    pass
+
+
+@dataclass
+class PytestJobResult:
+    """Результат запуска pytest в воркере."""
+    returncode: int
+    output: str
+    timed_out: bool = False
+
+
+class PytestWorker:
+    """Один прогретый процесс pytest."""
+
+    def __init__(self) -> None:
+        """Запускает процесс воркера (без ожидания прогрева, см. wait_ready())."""
+        self.jobs_done = 0
+        self._buffer = b""
+        self.process = subprocess.Popen(
+            [sys.executable, str(_WORKER_SCRIPT)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=os.environ.copy()
+        )
+
+    def _read_message(self, deadline: float) -> dict:
+        """Читает одну JSON строку ответа до дедлайна."""
+        assert self.process.stdout is not None
+        fd = self.process.stdout.fileno()
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PytestWorkerError("воркер pytest не ответил вовремя")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise PytestWorkerError("воркер pytest завершился")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def wait_ready(self, timeout: float = _STARTUP_TIMEOUT) -> None:
+        """Ждёт окончания прогрева.
+
+        Raises:
+            PytestWorkerError: Если воркер не запустился (например, нет pytest)
+        """
+        message = self._read_message(time.monotonic() + timeout)
+        if not message.get("ready"):
+            raise PytestWorkerError(message.get("error", "воркер pytest не запустился"))
+
+    def run(self, workdir: str, args: List[str], timeout: float) -> PytestJobResult:
+        """Выполняет pytest в директории задания.
+
+        Args:
+            workdir: Директория с файлами задания (станет cwd и первым в sys.path)
+            args: Аргументы pytest
+            timeout: Таймаут задания (секунды)
+
+        Returns:
+            PytestJobResult
+
+        Raises:
+            PytestWorkerError: Если воркер не ответил
+        """
+        assert self.process.stdin is not None
+        job = json.dumps({"workdir": workdir, "args": args, "timeout": timeout}) + "\n"
+        try:
+            self.process.stdin.write(job.encode("utf-8"))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise PytestWorkerError(f"воркер pytest недоступен: {e}") from e
+        message = self._read_message(time.monotonic() + timeout + _RESPONSE_GRACE)
+        self.jobs_done += 1
+        if message.get("error"):
+            raise PytestWorkerError(message.get("output", "ошибка воркера pytest"))
+        return PytestJobResult(
+            returncode=int(message["returncode"]),
+            output=message.get("output", ""),
+            timed_out=bool(message.get("timed_out"))
+        )
+
+    def is_alive(self) -> bool:
+        """Жив ли процесс воркера."""
+        return self.process.poll() is None
+
+    def close(self) -> None:
+        """Завершает процесс воркера."""
+        if self.process.poll() is None:
+            self.process.kill()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        for stream in (self.process.stdin, self.process.stdout):
+            if stream is not None:
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+
+
+class PytestWorkerPool:
+    """Потокобезопасный пул прогретых воркеров pytest."""
+
+    def __init__(self, size: int = 2, max_jobs_per_worker: int = 50) -> None:
+        """Инициализация пула (воркеры не запускаются, см. warm_up()).
+
+        Args:
+            size: Максимум воркеров (одновременных запусков pytest)
+            max_jobs_per_worker: Заданий до замены воркера новым
+        """
+        self.size = max(1, size)
+        self.max_jobs_per_worker = max(1, max_jobs_per_worker)
+        self._idle: List[PytestWorker] = []
+        self._total = 0
+        self._closed = False
+        # Ошибка старта воркера (нет pytest в интерпретаторе и т.п.) отключает пул
+        self.startup_error: Optional[str] = None
+        self._condition = threading.Condition()
+
+        self.jobs = 0
+        self.workers_started = 0
+        self.workers_recycled = 0
+        self.worker_failures = 0
+
+    def _spawn(self) -> PytestWorker:
+        """Запускает и прогревает воркер. Слот (_total) должен быть уже занят."""
+        worker = PytestWorker()
+        try:
+            worker.wait_ready()
+        except Exception as e:
+            worker.close()
+            with self._condition:
+                self._total -= 1
+                self.worker_failures += 1
+                self.startup_error = str(e)
+                self._condition.notify_all()
+            raise
+        with self._condition:
+            self.workers_started += 1
+        return worker
+
+    def _spawn_idle(self) -> None:
+        """Запускает воркер в свободный слот и кладёт его в очередь (для фона)."""
+        try:
+            worker = self._spawn()
+        except Exception as e:
+            logger.debug(f"⚠️ Не удалось прогреть воркер pytest: {e}")
+            return
+        with self._condition:
+            if self._closed:
+                self._total -= 1
+                worker.close()
+                return
+            self._idle.append(worker)
+            self._condition.notify()
+
+    def warm_up(self) -> None:
+        """Запускает недостающие воркеры в фоне."""
+        with self._condition:
+            missing = self.size - self._total
+            self._total += missing
+        for _ in range(missing):
+            threading.Thread(target=self._spawn_idle, name="pytest-warmup", daemon=True).start()
+
+    def _acquire(self) -> PytestWorker:
+        """Берёт свободный воркер, запускает новый или ждёт освобождения."""
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PytestWorkerError("пул pytest закрыт")
+                if self.startup_error is not None:
+                    raise PytestWorkerError(f"воркеры pytest не запускаются: {self.startup_error}")
+                if self._idle:
+                    return self._idle.pop()
+                if self._total < self.size:
+                    self._total += 1
+                    break
+                self._condition.wait()
+        return self._spawn()
+
+    def _release(self, worker: PytestWorker, healthy: bool) -> None:
+        """Возвращает воркер в пул или заменяет его."""
+        recycle = not healthy or worker.jobs_done >= self.max_jobs_per_worker or not worker.is_alive()
+        with self._condition:
+            if not recycle and not self._closed:
+                self._idle.append(worker)
+                self._condition.notify()
+                return
+            self._total -= 1
+            if healthy:
+                self.workers_recycled += 1
+            else:
+                self.worker_failures += 1
+            replace = not self._closed
+            if replace:
+                self._total += 1
+            self._condition.notify()
+        worker.close()
+        if replace:
+            # Замена прогревается в фоне, чтобы следующее задание не ждало старта
+            threading.Thread(target=self._spawn_idle, name="pytest-recycle", daemon=True).start()
+
+    def run(self, workdir: str, args: List[str], timeout: float = 30) -> PytestJobResult:
+        """Выполняет pytest в прогретом воркере.
+
+        Args:
+            workdir: Директория задания
+            args: Аргументы pytest
+            timeout: Таймаут задания (секунды)
+
+        Returns:
+            PytestJobResult
+
+        Raises:
+            PytestWorkerError: Если воркер не запустился или упал
+        """
+        worker = self._acquire()
+        try:
+            result = worker.run(workdir, args, timeout)
+        except Exception:
+            self._release(worker, healthy=False)
+            raise
+        self._release(worker, healthy=True)
+        with self._condition:
+            self.jobs += 1
+        return result
+
+    def get_stats(self) -> dict:
+        """Метрики пула."""
+        with self._condition:
+            return {
+                "size": self.size,
+                "workers": self._total,
+                "idle": len(self._idle),
+                "jobs": self.jobs,
+                "workers_started": self.workers_started,
+                "workers_recycled": self.workers_recycled,
+                "worker_failures": self.worker_failures,
+            }
+
+    def close(self) -> None:
+        """Завершает все свободные воркеры; занятые завершатся при возврате."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._condition.notify_all()
+        for worker in idle:
+            worker.close()
+
+
+# === Singleton ===
+
+_pool: Optional[PytestWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pytest_pool() -> Optional[PytestWorkerPool]:
+    """Возвращает глобальный пул воркеров pytest.
+
+    При первом вызове воркеры начинают прогреваться в фоне.
+
+    Returns:
+        PytestWorkerPool или None, если пул отключён или платформа без fork
+    """
+    global _pool
+
+    config = get_config()
+    if not config.pytest_pool_enabled or not hasattr(os, "fork"):
+        return None
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = PytestWorkerPool(
+                    size=config.pytest_pool_size,
+                    max_jobs_per_worker=config.pytest_pool_max_jobs_per_worker
+                )
+                pool.warm_up()
+                atexit.register(pool.close)
+                _pool = pool
+    return _pool
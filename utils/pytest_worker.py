@@ -0,0 +1,160 @@
+"""Прогретый процесс для запуска pytest (используется PytestWorkerPool).
+
+Запускается как отдельный скрипт и не импортирует модули проекта: только
+stdlib и pytest. При старте импортирует pytest и делает пробный прогон,
+чтобы плагины и модули assertion rewriting уже были загружены.
+
+Каждое задание выполняется в дочернем процессе (fork) — он получает
+прогретые модули, но собственное состояние: sys.modules, рабочую
+директорию, окружение. Поэтому задания не видят друг друга, как и при
+запуске нового процесса pytest. Таймаут убивает всю группу процессов
+задания.
+
+Протокол — JSON строки через stdin/stdout:
+    -> {"ready": true, "pytest": "8.0.0"}
+    <- {"workdir": "/tmp/...", "args": ["test_code.py", "-v"], "timeout": 30}
+    -> {"returncode": 1, "output": "...", "timed_out": false}
+"""
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+# Модули заданий, которые не должны браться из кэша (code есть и в stdlib)
+_JOB_MODULES = ("code", "test_code")
+
+# Интервал опроса завершения задания (секунды)
+_POLL_INTERVAL = 0.002
+
+
+def _warm_up() -> str:
+    """Импортирует pytest и прогоняет тривиальный тест."""
+    import pytest
+
+    with tempfile.TemporaryDirectory(prefix="pytest_warmup_") as tmpdir:
+        test_file = os.path.join(tmpdir, "test_warmup.py")
+        with open(test_file, "w", encoding="utf-8") as f:
+            f.write("def test_warmup():\n    assert 1 + 1 == 2\n")
+        pytest.main([test_file, "-q", "-p", "no:cacheprovider"])
+    return pytest.__version__
+
+
+def _run_child(workdir: str, args: list, log_path: str, protocol_fds: tuple) -> None:
+    """Тело дочернего процесса задания (не возвращается)."""
+    try:
+        os.setpgid(0, 0)
+        for fd in protocol_fds:
+            os.close(fd)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        log_fd = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.dup2(log_fd, 1)
+        os.dup2(log_fd, 2)
+
+        os.chdir(workdir)
+        sys.path.insert(0, workdir)
+        os.environ["PYTHONPATH"] = workdir + os.pathsep + os.environ.get("PYTHONPATH", "")
+        for name in _JOB_MODULES:
+            sys.modules.pop(name, None)
+
+        import pytest
+        code = pytest.main(args)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(int(code))
+    except BaseException:
+        traceback.print_exc()
+        sys.stderr.flush()
+        os._exit(3)
+
+
+def _run_job(job: dict, protocol_fds: tuple) -> dict:
+    """Выполняет задание в дочернем процессе с таймаутом."""
+    workdir = job["workdir"]
+    log_path = os.path.join(os.path.dirname(workdir), "pytest_output.log")
+    timeout = float(job.get("timeout", 30))
+
+    # Иначе буфер родителя попадёт в вывод задания
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        _run_child(workdir, job["args"], log_path, protocol_fds)
+
+    deadline = time.monotonic() + timeout
+    status = None
+    while status is None:
+        finished, status_code = os.waitpid(pid, os.WNOHANG)
+        if finished:
+            status = status_code
+            break
+        if time.monotonic() >= deadline:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            os.waitpid(pid, 0)
+            return {"returncode": -1, "output": _read_log(log_path), "timed_out": True}
+        time.sleep(_POLL_INTERVAL)
+
+    # Процессы, оставленные тестами в группе задания, не переживают его
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    return {"returncode": os.waitstatus_to_exitcode(status), "output": _read_log(log_path), "timed_out": False}
+
+
+def _read_log(log_path: str) -> str:
+    """Читает вывод задания."""
+    try:
+        with open(log_path, "rb") as f:
+            return f.read().decode("utf-8", errors="replace")
+    except OSError:
+        return ""
+
+
+def main() -> None:
+    """Цикл обработки заданий."""
+    # Каталог скрипта (utils/) не должен перекрывать модули заданий
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or ".") != script_dir]
+
+    # Протокол идёт через копии stdin/stdout, а сами 0/1 отданы в /dev/null,
+    # чтобы вывод прогрева и плагинов не ломал JSON строки
+    protocol_in = os.dup(0)
+    protocol_out = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    reader = os.fdopen(protocol_in, "r", encoding="utf-8")
+    writer = os.fdopen(protocol_out, "w", encoding="utf-8")
+
+    def send(message: dict) -> None:
+        writer.write(json.dumps(message) + "\n")
+        writer.flush()
+
+    try:
+        version = _warm_up()
+    except Exception as e:
+        send({"ready": False, "error": f"{type(e).__name__}: {e}"})
+        return
+    send({"ready": True, "pytest": version})
+
+    protocol_fds = (protocol_in, protocol_out)
+    for line in reader:
+        if not line.strip():
+            continue
+        try:
+            result = _run_job(json.loads(line), protocol_fds)
+        except Exception as e:
+            result = {"returncode": -1, "output": f"Ошибка воркера pytest: {e}", "timed_out": False, "error": True}
+        send(result)
+
+
+if __name__ == "__main__":
+    main()
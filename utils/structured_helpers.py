@@ -99,7 +99,8 @@ def generate_with_fallback(
     fallback_fn: Callable[[], T],
     agent_name: str,
     num_predict: int = 1024,
-    retries: int = 2
+    retries: int = 2,
+    cache: Optional[bool] = None
 ) -> T:
     """Генерирует structured output с fallback на legacy парсинг.
     
@@ -116,6 +117,7 @@ def generate_with_fallback(
         agent_name: Название агента для feature flag
         num_predict: Максимум токенов
         retries: Количество повторов при ошибке
+        cache: Кэш ответов LLM (см. LocalLLM.generate)
         
     Returns:
         Pydantic модель или результат fallback
@@ -142,7 +144,8 @@ def generate_with_fallback(
             prompt=prompt,
             response_model=response_model,
             num_predict=num_predict,
-            retries=retries
+            retries=retries,
+            cache=cache
         )
         logger.info(f"✅ Structured output успешен для {agent_name}")
         return result
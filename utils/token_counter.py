@@ -40,11 +40,13 @@
     - infrastructure.workflow_state: может использовать для мониторинга
 
 Примечания:
-    - Использует эвристику: 1 токен ≈ 4 символа или 1.5 токена на слово
-    - Для более точного подсчёта используйте библиотеки типа tiktoken
+    - estimate_tokens — эвристика: 1 токен ≈ 4 символа или 1.5 токена на слово
+    - Точный подсчёт токенизатором модели — utils.tokenizer (эвристика
+      остаётся fallback без токенизатора); estimate_workflow_tokens с model
+      считает через него
     - Учитывает накладные расходы на генерацию (output обычно больше промпта)
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 
 def estimate_tokens(text: str) -> int:
@@ -79,7 +81,8 @@ def estimate_workflow_tokens(
     context: str,
     tests: str,
     code: str,
-    prompts_used: List[str]
+    prompts_used: List[str],
+    model: Optional[str] = None
 ) -> int:
     """Оценивает общее количество токенов использованных в workflow.
     
@@ -90,25 +93,23 @@ def estimate_workflow_tokens(
         tests: Сгенерированные тесты
         code: Сгенерированный код
         prompts_used: Список промптов которые были использованы
+        model: Модель, токенизатором которой считать (None — эвристика)
         
     Returns:
         Общая оценка токенов
     """
-    total = 0
+    # Импорт здесь: utils.tokenizer сам использует estimate_tokens как fallback
+    from utils.tokenizer import get_tokenizer
     
-    total += estimate_tokens(task)
-    total += estimate_tokens(plan)
-    total += estimate_tokens(context)
-    total += estimate_tokens(tests)
-    total += estimate_tokens(code)
-    
-    for prompt in prompts_used:
-        total += estimate_tokens(prompt)
+    task_tokens, plan_tokens, context_tokens, tests_tokens, code_tokens, *prompt_tokens = (
+        get_tokenizer(model).count_batch([task, plan, context, tests, code, *prompts_used])
+    )
+    total = task_tokens + plan_tokens + context_tokens + tests_tokens + code_tokens + sum(prompt_tokens)
     
     # Добавляем накладные расходы на генерацию (output обычно в 1-2 раза больше промпта)
     # Для кода и тестов добавляем множитель
-    total += int(estimate_tokens(code) * 0.5)  # Генерация кода
-    total += int(estimate_tokens(tests) * 0.5)  # Генерация тестов
+    total += int(code_tokens * 0.5)  # Генерация кода
+    total += int(tests_tokens * 0.5)  # Генерация тестов
     
     return int(total)
 
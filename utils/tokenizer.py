@@ -0,0 +1,325 @@
+"""Подсчёт токенов токенизатором семейства модели.
+
+Модели Ollama (qwen2.5-coder:7b, llama3.1:8b, gemma2:9b, ...) сводятся к
+семейству токенизатора, для семейства лениво загружается tokenizer.json
+через библиотеку tokenizers:
+1. файл {directory}/{family}.json ([tokenizer] directory)
+2. кэш HuggingFace ([tokenizer.repos], без сети)
+3. загрузка с HuggingFace, если разрешена ([tokenizer] allow_download)
+
+Если библиотеки или файла нет (офлайн, неизвестная модель), используется
+эвристика utils.token_counter.estimate_tokens.
+
+Один и тот же текст (чанки кода, сообщения, промпты) считается многократно,
+поэтому результаты настоящего токенизатора запоминаются по хэшу
+содержимого (LRU, [tokenizer] memo_entries), а count_batch считает промахи
+одним вызовом encode_batch (параллельно внутри tokenizers).
+
+Использование:
+    from utils.tokenizer import get_tokenizer, take_recent_within_budget
+
+    tokenizer = get_tokenizer("qwen2.5-coder:7b")
+    tokens = tokenizer.count(text)
+    counts = tokenizer.count_batch(chunks)
+    recent = take_recent_within_budget(messages, 2048, lambda m: tokenizer.count(m["content"]))
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from utils.config import get_config
+from utils.logger import get_logger
+from utils.token_counter import estimate_tokens
+
+logger = get_logger()
+
+T = TypeVar("T")
+
+# Служебные токены шаблона чата на одно сообщение (роль, разделители)
+MESSAGE_TOKEN_OVERHEAD = 4
+
+# Префикс имени модели → семейство токенизатора (первое совпадение)
+_FAMILY_PREFIXES = (
+    ("qwen", "qwen"),
+    ("deepseek-r1", "qwen"),
+    ("deepseek-coder", "deepseek-coder"),
+    ("codellama", "llama2"),
+    ("tinyllama", "llama2"),
+    ("llama2", "llama2"),
+    ("llama", "llama3"),
+    ("gemma", "gemma"),
+    ("phi", "phi3"),
+    ("mistral", "mistral"),
+    ("mixtral", "mistral"),
+    ("codestral", "mistral"),
+)
+
+
+def model_family(model: Optional[str]) -> str:
+    """Семейство токенизатора для имени модели Ollama.
+
+    Args:
+        model: Имя модели (например "qwen2.5-coder:7b"), None — неизвестна
+
+    Returns:
+        Имя семейства или "default"
+    """
+    if not model:
+        return "default"
+    name = model.lower().rsplit("/", 1)[-1]
+    for prefix, family in _FAMILY_PREFIXES:
+        if name.startswith(prefix):
+            return family
+    return "default"
+
+
+class Tokenizer:
+    """Счётчик токенов одного семейства моделей (потокобезопасен)."""
+
+    def __init__(self, family: str, backend: Optional[Any] = None, memo_entries: int = 20000) -> None:
+        """Инициализация.
+
+        Args:
+            family: Семейство токенизатора
+            backend: tokenizers.Tokenizer (None — эвристика estimate_tokens)
+            memo_entries: Ёмкость LRU счётчиков по хэшу текста (0 — без памяти)
+        """
+        self.family = family
+        self._backend = backend
+        self._memo_entries = memo_entries
+        self._memo: "OrderedDict[bytes, int]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+    @property
+    def exact(self) -> bool:
+        """Считает ли настоящий токенизатор (а не эвристика)."""
+        return self._backend is not None
+
+    @property
+    def name(self) -> str:
+        """Ключ для кэшей счётчиков: семейство и способ подсчёта."""
+        return f"{self.family}:{'exact' if self.exact else 'estimate'}"
+
+    @staticmethod
+    def _digest(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def _memo_get(self, key: bytes) -> Optional[int]:
+        with self._memo_lock:
+            count = self._memo.get(key)
+            if count is None:
+                self.memo_misses += 1
+                return None
+            self._memo.move_to_end(key)
+            self.memo_hits += 1
+            return count
+
+    def _memo_put(self, key: bytes, count: int) -> None:
+        with self._memo_lock:
+            self._memo[key] = count
+            if len(self._memo) > self._memo_entries:
+                self._memo.popitem(last=False)
+
+    def count(self, text: str) -> int:
+        """Количество токенов в тексте (без служебных токенов)."""
+        if not text:
+            return 0
+        # Эвристика дешевле хэша, запоминаются только результаты токенизатора
+        if self._backend is None:
+            return estimate_tokens(text)
+        if not self._memo_entries:
+            return len(self._backend.encode(text, add_special_tokens=False).ids)
+
+        key = self._digest(text)
+        count = self._memo_get(key)
+        if count is None:
+            count = len(self._backend.encode(text, add_special_tokens=False).ids)
+            self._memo_put(key, count)
+        return count
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        """Количество токенов для каждого текста.
+
+        Тексты, которых нет в памяти, токенизируются одним encode_batch.
+
+        Args:
+            texts: Тексты
+
+        Returns:
+            Счётчики в порядке texts
+        """
+        if self._backend is None:
+            return [estimate_tokens(text) if text else 0 for text in texts]
+
+        counts: List[int] = [0] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        keys: Dict[str, bytes] = {}
+        for index, text in enumerate(texts):
+            if not text:
+                continue
+            if self._memo_entries:
+                key = keys.get(text) or self._digest(text)
+                keys[text] = key
+                cached = self._memo_get(key)
+                if cached is not None:
+                    counts[index] = cached
+                    continue
+            missing.setdefault(text, []).append(index)
+
+        if missing:
+            unique = list(missing)
+            encodings = self._backend.encode_batch(unique, add_special_tokens=False)
+            for text, encoding in zip(unique, encodings):
+                count = len(encoding.ids)
+                for index in missing[text]:
+                    counts[index] = count
+                if self._memo_entries:
+                    self._memo_put(keys[text], count)
+        return counts
+
+    def prefix_chars(self, text: str, max_tokens: int) -> int:
+        """Длина префикса text (в символах), укладывающегося в max_tokens.
+
+        Args:
+            text: Текст
+            max_tokens: Лимит токенов
+
+        Returns:
+            Количество символов (len(text), если текст укладывается целиком)
+        """
+        if max_tokens <= 0 or not text:
+            return 0
+        if self._backend is None:
+            total = estimate_tokens(text)
+            if total <= max_tokens:
+                return len(text)
+            # Средняя длина токена этого текста по той же эвристике
+            return int(len(text) * max_tokens / total)
+        offsets = self._backend.encode(text, add_special_tokens=False).offsets
+        if len(offsets) <= max_tokens:
+            return len(text)
+        return int(offsets[max_tokens - 1][1])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики памяти счётчиков."""
+        with self._memo_lock:
+            total = self.memo_hits + self.memo_misses
+            return {
+                "tokenizer": self.name,
+                "memo_size": len(self._memo),
+                "memo_hits": self.memo_hits,
+                "memo_misses": self.memo_misses,
+                "memo_hit_rate": self.memo_hits / total if total else 0.0
+            }
+
+
+def _load_backend(family: str) -> Optional[Any]:
+    """Загружает tokenizer.json семейства (None если недоступен)."""
+    try:
+        from tokenizers import Tokenizer as HFTokenizer
+    except ImportError:
+        logger.debug("ℹ️ Библиотека tokenizers не установлена, подсчёт токенов эвристикой")
+        return None
+
+    config = get_config()
+    local_path = Path(config.tokenizer_directory) / f"{family}.json"
+    repo = config.tokenizer_repos.get(family)
+    path: Optional[str] = str(local_path) if local_path.exists() else None
+
+    if path is None and repo:
+        try:
+            from huggingface_hub import hf_hub_download, try_to_load_from_cache
+
+            cached = try_to_load_from_cache(repo, "tokenizer.json")
+            if isinstance(cached, str):
+                path = cached
+            elif config.tokenizer_allow_download:
+                path = hf_hub_download(repo, "tokenizer.json")
+        except Exception as e:
+            logger.debug(f"⚠️ Токенизатор {repo} недоступен: {e}")
+
+    if path is None:
+        return None
+    try:
+        backend = HFTokenizer.from_file(path)
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось загрузить токенизатор {path}: {e}")
+        return None
+    logger.info(f"🔤 Токенизатор {family} загружен из {path}")
+    return backend
+
+
+_tokenizers: Dict[str, Tokenizer] = {}
+_tokenizers_lock = threading.Lock()
+
+
+def get_tokenizer(model: Optional[str] = None) -> Tokenizer:
+    """Возвращает токенизатор для модели (загружается один раз на семейство).
+
+    Args:
+        model: Имя модели Ollama (None — эвристика)
+
+    Returns:
+        Tokenizer
+    """
+    family = model_family(model)
+    tokenizer = _tokenizers.get(family)
+    if tokenizer is None:
+        with _tokenizers_lock:
+            tokenizer = _tokenizers.get(family)
+            if tokenizer is None:
+                backend = _load_backend(family) if family != "default" else None
+                tokenizer = Tokenizer(family, backend, memo_entries=get_config().tokenizer_memo_entries)
+                _tokenizers[family] = tokenizer
+    return tokenizer
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Количество токенов в тексте для модели (эвристика, если токенизатора нет).
+
+    Args:
+        text: Текст
+        model: Имя модели Ollama (None — эвристика)
+
+    Returns:
+        Количество токенов
+    """
+    return get_tokenizer(model).count(text)
+
+
+def reset_tokenizers() -> None:
+    """Сбрасывает загруженные токенизаторы (для тестов)."""
+    with _tokenizers_lock:
+        _tokenizers.clear()
+
+
+def take_recent_within_budget(
+    items: Sequence[T],
+    budget: int,
+    cost: Callable[[T], int]
+) -> List[T]:
+    """Самые новые элементы, суммарная стоимость которых укладывается в бюджет.
+
+    Элементы берутся с конца без пропусков: первый не поместившийся
+    отсекает все более старые.
+
+    Args:
+        items: Элементы от старых к новым
+        budget: Бюджет (токенов)
+        cost: Стоимость элемента
+
+    Returns:
+        Хвост items в исходном порядке
+    """
+    total = 0
+    start = len(items)
+    for index in range(len(items) - 1, -1, -1):
+        total += cost(items[index])
+        if total > budget:
+            break
+        start = index
+    return list(items[start:])
@@ -52,20 +52,33 @@
 Примечания:
     - Все проверки выполняются в безопасном окружении (временные файлы)
     - Таймауты защищают от зависания внешних инструментов
+    - pytest запускается в пуле прогретых процессов (utils.pytest_pool),
+      при недоступности пула — отдельным процессом
     - Результаты валидации сохраняются для анализа
     - Поддерживает pytest, mypy, bandit
+    - validate_code запускает проверки параллельно над одним workspace
+      и кэширует результаты по отпечатку кода (infrastructure.validation_cache)
 """
 import subprocess
 import tempfile
 import os
 import ast
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, Optional, List
 from pathlib import Path
+from utils.config import get_config
 from utils.logger import get_logger
+from utils.pytest_pool import PytestWorkerError, get_pytest_pool
+from infrastructure.validation_cache import get_validation_cache, validation_fingerprint
 
 
 logger = get_logger()
 
+# Как часто проверять отмену проверки, пока работает внешний инструмент (секунды)
+_CANCEL_POLL_INTERVAL = 0.05
+
 
 def check_syntax(code_str: str) -> Tuple[bool, str]:
     """Быстрая проверка синтаксиса Python через ast.parse.
@@ -119,6 +132,121 @@ def check_syntax_both(code_str: str, test_str: str) -> Tuple[bool, List[str]]:
     return len(errors) == 0, errors
 
 
+def _write_workspace(root: Path, code_str: str, test_str: Optional[str]) -> Path:
+    """Материализует файлы валидации в root/work.
+    
+    Один workspace используется всеми проверками (pytest, mypy, bandit).
+    Файлы лежат в подкаталоге: рядом воркер пула pytest пишет свой вывод.
+    
+    Args:
+        root: Временная директория валидации
+        code_str: Код
+        test_str: Тесты (None — без test_code.py)
+        
+    Returns:
+        Путь к директории с файлами
+    """
+    workdir = root / "work"
+    workdir.mkdir()
+    (workdir / "code.py").write_text(code_str, encoding="utf-8")
+    
+    if test_str is not None:
+        # Добавляем import code в начало тестов если его нет
+        # Это позволяет тестам использовать функции из code.py
+        (workdir / "test_code.py").write_text(_ensure_code_import(test_str), encoding="utf-8")
+        # Создаём __init__.py для правильного импорта
+        (workdir / "__init__.py").write_text("", encoding="utf-8")
+    return workdir
+
+
+def _run_tool(
+    cmd: List[str],
+    cwd: Path,
+    timeout: float,
+    cancel: Optional[threading.Event] = None,
+    env: Optional[dict] = None
+) -> Optional[subprocess.CompletedProcess]:
+    """Запускает внешний инструмент с таймаутом и возможностью отмены.
+    
+    Args:
+        cmd: Команда
+        cwd: Рабочая директория
+        timeout: Таймаут (секунды)
+        cancel: Событие отмены (процесс убивается, результат None)
+        env: Окружение процесса
+        
+    Returns:
+        CompletedProcess или None, если проверка отменена
+        
+    Raises:
+        subprocess.TimeoutExpired: Превышен таймаут
+        FileNotFoundError: Инструмент не установлен
+    """
+    process = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env
+    )
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            stdout, stderr = process.communicate(timeout=_CANCEL_POLL_INTERVAL)
+            return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+        except subprocess.TimeoutExpired:
+            if cancel is not None and cancel.is_set():
+                process.kill()
+                process.communicate()
+                return None
+            if time.monotonic() >= deadline:
+                process.kill()
+                process.communicate()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+
+
+def _pytest_in_workspace(workdir: Path) -> Tuple[bool, str]:
+    """Запускает pytest для test_code.py в готовом workspace.
+    
+    Args:
+        workdir: Директория с code.py и test_code.py
+        
+    Returns:
+        Кортеж (успех: bool, вывод: str)
+    """
+    timeout = get_config().pytest_timeout
+    pytest_args = [str(workdir / "test_code.py"), "-v", "--tb=short", "-x"]
+    
+    try:
+        # Прогретый воркер (без старта интерпретатора и импорта pytest)
+        pool = get_pytest_pool()
+        if pool is not None:
+            try:
+                job = pool.run(str(workdir), pytest_args, timeout=timeout)
+            except PytestWorkerError as e:
+                logger.debug(f"⚠️ Пул pytest недоступен, запускаю отдельный процесс: {e}")
+            else:
+                if job.timed_out:
+                    return False, f"Таймаут выполнения тестов (>{timeout} сек)"
+                return _report_pytest_result(job.returncode == 0, job.output)
+        
+        # Запускаем pytest с добавлением workdir в PYTHONPATH
+        env = os.environ.copy()
+        env["PYTHONPATH"] = str(workdir) + os.pathsep + env.get("PYTHONPATH", "")
+        
+        result = _run_tool(["pytest", *pytest_args], cwd=workdir, timeout=timeout, env=env)
+        assert result is not None
+        return _report_pytest_result(result.returncode == 0, result.stdout + result.stderr)
+        
+    except subprocess.TimeoutExpired:
+        return False, f"Таймаут выполнения тестов (>{timeout} сек)"
+    except FileNotFoundError:
+        return False, "pytest не найден. Установите: pip install pytest"
+    except Exception as e:
+        return False, f"Ошибка запуска pytest: {e}"
+
+
 def run_pytest(code_str: str, test_str: str) -> Tuple[bool, str]:
     """Запускает pytest для проверки что код проходит тесты.
     
@@ -144,50 +272,19 @@ def run_pytest(code_str: str, test_str: str) -> Tuple[bool, str]:
     
     with tempfile.TemporaryDirectory(prefix="pytest_validation_") as tmpdir:
         try:
-            # Создаём временные файлы
-            code_file = Path(tmpdir) / "code.py"
-            test_file = Path(tmpdir) / "test_code.py"
-            
-            code_file.write_text(code_str, encoding="utf-8")
-            
-            # Добавляем import code в начало тестов если его нет
-            # Это позволяет тестам использовать функции из code.py
-            test_str_with_import = _ensure_code_import(test_str)
-            test_file.write_text(test_str_with_import, encoding="utf-8")
-            
-            # Создаём __init__.py для правильного импорта
-            init_file = Path(tmpdir) / "__init__.py"
-            init_file.write_text("", encoding="utf-8")
-            
-            # Запускаем pytest с добавлением tmpdir в PYTHONPATH
-            env = os.environ.copy()
-            env["PYTHONPATH"] = tmpdir + os.pathsep + env.get("PYTHONPATH", "")
-            
-            result = subprocess.run(
-                ["pytest", str(test_file), "-v", "--tb=short", "-x"],
-                cwd=tmpdir,
-                capture_output=True,
-                text=True,
-                timeout=30,
-                env=env
-            )
-            
-            success = result.returncode == 0
-            output = result.stdout + result.stderr
-            
-            if success:
-                logger.info("✅ Все тесты прошли успешно")
-            else:
-                logger.warning(f"❌ Тесты не прошли: {output[:500]}")
-            
-            return success, output
-            
-        except subprocess.TimeoutExpired:
-            return False, "Таймаут выполнения тестов (>30 сек)"
-        except FileNotFoundError:
-            return False, "pytest не найден. Установите: pip install pytest"
+            workdir = _write_workspace(Path(tmpdir), code_str, test_str)
         except Exception as e:
             return False, f"Ошибка запуска pytest: {e}"
+        return _pytest_in_workspace(workdir)
+
+
+def _report_pytest_result(success: bool, output: str) -> Tuple[bool, str]:
+    """Логирует и возвращает результат pytest."""
+    if success:
+        logger.info("✅ Все тесты прошли успешно")
+    else:
+        logger.warning(f"❌ Тесты не прошли: {output[:500]}")
+    return success, output
 
 
 def _ensure_code_import(test_str: str) -> str:
@@ -255,6 +352,56 @@ def _ensure_code_import(test_str: str) -> str:
     return '\n'.join(lines)
 
 
+def _mypy_on(code_file: Path, cancel: Optional[threading.Event] = None) -> Optional[Tuple[bool, str]]:
+    """Запускает mypy для готового файла.
+    
+    Args:
+        code_file: Файл с кодом
+        cancel: Событие отмены
+        
+    Returns:
+        Кортеж (успех: bool, ошибки: str) или None, если проверка отменена
+    """
+    cmd = ["mypy", str(code_file), "--strict", "--no-error-summary"]
+    cache_dir = get_config().mypy_cache_dir
+    if cache_dir:
+        # Общий кэш: typeshed не разбирается заново в каждой временной директории
+        cmd += ["--cache-dir", str(Path(cache_dir).resolve())]
+    
+    try:
+        # Запускаем mypy в strict режиме
+        result = _run_tool(
+            cmd,
+            cwd=code_file.parent.parent,
+            timeout=30,
+            cancel=cancel
+        )
+        if result is None:
+            return None
+        
+        # mypy возвращает 0 если нет ошибок
+        success = result.returncode == 0
+        errors = result.stdout + result.stderr
+        
+        if success:
+            logger.info("✅ mypy проверка пройдена (0 ошибок)")
+        else:
+            # Показываем только первые несколько ошибок
+            error_lines = errors.split("\n")[:10]
+            logger.warning(f"❌ mypy нашёл ошибки: {' '.join(error_lines)}")
+        
+        return success, errors
+        
+    except subprocess.TimeoutExpired:
+        return False, "Таймаут проверки mypy (>30 сек)"
+    except FileNotFoundError:
+        logger.warning("⚠️ mypy не найден. Установите: pip install mypy")
+        # Если mypy не установлен, считаем проверку пропущенной (не ошибкой)
+        return True, "mypy не установлен, проверка пропущена"
+    except Exception as e:
+        return False, f"Ошибка запуска mypy: {e}"
+
+
 def check_mypy(code_str: str) -> Tuple[bool, str]:
     """Проверяет код с помощью mypy (type checking).
     
@@ -269,39 +416,59 @@ def check_mypy(code_str: str) -> Tuple[bool, str]:
     
     with tempfile.TemporaryDirectory(prefix="mypy_validation_") as tmpdir:
         try:
-            code_file = Path(tmpdir) / "code.py"
-            code_file.write_text(code_str, encoding="utf-8")
-            
-            # Запускаем mypy в strict режиме
-            result = subprocess.run(
-                ["mypy", str(code_file), "--strict", "--no-error-summary"],
-                cwd=tmpdir,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            # mypy возвращает 0 если нет ошибок
-            success = result.returncode == 0
-            errors = result.stdout + result.stderr
-            
-            if success:
-                logger.info("✅ mypy проверка пройдена (0 ошибок)")
-            else:
-                # Показываем только первые несколько ошибок
-                error_lines = errors.split("\n")[:10]
-                logger.warning(f"❌ mypy нашёл ошибки: {' '.join(error_lines)}")
-            
-            return success, errors
-            
-        except subprocess.TimeoutExpired:
-            return False, "Таймаут проверки mypy (>30 сек)"
-        except FileNotFoundError:
-            logger.warning("⚠️ mypy не найден. Установите: pip install mypy")
-            # Если mypy не установлен, считаем проверку пропущенной (не ошибкой)
-            return True, "mypy не установлен, проверка пропущена"
+            workdir = _write_workspace(Path(tmpdir), code_str, None)
         except Exception as e:
             return False, f"Ошибка запуска mypy: {e}"
+        result = _mypy_on(workdir / "code.py")
+        assert result is not None
+        return result
+
+
+def _bandit_on(code_file: Path, cancel: Optional[threading.Event] = None) -> Optional[Tuple[bool, str]]:
+    """Запускает bandit для готового файла.
+    
+    Args:
+        code_file: Файл с кодом
+        cancel: Событие отмены
+        
+    Returns:
+        Кортеж (успех: bool, проблемы: str) или None, если проверка отменена
+    """
+    try:
+        # Запускаем bandit с минимальным уровнем medium
+        result = _run_tool(
+            ["bandit", "-r", str(code_file), "-ll", "--format", "txt"],
+            cwd=code_file.parent.parent,
+            timeout=30,
+            cancel=cancel
+        )
+        if result is None:
+            return None
+        
+        output = result.stdout + result.stderr
+        
+        # bandit возвращает 0 если нет проблем уровня medium и выше
+        # По правилам нужен уровень medium и ниже
+        success = result.returncode == 0
+        
+        if success:
+            logger.info("✅ bandit проверка пройдена (нет критических проблем)")
+        else:
+            # Фильтруем только проблемы medium/high/critical
+            issues = [line for line in output.split("\n") 
+                     if any(level in line for level in ["Severity: ", "Issue: "])]
+            logger.warning(f"⚠️ bandit нашёл проблемы безопасности: {issues[:5]}")
+        
+        return success, output
+        
+    except subprocess.TimeoutExpired:
+        return False, "Таймаут проверки bandit (>30 сек)"
+    except FileNotFoundError:
+        logger.warning("⚠️ bandit не найден. Установите: pip install bandit")
+        # Если bandit не установлен, считаем проверку пропущенной
+        return True, "bandit не установлен, проверка пропущена"
+    except Exception as e:
+        return False, f"Ошибка запуска bandit: {e}"
 
 
 def check_bandit(code_str: str) -> Tuple[bool, str]:
@@ -318,50 +485,53 @@ def check_bandit(code_str: str) -> Tuple[bool, str]:
     
     with tempfile.TemporaryDirectory(prefix="bandit_validation_") as tmpdir:
         try:
-            code_file = Path(tmpdir) / "code.py"
-            code_file.write_text(code_str, encoding="utf-8")
-            
-            # Запускаем bandit с минимальным уровнем medium
-            result = subprocess.run(
-                ["bandit", "-r", str(code_file), "-ll", "--format", "txt"],
-                cwd=tmpdir,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            output = result.stdout + result.stderr
-            
-            # bandit возвращает 0 если нет проблем уровня medium и выше
-            # По правилам нужен уровень medium и ниже
-            success = result.returncode == 0
-            
-            if success:
-                logger.info("✅ bandit проверка пройдена (нет критических проблем)")
-            else:
-                # Фильтруем только проблемы medium/high/critical
-                issues = [line for line in output.split("\n") 
-                         if any(level in line for level in ["Severity: ", "Issue: "])]
-                logger.warning(f"⚠️ bandit нашёл проблемы безопасности: {issues[:5]}")
-            
-            return success, output
-            
-        except subprocess.TimeoutExpired:
-            return False, "Таймаут проверки bandit (>30 сек)"
-        except FileNotFoundError:
-            logger.warning("⚠️ bandit не найден. Установите: pip install bandit")
-            # Если bandit не установлен, считаем проверку пропущенной
-            return True, "bandit не установлен, проверка пропущена"
+            workdir = _write_workspace(Path(tmpdir), code_str, None)
         except Exception as e:
             return False, f"Ошибка запуска bandit: {e}"
+        result = _bandit_on(workdir / "code.py")
+        assert result is not None
+        return result
 
 
-def validate_code(code_str: str, test_str: Optional[str] = None) -> dict:
+# Начала сообщений о сбоях запуска инструментов (таймаут, нет инструмента):
+# такие результаты не кэшируются, при следующей попытке они могут пройти
+_TRANSIENT_PREFIXES = (
+    "Таймаут", "Ошибка запуска", "pytest не найден",
+    "mypy не установлен", "bandit не установлен"
+)
+
+
+def _is_cacheable(results: dict) -> bool:
+    """Можно ли кэшировать результаты (нет сбоев запуска инструментов)."""
+    for check, field in (("pytest", "output"), ("mypy", "errors"), ("bandit", "issues")):
+        if results[check].get(field, "").startswith(_TRANSIENT_PREFIXES):
+            return False
+    return True
+
+
+def validate_code(
+    code_str: str,
+    test_str: Optional[str] = None,
+    fail_fast: bool = False,
+    use_cache: bool = True
+) -> dict:
     """Комплексная валидация кода (pytest, mypy, bandit).
     
+    Проверки работают параллельно над одним workspace во временной
+    директории, поэтому время валидации близко к самой медленной
+    проверке, а не к их сумме.
+    
+    Результаты кэшируются по отпечатку кода и тестов
+    (infrastructure.validation_cache): код, отличающийся только
+    форматированием и комментариями, повторно не валидируется.
+    
     Args:
         code_str: Код для валидации
         test_str: Опциональные тесты для pytest
+        fail_fast: Если синтаксис или pytest не прошли, не ждать mypy и bandit
+            (они отменяются и помечаются "skipped": True). Нужен вызывающему
+            коду, которому достаточно первой причины провала
+        use_cache: Использовать кэш результатов валидации
         
     Returns:
         Словарь с результатами валидации:
@@ -369,9 +539,34 @@ def validate_code(code_str: str, test_str: Optional[str] = None) -> dict:
             "pytest": {"success": bool, "output": str},
             "mypy": {"success": bool, "errors": str},
             "bandit": {"success": bool, "issues": str},
-            "all_passed": bool
+            "all_passed": bool,
+            "fingerprint": str,  # отпечаток кода и тестов
+            "cached": bool  # результат взят из кэша
         }
     """
+    fingerprint = validation_fingerprint(code_str, test_str)
+    cache = get_validation_cache() if use_cache and code_str.strip() else None
+    
+    if cache is not None:
+        cached_results = cache.get(fingerprint, fail_fast)
+        if cached_results is not None:
+            logger.info("💾 Результат валидации взят из кэша (код не изменился)")
+            cached_results["fingerprint"] = fingerprint
+            cached_results["cached"] = True
+            return cached_results
+    
+    results = _run_validation(code_str, test_str, fail_fast)
+    
+    if cache is not None and _is_cacheable(results):
+        cache.set(fingerprint, results, fail_fast)
+    
+    results["fingerprint"] = fingerprint
+    results["cached"] = False
+    return results
+
+
+def _run_validation(code_str: str, test_str: Optional[str], fail_fast: bool) -> dict:
+    """Выполняет проверки validate_code без кэша."""
     results = {
         "pytest": {"success": False, "output": ""},
         "mypy": {"success": False, "errors": ""},
@@ -379,27 +574,70 @@ def validate_code(code_str: str, test_str: Optional[str] = None) -> dict:
         "all_passed": False
     }
     
-    # pytest проверка (если есть тесты)
+    if not code_str.strip():
+        if test_str:
+            results["pytest"] = {"success": False, "output": "Пустой код или тесты"}
+        results["mypy"] = {"success": False, "errors": "Пустой код"}
+        results["bandit"] = {"success": False, "issues": "Пустой код"}
+        return results
+    
+    run_tests = bool(test_str)
     if test_str:
-        pytest_success, pytest_output = run_pytest(code_str, test_str)
-        results["pytest"] = {"success": pytest_success, "output": pytest_output}
+        # Пустые тесты и синтаксис проверяем без запуска pytest
+        syntax_ok, syntax_errors = check_syntax_both(code_str, test_str)
+        if not test_str.strip():
+            failure: Optional[str] = "Пустой код или тесты"
+        elif not syntax_ok:
+            failure = "Синтаксические ошибки:\n" + "\n".join(syntax_errors)
+        else:
+            failure = None
+        
+        if failure is not None:
+            logger.warning(f"❌ Синтаксис не прошёл проверку до запуска pytest: {failure}")
+            results["pytest"] = {"success": False, "output": failure}
+            run_tests = False
+            if fail_fast:
+                results["mypy"] = {"success": True, "errors": "", "skipped": True}
+                results["bandit"] = {"success": True, "issues": "", "skipped": True}
+                return results
+    
+    with tempfile.TemporaryDirectory(prefix="validation_") as tmpdir:
+        workdir = _write_workspace(Path(tmpdir), code_str, test_str if run_tests else None)
+        code_file = workdir / "code.py"
+        cancel = threading.Event()
+        
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="validation") as executor:
+            mypy_future = executor.submit(_mypy_on, code_file, cancel)
+            bandit_future = executor.submit(_bandit_on, code_file, cancel)
+            
+            if run_tests:
+                pytest_success, pytest_output = _pytest_in_workspace(workdir)
+                results["pytest"] = {"success": pytest_success, "output": pytest_output}
+                if fail_fast and not pytest_success:
+                    # mypy и bandit ещё работают — результат уже известен
+                    cancel.set()
+            
+            mypy_result = mypy_future.result()
+            bandit_result = bandit_future.result()
     
-    # mypy проверка
-    mypy_success, mypy_errors = check_mypy(code_str)
-    results["mypy"] = {"success": mypy_success, "errors": mypy_errors}
+    if mypy_result is None:
+        results["mypy"] = {"success": True, "errors": "", "skipped": True}
+    else:
+        results["mypy"] = {"success": mypy_result[0], "errors": mypy_result[1]}
     
-    # bandit проверка
-    bandit_success, bandit_issues = check_bandit(code_str)
-    results["bandit"] = {"success": bandit_success, "issues": bandit_issues}
+    if bandit_result is None:
+        results["bandit"] = {"success": True, "issues": "", "skipped": True}
+    else:
+        results["bandit"] = {"success": bandit_result[0], "issues": bandit_result[1]}
     
     # Все проверки должны пройти
     pytest_result = results["pytest"]
-    mypy_result = results["mypy"]
-    bandit_result = results["bandit"]
+    mypy_result_dict = results["mypy"]
+    bandit_result_dict = results["bandit"]
     results["all_passed"] = (
         (pytest_result["success"] if test_str else True) and  # type: ignore[index]
-        mypy_result["success"] and  # type: ignore[index]
-        bandit_result["success"]  # type: ignore[index]
+        mypy_result_dict["success"] and  # type: ignore[index]
+        bandit_result_dict["success"]  # type: ignore[index]
     )
     
     return results